@@ -2,22 +2,47 @@
 
 from __future__ import annotations
 
+import contextlib
 import warnings
+from typing import Any, Iterator
 
 from google.adk import Agent
 from google.adk.tools.function_tool import FunctionTool
+from google.adk.tools.tool_context import ToolContext
 
 from .prompt import ORCHESTRATOR_PROMPT
 from .tools.diagramador import (
     DEFAULT_DATAMODEL_FILENAME,
     DEFAULT_DIAGRAM_FILENAME,
+    ASYNC_TOOLS,
     DEFAULT_MODEL,
+    PREWARM_TEMPLATES,
+    SESSION_STATE_ROOT,
+    TEMPLATE_WATCH_INTERVAL,
+    WATCH_TEMPLATES,
+    check_datamodel_integrity as _check_datamodel_integrity,
+    check_datamodel_integrity_async as _check_datamodel_integrity_async,
+    check_view_geometry as _check_view_geometry,
+    check_view_geometry_async as _check_view_geometry_async,
     describe_template as _describe_template,
+    describe_template_async as _describe_template_async,
+    diff_datamodels as _diff_datamodels,
+    diff_datamodels_async as _diff_datamodels_async,
+    fetch_preview_image as _fetch_preview_image,
+    fetch_preview_image_async as _fetch_preview_image_async,
     finalize_datamodel as _finalize_datamodel,
+    finalize_datamodel_async as _finalize_datamodel_async,
     generate_archimate_diagram as _generate_archimate_diagram,
+    generate_archimate_diagram_async as _generate_archimate_diagram_async,
     generate_mermaid_preview as _generate_mermaid_preview,
+    generate_mermaid_preview_async as _generate_mermaid_preview_async,
     list_templates as _list_templates,
+    list_templates_async as _list_templates_async,
+    query_datamodel_graph as _query_datamodel_graph,
+    query_datamodel_graph_async as _query_datamodel_graph_async,
     save_datamodel as _save_datamodel,
+    save_datamodel_async as _save_datamodel_async,
+    start_template_watcher,
 )
 
 warnings.filterwarnings("ignore", category=UserWarning, module=".*pydantic.*")
@@ -29,7 +54,20 @@ diagramador_description = (
 )
 
 
-def _make_tool(function, *, name: str | None = None):
+def _supports_async_tools() -> bool:
+    """Indica se as ferramentas devem ser registradas como corrotinas."""
+
+    if ASYNC_TOOLS in ("0", "false", "no"):
+        return False
+    if ASYNC_TOOLS in ("1", "true", "yes"):
+        return True
+    # O FunctionTool do ADK aguarda corrotinas a partir de ``run_async``.
+    return callable(getattr(FunctionTool, "run_async", None))
+
+
+def _make_tool(function, *, name: str | None = None, async_function=None):
+    if async_function is not None and _supports_async_tools():
+        function = async_function
     tool = FunctionTool(function)
     tool_name = name or getattr(function, "__tool_name__", None)
     if getattr(tool, "name", None) in (None, ""):
@@ -39,34 +77,126 @@ def _make_tool(function, *, name: str | None = None):
     return tool
 
 
+@contextlib.contextmanager
+def _session_state(tool_context: ToolContext | None) -> Iterator[Any]:
+    """Estado da sessão do ADK repassado às operações (isolamento de saídas, blueprints).
+
+    O ``State`` do ADK só registra no delta atribuições diretas; o bucket do agente é
+    reatribuído ao final para que mutações aninhadas sejam persistidas.
+    """
+
+    state = getattr(tool_context, "state", None)
+    yield state
+    if state is not None and SESSION_STATE_ROOT in state:
+        state[SESSION_STATE_ROOT] = state[SESSION_STATE_ROOT]
+
+
 def list_templates(directory: str = ""):
     """Wrapper to keep the public signature simple for automatic calling."""
 
     return _list_templates(directory or None)
 
 
-def describe_template(template_path: str):
-    return _describe_template(template_path, session_state=None)
+def describe_template(template_path: str, tool_context: ToolContext | None = None):
+    with _session_state(tool_context) as state:
+        return _describe_template(template_path, session_state=state)
+
+
+def generate_mermaid_preview(
+    datamodel: str,
+    template_path: str = "",
+    image_source: str = "",
+    detail: str = "",
+    tool_context: ToolContext | None = None,
+):
+    with _session_state(tool_context) as state:
+        return _generate_mermaid_preview(
+            datamodel,
+            template_path=template_path or None,
+            session_state=state,
+            image_source=image_source or None,
+            detail=detail or None,
+        )
+
+
+def fetch_preview_image(handle: str, tool_context: ToolContext | None = None):
+    with _session_state(tool_context) as state:
+        return _fetch_preview_image(handle, session_state=state)
+
+
+def check_datamodel_integrity(
+    datamodel: str, template_path: str = "", tool_context: ToolContext | None = None
+):
+    with _session_state(tool_context) as state:
+        return _check_datamodel_integrity(
+            datamodel,
+            template_path=template_path or None,
+            session_state=state,
+        )
+
+
+def query_datamodel_graph(
+    datamodel: str,
+    query: str,
+    element_id: str,
+    target_id: str = "",
+    relation_types: list[str] | None = None,
+    direction: str = "",
+    max_depth: int = 3,
+    tool_context: ToolContext | None = None,
+):
+    with _session_state(tool_context) as state:
+        return _query_datamodel_graph(
+            datamodel,
+            query,
+            element_id,
+            target_id=target_id or None,
+            relation_types=relation_types or None,
+            direction=direction or None,
+            max_depth=max_depth,
+            session_state=state,
+        )
+
+
+def diff_datamodels(
+    datamodel: str,
+    baseline: str = "",
+    template_path: str = "",
+    tool_context: ToolContext | None = None,
+):
+    with _session_state(tool_context) as state:
+        return _diff_datamodels(
+            datamodel,
+            baseline=baseline or None,
+            template_path=template_path or None,
+            session_state=state,
+        )
 
 
-def generate_mermaid_preview(datamodel: str, template_path: str = ""):
-    return _generate_mermaid_preview(
-        datamodel,
-        template_path=template_path or None,
-        session_state=None,
-    )
+def check_view_geometry(
+    datamodel: str, template_path: str = "", tool_context: ToolContext | None = None
+):
+    with _session_state(tool_context) as state:
+        return _check_view_geometry(
+            datamodel, template_path=template_path or None, session_state=state
+        )
 
 
-def finalize_datamodel(datamodel: str, template_path: str):
-    return _finalize_datamodel(datamodel, template_path, session_state=None)
+def finalize_datamodel(
+    datamodel: str, template_path: str, tool_context: ToolContext | None = None
+):
+    with _session_state(tool_context) as state:
+        return _finalize_datamodel(datamodel, template_path, session_state=state)
 
 
 def save_datamodel(
     datamodel: str,
     filename: str = DEFAULT_DATAMODEL_FILENAME,
+    tool_context: ToolContext | None = None,
 ):
     target = filename or DEFAULT_DATAMODEL_FILENAME
-    return _save_datamodel(datamodel, target)
+    with _session_state(tool_context) as state:
+        return _save_datamodel(datamodel, target, session_state=state)
 
 
 def generate_archimate_diagram(
@@ -75,15 +205,150 @@ def generate_archimate_diagram(
     template_path: str = "",
     validate: bool = True,
     xsd_dir: str = "",
+    force: bool = False,
+    tool_context: ToolContext | None = None,
 ):
     target_output = output_filename or DEFAULT_DIAGRAM_FILENAME
-    return _generate_archimate_diagram(
-        model_json_path,
-        output_filename=target_output,
-        template_path=template_path or None,
-        validate=validate,
-        xsd_dir=xsd_dir or None,
-    )
+    with _session_state(tool_context) as state:
+        return _generate_archimate_diagram(
+            model_json_path,
+            output_filename=target_output,
+            template_path=template_path or None,
+            validate=validate,
+            xsd_dir=xsd_dir or None,
+            session_state=state,
+            force=force,
+        )
+
+
+async def list_templates_async(directory: str = ""):
+    """Wrapper to keep the public signature simple for automatic calling."""
+
+    return await _list_templates_async(directory or None)
+
+
+async def describe_template_async(template_path: str, tool_context: ToolContext | None = None):
+    with _session_state(tool_context) as state:
+        return await _describe_template_async(template_path, session_state=state)
+
+
+async def generate_mermaid_preview_async(
+    datamodel: str,
+    template_path: str = "",
+    image_source: str = "",
+    detail: str = "",
+    tool_context: ToolContext | None = None,
+):
+    with _session_state(tool_context) as state:
+        return await _generate_mermaid_preview_async(
+            datamodel,
+            template_path=template_path or None,
+            session_state=state,
+            image_source=image_source or None,
+            detail=detail or None,
+        )
+
+
+async def fetch_preview_image_async(handle: str, tool_context: ToolContext | None = None):
+    with _session_state(tool_context) as state:
+        return await _fetch_preview_image_async(handle, session_state=state)
+
+
+async def check_datamodel_integrity_async(
+    datamodel: str, template_path: str = "", tool_context: ToolContext | None = None
+):
+    with _session_state(tool_context) as state:
+        return await _check_datamodel_integrity_async(
+            datamodel,
+            template_path=template_path or None,
+            session_state=state,
+        )
+
+
+async def query_datamodel_graph_async(
+    datamodel: str,
+    query: str,
+    element_id: str,
+    target_id: str = "",
+    relation_types: list[str] | None = None,
+    direction: str = "",
+    max_depth: int = 3,
+    tool_context: ToolContext | None = None,
+):
+    with _session_state(tool_context) as state:
+        return await _query_datamodel_graph_async(
+            datamodel,
+            query,
+            element_id,
+            target_id=target_id or None,
+            relation_types=relation_types or None,
+            direction=direction or None,
+            max_depth=max_depth,
+            session_state=state,
+        )
+
+
+async def diff_datamodels_async(
+    datamodel: str,
+    baseline: str = "",
+    template_path: str = "",
+    tool_context: ToolContext | None = None,
+):
+    with _session_state(tool_context) as state:
+        return await _diff_datamodels_async(
+            datamodel,
+            baseline=baseline or None,
+            template_path=template_path or None,
+            session_state=state,
+        )
+
+
+async def check_view_geometry_async(
+    datamodel: str, template_path: str = "", tool_context: ToolContext | None = None
+):
+    with _session_state(tool_context) as state:
+        return await _check_view_geometry_async(
+            datamodel, template_path=template_path or None, session_state=state
+        )
+
+
+async def finalize_datamodel_async(
+    datamodel: str, template_path: str, tool_context: ToolContext | None = None
+):
+    with _session_state(tool_context) as state:
+        return await _finalize_datamodel_async(datamodel, template_path, session_state=state)
+
+
+async def save_datamodel_async(
+    datamodel: str,
+    filename: str = DEFAULT_DATAMODEL_FILENAME,
+    tool_context: ToolContext | None = None,
+):
+    target = filename or DEFAULT_DATAMODEL_FILENAME
+    with _session_state(tool_context) as state:
+        return await _save_datamodel_async(datamodel, target, session_state=state)
+
+
+async def generate_archimate_diagram_async(
+    model_json_path: str,
+    output_filename: str = DEFAULT_DIAGRAM_FILENAME,
+    template_path: str = "",
+    validate: bool = True,
+    xsd_dir: str = "",
+    force: bool = False,
+    tool_context: ToolContext | None = None,
+):
+    target_output = output_filename or DEFAULT_DIAGRAM_FILENAME
+    with _session_state(tool_context) as state:
+        return await _generate_archimate_diagram_async(
+            model_json_path,
+            output_filename=target_output,
+            template_path=template_path or None,
+            validate=validate,
+            xsd_dir=xsd_dir or None,
+            session_state=state,
+            force=force,
+        )
 
 
 diagramador_agent = Agent(
@@ -92,19 +357,69 @@ diagramador_agent = Agent(
     description=diagramador_description,
     instruction=ORCHESTRATOR_PROMPT,
     tools=[
-        _make_tool(list_templates, name="list_templates"),
-        _make_tool(describe_template, name="describe_template"),
-        _make_tool(generate_mermaid_preview, name="generate_mermaid_preview"),
-        _make_tool(finalize_datamodel, name="finalize_datamodel"),
-        _make_tool(save_datamodel, name="save_datamodel"),
+        _make_tool(
+            list_templates,
+            name="list_templates",
+            async_function=list_templates_async,
+        ),
+        _make_tool(
+            describe_template,
+            name="describe_template",
+            async_function=describe_template_async,
+        ),
+        _make_tool(
+            generate_mermaid_preview,
+            name="generate_mermaid_preview",
+            async_function=generate_mermaid_preview_async,
+        ),
+        _make_tool(
+            fetch_preview_image,
+            name="fetch_preview_image",
+            async_function=fetch_preview_image_async,
+        ),
+        _make_tool(
+            check_datamodel_integrity,
+            name="check_datamodel_integrity",
+            async_function=check_datamodel_integrity_async,
+        ),
+        _make_tool(
+            query_datamodel_graph,
+            name="query_datamodel_graph",
+            async_function=query_datamodel_graph_async,
+        ),
+        _make_tool(
+            diff_datamodels,
+            name="diff_datamodels",
+            async_function=diff_datamodels_async,
+        ),
+        _make_tool(
+            check_view_geometry,
+            name="check_view_geometry",
+            async_function=check_view_geometry_async,
+        ),
+        _make_tool(
+            finalize_datamodel,
+            name="finalize_datamodel",
+            async_function=finalize_datamodel_async,
+        ),
+        _make_tool(
+            save_datamodel,
+            name="save_datamodel",
+            async_function=save_datamodel_async,
+        ),
         _make_tool(
             generate_archimate_diagram,
             name="generate_archimate_diagram",
+            async_function=generate_archimate_diagram_async,
         ),
     ],
 )
 
 
+if WATCH_TEMPLATES:
+    start_template_watcher(prewarm=PREWARM_TEMPLATES, interval=TEMPLATE_WATCH_INTERVAL)
+
+
 def get_root_agent() -> Agent:
     """Return the Diagramador agent instance.
 
@@ -33,17 +33,39 @@ validação XSD concluída.
    - Prepare um datamodel preliminar com os campos semânticos (`model_identifier`, `elements`,
      `relations`, `organizations`, `views`) e utilize `generate_mermaid_preview`, informando o
      `template_path`, para gerar diagramas Mermaid que reflitam a hierarquia do template e as
-     instruções/documentações aplicáveis. Utilize os metadados `image` retornados pela ferramenta
-     para construir URLs ou anexos visuais de cada visão.
-   - Apresente os diagramas como imagens Markdown (por exemplo, `![Visão](URL-gerado)`) com
-     renderização utilizando imagens PNG geradas pela pré-visualização,
-     acompanhados dos detalhes textuais de cada visão, e
-     solicite aprovação explícita antes de gravar o datamodel. Se o usuário pedir mudanças, atualize o
-     conteúdo e a pré-visualização até obter o aval final.
+     instruções/documentações aplicáveis. Os metadados `image` de cada visão apontam para o
+     arquivo gravado da imagem (o `url` é só a base do renderizador). Quando o layout real do
+     template for mais útil que o Mermaid (ou não houver acesso à rede), informe `image_source="svg"` para
+     receber um SVG desenhado localmente a partir das posições e estilos das visões.
+     Visões grandes voltam em modo compacto (sem notas, contêineres como `subgraph`) e, acima dos
+     limites por imagem, divididas em `parts`; mostre uma imagem por parte, na ordem. Use
+     `detail="full"` só se o usuário pedir todos os detalhes de uma visão pequena.
+     As imagens vêm por referência (`handle`, `path`, `sha256`, `width`/`height`), sem os bytes;
+     chame `fetch_preview_image` com o `handle` apenas quando precisar do conteúdo da imagem.
+   - Apresente cada visão indicando o artefato gerado pela pré-visualização (`image.path`, ou o
+     `image.handle`, com `width`/`height`), acompanhado dos detalhes textuais da visão, e
+     solicite aprovação explícita antes de gravar o datamodel. Não chame `fetch_preview_image`
+     só para exibir as visões: os bytes voltariam à conversa em base64. Se o usuário pedir
+     mudanças, atualize o conteúdo e a pré-visualização até obter o aval final.
+   - Quando o usuário perguntar o que mudou, use `diff_datamodels` com a versão anterior em
+     `baseline` (ou apenas o `template_path`, para comparar com o template) e resuma o changeset
+     devolvido em vez de comparar os JSONs manualmente.
 5. **Construção do datamodel base** (após aprovação):
    - Com a aprovação formal, consolide o datamodel base sem atributos de layout, mantendo os
      identificadores originais do template e assegurando coerência entre elementos, relações e
      organizações.
+   - Use `check_datamodel_integrity` (com o `template_path`) para confirmar que todas as
+     referências (`source`/`target`, `elementRef`, `relationshipRef`, `identifierRef`) resolvem e
+     que não há identificadores duplicados; corrija o datamodel antes de seguir. O mesmo relatório
+     volta no campo `integrity` de `finalize_datamodel`.
+   - Para perguntas pontuais sobre o modelo (vizinhos de um elemento, caminho entre dois
+     elementos, impacto de uma mudança ou em quais visões/pastas um elemento aparece), use
+     `query_datamodel_graph` com o datamodel (ou o nome do arquivo salvo) em vez de reler o
+     JSON completo; a resposta traz apenas o conjunto de resultados.
+   - Se o usuário reclamar de elementos encavalados ou fora do grupo, use `check_view_geometry`
+     (com o `template_path`) para listar sobreposições entre irmãos, filhos fora do contêiner e
+     contêineres vazios de cada visão; o resumo também volta no campo `geometry` de
+     `finalize_datamodel`.
 6. **Finalização, persistência e exportação**:
    - Acione `finalize_datamodel`, informando o `template_path` selecionado, para enriquecer o
      datamodel com todos os atributos e propriedades exigidos pelo template.
@@ -51,7 +73,8 @@ validação XSD concluída.
      artefato final em `outputs/` com o nome padrão ou solicitado pelo usuário.
    - Em seguida invoque `generate_archimate_diagram`, informando o `template_path` escolhido e, se
      necessário, o diretório de validação XSD (`xsd_dir`). O XML deve ser salvo em `outputs/` e
-     validado quando possível.
+     validado quando possível. Se template e datamodel não mudaram, o XML e a validação anteriores
+     são reaproveitados (`cached: true`); use `force=true` apenas para regenerar mesmo assim.
 7. **Resposta final ao usuário**:
    - Entregue um resumo executivo destacando atores, containers, integrações e decisões relevantes.
    - Informe explicitamente os caminhos dos artefatos gerados (JSON e XML) e o status da validação.
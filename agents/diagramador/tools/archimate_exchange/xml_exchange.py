@@ -43,7 +43,19 @@ Uso (CLI):
       --template template.xml \
       --model-json datamodel.json \
       --out out.xml \
-      [--validate-xsd-dir /caminho/para/xsds]
+      [--validate-xsd-dir /caminho/para/xsds [--structural-only]]
+
+A validação roda em duas etapas: primeiro as regras estruturais pré-compiladas dos XSDs
+(tipos, ordem dos filhos, obrigatórios, identificadores e referências, em uma passada);
+só se ela passar vem a validação XSD completa, dispensável com --structural-only.
+
+Uso em lote (diretório, glob ou manifesto de datamodels, processados em paralelo):
+  python archimate_template_patcher.py \
+      --template template.xml \
+      --batch "datamodels/*.json" | --manifest manifest.json \
+      --out-dir outputs/ \
+      [--validate-xsd-dir /caminho/para/xsds] [--workers 8] [--summary resumo.json] \
+      [--watch [--watch-interval 2]]
 
 Autor: você
 """
@@ -51,16 +63,26 @@ Autor: você
 from __future__ import annotations
 
 import argparse
+import copy
+import glob
+import hashlib
 import io
+import itertools
 import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 try:
     from lxml import etree as ET  # type: ignore
     LXML_AVAILABLE = True
 except ModuleNotFoundError:  # pragma: no cover - fallback for environments sem lxml
-    from xml.dom import minidom
     from xml.etree import ElementTree as _ET
 
     LXML_AVAILABLE = False
@@ -87,18 +109,24 @@ except ModuleNotFoundError:  # pragma: no cover - fallback for environments sem
                 tree = _ET.ElementTree(element_or_tree)
 
             buffer = io.BytesIO()
-            tree.write(buffer, encoding=encoding, xml_declaration=xml_declaration)
-            data = buffer.getvalue()
-
-            if pretty_print:
-                try:
-                    parsed = minidom.parseString(data)
-                    data = parsed.toprettyxml(indent="  ", encoding=encoding)
-                except Exception:
-                    # Mantém saída sem pretty print caso a formatação falhe
-                    pass
-
-            return data
+            if not pretty_print:
+                tree.write(buffer, encoding=encoding, xml_declaration=xml_declaration)
+                return buffer.getvalue()
+
+            # Identa na própria árvore (sem reparse em DOM) e devolve os espaços originais
+            # depois da escrita, para não alterar a árvore de quem chamou.
+            original = [(el, el.text, el.tail) for el in tree.iter()]
+            try:
+                _ET.indent(tree, space="  ")
+                if xml_declaration:
+                    buffer.write(f'<?xml version="1.0" encoding="{encoding}"?>\n'.encode(encoding))
+                tree.write(buffer, encoding=encoding, xml_declaration=False)
+            finally:
+                for el, text, tail in original:
+                    el.text = text
+                    el.tail = tail
+            buffer.write(b"\n")
+            return buffer.getvalue()
 
         @staticmethod
         def XMLSchema(*_args, **_kwargs):
@@ -112,10 +140,20 @@ except ModuleNotFoundError:  # pragma: no cover - fallback for environments sem
 
     ET = _CompatET()  # type: ignore
 
+try:
+    import sqlite3
+
+    SQLITE_AVAILABLE = True
+except ModuleNotFoundError:  # pragma: no cover - builds mínimos do Python sem sqlite3
+    SQLITE_AVAILABLE = False
+
 ARCHI_NS = "http://www.opengroup.org/xsd/archimate/3.0/"
 XSI_NS   = "http://www.w3.org/2001/XMLSchema-instance"
 XML_NS   = "http://www.w3.org/XML/1998/namespace"
 
+# incrementar sempre que o XML gerado para as mesmas entradas mudar (invalida os caches de saída)
+GENERATOR_VERSION = f"1-{'lxml' if LXML_AVAILABLE else 'stdlib'}"
+
 
 def qn(tag: str) -> str:
     """Retorna o QName completo para uma tag dentro do namespace ArchiMate."""
@@ -146,6 +184,154 @@ def _serialize_tree(tree: "ET.ElementTree") -> str:
         return xml_bytes.decode("utf-8")
     return xml_bytes
 
+# -------------------- Caches de processo (templates e XSDs) --------------------
+
+_CACHE_LOCK = threading.Lock()
+# caminho absoluto do template -> (assinatura do arquivo, árvore parseada)
+_TEMPLATE_TREE_CACHE: Dict[str, tuple] = {}
+# diretório absoluto de XSDs -> (assinaturas dos XSDs de origem, schema compilado, lock)
+_SCHEMA_CACHE: Dict[str, tuple] = {}
+# diretório absoluto de XSDs -> (assinaturas dos XSDs de origem, regras estruturais)
+_RULES_CACHE: Dict[str, tuple] = {}
+# caminho absoluto do template -> (assinatura do arquivo, plano de patch compilado)
+_PATCH_PLAN_CACHE: Dict[str, tuple] = {}
+# diretório absoluto de XSDs -> (assinaturas dos XSDs de origem, impressão digital do conteúdo)
+_SCHEMA_FINGERPRINT_CACHE: Dict[str, tuple] = {}
+
+_SCHEMA_SOURCES = ("archimate3_Model.xsd", "archimate3_View.xsd", "archimate3_Diagram.xsd")
+
+
+def file_sha256(path: str | Path) -> str:
+    """SHA-256 (hex) do conteúdo do arquivo, lido em blocos de 1 MiB."""
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(path: str | Path) -> Optional[tuple[int, int]]:
+    """Retorna ``(mtime_ns, tamanho)`` do arquivo ou ``None`` se ele não existir."""
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def atomic_write_bytes(path: str | Path, data: bytes) -> Path:
+    """Grava ``data`` em um temporário no mesmo diretório e o move com ``os.replace``.
+
+    Leitores concorrentes veem o arquivo antigo ou o novo, nunca uma escrita parcial.
+    """
+
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{target.name}.", suffix=".tmp", dir=target.parent)
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_name, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+    return target
+
+
+def atomic_write_text(path: str | Path, text: str, encoding: str = "utf-8") -> Path:
+    return atomic_write_bytes(path, text.encode(encoding))
+
+
+def _cache_key(path: str | Path) -> str:
+    return str(Path(path).resolve())
+
+
+def load_template_tree(template_xml: str | Path) -> "ET.ElementTree":
+    """Retorna uma cópia privada da árvore do template, parseando-o apenas quando muda."""
+
+    key = _cache_key(template_xml)
+    signature = file_signature(Path(key))
+    with _CACHE_LOCK:
+        entry = _TEMPLATE_TREE_CACHE.get(key)
+    if entry is None or entry[0] != signature:
+        tree = ET.parse(key)
+        if signature is not None:
+            with _CACHE_LOCK:
+                _TEMPLATE_TREE_CACHE[key] = (signature, tree)
+    else:
+        tree = entry[1]
+    return copy.deepcopy(tree)
+
+
+def _schema_signature(xsd_dir: Path) -> tuple:
+    return tuple(file_signature(xsd_dir / name) for name in _SCHEMA_SOURCES)
+
+
+def paths_overlap(candidate: str, prefixes: Iterable[str]) -> bool:
+    """Indica se ``candidate`` está contido em algum prefixo ou o contém.
+
+    Nos dois sentidos: invalidar um diretório atinge os arquivos abaixo dele e invalidar
+    um arquivo atinge as entradas indexadas pelo diretório que o contém.
+    """
+
+    for prefix in prefixes:
+        if candidate == prefix or candidate.startswith(prefix.rstrip(os.sep) + os.sep):
+            return True
+        if prefix.startswith(candidate.rstrip(os.sep) + os.sep):
+            return True
+    return False
+
+
+def invalidate_caches(paths: Optional[Iterable[str | Path]] = None) -> int:
+    """Descarta árvores de template e schemas compilados afetados pelos caminhos.
+
+    Sem ``paths`` todos os caches são limpos. Um caminho de diretório invalida tudo o que
+    estiver abaixo dele; um arquivo ``.xsd`` invalida o schema do diretório que o contém.
+    Retorna a quantidade de entradas removidas.
+    """
+
+    with _CACHE_LOCK:
+        if paths is None:
+            removed = (
+                len(_TEMPLATE_TREE_CACHE)
+                + len(_SCHEMA_CACHE)
+                + len(_RULES_CACHE)
+                + len(_PATCH_PLAN_CACHE)
+                + len(_SCHEMA_FINGERPRINT_CACHE)
+            )
+            _TEMPLATE_TREE_CACHE.clear()
+            _SCHEMA_CACHE.clear()
+            _RULES_CACHE.clear()
+            _PATCH_PLAN_CACHE.clear()
+            _SCHEMA_FINGERPRINT_CACHE.clear()
+            return removed
+
+        targets = [_cache_key(path) for path in paths]
+        removed = 0
+        for key in [k for k in _TEMPLATE_TREE_CACHE if paths_overlap(k, targets)]:
+            del _TEMPLATE_TREE_CACHE[key]
+            removed += 1
+        for key in [k for k in _SCHEMA_CACHE if paths_overlap(k, targets)]:
+            del _SCHEMA_CACHE[key]
+            removed += 1
+        for key in [k for k in _RULES_CACHE if paths_overlap(k, targets)]:
+            del _RULES_CACHE[key]
+            removed += 1
+        for key in [k for k in _PATCH_PLAN_CACHE if paths_overlap(k, targets)]:
+            del _PATCH_PLAN_CACHE[key]
+            removed += 1
+        for key in [k for k in _SCHEMA_FINGERPRINT_CACHE if paths_overlap(k, targets)]:
+            del _SCHEMA_FINGERPRINT_CACHE[key]
+            removed += 1
+        return removed
+
 # Ordem de filhos que manipulamos (subset suficiente e seguro)
 ORDER: Dict[str, list[str]] = {
     "model": [
@@ -281,14 +467,19 @@ def _upsert_in_order(parent: ET._Element, tag: str, text: str, lang: Optional[st
         parent.insert(insert_pos, el)
         return el
 
-    # substitui conteúdo
+    _replace_text(existing, text, lang)
+    return existing
+
+
+def _replace_text(existing: ET._Element, text: str, lang: Optional[str]) -> None:
+    """Troca o conteúdo de um elemento de texto existente, descartando filhos indevidos."""
+
     for c in list(existing):
         existing.remove(c)
     existing.text = text
     # só seta xml:lang se for fornecido (evita mudar o template desnecessariamente)
     if lang is not None:
         existing.set(ET.QName(XML_NS, "lang"), lang)
-    return existing
 
 def _upsert_element(el_root: ET._Element, item: dict) -> ET._Element:
     """Upsert de <element> com 'xsi:type' **sem prefixo** e filhos ordenados (<name>, <documentation>)."""
@@ -351,7 +542,7 @@ def _upsert_relationship(rel_root: ET._Element, rel: dict) -> ET._Element:
     return target
 
 
-def _build_elements_tree(items: list[dict]) -> ET._Element:
+def _build_elements_tree(items: Iterable[dict]) -> ET._Element:
     root = ET.Element(qn("elements"))
     for item in items:
         el = ET.Element(qn("element"))
@@ -373,7 +564,7 @@ def _build_elements_tree(items: list[dict]) -> ET._Element:
     return root
 
 
-def _build_relationships_tree(items: list[dict]) -> ET._Element:
+def _build_relationships_tree(items: Iterable[dict]) -> ET._Element:
     root = ET.Element(qn("relationships"))
     for rel in items:
         el = ET.Element(qn("relationship"))
@@ -679,52 +870,349 @@ def _build_diagrams(payload: dict) -> Optional[ET._Element]:
         diagrams_el.append(view_el)
     return diagrams_el
 
+# ---------------------------------------------------------------------------
+# Leitura incremental do datamodel
+# ---------------------------------------------------------------------------
+
+# chaves de topo cujos itens são entregues um a um, sem materializar a lista
+STREAMED_MODEL_KEYS = ("elements", "relations")
+_STREAM_CHUNK_SIZE = 1 << 20
+_JSON_WS = re.compile(r"[ \t\n\r]*")
+
+
+class _JsonStreamReader:
+    """Lê o objeto JSON de topo de um arquivo em blocos, decodificando um valor por vez.
+
+    Cada valor (ou cada item das listas em ``STREAMED_MODEL_KEYS``) é decodificado com o
+    scanner em C do módulo ``json`` sobre um buffer que só guarda o trecho ainda não
+    consumido, então o texto completo nunca coexiste com os objetos já construídos. Um
+    ``str`` já em memória é percorrido diretamente, sem cópia para um stream.
+    """
+
+    __slots__ = ("_fp", "_buffer", "_pos", "_eof", "_decoder", "_chunk")
+
+    def __init__(self, source: io.TextIOBase | str, chunk_size: int = _STREAM_CHUNK_SIZE) -> None:
+        if isinstance(source, str):
+            self._fp = None
+            self._buffer = source
+            self._eof = True
+        else:
+            self._fp = source
+            self._buffer = ""
+            self._eof = False
+        self._pos = 0
+        self._decoder = json.JSONDecoder()
+        self._chunk = chunk_size
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        # leituras crescem com o buffer pendente: valores grandes custam O(n) no total
+        data = self._fp.read(max(self._chunk, len(self._buffer) - self._pos))
+        if not data:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self._pos = _JSON_WS.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str) -> None:
+        found = self._peek()
+        if found != char:
+            raise ValueError(
+                f"JSON inválido no datamodel: esperado {char!r}, encontrado {found or 'fim do arquivo'!r}."
+            )
+        self._pos += 1
+
+    def _decode(self) -> Any:
+        self._peek()
+        scan = self._decoder.scan_once
+        while True:
+            try:
+                value, end = scan(self._buffer, self._pos)
+            except (json.JSONDecodeError, StopIteration) as exc:
+                if self._fill():
+                    continue
+                if isinstance(exc, json.JSONDecodeError):
+                    raise
+                raise json.JSONDecodeError("Expecting value", self._buffer, self._pos) from None
+            # um número no fim do buffer pode continuar no próximo bloco
+            if end >= len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _items(self) -> Iterator[Any]:
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._decode()
+            separator = self._peek()
+            self._pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError("JSON inválido no datamodel: lista malformada.")
+
+    def sections(self) -> Iterator[Tuple[str, Any]]:
+        """Gera ``(chave, valor)`` do objeto de topo, na ordem do arquivo.
+
+        Para as chaves em ``STREAMED_MODEL_KEYS`` o valor é um iterador sobre os itens,
+        que deve ser consumido antes do próximo par (o restante é descartado se não for).
+        """
+
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            self._expect_end()
+            return
+        while True:
+            key = self._decode()
+            if not isinstance(key, str):
+                raise ValueError("JSON inválido no datamodel: chave de objeto esperada.")
+            self._expect(":")
+            if key in STREAMED_MODEL_KEYS and self._peek() == "[":
+                items = self._items()
+                yield key, items
+                for _ in items:
+                    pass
+            else:
+                yield key, self._decode()
+            separator = self._peek()
+            self._pos += 1
+            if separator == "}":
+                self._expect_end()
+                return
+            if separator != ",":
+                raise ValueError("JSON inválido no datamodel: objeto malformado.")
+
+    def _expect_end(self) -> None:
+        if self._peek():
+            raise ValueError("JSON inválido no datamodel: conteúdo após o objeto de topo.")
+
+
+def iter_model_sections(model_json: str | Path | io.TextIOBase) -> Iterator[Tuple[str, Any]]:
+    """Percorre o datamodel (arquivo ou stream de texto) sem carregá-lo inteiro.
+
+    ``elements`` e ``relations`` chegam como iteradores de itens; as demais chaves, como
+    valores já decodificados.
+    """
+
+    if isinstance(model_json, io.TextIOBase):
+        yield from _JsonStreamReader(model_json).sections()
+        return
+    with open(model_json, "r", encoding="utf-8") as fp:
+        yield from _JsonStreamReader(fp).sections()
+
+
+def iter_model_text_sections(text: str) -> Iterator[Tuple[str, Any]]:
+    """Como ``iter_model_sections``, sobre um datamodel que já está em memória como texto."""
+
+    yield from _JsonStreamReader(text).sections()
+
+
+# -------------------- Planos de patch por template --------------------
+
+# filhos de <model> que o datamodel substitui, na ordem em que o patch sempre os aplicou
+_PATCH_SLOTS = ("name", "elements", "relationships", "organizations")
+
+
+class TemplatePatchPlan:
+    """Estrutura de um template pré-compilada para o patch.
+
+    O esqueleto é o template já normalizado (``_ensure_views_sequence`` e
+    ``_ensure_view_children_order`` aplicados uma única vez) sem as seções que o datamodel
+    substitui: <name>, <elements>, <relationships>, <organizations> e <views>/<diagrams>.
+    As seções retiradas ficam em ``defaults`` para quando o datamodel não as trouxer, e
+    ``slots`` guarda, para cada uma (presente ou não no template), o índice entre os filhos
+    do esqueleto em que ela entra, com a mesma posição que ``_upsert_in_order`` e
+    ``_replace_child`` calculariam. Aplicar o plano é copiar o esqueleto e encaixar as
+    seções por índice, sem percorrer a árvore.
+    """
+
+    __slots__ = ("skeleton", "slots", "defaults", "views_index", "diagrams_index", "views_shell")
+
+    def __init__(self, tree: "ET.ElementTree") -> None:
+        self._compile(tree)
+
+    # ---- compilação ----
+
+    def _compile(self, tree: "ET.ElementTree") -> None:
+        root = tree.getroot()
+        _ensure_views_sequence(root)
+        _ensure_view_children_order(root)
+
+        seq = ORDER["model"]
+        children = list(root)
+        self.defaults: Dict[str, ET._Element] = {}
+        anchors: Dict[str, float] = {}
+        for index, child in enumerate(children):
+            local = _local_name(child.tag)
+            if local in _PATCH_SLOTS and local not in self.defaults:
+                self.defaults[local] = child
+                anchors[local] = index
+        for tag in _PATCH_SLOTS:
+            if tag in anchors:
+                continue
+            # ausente: entra antes do primeiro filho que vem depois dele na sequência
+            rank = seq.index(tag)
+            anchors[tag] = len(children) - 0.5
+            for index, child in enumerate(children):
+                local = _local_name(child.tag)
+                if local in seq and seq.index(local) > rank:
+                    anchors[tag] = index - 0.5
+                    break
+
+        kept = [child for child in children if child not in self.defaults.values()]
+        for child in self.defaults.values():
+            root.remove(child)
+
+        # (índice no esqueleto, desempate pela posição original e pela sequência, tag)
+        slots = []
+        for tag, anchor in anchors.items():
+            position = sum(1 for index, child in enumerate(children) if index < anchor and child in kept)
+            slots.append((position, anchor, seq.index(tag), tag))
+        self.slots: Tuple[Tuple[int, str], ...] = tuple(
+            (position, tag) for position, _, _, tag in sorted(slots)
+        )
+
+        self.views_index: Optional[int] = None
+        self.diagrams_index: Optional[int] = None
+        views = root.find(qn("views"))
+        if views is not None:
+            self.views_index = kept.index(views)
+            diagrams = views.find(qn("diagrams"))
+            if diagrams is not None:
+                self.diagrams_index = list(views).index(diagrams)
+                self.defaults["diagrams"] = diagrams
+                views.remove(diagrams)
+
+        # <views> mínimo para templates sem visões cujo datamodel as traz
+        holder = ET.Element(qn("model"))
+        self.views_shell = ET.SubElement(holder, qn("views"))
+        _ensure_views_sequence(holder)
+        holder.remove(self.views_shell)
+        self.skeleton = tree
+
+    # ---- aplicação ----
+
+    def apply(
+        self,
+        sections: Dict[str, Optional[ET._Element]],
+        *,
+        identifier: Optional[str] = None,
+        name: Optional[Tuple[str, Optional[str]]] = None,
+    ) -> "ET.ElementTree":
+        """Gera uma árvore nova a partir do esqueleto.
+
+        ``sections`` mapeia seções de ``_PATCH_SLOTS`` e ``diagrams`` para o elemento novo
+        (``None`` remove a seção); seções ausentes mantêm o conteúdo do template. ``name``
+        é ``(texto, idioma)`` do <name> do modelo.
+        """
+
+        tree = copy.deepcopy(self.skeleton)
+        root = tree.getroot()
+        if identifier:
+            root.set("identifier", identifier)
+        views = root[self.views_index] if self.views_index is not None else None
+
+        placed: List[Tuple[int, ET._Element]] = []
+        for position, tag in self.slots:
+            if tag == "name" and name is not None:
+                element = self.defaults.get("name")
+                if element is None:
+                    element = ET.Element(qn("name"))
+                    if name[1]:
+                        element.set(ET.QName(XML_NS, "lang"), name[1])
+                    element.text = name[0]
+                else:
+                    element = copy.deepcopy(element)
+                    _replace_text(element, *name)
+            elif tag in sections:
+                element = sections[tag]
+            elif tag in self.defaults:
+                element = copy.deepcopy(self.defaults[tag])
+            else:
+                element = None
+            if element is not None:
+                placed.append((position, element))
+        # de trás para frente: cada inserção não desloca as posições ainda por aplicar
+        for position, element in reversed(placed):
+            root.insert(position, element)
+
+        if "diagrams" in sections:
+            if views is None:
+                views = copy.deepcopy(self.views_shell)
+                root.append(views)
+            diagrams = sections["diagrams"]
+            if diagrams is not None:
+                _order_view_children(diagrams)
+                if self.diagrams_index is None:
+                    views.append(diagrams)
+                else:
+                    views.insert(self.diagrams_index, diagrams)
+        elif views is not None and "diagrams" in self.defaults:
+            views.insert(self.diagrams_index, copy.deepcopy(self.defaults["diagrams"]))
+        return tree
+
+
+def load_patch_plan(template_xml: str | Path) -> TemplatePatchPlan:
+    """Retorna o plano de patch do template, recompilando apenas quando o arquivo muda."""
+
+    key = _cache_key(template_xml)
+    signature = file_signature(Path(key))
+    with _CACHE_LOCK:
+        entry = _PATCH_PLAN_CACHE.get(key)
+    if entry is not None and entry[0] == signature:
+        return entry[1]
+    plan = TemplatePatchPlan(load_template_tree(key))
+    if signature is not None:
+        with _CACHE_LOCK:
+            _PATCH_PLAN_CACHE[key] = (signature, plan)
+    return plan
+
+
 def patch_template_with_model(template_xml: str | Path, model_json: str | Path, out_xml: str | Path) -> Path:
     """Copia o template.xml, aplica patch com os dados do datamodel e grava o resultado."""
     template_xml = Path(template_xml)
     model_json = Path(model_json)
     out_xml = Path(out_xml)
 
-    tree = ET.parse(str(template_xml))
-    root = tree.getroot()  # mantém namespaces como no arquivo
-
-    model = json.loads(model_json.read_text(encoding="utf-8"))
+    plan = load_patch_plan(template_xml)
+
+    # elements/relations vão item a item do arquivo para os builders; as demais seções
+    # são pequenas e ficam em `model`
+    model: Dict[str, Any] = {}
+    sections: Dict[str, Optional[ET._Element]] = {}
+    for key, value in iter_model_sections(model_json):
+        if key == "elements":
+            sections["elements"] = _build_elements_tree(value if value is not None else [])
+        elif key == "relations":
+            sections["relationships"] = _build_relationships_tree(value if value is not None else [])
+        else:
+            model[key] = value
 
-    # metadados do model
-    if model.get("model_identifier"):
-        root.set("identifier", model["model_identifier"])
+    name = None
     if model.get("model_name"):
         nm_text, nm_lang = _normalize_text_payload(model.get("model_name"))
         if nm_text:
-            _upsert_in_order(root, "name", nm_text, nm_lang)
-
-    # elements
-    if "elements" in model:
-        el_tree = _build_elements_tree(model.get("elements", []))
-        _replace_child(root, "elements", el_tree)
-
-    # relationships
-    if "relations" in model:
-        rel_tree = _build_relationships_tree(model.get("relations", []))
-        _replace_child(root, "relationships", rel_tree)
-
-    # organizations
+            name = (nm_text, nm_lang)
     if "organizations" in model:
-        orgs_el = _build_organizations(model.get("organizations"))
-        _replace_child(root, "organizations", orgs_el)
-
-    # views (diagrams)
+        sections["organizations"] = _build_organizations(model.get("organizations"))
     if "views" in model:
-        views_payload = model.get("views") or {}
-        views_root = root.find(qn("views"))
-        if views_root is None:
-            views_root = ET.SubElement(root, qn("views"))
-        diagrams_el = _build_diagrams(views_payload)
-        _replace_child(views_root, "diagrams", diagrams_el)
+        sections["diagrams"] = _build_diagrams(model.get("views") or {})
 
-    # garante ordem correta dentro de <views>
-    _ensure_views_sequence(tree)
-    _ensure_view_children_order(tree)
+    tree = plan.apply(sections, identifier=model.get("model_identifier"), name=name)
 
     _prune_invalid_identifierRefs(tree)
 
@@ -733,8 +1221,7 @@ def patch_template_with_model(template_xml: str | Path, model_json: str | Path,
     xml_txt = _serialize_tree(tree)
     xml_txt = xml_txt.replace("&amp;#xD;", "&#xD;")
 
-    out_xml.parent.mkdir(parents=True, exist_ok=True)
-    out_xml.write_text(xml_txt, encoding="utf-8")
+    atomic_write_text(out_xml, xml_txt)
     return out_xml
 
 def _ensure_views_sequence(root: ET._Element) -> None:
@@ -775,25 +1262,7 @@ def _ensure_view_children_order(root: ET._Element) -> None:
     diagrams = views.find(qn("diagrams"))
     if diagrams is None: return
 
-    # Alguns templates usam tag 'view' (Archi) — cobrir 'view' e 'diagram' por segurança
-    for tag in ("view", "diagram"):
-        for v in diagrams.findall(qn(tag)):
-            # procura <name>
-            name_el = None
-            for ch in v:
-                if _local_name(ch.tag) == "name":
-                    name_el = ch
-                    break
-            if name_el is None:
-                name_el = ET.Element(qn("name"))
-                name_el.text = "View"
-                v.insert(0, name_el)
-            else:
-                # move para primeira posição se necessário
-                first = v[0] if len(v) else None
-                if first is not name_el:
-                    v.remove(name_el)
-                    v.insert(0, name_el)
+    _order_view_children(diagrams)
     """
     Garante a ordem e o conteúdo mínimo de <views>:
       - <viewpoints> (obrigatório) ANTES de <diagrams>
@@ -867,6 +1336,30 @@ def _ensure_view_children_order(root: ET._Element) -> None:
             idx = children.index(diagrams)
             views.insert(idx, viewpoints)
 
+def _order_view_children(diagrams: ET._Element) -> None:
+    """Garante <name> (criado se faltar) como primeiro filho de cada visão de <diagrams>."""
+
+    # Alguns templates usam tag 'view' (Archi) — cobrir 'view' e 'diagram' por segurança
+    for tag in ("view", "diagram"):
+        for v in diagrams.findall(qn(tag)):
+            # procura <name>
+            name_el = None
+            for ch in v:
+                if _local_name(ch.tag) == "name":
+                    name_el = ch
+                    break
+            if name_el is None:
+                name_el = ET.Element(qn("name"))
+                name_el.text = "View"
+                v.insert(0, name_el)
+            else:
+                # move para primeira posição se necessário
+                first = v[0] if len(v) else None
+                if first is not name_el:
+                    v.remove(name_el)
+                    v.insert(0, name_el)
+
+
 # -------------------- Validação opcional por XSD (offline) --------------------
 
 def _ensure_local_xml_xsd(xsd_dir: Path) -> Path:
@@ -886,26 +1379,24 @@ def _ensure_local_xml_xsd(xsd_dir: Path) -> Path:
         )
     return xml_xsd
 
-def validate_with_full_xsd(xml_path: str | Path, xsd_dir: str | Path) -> tuple[bool, list[str]]:
-    """
-    Valida o XML gerado contra o conjunto completo de XSDs.
-    Preferência: archimate3_Diagram.xsd (que redefine ViewsType para permitir <diagrams>).
-    - Patching local: substitui o schemaLocation do xml.xsd dentro do Model.xsd
-      e faz com que os demais XSDs apontem para as versões locais.
-    """
-    if not LXML_AVAILABLE:
-        return False, [
-            "Validação indisponível: instale a dependência opcional 'lxml' (ex.: pip install lxml)."
-        ]
+def _write_if_changed(path: Path, text: str) -> None:
+    """Evita reescrever os XSDs locais (e disparar observadores) quando nada mudou."""
 
-    xml_path = Path(xml_path)
-    xsd_dir = Path(xsd_dir)
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return
+    except OSError:
+        pass
+    # vários processos podem compilar o mesmo diretório ao mesmo tempo
+    atomic_write_text(path, text)
+
+
+def _compile_schema(xsd_dir: Path):
+    """Gera as cópias locais dos XSDs e compila o schema mais completo disponível."""
 
     diagram_xsd = xsd_dir / "archimate3_Diagram.xsd"
     view_xsd = xsd_dir / "archimate3_View.xsd"
     model_xsd = xsd_dir / "archimate3_Model.xsd"
-    if not model_xsd.exists():
-        return False, [f"XSD não encontrado: {model_xsd}"]
 
     # garante xml.xsd local
     _ensure_local_xml_xsd(xsd_dir)
@@ -917,7 +1408,7 @@ def validate_with_full_xsd(xml_path: str | Path, xsd_dir: str | Path) -> tuple[b
         'schemaLocation="xml.xsd"'
     )
     model_local = xsd_dir / "_archimate3_Model_local.xsd"
-    model_local.write_text(model_txt, encoding="utf-8")
+    _write_if_changed(model_local, model_txt)
 
     view_local: Optional[Path] = None
     if view_xsd.exists():
@@ -928,7 +1419,7 @@ def validate_with_full_xsd(xml_path: str | Path, xsd_dir: str | Path) -> tuple[b
             'schemaLocation="_archimate3_Model_local.xsd"'
         )
         view_local = xsd_dir / "_archimate3_View_local.xsd"
-        view_local.write_text(view_txt, encoding="utf-8")
+        _write_if_changed(view_local, view_txt)
 
     diagram_local: Optional[Path] = None
     if view_local is not None and diagram_xsd.exists():
@@ -939,7 +1430,7 @@ def validate_with_full_xsd(xml_path: str | Path, xsd_dir: str | Path) -> tuple[b
             'schemaLocation="_archimate3_View_local.xsd"'
         )
         diagram_local = xsd_dir / "_archimate3_Diagram_local.xsd"
-        diagram_local.write_text(diagram_txt, encoding="utf-8")
+        _write_if_changed(diagram_local, diagram_txt)
 
     if diagram_local is not None:
         schema_doc = ET.parse(str(diagram_local))
@@ -948,32 +1439,971 @@ def validate_with_full_xsd(xml_path: str | Path, xsd_dir: str | Path) -> tuple[b
     else:
         # fallback: validar só com o Model (sem views)
         schema_doc = ET.parse(str(model_local))
-    schema = ET.XMLSchema(schema_doc)
+    return ET.XMLSchema(schema_doc)
+
+
+def _schema_entry(xsd_dir: str | Path) -> tuple:
+    key = _cache_key(xsd_dir)
+    signature = _schema_signature(Path(key))
+    with _CACHE_LOCK:
+        entry = _SCHEMA_CACHE.get(key)
+    if entry is not None and entry[0] == signature:
+        return entry
+    # o error_log do lxml pertence ao objeto schema: validações concorrentes são serializadas
+    entry = (signature, _compile_schema(Path(key)), threading.Lock())
+    with _CACHE_LOCK:
+        _SCHEMA_CACHE[key] = entry
+    return entry
+
+
+def load_schema(xsd_dir: str | Path):
+    """Retorna o schema compilado do diretório, recompilando apenas se os XSDs mudarem."""
+
+    return _schema_entry(xsd_dir)[1]
+
+
+# -------------------- Cache persistente de veredictos XSD --------------------
+
+# marca o caminho do XML nas mensagens guardadas (o mesmo conteúdo pode vir de outro arquivo)
+_VERDICT_PATH_MARK = "{xml}"
+_VERDICT_STORES: Dict[str, "VerdictStore"] = {}
+
+
+def _schema_fingerprint(xsd_dir: Path) -> str:
+    """Hash do conteúdo dos XSDs de origem e da versão do libxml2 (que redige as mensagens)."""
+
+    key = _cache_key(xsd_dir)
+    signature = _schema_signature(Path(key))
+    with _CACHE_LOCK:
+        entry = _SCHEMA_FINGERPRINT_CACHE.get(key)
+    if entry is not None and entry[0] == signature:
+        return entry[1]
+    digest = hashlib.sha256(repr(getattr(ET, "LIBXML_VERSION", None)).encode("utf-8"))
+    for name in _SCHEMA_SOURCES:
+        try:
+            content = (Path(key) / name).read_bytes()
+        except OSError:
+            continue
+        digest.update(name.encode("utf-8") + b"\0" + hashlib.sha256(content).digest())
+    fingerprint = digest.hexdigest()
+    with _CACHE_LOCK:
+        _SCHEMA_FINGERPRINT_CACHE[key] = (signature, fingerprint)
+    return fingerprint
+
+
+# gravações entre duas verificações do limite de ``VerdictStore.max_entries``
+_VERDICT_PRUNE_EVERY = 64
+
+
+class VerdictStore:
+    """Veredictos ``(ok, erros)`` da validação XSD completa, persistidos em SQLite.
+
+    A chave é o SHA-256 dos bytes do XML mais a impressão digital dos XSDs; os bytes (e
+    não uma forma canônica) garantem que as linhas citadas nos erros continuem valendo.
+    Vários processos podem compartilhar o arquivo. Falhas do SQLite nunca interrompem a
+    validação: a consulta vira um *miss* e a gravação é descartada. A tabela pode passar
+    de ``max_entries`` por algumas gravações até a próxima poda.
+    """
+
+    def __init__(self, path: str | Path, *, max_entries: int = 5000) -> None:
+        self.path = Path(path)
+        self.max_entries = max(int(max_entries), 1)
+        self._local = threading.local()
+        self._puts = itertools.count()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                " xml_sha256 TEXT NOT NULL, schema TEXT NOT NULL, ok INTEGER NOT NULL,"
+                " errors TEXT NOT NULL, created REAL NOT NULL,"
+                " PRIMARY KEY (xml_sha256, schema))"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, xml_sha256: str, schema: str) -> Optional[tuple[bool, list[str]]]:
+        try:
+            row = self._connect().execute(
+                "SELECT ok, errors FROM verdicts WHERE xml_sha256 = ? AND schema = ?",
+                (xml_sha256, schema),
+            ).fetchone()
+        except (sqlite3.Error, OSError):
+            return None
+        if row is None:
+            return None
+        return bool(row[0]), json.loads(row[1])
+
+    def put(self, xml_sha256: str, schema: str, ok: bool, errors: list[str]) -> None:
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?)",
+                    (xml_sha256, schema, int(ok), json.dumps(errors), time.time()),
+                )
+            # a poda ordena a tabela inteira: roda a cada N gravações, fora da transação do
+            # INSERT, e só quando o limite foi de fato ultrapassado
+            if next(self._puts) % _VERDICT_PRUNE_EVERY == 0:
+                self._prune(conn)
+        except (sqlite3.Error, OSError):
+            pass
+
+    def _prune(self, conn) -> None:
+        (count,) = conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        if count <= self.max_entries:
+            return
+        with conn:
+            # mantém o arquivo pequeno descartando os veredictos mais antigos
+            conn.execute(
+                "DELETE FROM verdicts WHERE rowid IN (SELECT rowid FROM verdicts"
+                " ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+def get_verdict_store(path: str | Path) -> Optional[VerdictStore]:
+    """Store compartilhado do processo para ``path`` (``None`` sem o módulo sqlite3)."""
+
+    if not SQLITE_AVAILABLE:
+        return None
+    key = str(Path(path).resolve())
+    with _CACHE_LOCK:
+        store = _VERDICT_STORES.get(key)
+        if store is None:
+            store = _VERDICT_STORES[key] = VerdictStore(key)
+        return store
+
+
+def validate_with_full_xsd(
+    xml_path: str | Path,
+    xsd_dir: str | Path,
+    *,
+    verdict_cache: str | Path | None = None,
+) -> tuple[bool, list[str]]:
+    """
+    Valida o XML gerado contra o conjunto completo de XSDs.
+    Preferência: archimate3_Diagram.xsd (que redefine ViewsType para permitir <diagrams>).
+    - Patching local: substitui o schemaLocation do xml.xsd dentro do Model.xsd
+      e faz com que os demais XSDs apontem para as versões locais.
+    - O schema compilado fica em cache por diretório até que algum XSD de origem mude.
+    - Com ``verdict_cache`` (arquivo SQLite) o veredicto de um XML já validado com os
+      mesmos XSDs é devolvido sem compilar o schema nem reparsear o XML.
+    """
+    if not LXML_AVAILABLE:
+        return False, [
+            "Validação indisponível: instale a dependência opcional 'lxml' (ex.: pip install lxml)."
+        ]
+
+    xml_path = Path(xml_path)
+    xsd_dir = Path(xsd_dir)
+
+    model_xsd = xsd_dir / "archimate3_Model.xsd"
+    if not model_xsd.exists():
+        return False, [f"XSD não encontrado: {model_xsd}"]
+
+    store = get_verdict_store(verdict_cache) if verdict_cache else None
+    if store is not None:
+        verdict_key = (file_sha256(xml_path), _schema_fingerprint(xsd_dir))
+        verdict = store.get(*verdict_key)
+        if verdict is not None:
+            ok, errors = verdict
+            return ok, [error.replace(_VERDICT_PATH_MARK, str(xml_path), 1) for error in errors]
+
+    _signature, schema, lock = _schema_entry(xsd_dir)
 
     doc = ET.parse(str(xml_path))
-    ok = schema.validate(doc)
-    errors = [str(e) for e in schema.error_log]
+    with lock:
+        ok = schema.validate(doc)
+        entries = list(schema.error_log)
+    errors = [str(e) for e in entries]
+
+    if store is not None:
+        # o caminho sai das mensagens guardadas e volta na leitura, com o arquivo da vez
+        stored = [
+            _VERDICT_PATH_MARK + text[len(entry.filename):]
+            if entry.filename and text.startswith(entry.filename)
+            else text
+            for entry, text in zip(entries, errors)
+        ]
+        store.put(*verdict_key, ok, stored)
     return ok, errors
 
+# -------------------- Pré-validação estrutural (regras derivadas dos XSDs) --------------------
+
+XS_NS = "http://www.w3.org/2001/XMLSchema"
+XSI_TYPE = f"{{{XSI_NS}}}type"
+_STRUCTURAL_MAX_ERRORS = 20
+_SCHEMA_ENTRYPOINTS = ("archimate3_Diagram.xsd", "archimate3_View.xsd", "archimate3_Model.xsd")
+_SCHEMA_DEFINITION_KINDS = ("complexType", "simpleType", "group", "attributeGroup", "element")
+
+
+class _StopValidation(Exception):
+    """Interrompe a passada assim que o limite de erros é atingido."""
+
+
+def _xs_local(value: Optional[str]) -> Optional[str]:
+    """Remove o prefixo de QNames dos XSDs (``xs:ID`` -> ``ID``)."""
+
+    return value.rsplit(":", 1)[-1] if value else value
+
+
+def _xs_children(node, *kinds: str) -> Iterable:
+    for child in node:
+        if isinstance(child.tag, str) and child.tag.startswith(f"{{{XS_NS}}}"):
+            if not kinds or _local_name(child.tag) in kinds:
+                yield child
+
+
+def _max_occurs(node) -> float:
+    value = node.get("maxOccurs", "1")
+    return float("inf") if value == "unbounded" else float(value)
+
+
+def _load_schema_definitions(xsd_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """Lê os XSDs (seguindo ``include``/``redefine``) e indexa as definições globais.
+
+    Tipos redefinidos ficam sob o nome original; a versão anterior é guardada como
+    ``<nome>#<n>`` e a redefinição passa a apontar para ela como base.
+    """
+
+    defs: Dict[str, Dict[str, Any]] = {kind: {} for kind in _SCHEMA_DEFINITION_KINDS}
+    loaded: set[Path] = set()
+
+    def register(kind: str, name: str, node, *, redefine: bool = False) -> None:
+        table = defs[kind]
+        previous = table.get(name)
+        base_alias = None
+        if redefine and previous is not None:
+            base_alias = f"{name}#{sum(1 for key in table if key.startswith(name + '#')) + 1}"
+            table[base_alias] = previous
+        table[name] = (node, base_alias)
+
+    def load(path: Path) -> None:
+        path = path.resolve()
+        if path in loaded or not path.exists():
+            return
+        loaded.add(path)
+        root = ET.parse(str(path)).getroot()
+        for child in _xs_children(root):
+            kind = _local_name(child.tag)
+            if kind == "include":
+                load(path.parent / child.get("schemaLocation", ""))
+            elif kind == "redefine":
+                load(path.parent / child.get("schemaLocation", ""))
+                for item in _xs_children(child, *_SCHEMA_DEFINITION_KINDS):
+                    if item.get("name"):
+                        register(_local_name(item.tag), item.get("name"), item, redefine=True)
+            elif kind in defs and child.get("name"):
+                register(kind, child.get("name"), child)
+
+    for entrypoint in _SCHEMA_ENTRYPOINTS:
+        if (xsd_dir / entrypoint).exists():
+            load(xsd_dir / entrypoint)
+            break
+    return defs
+
+
+class StructuralRules:
+    """Tabelas pré-compiladas a partir dos XSDs para a pré-validação estrutural.
+
+    Para cada ``complexType`` guarda a posição de cada filho na sequência (filhos de um
+    mesmo ``choice`` compartilham a posição), os filhos e atributos obrigatórios e os tipos
+    dos atributos. ``concrete`` lista, por tipo, os ``xsi:type`` aceitos (tipos não
+    abstratos derivados dele) — as tabelas de tipos de elemento, relacionamento, nó e
+    conexão. ``enums`` guarda os valores permitidos dos ``simpleType`` enumerados.
+    """
+
+    __slots__ = ("types", "concrete", "enums", "roots")
+
+    def __init__(self, defs: Dict[str, Dict[str, Any]]) -> None:
+        self._compile(defs)
+
+    # ---- compilação ----
+
+    def _compile(self, defs: Dict[str, Dict[str, Any]]) -> None:
+        complex_defs = defs["complexType"]
+        self.enums: Dict[str, frozenset] = {}
+        for name, (node, _alias) in defs["simpleType"].items():
+            values = [
+                item.get("value")
+                for restriction in _xs_children(node, "restriction")
+                for item in _xs_children(restriction, "enumeration")
+            ]
+            if values:
+                self.enums[name] = frozenset(values)
+
+        self.types: Dict[str, Dict[str, Any]] = {}
+        pending = list(complex_defs)
+        while pending:
+            name = pending.pop()
+            if name not in self.types:
+                self._compile_type(name, defs, pending)
+
+        descendants: Dict[str, set] = {}
+        for name, rule in self.types.items():
+            if "#" in name or rule["abstract"]:
+                continue
+            current: Optional[str] = name
+            seen: set[str] = set()
+            while current and current not in seen:
+                seen.add(current)
+                descendants.setdefault(current.split("#", 1)[0], set()).add(name)
+                current = self.types.get(current, {}).get("base")
+        self.concrete: Dict[str, frozenset] = {
+            name: frozenset(values) for name, values in descendants.items()
+        }
+
+        self.roots = {
+            name: _xs_local(node.get("type"))
+            for name, (node, _alias) in defs["element"].items()
+            if node.get("type")
+        }
+
+    def _compile_type(self, name: str, defs: Dict[str, Dict[str, Any]], pending: List[str]) -> Dict[str, Any]:
+        cached = self.types.get(name)
+        if cached is not None:
+            return cached
+        entry = defs["complexType"].get(name)
+        rule: Dict[str, Any] = {
+            "abstract": False,
+            "base": None,
+            "simple": entry is None,
+            "children": {},
+            "required": [],
+            "wildcard": False,
+            "attributes": {},
+        }
+        self.types[name] = rule
+        if entry is None:
+            return rule
+        node, base_alias = entry
+        rule["abstract"] = node.get("abstract") == "true"
+
+        content = node
+        for wrapper in _xs_children(node, "complexContent", "simpleContent"):
+            derivation = next(iter(_xs_children(wrapper, "extension", "restriction")), None)
+            if derivation is None:
+                continue
+            base = _xs_local(derivation.get("base"))
+            if base == name and base_alias:
+                base = base_alias
+            rule["base"] = base
+            base_rule = (
+                self._compile_type(base, defs, pending)
+                if base in defs["complexType"]
+                else None
+            )
+            if base_rule is not None:
+                rule["attributes"].update(base_rule["attributes"])
+                if _local_name(derivation.tag) == "extension":
+                    rule["children"].update(base_rule["children"])
+                    rule["required"].extend(base_rule["required"])
+                    rule["wildcard"] = base_rule["wildcard"]
+            rule["simple"] = _local_name(wrapper.tag) == "simpleContent"
+            content = derivation
+
+        counter = [max((pos for pos, _ in rule["children"].values()), default=-1) + 1]
+        for particle in _xs_children(content, "sequence", "choice", "group", "all"):
+            self._flatten(particle, rule, defs, counter, required=True, shared=None)
+        self._collect_attributes(content, rule["attributes"], defs)
+        return rule
+
+    def _flatten(
+        self,
+        node,
+        rule: Dict[str, Any],
+        defs: Dict[str, Dict[str, Any]],
+        counter: List[int],
+        *,
+        required: bool,
+        shared: Optional[int],
+    ) -> None:
+        kind = _local_name(node.tag)
+        required = required and node.get("minOccurs", "1") != "0"
+
+        def next_position() -> int:
+            if shared is not None:
+                return shared
+            counter[0] += 1
+            return counter[0] - 1
+
+        if kind == "element":
+            element_name = node.get("name")
+            type_name = _xs_local(node.get("type"))
+            if node.get("ref"):
+                element_name = _xs_local(node.get("ref"))
+                ref_entry = defs["element"].get(element_name)
+                type_name = _xs_local(ref_entry[0].get("type")) if ref_entry else None
+            if element_name not in rule["children"]:
+                rule["children"][element_name] = (next_position(), type_name or "anyType")
+            if required:
+                rule["required"].append(element_name)
+        elif kind == "any":
+            next_position()
+            rule["wildcard"] = True
+        elif kind == "group":
+            group = defs["group"].get(_xs_local(node.get("ref")) or "")
+            if group is not None:
+                inner_shared = shared
+                if inner_shared is None and _max_occurs(node) > 1:
+                    inner_shared = next_position()
+                for particle in _xs_children(group[0], "sequence", "choice", "all"):
+                    self._flatten(particle, rule, defs, counter, required=required, shared=inner_shared)
+        elif kind in ("sequence", "all", "choice"):
+            inner_shared = shared
+            if inner_shared is None and (kind != "sequence" or _max_occurs(node) > 1):
+                # filhos de choice/all (ou de sequências repetidas) ocupam a mesma posição
+                inner_shared = next_position()
+            for child in _xs_children(node, "element", "any", "group", "sequence", "choice"):
+                self._flatten(
+                    child, rule, defs, counter,
+                    required=required and kind != "choice",
+                    shared=inner_shared,
+                )
+
+    def _collect_attributes(self, node, attributes: Dict[str, Any], defs: Dict[str, Dict[str, Any]]) -> None:
+        for item in _xs_children(node, "attribute", "attributeGroup"):
+            if _local_name(item.tag) == "attributeGroup":
+                group = defs["attributeGroup"].get(_xs_local(item.get("ref")) or "")
+                if group is not None:
+                    self._collect_attributes(group[0], attributes, defs)
+                continue
+            name = item.get("name")
+            if not name:
+                # ``ref="xml:lang"`` e afins vivem em outro namespace
+                continue
+            if item.get("use") == "prohibited":
+                attributes.pop(name, None)
+                continue
+            attributes[name] = (item.get("use") == "required", _xs_local(item.get("type")))
+
+    # ---- validação ----
+
+    def check(self, tree, *, max_errors: int = _STRUCTURAL_MAX_ERRORS) -> tuple[bool, list[str]]:
+        """Valida ``tree`` em uma única passada, parando após ``max_errors`` erros."""
+
+        root = tree.getroot() if hasattr(tree, "getroot") else tree
+        errors: List[str] = []
+        ids: Dict[str, str] = {}
+        refs: List[tuple] = []
+
+        def report(path: str, element, message: str) -> None:
+            line = getattr(element, "sourceline", None)
+            location = f"{path} (linha {line})" if line else path
+            errors.append(f"{location}: {message}")
+            if len(errors) >= max_errors:
+                raise _StopValidation
+
+        def visit(element, type_name: Optional[str], path: str) -> None:
+            tag = _local_name(element.tag)
+            xsi_type = element.get(XSI_TYPE)
+            if xsi_type:
+                local = _xs_local(xsi_type)
+                allowed = self.concrete.get(type_name or "", frozenset())
+                if local not in allowed:
+                    # o identificador ainda conta, evitando erros de referência em cascata
+                    if element.get("identifier"):
+                        ids.setdefault(element.get("identifier"), path)
+                    accepted = sorted(allowed)
+                    listed = ", ".join(accepted[:12])
+                    if len(accepted) > 12:
+                        listed += f", … (+{len(accepted) - 12})"
+                    report(path, element, f"xsi:type '{local}' inválido para <{tag}>; aceitos: {listed}")
+                    return
+                type_name = local
+            rule = self.types.get(type_name or "")
+            if rule is None:
+                return
+            if rule["abstract"]:
+                report(path, element, f"<{tag}> exige xsi:type (o tipo {type_name} é abstrato)")
+                return
+
+            for name, (required, attr_type) in rule["attributes"].items():
+                value = element.get(name)
+                if value is None:
+                    if required:
+                        report(path, element, f"atributo obrigatório '{name}' ausente")
+                    continue
+                allowed_values = self.enums.get(attr_type or "")
+                if allowed_values is not None and value not in allowed_values:
+                    report(path, element, f"valor '{value}' inválido para o atributo '{name}'")
+                elif attr_type == "ID":
+                    if value in ids:
+                        report(path, element, f"identificador duplicado '{value}' (já usado em {ids[value]})")
+                    else:
+                        ids[value] = path
+                elif attr_type == "IDREF":
+                    refs.append((value, path, name, element))
+
+            if rule["simple"]:
+                return
+            last_position = -1
+            last_name = None
+            present: set[str] = set()
+            counts: Dict[str, int] = {}
+            for child in element:
+                if not isinstance(child.tag, str):
+                    continue
+                local = _local_name(child.tag)
+                if not child.tag.startswith(f"{{{ARCHI_NS}}}"):
+                    if not rule["wildcard"]:
+                        report(path, child, f"<{local}> de outro namespace não é permitido em <{tag}>")
+                    continue
+                spec = rule["children"].get(local)
+                counts[local] = counts.get(local, 0) + 1
+                identifier = child.get("identifier")
+                child_path = (
+                    f"{path}/{local}[@identifier='{identifier}']"
+                    if identifier
+                    else f"{path}/{local}[{counts[local]}]"
+                )
+                if spec is None:
+                    report(child_path, child, f"<{local}> não é permitido em <{tag}>")
+                    continue
+                position, child_type = spec
+                if position < last_position:
+                    report(child_path, child, f"<{local}> fora de ordem: deve vir antes de <{last_name}>")
+                else:
+                    last_position, last_name = position, local
+                present.add(local)
+                visit(child, child_type, child_path)
+            for name in rule["required"]:
+                if name not in present:
+                    report(path, element, f"filho obrigatório <{name}> ausente em <{tag}>")
+
+        try:
+            root_tag = _local_name(root.tag)
+            root_type = self.roots.get(root_tag)
+            if root_type is None:
+                report(f"/{root_tag}", root, f"elemento raiz <{root_tag}> desconhecido")
+            else:
+                visit(root, root_type, f"/{root_tag}")
+                for value, path, name, element in refs:
+                    if value not in ids:
+                        report(path, element, f"atributo '{name}' referencia identificador inexistente '{value}'")
+        except _StopValidation:
+            pass
+        return not errors, errors
+
+
+def _rules_entry(xsd_dir: str | Path) -> tuple:
+    key = _cache_key(xsd_dir)
+    signature = _schema_signature(Path(key))
+    with _CACHE_LOCK:
+        entry = _RULES_CACHE.get(key)
+    if entry is not None and entry[0] == signature:
+        return entry
+    entry = (signature, StructuralRules(_load_schema_definitions(Path(key))))
+    with _CACHE_LOCK:
+        _RULES_CACHE[key] = entry
+    return entry
+
+
+def load_structural_rules(xsd_dir: str | Path) -> StructuralRules:
+    """Retorna as regras estruturais do diretório, recompilando apenas se os XSDs mudarem."""
+
+    return _rules_entry(xsd_dir)[1]
+
+
+def prevalidate_structure(
+    xml_source,
+    xsd_dir: str | Path,
+    *,
+    max_errors: int = _STRUCTURAL_MAX_ERRORS,
+) -> tuple[bool, list[str]]:
+    """
+    Pré-validação rápida (uma passada na árvore) com as regras derivadas dos XSDs:
+    ``xsi:type`` fora das tabelas de tipos, filhos fora de ordem ou não permitidos, filhos e
+    atributos obrigatórios ausentes, valores fora das enumerações, identificadores duplicados
+    e referências (IDREF) sem destino. Não substitui a validação XSD completa, que continua
+    disponível como segunda etapa em ``validate_with_full_xsd``.
+    ``xml_source`` pode ser um caminho ou uma árvore já carregada. Funciona sem lxml.
+    """
+
+    xsd_dir = Path(xsd_dir)
+    if not (xsd_dir / "archimate3_Model.xsd").exists():
+        return False, [f"XSD não encontrado: {xsd_dir / 'archimate3_Model.xsd'}"]
+    rules = load_structural_rules(xsd_dir)
+    tree = xml_source if hasattr(xml_source, "getroot") else ET.parse(str(xml_source))
+    return rules.check(tree, max_errors=max_errors)
+
+
+def validate_in_stages(
+    xml_path: str | Path,
+    xsd_dir: str | Path,
+    *,
+    full_xsd: bool = True,
+    verdict_cache: str | Path | None = None,
+) -> tuple[bool, list[str], str]:
+    """Pré-validação estrutural seguida (se ela passar e ``full_xsd``) da validação XSD completa.
+
+    Retorna ``(ok, erros, etapa)``, onde ``etapa`` é ``"structural"`` ou ``"xsd"``.
+    ``verdict_cache`` é repassado a ``validate_with_full_xsd``.
+    """
+
+    tree = ET.parse(str(xml_path))
+    ok, errors = prevalidate_structure(tree, xsd_dir)
+    if not ok or not full_xsd:
+        return ok, errors, "structural"
+    ok, errors = validate_with_full_xsd(xml_path, xsd_dir, verdict_cache=verdict_cache)
+    return ok, errors, "xsd"
+
+# -------------------- Processamento em lote --------------------
+
+_GLOB_CHARS = ("*", "?", "[")
+_MAX_SUMMARY_ERRORS = 10
+
+# Configuração carregada uma vez por processo de trabalho do lote
+_WORKER_CONFIG: Dict[str, Optional[str]] = {}
+
+
+def _resolve_batch_inputs(spec: str | Path) -> List[Path]:
+    """Expande um diretório (``*.json``) ou padrão glob em uma lista ordenada de datamodels."""
+
+    text = str(spec)
+    if any(ch in text for ch in _GLOB_CHARS):
+        return sorted(Path(p) for p in glob.glob(text, recursive=True) if Path(p).is_file())
+    path = Path(text)
+    if path.is_dir():
+        return sorted(p for p in path.glob("*.json") if p.is_file())
+    if path.is_file():
+        return [path]
+    return []
+
+
+def _load_manifest(manifest: str | Path) -> List[Tuple[Path, Optional[Path]]]:
+    """Lê um manifesto JSON (lista de caminhos ou ``{"model", "out"}``) ou texto (um por linha).
+
+    Caminhos relativos são resolvidos a partir do diretório do manifesto.
+    """
+
+    manifest = Path(manifest)
+    base = manifest.parent
+    text = manifest.read_text(encoding="utf-8")
+    entries: List[Tuple[Path, Optional[Path]]] = []
+    if manifest.suffix.lower() == ".json":
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get("models") or []
+        for item in data:
+            if isinstance(item, str):
+                entries.append((base / item, None))
+            elif isinstance(item, dict) and item.get("model"):
+                out = item.get("out")
+                entries.append((base / item["model"], base / out if out else None))
+    else:
+        for line in text.splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                entries.append((base / line, None))
+    return entries
+
+
+def _batch_worker_init(
+    template_xml: str,
+    xsd_dir: Optional[str],
+    full_xsd: bool = True,
+    verdict_cache: Optional[str] = None,
+) -> None:
+    """Compila plano de patch, regras estruturais e schema uma única vez por processo de trabalho."""
+
+    _WORKER_CONFIG["template"] = template_xml
+    _WORKER_CONFIG["xsd_dir"] = xsd_dir
+    _WORKER_CONFIG["full_xsd"] = "1" if full_xsd else ""
+    _WORKER_CONFIG["verdict_cache"] = verdict_cache or ""
+    load_patch_plan(template_xml)
+    if xsd_dir and (Path(xsd_dir) / "archimate3_Model.xsd").exists():
+        load_structural_rules(xsd_dir)
+        if full_xsd and LXML_AVAILABLE:
+            load_schema(xsd_dir)
+
+
+def _batch_process_one(model_json: str, out_xml: str) -> Dict[str, Any]:
+    template_xml = _WORKER_CONFIG["template"]
+    xsd_dir = _WORKER_CONFIG.get("xsd_dir")
+    result: Dict[str, Any] = {"model": model_json, "out": out_xml, "pid": os.getpid()}
+    started = time.perf_counter()
+    try:
+        patch_template_with_model(template_xml, model_json, out_xml)
+        patched = time.perf_counter()
+        result["patch_ms"] = round((patched - started) * 1000, 3)
+        if xsd_dir:
+            ok, errors, stage = validate_in_stages(
+                out_xml,
+                xsd_dir,
+                full_xsd=bool(_WORKER_CONFIG.get("full_xsd", "1")),
+                verdict_cache=_WORKER_CONFIG.get("verdict_cache") or None,
+            )
+            result["validation_stage"] = stage
+            result["validate_ms"] = round((time.perf_counter() - patched) * 1000, 3)
+            result["valid"] = ok
+            result["error_count"] = len(errors)
+            result["errors"] = errors[:_MAX_SUMMARY_ERRORS]
+            result["status"] = "ok" if ok else "invalid"
+        else:
+            result["valid"] = None
+            result["status"] = "ok"
+    except Exception as exc:  # noqa: BLE001 - um arquivo ruim não deve interromper o lote
+        result["status"] = "error"
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    result["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def _batch_jobs(
+    entries: Iterable[Tuple[Path, Optional[Path]]],
+    out_dir: Path,
+    assigned: Optional[Dict[Tuple[Path, Optional[Path]], str]] = None,
+) -> List[Tuple[str, str]]:
+    """Associa cada datamodel ao XML de saída.
+
+    ``assigned`` (entrada -> XML) guarda os nomes já escolhidos e é atualizado: no modo
+    watch o mesmo datamodel cai sempre no mesmo arquivo, mesmo que outro de mesmo nome
+    seja processado sozinho em outro ciclo.
+    """
+
+    if assigned is None:
+        assigned = {}
+    taken = set(assigned.values())
+    jobs: List[Tuple[str, str]] = []
+    for entry in entries:
+        out = assigned.get(entry)
+        if out is None:
+            model, explicit = entry
+            if explicit is not None:
+                out = str(explicit)
+            else:
+                out = str(out_dir / f"{model.stem}.xml")
+                count = 0
+                while out in taken:
+                    count += 1
+                    out = str(out_dir / f"{model.stem}_{count}.xml")
+            assigned[entry] = out
+            taken.add(out)
+        jobs.append((str(entry[0]), out))
+    return jobs
+
+
+def run_batch(
+    entries: Iterable[Tuple[Path, Optional[Path]]],
+    template_xml: str | Path,
+    out_dir: str | Path,
+    *,
+    xsd_dir: str | Path | None = None,
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    full_xsd: bool = True,
+    verdict_cache: str | Path | None = None,
+    output_names: Optional[Dict[Tuple[Path, Optional[Path]], str]] = None,
+) -> Dict[str, Any]:
+    """Gera (e opcionalmente valida) vários datamodels contra o mesmo template.
+
+    Os arquivos são distribuídos em um ``ProcessPoolExecutor`` cujos processos carregam o
+    template e o schema uma única vez. Com ``workers=1`` o lote roda no próprio processo.
+    A validação começa pela pré-validação estrutural; ``full_xsd=False`` dispensa a etapa XSD
+    e ``verdict_cache`` (arquivo SQLite) reaproveita veredictos XSD de execuções anteriores.
+    Com ``executor`` os processos já foram inicializados por quem o criou; ``output_names``
+    mantém o XML de cada entrada entre chamadas (ver ``_batch_jobs``).
+    Retorna um resumo JSON-serializável com tempos e status por arquivo.
+    """
+
+    template = str(Path(template_xml).resolve())
+    xsd = str(Path(xsd_dir).resolve()) if xsd_dir else None
+    verdicts = str(Path(verdict_cache).resolve()) if verdict_cache else None
+    out_root = Path(out_dir)
+    jobs = _batch_jobs(entries, out_root, output_names)
+    started = time.perf_counter()
+
+    results: List[Dict[str, Any]] = []
+    if jobs:
+        for _model, out in jobs:
+            Path(out).parent.mkdir(parents=True, exist_ok=True)
+        if executor is not None:
+            results = list(executor.map(_batch_process_one, *zip(*jobs)))
+        elif workers == 1:
+            _batch_worker_init(template, xsd, full_xsd, verdicts)
+            results = [_batch_process_one(model, out) for model, out in jobs]
+        else:
+            max_workers = min(workers or os.cpu_count() or 1, len(jobs))
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_batch_worker_init,
+                initargs=(template, xsd, full_xsd, verdicts),
+            ) as pool:
+                results = list(pool.map(_batch_process_one, *zip(*jobs)))
+
+    return {
+        "template": template,
+        "xsd_dir": xsd,
+        "total": len(results),
+        "succeeded": sum(1 for r in results if r["status"] == "ok"),
+        "invalid": sum(1 for r in results if r["status"] == "invalid"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        "files": results,
+    }
+
+
+def _input_signatures(
+    entries: Iterable[Tuple[Path, Optional[Path]]]
+) -> Dict[Tuple[Path, Optional[Path]], Any]:
+    return {entry: file_signature(entry[0]) for entry in entries}
+
+
+def _watch_batch(
+    collect,
+    template_xml: str | Path,
+    out_dir: str | Path,
+    *,
+    xsd_dir: str | Path | None,
+    workers: Optional[int],
+    interval: float,
+    emit,
+    max_cycles: Optional[int] = None,
+    full_xsd: bool = True,
+    verdict_cache: str | Path | None = None,
+) -> None:
+    """Reprocessa continuamente os datamodels novos ou alterados, reutilizando o pool."""
+
+    template = str(Path(template_xml).resolve())
+    xsd = str(Path(xsd_dir).resolve()) if xsd_dir else None
+    verdicts = str(Path(verdict_cache).resolve()) if verdict_cache else None
+    seen: Dict[Tuple[Path, Optional[Path]], Any] = {}
+    names: Dict[Tuple[Path, Optional[Path]], str] = {}
+    cycles = 0
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count() or 1,
+        initializer=_batch_worker_init,
+        initargs=(template, xsd, full_xsd, verdicts),
+    ) as pool:
+        while max_cycles is None or cycles < max_cycles:
+            cycles += 1
+            current = _input_signatures(collect())
+            changed = [
+                entry for entry, sig in current.items()
+                if sig is not None and seen.get(entry) != sig
+            ]
+            seen = current
+            # nomes decididos pela lista completa, não só pelos alterados no ciclo
+            _batch_jobs(current, Path(out_dir), names)
+            if changed:
+                emit(
+                    run_batch(
+                        changed,
+                        template,
+                        out_dir,
+                        xsd_dir=xsd,
+                        executor=pool,
+                        full_xsd=full_xsd,
+                        output_names=names,
+                    )
+                )
+            if max_cycles is None or cycles < max_cycles:
+                time.sleep(interval)
+
+
 # -------------------- CLI --------------------
 
 def _cli() -> None:
     ap = argparse.ArgumentParser(description="ArchiMate Exchange – Copy+Patch generator")
     ap.add_argument("--template", required=True, help="Caminho para template.xml (base)")
-    ap.add_argument("--model-json", required=True, help="Caminho para datamodel.json")
-    ap.add_argument("--out", required=True, help="Caminho para o xml de saída")
+    source = ap.add_mutually_exclusive_group(required=True)
+    source.add_argument("--model-json", help="Caminho para datamodel.json")
+    source.add_argument("--batch", help="Diretório ou padrão glob de datamodels (*.json)")
+    source.add_argument("--manifest", help="Manifesto JSON/texto com a lista de datamodels")
+    ap.add_argument("--out", help="Caminho para o xml de saída (modo arquivo único)")
+    ap.add_argument("--out-dir", help="Diretório dos XMLs gerados (modos --batch/--manifest)")
     ap.add_argument("--validate-xsd-dir", help="Diretório contendo archimate3_Model.xsd (+ xml.xsd será criado)")
+    ap.add_argument(
+        "--structural-only",
+        action="store_true",
+        help="Valida apenas com as regras estruturais derivadas dos XSDs (sem a etapa XSD completa)",
+    )
+    ap.add_argument(
+        "--verdict-cache",
+        help="Arquivo SQLite com veredictos XSD já calculados (reaproveitados entre execuções)",
+    )
+    ap.add_argument("--workers", type=int, help="Quantidade de processos do lote (padrão: CPUs)")
+    ap.add_argument("--summary", help="Grava o resumo JSON do lote neste arquivo (padrão: stdout)")
+    ap.add_argument("--watch", action="store_true", help="Observa as entradas e reprocessa alterações")
+    ap.add_argument("--watch-interval", type=float, default=2.0, help="Intervalo de polling em segundos")
     args = ap.parse_args()
 
-    out = patch_template_with_model(args.template, args.model_json, args.out)
-    print(f"[OK] XML gerado: {out}")
+    if args.model_json:
+        if not args.out:
+            ap.error("--out é obrigatório com --model-json")
+        out = patch_template_with_model(args.template, args.model_json, args.out)
+        print(f"[OK] XML gerado: {out}")
+
+        if args.validate_xsd_dir:
+            ok, errs, stage = validate_in_stages(
+                out,
+                args.validate_xsd_dir,
+                full_xsd=not args.structural_only,
+                verdict_cache=args.verdict_cache,
+            )
+            label = "XSD" if stage == "xsd" else "estrutural"
+            print(f"[VALIDAÇÃO] ArchiMate ({label}): {'OK' if ok else 'FALHOU'}")
+            if not ok:
+                for e in errs[:10]:
+                    print(" -", e)
+        return
+
+    if not args.out_dir:
+        ap.error("--out-dir é obrigatório com --batch/--manifest")
+
+    summary_path = Path(args.summary).resolve() if args.summary else None
+
+    def collect() -> List[Tuple[Path, Optional[Path]]]:
+        if args.manifest:
+            entries = _load_manifest(args.manifest)
+        else:
+            entries = [(path, None) for path in _resolve_batch_inputs(args.batch)]
+        # o próprio resumo pode cair no padrão de entrada (ex.: "*.json")
+        return [entry for entry in entries if entry[0].resolve() != summary_path]
+
+    def emit(summary: Dict[str, Any]) -> None:
+        text = json.dumps(summary, indent=2, ensure_ascii=False)
+        if args.summary:
+            Path(args.summary).write_text(text, encoding="utf-8")
+            print(f"[LOTE] {summary['succeeded']}/{summary['total']} OK em {summary['elapsed_ms']} ms")
+        else:
+            print(text)
+
+    if args.watch:
+        try:
+            _watch_batch(
+                collect,
+                args.template,
+                args.out_dir,
+                xsd_dir=args.validate_xsd_dir,
+                workers=args.workers,
+                interval=args.watch_interval,
+                emit=emit,
+                full_xsd=not args.structural_only,
+                verdict_cache=args.verdict_cache,
+            )
+        except KeyboardInterrupt:
+            pass
+        return
 
-    if args.validate_xsd_dir:
-        ok, errs = validate_with_full_xsd(out, args.validate_xsd_dir)
-        print(f"[VALIDAÇÃO] ArchiMate XSD: {'OK' if ok else 'FALHOU'}")
-        if not ok:
-            for e in errs[:10]:
-                print(" -", e)
+    summary = run_batch(
+        collect(),
+        args.template,
+        args.out_dir,
+        xsd_dir=args.validate_xsd_dir,
+        workers=args.workers,
+        full_xsd=not args.structural_only,
+        verdict_cache=args.verdict_cache,
+    )
+    emit(summary)
+    if summary["invalid"] or summary["failed"]:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -4,6 +4,8 @@ from __future__ import annotations
 
 from .constants import (
     ARCHIMATE_NS,
+    ASYNC_EXECUTOR_WORKERS,
+    ASYNC_TOOLS,
     DEFAULT_DATAMODEL_FILENAME,
     DEFAULT_DIAGRAM_FILENAME,
     DEFAULT_MODEL,
@@ -11,30 +13,95 @@ from .constants import (
     DEFAULT_TEMPLATES_DIR,
     DEFAULT_XSD_DIR,
     DEFAULT_KROKI_URL,
+    KROKI_BALANCING,
+    KROKI_HEALTH_INTERVAL,
+    KROKI_HEDGE_AFTER_MS,
+    KROKI_RETRIES,
+    KROKI_URLS,
     DEFAULT_MERMAID_IMAGE_FORMAT,
     FETCH_MERMAID_IMAGES,
+    FULL_XSD_VALIDATION,
+    OUTPUT_CACHE,
+    XSD_VERDICT_CACHE,
+    IMAGE_PAYLOAD_MODE,
+    MERMAID_DETAIL,
+    MERMAID_DETAIL_NODE_BUDGET,
+    MERMAID_MAX_CHARS_PER_RENDER,
+    MERMAID_MAX_NODES_PER_RENDER,
+    PREVIEW_IMAGE_SOURCE,
+    RENDER_HOST_CONCURRENCY,
+    RENDER_QUEUE_TIMEOUT,
+    RENDER_RATE_BURST,
+    RENDER_RATE_LIMIT,
+    STREAMING_JSON_THRESHOLD,
     OUTPUT_DIR,
+    OUTPUT_ISOLATION,
+    PREWARM_TEMPLATES,
+    TEMPLATE_WATCH_INTERVAL,
+    WATCH_TEMPLATES,
     XML_LANG_ATTR,
     XSI_ATTR,
 )
 from .operations import (
+    check_datamodel_integrity,
+    check_view_geometry,
     describe_template,
+    diff_datamodels,
+    fetch_preview_image,
     finalize_datamodel,
     generate_archimate_diagram,
     generate_mermaid_preview,
+    invalidate_template_caches,
     list_templates,
+    prewarm_template_caches,
+    query_datamodel_graph,
     save_datamodel,
 )
+from .async_operations import (
+    check_datamodel_integrity_async,
+    check_view_geometry_async,
+    describe_template_async,
+    diff_datamodels_async,
+    fetch_preview_image_async,
+    finalize_datamodel_async,
+    generate_archimate_diagram_async,
+    generate_mermaid_preview_async,
+    list_templates_async,
+    query_datamodel_graph_async,
+    save_datamodel_async,
+)
+from .diff import diff_payloads
+from .graph import DatamodelGraph
+from .integrity import check_referential_integrity
+from .layout import NUMPY_AVAILABLE, auto_layout_view
+from .model import (
+    Element,
+    OrgItem,
+    Relationship,
+    TemplateModel,
+    ViewConnection,
+    ViewDiagram,
+    ViewNode,
+)
+from .rate_limit import RendererBusyError, RenderLimiter, get_render_limiter
+from .renderer_pool import RendererPool, configure_renderer_pool, get_renderer_pool
+from .spatial import GridIndex, analyze_view_geometry
+from .svg_renderer import render_view_svg
 from .session import (
     BLUEPRINT_CACHE_KEY,
     SESSION_STATE_ROOT,
+    get_blueprint_handle,
     get_cached_blueprint,
     get_session_bucket,
+    session_state_footprint,
     store_blueprint,
 )
+from .watcher import TemplateWatcher, start_template_watcher, stop_template_watcher
 
 __all__ = [
     "ARCHIMATE_NS",
+    "ASYNC_EXECUTOR_WORKERS",
+    "ASYNC_TOOLS",
     "DEFAULT_DATAMODEL_FILENAME",
     "DEFAULT_DIAGRAM_FILENAME",
     "DEFAULT_MODEL",
@@ -42,20 +109,87 @@ __all__ = [
     "DEFAULT_TEMPLATES_DIR",
     "DEFAULT_XSD_DIR",
     "DEFAULT_KROKI_URL",
+    "KROKI_BALANCING",
+    "KROKI_HEALTH_INTERVAL",
+    "KROKI_HEDGE_AFTER_MS",
+    "KROKI_RETRIES",
+    "KROKI_URLS",
     "DEFAULT_MERMAID_IMAGE_FORMAT",
     "FETCH_MERMAID_IMAGES",
+    "FULL_XSD_VALIDATION",
+    "OUTPUT_CACHE",
+    "XSD_VERDICT_CACHE",
+    "IMAGE_PAYLOAD_MODE",
+    "MERMAID_DETAIL",
+    "MERMAID_DETAIL_NODE_BUDGET",
+    "MERMAID_MAX_CHARS_PER_RENDER",
+    "MERMAID_MAX_NODES_PER_RENDER",
+    "PREVIEW_IMAGE_SOURCE",
+    "RENDER_HOST_CONCURRENCY",
+    "RENDER_QUEUE_TIMEOUT",
+    "RENDER_RATE_BURST",
+    "RENDER_RATE_LIMIT",
+    "STREAMING_JSON_THRESHOLD",
     "OUTPUT_DIR",
+    "OUTPUT_ISOLATION",
+    "PREWARM_TEMPLATES",
+    "TEMPLATE_WATCH_INTERVAL",
+    "WATCH_TEMPLATES",
     "XML_LANG_ATTR",
     "XSI_ATTR",
+    "check_datamodel_integrity",
+    "check_view_geometry",
     "describe_template",
+    "diff_datamodels",
+    "fetch_preview_image",
     "finalize_datamodel",
     "generate_archimate_diagram",
     "generate_mermaid_preview",
+    "invalidate_template_caches",
     "list_templates",
+    "prewarm_template_caches",
+    "query_datamodel_graph",
     "save_datamodel",
+    "check_datamodel_integrity_async",
+    "check_view_geometry_async",
+    "describe_template_async",
+    "diff_datamodels_async",
+    "fetch_preview_image_async",
+    "finalize_datamodel_async",
+    "generate_archimate_diagram_async",
+    "generate_mermaid_preview_async",
+    "list_templates_async",
+    "query_datamodel_graph_async",
+    "save_datamodel_async",
+    "check_referential_integrity",
+    "NUMPY_AVAILABLE",
+    "auto_layout_view",
+    "DatamodelGraph",
+    "diff_payloads",
+    "RenderLimiter",
+    "RendererBusyError",
+    "RendererPool",
+    "get_render_limiter",
+    "configure_renderer_pool",
+    "get_renderer_pool",
+    "GridIndex",
+    "analyze_view_geometry",
+    "Element",
+    "OrgItem",
+    "Relationship",
+    "TemplateModel",
+    "ViewConnection",
+    "ViewDiagram",
+    "ViewNode",
+    "render_view_svg",
     "BLUEPRINT_CACHE_KEY",
     "SESSION_STATE_ROOT",
+    "get_blueprint_handle",
     "get_cached_blueprint",
     "get_session_bucket",
+    "session_state_footprint",
     "store_blueprint",
+    "TemplateWatcher",
+    "start_template_watcher",
+    "stop_template_watcher",
 ]
@@ -0,0 +1,376 @@
+"""Variantes assíncronas (asyncio) das ferramentas do agente Diagramador.
+
+As chamadas HTTP ao Kroki e ao mermaid.ink usam ``httpx.AsyncClient`` quando a dependência
+opcional está instalada; o parse/validação com lxml e a escrita de arquivos rodam em um
+executor limitado para não bloquear o event loop dos demais usuários.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, MutableMapping, Optional, Sequence, TypeVar
+
+import requests
+
+from google.genai import types
+
+from . import operations
+from .constants import (
+    ASYNC_EXECUTOR_WORKERS,
+    DEFAULT_DATAMODEL_FILENAME,
+    DEFAULT_DIAGRAM_FILENAME,
+)
+from .rate_limit import RendererBusyError, get_render_limiter, track_queue_time
+from .renderer_pool import get_renderer_pool
+
+try:
+    import httpx  # type: ignore
+
+    HTTPX_AVAILABLE = True
+except ModuleNotFoundError:  # pragma: no cover - fallback para ambientes sem httpx
+    httpx = None  # type: ignore[assignment]
+    HTTPX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "HTTPX_AVAILABLE",
+    "run_blocking",
+    "check_datamodel_integrity_async",
+    "query_datamodel_graph_async",
+    "diff_datamodels_async",
+    "check_view_geometry_async",
+    "list_templates_async",
+    "describe_template_async",
+    "generate_mermaid_preview_async",
+    "fetch_preview_image_async",
+    "finalize_datamodel_async",
+    "save_datamodel_async",
+    "generate_archimate_diagram_async",
+]
+
+T = TypeVar("T")
+
+
+class _FlightClientClosed(RuntimeError):
+    """O cliente HTTP de quem disparou a renderização compartilhada foi fechado no meio dela."""
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=ASYNC_EXECUTOR_WORKERS,
+                thread_name_prefix="diagramador-async",
+            )
+        return _EXECUTOR
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Executa ``func`` no executor limitado do Diagramador e aguarda o resultado."""
+
+    loop = asyncio.get_running_loop()
+    # o contexto acompanha a chamada (ex.: coleta do tempo de fila dos renderizadores)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+@contextlib.asynccontextmanager
+async def _http_client() -> AsyncIterator[Any]:
+    if not HTTPX_AVAILABLE:
+        yield None
+        return
+    async with httpx.AsyncClient() as client:  # type: ignore[union-attr]
+        yield client
+
+
+async def _avalidate_mermaid_syntax(mermaid: str, client: Any) -> None:
+    url = operations._mermaid_validation_url(mermaid)
+    if url is None:
+        return
+
+    if client is not None:
+        try:
+            async with get_render_limiter().aslot(url):
+                response = await client.get(url, timeout=10)
+            response.raise_for_status()
+        except (httpx.HTTPError, RendererBusyError) as exc:  # type: ignore[union-attr]
+            logger.warning("Não foi possível validar o Mermaid gerado", exc_info=exc)
+            return
+        text = response.text
+    else:
+
+        def _fetch() -> str:
+            response = operations._mermaid_validation_request(url)
+            response.raise_for_status()
+            return response.text
+
+        try:
+            text = await run_blocking(_fetch)
+        except requests.RequestException as exc:
+            logger.warning("Não foi possível validar o Mermaid gerado", exc_info=exc)
+            return
+
+    operations._check_mermaid_validation_payload(text)
+
+
+async def _abuild_mermaid_image_payload(
+    mermaid: str,
+    *,
+    alias: str,
+    title: str,
+    client: Any,
+    output_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    payload = operations._mermaid_image_request(mermaid, title=title)
+    if not operations.FETCH_MERMAID_IMAGES:
+        return payload
+
+    digest = operations._mermaid_digest(mermaid)
+    if client is not None:
+
+        async def _apost() -> tuple[str, bytes, str]:
+            try:
+                response, endpoint = await get_renderer_pool().apost(
+                    client, "/", json=payload["body"], headers=payload["headers"], timeout=30
+                )
+            except Exception as exc:
+                # o voo é compartilhado: se quem o disparou foi cancelado e fechou o cliente,
+                # quem aguarda o resultado refaz a chamada com o próprio cliente
+                if client.is_closed:
+                    raise _FlightClientClosed("Cliente HTTP da renderização compartilhada fechado") from exc
+                raise
+            return response.headers.get("Content-Type", "") or "", response.content or b"", endpoint
+
+        try:
+            try:
+                (content_type, body, endpoint), shared = await operations._RENDER_FLIGHTS.ado(
+                    operations._render_flight_key(payload, digest), _apost
+                )
+            except _FlightClientClosed:
+                logger.info("Renderização compartilhada interrompida; refazendo sem agrupamento")
+                (content_type, body, endpoint), shared = await _apost(), False
+        except (httpx.HTTPError, RendererBusyError) as exc:  # type: ignore[union-attr]
+            logger.warning("Falha ao baixar imagem Mermaid", exc_info=exc)
+            return payload
+    else:
+        try:
+            content_type, body, endpoint, shared = await run_blocking(
+                operations._fetch_mermaid_render, payload, digest
+            )
+        except requests.RequestException as exc:
+            logger.warning("Falha ao baixar imagem Mermaid", exc_info=exc)
+            return payload
+    payload["url"] = f"{endpoint}/"
+    if shared:
+        payload["coalesced"] = True
+
+    # decodificação e gravação em disco ficam fora do event loop
+    return await run_blocking(
+        operations._apply_mermaid_image_response,
+        payload,
+        mermaid,
+        alias=alias,
+        content_type=content_type,
+        body=body,
+        output_dir=output_dir,
+        digest=digest,
+    )
+
+
+async def list_templates_async(directory: str | None = None) -> Dict[str, Any]:
+    return await run_blocking(operations.list_templates, directory)
+
+
+async def describe_template_async(
+    template_path: str,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    return await run_blocking(operations.describe_template, template_path, session_state)
+
+
+async def generate_mermaid_preview_async(
+    datamodel: types.Content | str | bytes,
+    template_path: str | None = None,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+    image_source: str | None = None,
+    detail: str | None = None,
+    image_payload: str | None = None,
+) -> Dict[str, Any]:
+    """Versão assíncrona de ``generate_mermaid_preview``.
+
+    Validação e renderização das visões são disparadas em paralelo no mesmo cliente HTTP.
+    Com a origem ``svg`` nada passa pela rede: o SVG é desenhado no executor.
+    """
+
+    source = operations._resolve_image_source(image_source)
+    payload, template_metadata, composed = await run_blocking(
+        operations._compose_mermaid_preview, datamodel, template_path, session_state, detail
+    )
+    output_dir = operations._resolve_output_dir(session_state)
+
+    if source == "svg":
+
+        def _render_all() -> List[Dict[str, Any]]:
+            rendered: List[Dict[str, Any]] = []
+            for result, view_alias, render in composed:
+                result["image"] = operations._build_svg_image_payload(
+                    render(title=result["name"]),
+                    alias=view_alias,
+                    title=result["name"],
+                    output_dir=output_dir,
+                )
+                rendered.append(result)
+            return rendered
+
+        results = await run_blocking(_render_all)
+        return operations._assemble_preview_response(
+            payload, template_metadata, results, image_payload
+        )
+
+    async with _http_client() as client:
+
+        async def _finish(result: Dict[str, Any], view_alias: str) -> Dict[str, Any]:
+            with track_queue_time() as waits:
+                for target, mermaid, alias in operations._mermaid_render_targets(result, view_alias):
+                    await _avalidate_mermaid_syntax(mermaid, client)
+                    target["image"] = await _abuild_mermaid_image_payload(
+                        mermaid,
+                        alias=alias,
+                        title=result["name"],
+                        client=client,
+                        output_dir=output_dir,
+                    )
+            result["queue_ms"] = operations._queue_ms(waits)
+            if result.get("parts"):
+                result["image"] = result["parts"][0]["image"]
+            return result
+
+        outcomes = await asyncio.gather(
+            *(_finish(result, view_alias) for result, view_alias, _ in composed),
+            return_exceptions=True,
+        )
+
+    results = []
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+        results.append(outcome)
+    return operations._assemble_preview_response(
+        payload, template_metadata, results, image_payload
+    )
+
+
+async def fetch_preview_image_async(
+    handle: str,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    return await run_blocking(operations.fetch_preview_image, handle, session_state)
+
+
+async def check_datamodel_integrity_async(
+    datamodel: types.Content | str | bytes,
+    template_path: str | None = None,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    return await run_blocking(
+        operations.check_datamodel_integrity, datamodel, template_path, session_state
+    )
+
+
+async def query_datamodel_graph_async(
+    datamodel: types.Content | str | bytes,
+    query: str,
+    element_id: str,
+    target_id: str | None = None,
+    relation_types: Sequence[str] | None = None,
+    direction: str | None = None,
+    max_depth: int = 3,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    return await run_blocking(
+        operations.query_datamodel_graph,
+        datamodel,
+        query,
+        element_id,
+        target_id=target_id,
+        relation_types=relation_types,
+        direction=direction,
+        max_depth=max_depth,
+        session_state=session_state,
+    )
+
+
+async def diff_datamodels_async(
+    datamodel: types.Content | str | bytes,
+    baseline: types.Content | str | bytes | None = None,
+    template_path: str | None = None,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    return await run_blocking(
+        operations.diff_datamodels, datamodel, baseline, template_path, session_state
+    )
+
+
+async def check_view_geometry_async(
+    datamodel: types.Content | str | bytes,
+    template_path: str | None = None,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    return await run_blocking(
+        operations.check_view_geometry, datamodel, template_path, session_state
+    )
+
+
+async def finalize_datamodel_async(
+    datamodel: types.Content | str | bytes,
+    template_path: str,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    return await run_blocking(
+        operations.finalize_datamodel, datamodel, template_path, session_state
+    )
+
+
+async def save_datamodel_async(
+    datamodel: types.Content | str | bytes,
+    filename: str = DEFAULT_DATAMODEL_FILENAME,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    return await run_blocking(operations.save_datamodel, datamodel, filename, session_state)
+
+
+async def generate_archimate_diagram_async(
+    model_json_path: str,
+    output_filename: str = DEFAULT_DIAGRAM_FILENAME,
+    template_path: str | None = None,
+    validate: bool = True,
+    xsd_dir: str | None = None,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+    full_xsd: bool | None = None,
+    force: bool = False,
+) -> Dict[str, Any]:
+    return await run_blocking(
+        operations.generate_archimate_diagram,
+        model_json_path,
+        output_filename=output_filename,
+        template_path=template_path,
+        validate=validate,
+        xsd_dir=xsd_dir,
+        session_state=session_state,
+        full_xsd=full_xsd,
+        force=force,
+    )
@@ -0,0 +1,240 @@
+"""Caches de processo compartilhados entre as sessões do agente Diagramador."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# mesma assinatura e mesma regra de sobreposição dos caches do xml_exchange
+from ..archimate_exchange.xml_exchange import file_signature, paths_overlap
+
+__all__ = [
+    "FileCache",
+    "LRUCache",
+    "SingleFlight",
+    "file_signature",
+    "get_cache",
+    "invalidate_paths",
+    "register_invalidation_hook",
+]
+
+FileSignature = Tuple[int, int]
+InvalidationHook = Callable[[Optional[List[str]]], int]
+
+_REGISTRY: Dict[str, "FileCache | LRUCache"] = {}
+_HOOKS: Dict[str, InvalidationHook] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _normalize_path(path: str | Path) -> str:
+    candidate = Path(path)
+    if not candidate.is_absolute():
+        candidate = Path.cwd() / candidate
+    return str(candidate.resolve())
+
+
+class FileCache:
+    """Cache thread-safe indexado pelo caminho absoluto de um arquivo.
+
+    Cada entrada guarda a assinatura do arquivo no momento da carga; se o arquivo mudar a
+    entrada é recarregada na próxima consulta. Os valores são compartilhados entre chamadas
+    e não devem ser modificados por quem os consome.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._entries: Dict[str, Tuple[FileSignature, Any]] = {}
+        self._lock = threading.Lock()
+        with _REGISTRY_LOCK:
+            _REGISTRY[name] = self
+
+    def get(self, path: str | Path, loader: Callable[[Path], Any]) -> Any:
+        key = _normalize_path(path)
+        signature = file_signature(key)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        value = loader(Path(key))
+        if signature is not None:
+            with self._lock:
+                self._entries[key] = (signature, value)
+        return value
+
+    def peek(self, path: str | Path) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(_normalize_path(path))
+        return entry[1] if entry is not None else None
+
+    def invalidate(self, paths: Optional[Iterable[str | Path]] = None) -> int:
+        """Remove as entradas dos caminhos informados, abaixo deles ou que os contêm."""
+
+        with self._lock:
+            if paths is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+            targets = [_normalize_path(path) for path in paths]
+            stale = [key for key in self._entries if paths_overlap(key, targets)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class LRUCache:
+    """Cache thread-safe com limite de entradas, indexado por chaves arbitrárias (ex.: hashes).
+
+    Como as chaves não são caminhos, qualquer invalidação por caminho descarta todas as
+    entradas; elas são recalculadas sob demanda.
+    """
+
+    def __init__(self, name: str, maxsize: int = 32) -> None:
+        self.name = name
+        self.maxsize = max(int(maxsize), 1)
+        self._entries: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        with _REGISTRY_LOCK:
+            _REGISTRY[name] = self
+
+    def get(self, key: Any, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = loader()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def peek(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def invalidate(self, paths: Optional[Iterable[str | Path]] = None) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+
+    def keys(self) -> List[Any]:
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+@dataclass
+class _Flight:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes com a mesma chave em uma única execução.
+
+    Enquanto a primeira chamada de uma chave está em andamento, as demais esperam por ela e
+    recebem o mesmo resultado (ou a mesma exceção). Nada é guardado depois que a chamada
+    termina: a deduplicação vale só para o que está em voo.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._tasks: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Executa ``func`` uma vez por chave em voo; retorna ``(resultado, compartilhado)``."""
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = func()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return flight.result, False
+
+    async def ado(
+        self, key: Hashable, factory: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """Versão assíncrona de :meth:`do` para chamadas no mesmo event loop."""
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            shared = task is not None and task.get_loop() is loop
+            if not shared:
+                task = asyncio.ensure_future(factory())
+                self._tasks[key] = task
+
+                def _forget(finished: "asyncio.Future[Any]", key: Hashable = key) -> None:
+                    with self._lock:
+                        if self._tasks.get(key) is finished:
+                            del self._tasks[key]
+
+                task.add_done_callback(_forget)
+        # o shield mantém a chamada viva para os demais se quem a iniciou for cancelado
+        return await asyncio.shield(task), shared
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._flights) + len(self._tasks)
+
+
+def get_cache(name: str) -> Optional["FileCache | LRUCache"]:
+    with _REGISTRY_LOCK:
+        return _REGISTRY.get(name)
+
+
+def register_invalidation_hook(name: str, hook: InvalidationHook) -> None:
+    """Registra caches externos (ex.: ``xml_exchange``) na invalidação por caminho."""
+
+    with _REGISTRY_LOCK:
+        _HOOKS[name] = hook
+
+
+def invalidate_paths(paths: Optional[Iterable[str | Path]] = None) -> Dict[str, int]:
+    """Invalida todos os caches registrados para os caminhos afetados.
+
+    Retorna a quantidade de entradas removidas por cache.
+    """
+
+    normalized = None if paths is None else [_normalize_path(path) for path in paths]
+    with _REGISTRY_LOCK:
+        caches = list(_REGISTRY.values())
+        hooks = list(_HOOKS.items())
+    removed = {cache.name: cache.invalidate(normalized) for cache in caches}
+    for name, hook in hooks:
+        removed[name] = hook(normalized)
+    return removed
@@ -8,15 +8,40 @@ from pathlib import Path
 __all__ = [
     "DEFAULT_MODEL",
     "OUTPUT_DIR",
+    "OUTPUT_ISOLATION",
     "DEFAULT_DATAMODEL_FILENAME",
     "DEFAULT_DIAGRAM_FILENAME",
     "DEFAULT_TEMPLATE",
     "DEFAULT_TEMPLATES_DIR",
     "DEFAULT_XSD_DIR",
     "DEFAULT_KROKI_URL",
+    "KROKI_URLS",
+    "KROKI_BALANCING",
+    "KROKI_RETRIES",
+    "KROKI_HEDGE_AFTER_MS",
+    "KROKI_HEALTH_INTERVAL",
+    "RENDER_RATE_LIMIT",
+    "RENDER_RATE_BURST",
+    "RENDER_HOST_CONCURRENCY",
+    "RENDER_QUEUE_TIMEOUT",
     "DEFAULT_MERMAID_IMAGE_FORMAT",
     "DEFAULT_MERMAID_VALIDATION_URL",
     "FETCH_MERMAID_IMAGES",
+    "FULL_XSD_VALIDATION",
+    "OUTPUT_CACHE",
+    "XSD_VERDICT_CACHE",
+    "PREVIEW_IMAGE_SOURCE",
+    "IMAGE_PAYLOAD_MODE",
+    "MERMAID_DETAIL",
+    "MERMAID_DETAIL_NODE_BUDGET",
+    "MERMAID_MAX_NODES_PER_RENDER",
+    "MERMAID_MAX_CHARS_PER_RENDER",
+    "STREAMING_JSON_THRESHOLD",
+    "WATCH_TEMPLATES",
+    "PREWARM_TEMPLATES",
+    "TEMPLATE_WATCH_INTERVAL",
+    "ASYNC_TOOLS",
+    "ASYNC_EXECUTOR_WORKERS",
     "ARCHIMATE_NS",
     "XSI_ATTR",
     "XML_LANG_ATTR",
@@ -24,6 +49,10 @@ __all__ = [
 
 DEFAULT_MODEL = os.getenv("DIAGRAMADOR_MODEL", "gemini-2.5-pro")
 OUTPUT_DIR = Path("outputs")
+# "session" (padrão), "invocation" ou "none"; ver storage.namespaced_output_dir
+OUTPUT_ISOLATION = os.getenv("DIAGRAMADOR_OUTPUT_ISOLATION", "session").lower() or "session"
+if OUTPUT_ISOLATION not in {"session", "invocation", "none"}:
+    OUTPUT_ISOLATION = "session"
 DEFAULT_DATAMODEL_FILENAME = "diagramador_datamodel.json"
 DEFAULT_DIAGRAM_FILENAME = "diagramador_container_diagram.xml"
 DEFAULT_TEMPLATE = Path("templates/BV-C4-Model-SDLC/layout_template.xml")
@@ -32,6 +61,28 @@ DEFAULT_XSD_DIR = Path(
     os.getenv("DIAGRAMADOR_XSD_DIR", "templates/BV-C4-Model-SDLC/schemas")
 )
 DEFAULT_KROKI_URL = os.getenv("DIAGRAMADOR_KROKI_URL", "https://kroki.io")
+# lista separada por vírgulas; sem ela o pool usa apenas DEFAULT_KROKI_URL
+KROKI_URLS = [
+    url.strip().rstrip("/")
+    for url in os.getenv("DIAGRAMADOR_KROKI_URLS", "").split(",")
+    if url.strip()
+] or [DEFAULT_KROKI_URL.rstrip("/")]
+# "least_outstanding" (menos requisições em andamento) ou "round_robin"
+KROKI_BALANCING = os.getenv("DIAGRAMADOR_KROKI_BALANCING", "least_outstanding").lower()
+if KROKI_BALANCING not in {"least_outstanding", "round_robin"}:
+    KROKI_BALANCING = "least_outstanding"
+KROKI_RETRIES = max(int(os.getenv("DIAGRAMADOR_KROKI_RETRIES", "2")), 0)
+# 0 desativa; acima disso, endpoints com p95 maior que o limite recebem requisição hedge
+KROKI_HEDGE_AFTER_MS = max(float(os.getenv("DIAGRAMADOR_KROKI_HEDGE_AFTER_MS", "0")), 0.0)
+# intervalo (s) das sondas de saúde em segundo plano; 0 desativa
+KROKI_HEALTH_INTERVAL = max(float(os.getenv("DIAGRAMADOR_KROKI_HEALTH_INTERVAL", "30")), 0.0)
+# limite global (requisições/s, 0 desativa) e rajada das chamadas aos renderizadores
+RENDER_RATE_LIMIT = max(float(os.getenv("DIAGRAMADOR_RENDER_RATE_LIMIT", "20")), 0.0)
+RENDER_RATE_BURST = max(float(os.getenv("DIAGRAMADOR_RENDER_RATE_BURST", "40")), 1.0)
+# chamadas simultâneas por host de renderização (Kroki, mermaid.ink)
+RENDER_HOST_CONCURRENCY = max(int(os.getenv("DIAGRAMADOR_RENDER_HOST_CONCURRENCY", "8")), 1)
+# espera máxima (s) na fila antes de desistir da chamada
+RENDER_QUEUE_TIMEOUT = max(float(os.getenv("DIAGRAMADOR_RENDER_QUEUE_TIMEOUT", "10")), 0.0)
 DEFAULT_MERMAID_VALIDATION_URL = os.getenv(
     "DIAGRAMADOR_MERMAID_VALIDATION_URL", "https://mermaid.ink"
 )
@@ -40,6 +91,64 @@ FETCH_MERMAID_IMAGES = os.getenv("DIAGRAMADOR_FETCH_MERMAID_IMAGES", "1").lower(
     "true",
     "yes",
 )
+# a pré-validação estrutural sempre roda; esta flag controla a segunda etapa (XSD completo)
+FULL_XSD_VALIDATION = os.getenv("DIAGRAMADOR_FULL_XSD_VALIDATION", "1").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# reaproveita o XML (e o relatório de validação) quando template e datamodel não mudaram
+OUTPUT_CACHE = os.getenv("DIAGRAMADOR_OUTPUT_CACHE", "1").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# guarda os veredictos da validação XSD completa (hash do XML + XSDs) em OUTPUT_DIR
+XSD_VERDICT_CACHE = os.getenv("DIAGRAMADOR_XSD_VERDICT_CACHE", "1").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# "kroki" (Mermaid renderizado remotamente) ou "svg" (layout do template, sem rede)
+PREVIEW_IMAGE_SOURCE = (
+    os.getenv("DIAGRAMADOR_PREVIEW_IMAGE_SOURCE", "kroki").lower() or "kroki"
+)
+if PREVIEW_IMAGE_SOURCE not in {"kroki", "svg"}:
+    PREVIEW_IMAGE_SOURCE = "kroki"
+# "reference" devolve só handle/hash/dimensões da imagem gravada; "inline" inclui o data URI
+IMAGE_PAYLOAD_MODE = os.getenv("DIAGRAMADOR_IMAGE_PAYLOAD", "reference").lower() or "reference"
+if IMAGE_PAYLOAD_MODE not in {"reference", "inline"}:
+    IMAGE_PAYLOAD_MODE = "reference"
+# nível de detalhe do Mermaid: "auto" (compacta visões grandes), "full" ou "compact"
+MERMAID_DETAIL = os.getenv("DIAGRAMADOR_MERMAID_DETAIL", "auto").lower() or "auto"
+if MERMAID_DETAIL not in {"auto", "full", "compact"}:
+    MERMAID_DETAIL = "auto"
+# acima deste número de nós a visão perde as notas e os contêineres viram subgraphs
+MERMAID_DETAIL_NODE_BUDGET = max(int(os.getenv("DIAGRAMADOR_MERMAID_DETAIL_NODES", "60")), 1)
+# limites de cada render no modo compacto; visões maiores são divididas em partes ligadas
+MERMAID_MAX_NODES_PER_RENDER = max(int(os.getenv("DIAGRAMADOR_MERMAID_MAX_NODES", "150")), 1)
+MERMAID_MAX_CHARS_PER_RENDER = max(
+    int(os.getenv("DIAGRAMADOR_MERMAID_MAX_CHARS", "20000")), 1000
+)
+# datamodels acima deste tamanho (bytes) são lidos em modo incremental, item a item
+STREAMING_JSON_THRESHOLD = max(
+    int(os.getenv("DIAGRAMADOR_STREAMING_JSON_BYTES", str(8 * 1024 * 1024))), 0
+)
+
+WATCH_TEMPLATES = os.getenv("DIAGRAMADOR_WATCH_TEMPLATES", "0").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+PREWARM_TEMPLATES = os.getenv("DIAGRAMADOR_PREWARM_TEMPLATES", "0").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+TEMPLATE_WATCH_INTERVAL = float(os.getenv("DIAGRAMADOR_TEMPLATE_WATCH_INTERVAL", "1.0"))
+# "auto" registra as ferramentas assíncronas apenas se o runtime do ADK suportar corrotinas
+ASYNC_TOOLS = os.getenv("DIAGRAMADOR_ASYNC_TOOLS", "auto").lower() or "auto"
+ASYNC_EXECUTOR_WORKERS = max(int(os.getenv("DIAGRAMADOR_ASYNC_WORKERS", "4")), 1)
 
 _MERMAID_SUPPORTED_FORMATS = {"png", "svg"}
 DEFAULT_MERMAID_IMAGE_FORMAT = (
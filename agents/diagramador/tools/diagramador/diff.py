@@ -0,0 +1,180 @@
+"""Diff estrutural por identificador entre datamodels (ou entre datamodel e blueprint).
+
+Elementos, relacionamentos, visões, nós, conexões e itens de organização são casados pela
+mesma chave usada no merge com o template (``id``, :func:`view_node_key` e
+:func:`organization_key`). Cada lado é indexado uma única vez em dicionários, de modo que
+o changeset — itens adicionados, removidos e campos alterados — sai em tempo linear e
+contém apenas o que mudou.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+from .model import (
+    organization_key,
+    payload_child_nodes,
+    payload_id,
+    text_of,
+    view_node_key,
+    walk_payload_nodes,
+)
+
+__all__ = [
+    "DIFF_SECTIONS",
+    "diff_payloads",
+]
+
+DIFF_SECTIONS = ("elements", "relations", "views", "nodes", "connections", "organizations")
+
+# campos textuais comparados pelo texto (``"Nome"`` equivale a ``{"text": "Nome"}``)
+_TEXT_FIELDS = frozenset({"name", "documentation", "label"})
+# filhos são casados separadamente e não entram na comparação de campos
+_CHILD_FIELDS = frozenset({"nodes", "children", "connections", "items"})
+# campos que identificam o item no relatório de adicionados/removidos
+_SUMMARY_FIELDS = ("id", "type", "name", "label", "source", "target", "elementRef", "relationshipRef")
+
+Index = Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]]
+
+
+def _list(value: Any) -> List[Dict[str, Any]]:
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict)]
+    return []
+
+
+def _diagrams(payload: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    views = payload.get("views")
+    if isinstance(views, dict):
+        return _list(views.get("diagrams"))
+    return _list(views)
+
+
+def _walk_organizations(
+    items: Iterable[Dict[str, Any]], scope: str
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    for item in items:
+        key = organization_key(item)
+        # como no merge, itens são casados dentro da pasta-mãe
+        path = f"{scope}/{key}" if key else None
+        if path:
+            yield path, item
+        yield from _walk_organizations(_list(item.get("items")), path or scope)
+
+
+def _index(payload: Mapping[str, Any]) -> Dict[str, Index]:
+    """Chave -> (item, contexto) para cada seção do diff."""
+
+    sections: Dict[str, Index] = {name: {} for name in DIFF_SECTIONS}
+    for name in ("elements", "relations"):
+        for item in _list(payload.get(name)):
+            key = payload_id(item)
+            if key:
+                sections[name][key] = (item, {})
+    for diagram in _diagrams(payload):
+        view_id = payload_id(diagram)
+        if not view_id:
+            continue
+        sections["views"][view_id] = (diagram, {})
+        context = {"view": view_id}
+        connections = list(_list(diagram.get("connections")))
+        _key, nodes = payload_child_nodes(diagram)
+        for node in walk_payload_nodes(nodes):
+            key = view_node_key(node)
+            if key:
+                sections["nodes"][f"{view_id}/{key}"] = (node, context)
+            connections.extend(_list(node.get("connections")))
+        for connection in connections:
+            key = payload_id(connection) or (
+                f"relationshipRef:{connection['relationshipRef']}"
+                if connection.get("relationshipRef")
+                else None
+            )
+            if key:
+                sections["connections"][f"{view_id}/{key}"] = (connection, context)
+    for path, item in _walk_organizations(_list(payload.get("organizations")), ""):
+        sections["organizations"][path] = (item, {})
+    return sections
+
+
+def _comparable(field: str, value: Any) -> Any:
+    if field in _TEXT_FIELDS:
+        return text_of(value)
+    return value
+
+
+def _field_changes(
+    before: Mapping[str, Any], after: Mapping[str, Any], *, partial: bool
+) -> Dict[str, Dict[str, Any]]:
+    changes: Dict[str, Dict[str, Any]] = {}
+    for field in before.keys() | after.keys():
+        if field in _CHILD_FIELDS or field == "identifier":
+            continue
+        if partial and field not in after:
+            continue
+        old = _comparable(field, before.get(field))
+        new = _comparable(field, after.get(field))
+        if old != new:
+            changes[field] = {"before": old, "after": new}
+    return dict(sorted(changes.items()))
+
+
+def _summary(key: str, item: Mapping[str, Any], context: Mapping[str, Any]) -> Dict[str, Any]:
+    entry: Dict[str, Any] = {"key": key}
+    entry.update(context)
+    for field in _SUMMARY_FIELDS:
+        value = _comparable(field, item.get(field))
+        if value is not None:
+            entry[field] = value
+    return entry
+
+
+def diff_payloads(
+    before: Mapping[str, Any],
+    after: Mapping[str, Any],
+    *,
+    partial: bool = False,
+) -> Dict[str, Any]:
+    """Changeset de ``before`` para ``after``, seção a seção.
+
+    Com ``partial=True`` (datamodel comparado ao blueprint do template) campos ausentes em
+    ``after`` não contam como alteração e itens do ``before`` que não aparecem em ``after``
+    são apenas contados, pois o merge com o template os preenche.
+    """
+
+    before_index = _index(before)
+    after_index = _index(after)
+    summary: Dict[str, Dict[str, int]] = {}
+    changeset: Dict[str, Any] = {}
+    for name in DIFF_SECTIONS:
+        old_items, new_items = before_index[name], after_index[name]
+        added = [
+            _summary(key, item, context)
+            for key, (item, context) in new_items.items()
+            if key not in old_items
+        ]
+        removed_keys = [key for key in old_items if key not in new_items]
+        modified = []
+        for key, (item, context) in new_items.items():
+            previous = old_items.get(key)
+            if previous is None:
+                continue
+            changes = _field_changes(previous[0], item, partial=partial)
+            if changes:
+                modified.append({"key": key, **context, "changes": changes})
+        counts = {"added": len(added), "removed": len(removed_keys), "modified": len(modified)}
+        summary[name] = counts
+        section: Dict[str, Any] = {}
+        if added:
+            section["added"] = added
+        if removed_keys and not partial:
+            section["removed"] = [_summary(key, *old_items[key]) for key in removed_keys]
+        if modified:
+            section["modified"] = modified
+        if section:
+            changeset[name] = section
+    identical = all(
+        not counts["added"] and not counts["modified"] and (partial or not counts["removed"])
+        for counts in summary.values()
+    )
+    return {"identical": identical, "summary": summary, "changes": changeset}
@@ -0,0 +1,262 @@
+"""Índice de grafo em memória sobre o datamodel de trabalho do Diagramador.
+
+Construído uma vez a partir de ``elements``, ``relations``, visões e organizações, o índice
+mantém listas de adjacência por tipo de relacionamento (nos dois sentidos) e índices
+reversos elemento -> visões e elemento -> organizações. As consultas (vizinhos, caminho,
+impacto e "onde é usado") percorrem apenas esses índices e devolvem um resultado pequeno,
+sem que o datamodel inteiro precise voltar ao contexto do modelo.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .model import (
+    OrgItem,
+    Relationship,
+    payload_diagrams,
+    text_of,
+    view_connections,
+    walk_view_nodes,
+)
+
+__all__ = [
+    "DatamodelGraph",
+    "GRAPH_DIRECTIONS",
+    "normalize_relation_type",
+]
+
+GRAPH_DIRECTIONS = ("outgoing", "incoming", "both")
+
+# tipo de relacionamento -> lista de (vizinho, id do relacionamento)
+Adjacency = Dict[str, Dict[str, List[Tuple[str, str]]]]
+
+
+def normalize_relation_type(value: Optional[str]) -> Optional[str]:
+    """``ServingRelationship`` e ``Serving`` designam o mesmo tipo."""
+
+    if not value:
+        return value
+    local = value.rsplit(":", 1)[-1]
+    return local[: -len("Relationship")] if local.endswith("Relationship") and local != "Relationship" else local
+
+
+@dataclass(slots=True)
+class DatamodelGraph:
+    concepts: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    outgoing: Adjacency = field(default_factory=dict)
+    incoming: Adjacency = field(default_factory=dict)
+    # elemento -> [(id da visão, id do nó)]
+    views_by_concept: Dict[str, List[Tuple[str, Optional[str]]]] = field(default_factory=dict)
+    view_names: Dict[str, Optional[str]] = field(default_factory=dict)
+    # elemento -> caminhos de rótulos das pastas que o referenciam
+    folders_by_concept: Dict[str, List[Tuple[str, ...]]] = field(default_factory=dict)
+
+    @classmethod
+    def from_payload(cls, payload: Mapping[str, Any]) -> "DatamodelGraph":
+        graph = cls()
+        for item in payload.get("elements") or []:
+            if isinstance(item, dict):
+                identifier = item.get("id") or item.get("identifier")
+                if identifier:
+                    graph.concepts[identifier] = {
+                        "id": identifier,
+                        "type": item.get("type"),
+                        "name": text_of(item.get("name")),
+                    }
+        for item in payload.get("relations") or []:
+            if not isinstance(item, dict):
+                continue
+            relation = Relationship.from_dict(item)
+            if not relation.id:
+                continue
+            relation_type = normalize_relation_type(relation.type) or "Association"
+            graph.concepts[relation.id] = {
+                "id": relation.id,
+                "type": relation_type,
+                "name": text_of(item.get("name")),
+                "source": relation.source,
+                "target": relation.target,
+            }
+            if relation.source and relation.target:
+                graph.outgoing.setdefault(relation.source, {}).setdefault(relation_type, []).append(
+                    (relation.target, relation.id)
+                )
+                graph.incoming.setdefault(relation.target, {}).setdefault(relation_type, []).append(
+                    (relation.source, relation.id)
+                )
+        for _path, diagram in payload_diagrams(payload):
+            if not diagram.id:
+                continue
+            graph.view_names[diagram.id] = text_of(diagram.name)
+            for _node_path, node in walk_view_nodes(diagram.nodes, ""):
+                for kind in ("elementRef", "relationshipRef"):
+                    ref = node.ref(kind)
+                    if ref:
+                        graph.views_by_concept.setdefault(ref, []).append((diagram.id, node.id))
+            # conexões no nível da visão e as aninhadas nos nós
+            for _connection_path, connection in view_connections(diagram):
+                if connection.relationship_ref:
+                    graph.views_by_concept.setdefault(connection.relationship_ref, []).append(
+                        (diagram.id, connection.id)
+                    )
+        roots = [OrgItem.from_dict(item) for item in payload.get("organizations") or [] if isinstance(item, dict)]
+        graph._index_folders(roots, ())
+        return graph
+
+    def _index_folders(self, items: Iterable[OrgItem], trail: Tuple[str, ...]) -> None:
+        for item in items:
+            label = text_of(item.label)
+            if item.identifier_ref:
+                self.folders_by_concept.setdefault(item.identifier_ref, []).append(trail)
+            self._index_folders(item.items, trail + (label,) if label else trail)
+
+    # ---- consultas ----
+
+    def describe(self, identifier: str) -> Dict[str, Any]:
+        concept = self.concepts.get(identifier)
+        if concept is None:
+            return {"id": identifier, "missing": True}
+        return {key: value for key, value in concept.items() if value is not None}
+
+    def _edges(
+        self,
+        identifier: str,
+        direction: str,
+        relation_types: Optional[Iterable[str]] = None,
+    ) -> Iterable[Tuple[str, str, str, str]]:
+        """Gera ``(vizinho, tipo, id do relacionamento, sentido)`` a partir de ``identifier``."""
+
+        wanted = {normalize_relation_type(value) for value in relation_types} if relation_types else None
+        sides = []
+        if direction in ("outgoing", "both"):
+            sides.append(("outgoing", self.outgoing.get(identifier, {})))
+        if direction in ("incoming", "both"):
+            sides.append(("incoming", self.incoming.get(identifier, {})))
+        for side, adjacency in sides:
+            for relation_type, edges in adjacency.items():
+                if wanted is not None and relation_type not in wanted:
+                    continue
+                for neighbor, relation_id in edges:
+                    yield neighbor, relation_type, relation_id, side
+
+    def neighbors(
+        self,
+        identifier: str,
+        *,
+        direction: str = "both",
+        relation_types: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        return [
+            {
+                **self.describe(neighbor),
+                "relation": relation_type,
+                "relation_id": relation_id,
+                "direction": side,
+            }
+            for neighbor, relation_type, relation_id, side in self._edges(
+                identifier, direction, relation_types
+            )
+        ]
+
+    def path(
+        self,
+        source: str,
+        target: str,
+        *,
+        direction: str = "both",
+        relation_types: Optional[Iterable[str]] = None,
+        max_depth: int = 6,
+    ) -> List[Dict[str, Any]]:
+        """Menor caminho (em número de relacionamentos) entre ``source`` e ``target`` (BFS)."""
+
+        if source == target:
+            return [self.describe(source)]
+        previous: Dict[str, Tuple[str, str, str, str]] = {}
+        frontier = deque([(source, 0)])
+        seen = {source}
+        while frontier:
+            current, depth = frontier.popleft()
+            if depth >= max_depth:
+                continue
+            for neighbor, relation_type, relation_id, side in self._edges(current, direction, relation_types):
+                if neighbor in seen:
+                    continue
+                seen.add(neighbor)
+                previous[neighbor] = (current, relation_type, relation_id, side)
+                if neighbor == target:
+                    return self._unwind(previous, source, target)
+                frontier.append((neighbor, depth + 1))
+        return []
+
+    def _unwind(
+        self, previous: Mapping[str, Tuple[str, str, str, str]], source: str, target: str
+    ) -> List[Dict[str, Any]]:
+        steps: List[Dict[str, Any]] = []
+        current = target
+        while current != source:
+            parent, relation_type, relation_id, side = previous[current]
+            steps.append(
+                {
+                    **self.describe(current),
+                    "via": {"relation": relation_type, "relation_id": relation_id, "direction": side},
+                }
+            )
+            current = parent
+        steps.append(self.describe(source))
+        steps.reverse()
+        return steps
+
+    def impact(
+        self,
+        identifier: str,
+        *,
+        direction: str = "outgoing",
+        relation_types: Optional[Iterable[str]] = None,
+        max_depth: int = 3,
+    ) -> List[Dict[str, Any]]:
+        """Conceitos alcançáveis a partir de ``identifier`` até ``max_depth`` saltos.
+
+        Por padrão segue os relacionamentos no sentido origem -> destino (quem é servido,
+        acionado ou alimentado por ``identifier``); ``incoming`` responde "quem depende dele".
+        """
+
+        reached: List[Dict[str, Any]] = []
+        seen = {identifier}
+        frontier = [identifier]
+        for depth in range(1, max_depth + 1):
+            next_frontier: List[str] = []
+            for current in frontier:
+                for neighbor, relation_type, relation_id, _side in self._edges(
+                    current, direction, relation_types
+                ):
+                    if neighbor in seen:
+                        continue
+                    seen.add(neighbor)
+                    next_frontier.append(neighbor)
+                    reached.append(
+                        {
+                            **self.describe(neighbor),
+                            "depth": depth,
+                            "via": {"from": current, "relation": relation_type, "relation_id": relation_id},
+                        }
+                    )
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return reached
+
+    def where_used(self, identifier: str) -> Dict[str, Any]:
+        views: Dict[str, Dict[str, Any]] = {}
+        for view_id, node_id in self.views_by_concept.get(identifier, []):
+            entry = views.setdefault(
+                view_id, {"id": view_id, "name": self.view_names.get(view_id), "nodes": []}
+            )
+            if node_id:
+                entry["nodes"].append(node_id)
+        return {
+            "views": list(views.values()),
+            "organizations": [list(trail) for trail in self.folders_by_concept.get(identifier, [])],
+        }
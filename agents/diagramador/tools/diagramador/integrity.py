@@ -0,0 +1,169 @@
+"""Integridade referencial de datamodels ArchiMate (identificadores e referências).
+
+Um único índice de identificadores cobre elementos, relacionamentos, visões (com seus nós e
+conexões) e itens de organização. A partir dele cada referência — ``source``/``target`` de
+relacionamentos, ``elementRef``/``relationshipRef``/``viewRef`` de nós, ``relationshipRef``/
+``source``/``target`` de conexões e ``identifierRef`` de organizações — é resolvida em tempo
+constante, e o relatório lista todas as referências pendentes e os identificadores
+duplicados em uma passada linear sobre o datamodel.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from .model import (
+    OrgItem,
+    Relationship,
+    payload_diagrams,
+    view_connections,
+    walk_view_nodes,
+)
+
+__all__ = [
+    "IdentifierIndex",
+    "build_identifier_index",
+    "check_referential_integrity",
+]
+
+# tipos de destino aceitos por referência
+_RELATION_ENDS = ("element", "relation")
+_CONNECTION_ENDS = ("node", "connection")
+_ORGANIZATION_TARGETS = ("element", "relation", "view")
+
+
+@dataclass(slots=True)
+class IdentifierIndex:
+    """Identificador -> (tipo, caminho da primeira ocorrência), mais as duplicatas vistas."""
+
+    entries: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+    duplicates: Dict[str, List[str]] = field(default_factory=dict)
+    # identificadores conhecidos de fora do datamodel (ex.: template), sem checagem de duplicata
+    external: Dict[str, str] = field(default_factory=dict)
+
+    def add(self, identifier: Optional[str], kind: str, path: str) -> None:
+        if not identifier:
+            return
+        first = self.entries.get(identifier)
+        if first is None:
+            self.entries[identifier] = (kind, path)
+            return
+        self.duplicates.setdefault(identifier, [first[1]]).append(path)
+
+    def kind_of(self, identifier: str) -> Optional[str]:
+        entry = self.entries.get(identifier)
+        if entry is not None:
+            return entry[0]
+        return self.external.get(identifier)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def _items(payload: Mapping[str, Any], key: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    values = payload.get(key)
+    if isinstance(values, list):
+        for position, item in enumerate(values):
+            if isinstance(item, dict):
+                yield position, item
+
+
+def _walk_organizations(
+    items: Iterable[OrgItem], path: str
+) -> Iterator[Tuple[str, OrgItem]]:
+    for position, item in enumerate(items):
+        item_path = f"{path}[{position}]"
+        yield item_path, item
+        yield from _walk_organizations(item.items, f"{item_path}.items")
+
+
+def build_identifier_index(
+    payload: Mapping[str, Any],
+    *,
+    known: Optional[Mapping[str, str]] = None,
+) -> IdentifierIndex:
+    """Indexa todos os identificadores declarados no datamodel.
+
+    ``known`` (identificador -> tipo) registra identificadores que existem fora do
+    datamodel, como os do template, e que podem ser referenciados sem serem redeclarados.
+    """
+
+    index = IdentifierIndex(external=dict(known or {}))
+    for position, item in _items(payload, "elements"):
+        index.add(item.get("id") or item.get("identifier"), "element", f"elements[{position}]")
+    for position, item in _items(payload, "relations"):
+        index.add(item.get("id") or item.get("identifier"), "relation", f"relations[{position}]")
+    for path, diagram in payload_diagrams(payload):
+        index.add(diagram.id, "view", path)
+        for node_path, node in walk_view_nodes(diagram.nodes, path):
+            index.add(node.id, "node", node_path)
+        for connection_path, connection in view_connections(diagram, path):
+            index.add(connection.id, "connection", connection_path)
+    organizations = [OrgItem.from_dict(item) for _, item in _items(payload, "organizations")]
+    for path, item in _walk_organizations(organizations, "organizations"):
+        index.add(item.identifier, "organization", path)
+    return index
+
+
+def check_referential_integrity(
+    payload: Mapping[str, Any],
+    *,
+    known: Optional[Mapping[str, str]] = None,
+) -> Dict[str, Any]:
+    """Verifica se todas as referências do datamodel resolvem para o tipo esperado.
+
+    Retorna um relatório JSON-serializável com ``valid``, as referências pendentes
+    (``dangling``: caminho, atributo, valor, tipos aceitos e o tipo encontrado, se houver) e
+    os identificadores duplicados (``duplicates``) com todos os caminhos onde aparecem.
+    """
+
+    index = build_identifier_index(payload, known=known)
+    dangling: List[Dict[str, Any]] = []
+
+    def expect(path: str, attribute: str, value: Optional[str], kinds: Tuple[str, ...]) -> None:
+        if not value:
+            return
+        found = index.kind_of(value)
+        if found in kinds:
+            return
+        issue: Dict[str, Any] = {
+            "path": path,
+            "attribute": attribute,
+            "ref": value,
+            "expected": list(kinds),
+        }
+        if found:
+            issue["found"] = found
+        dangling.append(issue)
+
+    for position, item in _items(payload, "relations"):
+        relation = Relationship.from_dict(item)
+        path = f"relations[{position}]"
+        expect(path, "source", relation.source, _RELATION_ENDS)
+        expect(path, "target", relation.target, _RELATION_ENDS)
+
+    for path, diagram in payload_diagrams(payload):
+        for node_path, node in walk_view_nodes(diagram.nodes, path):
+            expect(node_path, "elementRef", node.ref("elementRef"), ("element",))
+            expect(node_path, "relationshipRef", node.ref("relationshipRef"), ("relation",))
+            expect(node_path, "viewRef", node.ref("viewRef"), ("view",))
+        for connection_path, connection in view_connections(diagram, path):
+            expect(connection_path, "relationshipRef", connection.relationship_ref, ("relation",))
+            expect(connection_path, "source", connection.source, _CONNECTION_ENDS)
+            expect(connection_path, "target", connection.target, _CONNECTION_ENDS)
+
+    organizations = [OrgItem.from_dict(item) for _, item in _items(payload, "organizations")]
+    for path, item in _walk_organizations(organizations, "organizations"):
+        expect(path, "identifierRef", item.identifier_ref, _ORGANIZATION_TARGETS)
+
+    duplicates = [
+        {"id": identifier, "paths": paths} for identifier, paths in index.duplicates.items()
+    ]
+    return {
+        "valid": not dangling and not duplicates,
+        "identifier_count": len(index),
+        "issue_count": len(dangling) + len(duplicates),
+        "dangling": dangling,
+        "duplicates": duplicates,
+    }
@@ -0,0 +1,417 @@
+"""Layout automático (em camadas, estilo Sugiyama) para nós de visão sem ``bounds``.
+
+Nós e conexões acrescentados pelo datamodel chegam ao merge sem coordenadas e o gerador
+de XML os emitiria sem ``x``/``y``/``w``/``h``, empilhados na origem. Aqui cada grupo de
+irmãos novos é organizado dentro do contêiner pai:
+
+1. os relacionamentos entre irmãos (conexões da visão e relações entre os elementos
+   referenciados) formam um grafo, cujos ciclos são quebrados por DFS;
+2. cada nó recebe a camada do caminho mais longo a partir das fontes;
+3. a ordem dentro das camadas é refinada por baricentro, e camadas largas quebram em
+   várias linhas;
+4. as coordenadas saem de somas acumuladas por linha (vetorizadas com NumPy quando
+   disponível) e o bloco é deslocado para baixo dos nós já posicionados pelo template.
+
+Contêineres novos são medidos de baixo para cima (o tamanho acompanha o conteúdo) e
+contêineres do template crescem quando o bloco novo não cabe neles. Os dicionários de
+``bounds`` existentes nunca são alterados no lugar, pois podem ser compartilhados com o
+modelo do template em cache.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+from .model import payload_child_nodes, payload_id, payload_ref, walk_payload_nodes
+
+try:
+    import numpy as np  # type: ignore
+
+    NUMPY_AVAILABLE = True
+except ModuleNotFoundError:  # pragma: no cover - fallback para ambientes sem numpy
+    np = None  # type: ignore[assignment]
+    NUMPY_AVAILABLE = False
+
+__all__ = [
+    "NUMPY_AVAILABLE",
+    "auto_layout_view",
+    "auto_layout_views",
+]
+
+logger = logging.getLogger(__name__)
+
+NODE_WIDTH = 120
+NODE_HEIGHT = 55
+GAP_X = 40
+GAP_Y = 40
+PADDING = 20
+# espaço reservado para o rótulo no topo dos contêineres
+HEADER = 30
+# a partir deste número de irmãos as operações de coordenadas usam NumPy
+_VECTOR_THRESHOLD = 64
+_BARYCENTER_SWEEPS = 2
+
+
+@dataclass(slots=True)
+class _LayoutContext:
+    # id do nó -> ids dos nós ligados por conexões da visão
+    node_edges: Dict[str, Set[str]] = field(default_factory=dict)
+    # id do elemento -> ids dos elementos de destino das relações
+    element_edges: Dict[str, Set[str]] = field(default_factory=dict)
+    # nós posicionados nesta execução (``id()`` dos dicionários)
+    placed: Set[int] = field(default_factory=set)
+
+
+def _bounds(node: Mapping[str, Any]) -> Optional[Tuple[float, float, float, float]]:
+    bounds = node.get("bounds")
+    if not isinstance(bounds, Mapping):
+        return None
+    try:
+        return tuple(float(bounds[key]) for key in ("x", "y", "w", "h"))  # type: ignore[return-value]
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _sibling_edges(
+    siblings: Sequence[Dict[str, Any]], context: _LayoutContext
+) -> List[Tuple[int, int]]:
+    """Arestas entre irmãos, herdadas de qualquer descendente de cada um."""
+
+    by_node: Dict[str, int] = {}
+    by_element: Dict[str, int] = {}
+    for index, sibling in enumerate(siblings):
+        for node in walk_payload_nodes([sibling]):
+            identifier = payload_id(node)
+            if identifier:
+                by_node.setdefault(identifier, index)
+            element = payload_ref(node, "elementRef")
+            if element:
+                by_element.setdefault(element, index)
+
+    edges: Set[Tuple[int, int]] = set()
+    for source, index in by_node.items():
+        for target in context.node_edges.get(source, ()):
+            other = by_node.get(target)
+            if other is not None and other != index:
+                edges.add((index, other))
+    for source, index in by_element.items():
+        for target in context.element_edges.get(source, ()):
+            other = by_element.get(target)
+            if other is not None and other != index:
+                edges.add((index, other))
+    return sorted(edges)
+
+
+def _layers(count: int, edges: Sequence[Tuple[int, int]]) -> List[int]:
+    """Camada de cada nó pelo caminho mais longo, após descartar as arestas de retorno."""
+
+    successors: List[List[int]] = [[] for _ in range(count)]
+    for source, target in edges:
+        successors[source].append(target)
+
+    # DFS iterativa: arestas para nós ainda na pilha fecham ciclos e são descartadas
+    state = [0] * count  # 0 = não visitado, 1 = na pilha, 2 = concluído
+    acyclic: List[List[int]] = [[] for _ in range(count)]
+    for root in range(count):
+        if state[root]:
+            continue
+        stack = [(root, iter(successors[root]))]
+        state[root] = 1
+        while stack:
+            node, pending = stack[-1]
+            advanced = False
+            for target in pending:
+                if state[target] == 1:
+                    continue
+                acyclic[node].append(target)
+                if state[target] == 0:
+                    state[target] = 1
+                    stack.append((target, iter(successors[target])))
+                    advanced = True
+                    break
+            if not advanced:
+                state[node] = 2
+                stack.pop()
+
+    indegree = [0] * count
+    for targets in acyclic:
+        for target in targets:
+            indegree[target] += 1
+    layer = [0] * count
+    queue = [node for node in range(count) if indegree[node] == 0]
+    while queue:
+        node = queue.pop()
+        for target in acyclic[node]:
+            layer[target] = max(layer[target], layer[node] + 1)
+            indegree[target] -= 1
+            if indegree[target] == 0:
+                queue.append(target)
+    return layer
+
+
+def _order_layers(layer: Sequence[int], edges: Sequence[Tuple[int, int]]) -> List[List[int]]:
+    """Ordena cada camada pelo baricentro dos vizinhos na camada anterior."""
+
+    depth = max(layer) + 1 if layer else 0
+    rows: List[List[int]] = [[] for _ in range(depth)]
+    for node, value in enumerate(layer):
+        rows[value].append(node)
+    predecessors: Dict[int, List[int]] = {}
+    for source, target in edges:
+        if layer[source] < layer[target]:
+            predecessors.setdefault(target, []).append(source)
+    for _ in range(_BARYCENTER_SWEEPS):
+        position = {node: index for row in rows for index, node in enumerate(row)}
+        for row in rows[1:]:
+            def barycenter(node: int) -> float:
+                parents = predecessors.get(node)
+                if not parents:
+                    return float(position[node])
+                return sum(position[parent] for parent in parents) / len(parents)
+
+            row.sort(key=barycenter)
+            position.update({node: index for index, node in enumerate(row)})
+    return rows
+
+
+def _grid(
+    rows: Sequence[Sequence[int]], widths: Sequence[float], heights: Sequence[float]
+) -> Tuple[List[float], List[float], float, float]:
+    """Coordenadas relativas (x, y) por nó e o tamanho do bloco, linhas centralizadas."""
+
+    count = len(widths)
+    if NUMPY_AVAILABLE and count >= _VECTOR_THRESHOLD:
+        order = np.fromiter((node for row in rows for node in row), dtype=np.int64, count=count)
+        row_of = np.repeat(np.arange(len(rows)), [len(row) for row in rows])
+        starts = np.concatenate(([0], np.cumsum([len(row) for row in rows])[:-1]))
+        w = np.asarray(widths, dtype=float)[order]
+        h = np.asarray(heights, dtype=float)[order]
+        advance = np.cumsum(w + GAP_X)
+        x = advance - (w + GAP_X)
+        x -= x[starts][row_of]
+        row_width = (x + w)[np.append(starts[1:] - 1, count - 1)]
+        row_height = np.maximum.reduceat(h, starts)
+        row_top = np.concatenate(([0.0], np.cumsum(row_height + GAP_Y)[:-1]))
+        block_w = float(row_width.max())
+        x += ((block_w - row_width) / 2.0)[row_of]
+        y = row_top[row_of]
+        xs = np.empty(count)
+        ys = np.empty(count)
+        xs[order] = x
+        ys[order] = y
+        block_h = float(row_top[-1] + row_height[-1])
+        return xs.tolist(), ys.tolist(), block_w, block_h
+
+    xs = [0.0] * count
+    ys = [0.0] * count
+    row_widths = []
+    top = 0.0
+    for row in rows:
+        cursor = 0.0
+        for node in row:
+            xs[node] = cursor
+            ys[node] = top
+            cursor += widths[node] + GAP_X
+        row_widths.append(cursor - GAP_X)
+        top += max(heights[node] for node in row) + GAP_Y
+    block_w = max(row_widths)
+    for row, width in zip(rows, row_widths):
+        shift = (block_w - width) / 2.0
+        for node in row:
+            xs[node] += shift
+    return xs, ys, block_w, top - GAP_Y
+
+
+def _arrange(
+    siblings: Sequence[Dict[str, Any]],
+    sizes: Sequence[Tuple[float, float]],
+    context: _LayoutContext,
+) -> Tuple[List[float], List[float], float, float]:
+    edges = _sibling_edges(siblings, context)
+    layer = _layers(len(siblings), edges)
+    rows: List[List[int]] = []
+    # camadas largas (ex.: centenas de nós sem relações) quebram em linhas de ~sqrt(n)
+    width_limit = max(4, math.ceil(math.sqrt(len(siblings))))
+    for row in _order_layers(layer, edges):
+        rows.extend(row[start : start + width_limit] for start in range(0, len(row), width_limit))
+    return _grid(rows, [size[0] for size in sizes], [size[1] for size in sizes])
+
+
+def _clear_of_obstacles(
+    x: float,
+    y: float,
+    width: float,
+    height: float,
+    obstacles: Sequence[Tuple[float, float, float, float]],
+) -> float:
+    """Menor ``y`` a partir do qual o bloco não se sobrepõe aos nós existentes."""
+
+    if not obstacles:
+        return y
+    if NUMPY_AVAILABLE and len(obstacles) >= _VECTOR_THRESHOLD:
+        boxes = np.asarray(obstacles, dtype=float)
+        horizontal = (boxes[:, 0] < x + width) & (boxes[:, 0] + boxes[:, 2] > x)
+        boxes = boxes[horizontal]
+        while boxes.size:
+            hits = (boxes[:, 1] < y + height) & (boxes[:, 1] + boxes[:, 3] > y)
+            if not hits.any():
+                break
+            y = float((boxes[hits, 1] + boxes[hits, 3]).max()) + GAP_Y
+        return y
+    candidates = [box for box in obstacles if box[0] < x + width and box[0] + box[2] > x]
+    while True:
+        bottoms = [box[1] + box[3] for box in candidates if box[1] < y + height and box[1] + box[3] > y]
+        if not bottoms:
+            return y
+        y = max(bottoms) + GAP_Y
+
+
+def _translate(node: Dict[str, Any], dx: float, dy: float, context: _LayoutContext) -> None:
+    _key, children = payload_child_nodes(node)
+    for child in children:
+        if id(child) not in context.placed:
+            continue
+        bounds = child["bounds"]
+        bounds["x"] = int(round(bounds["x"] + dx))
+        bounds["y"] = int(round(bounds["y"] + dy))
+        _translate(child, dx, dy, context)
+
+
+def _measure(node: Dict[str, Any], context: _LayoutContext) -> Tuple[float, float]:
+    """Organiza os filhos de um nó novo em coordenadas relativas e devolve seu tamanho."""
+
+    _key, children = payload_child_nodes(node)
+    if not children:
+        return float(NODE_WIDTH), float(NODE_HEIGHT)
+    right, bottom, _placed = _layout_children(children, PADDING, HEADER, context)
+    return max(float(NODE_WIDTH), right + PADDING), max(float(NODE_HEIGHT), bottom + PADDING)
+
+
+def _layout_children(
+    children: Sequence[Dict[str, Any]],
+    origin_x: float,
+    origin_y: float,
+    context: _LayoutContext,
+) -> Tuple[float, float, int]:
+    """Posiciona os filhos novos a partir de ``(origin_x, origin_y)``.
+
+    Retorna a maior coordenada direita/inferior ocupada pelos filhos (novos e existentes)
+    e quantos nós foram posicionados nesta subárvore.
+    """
+
+    existing: List[Tuple[float, float, float, float]] = []
+    pending: List[Dict[str, Any]] = []
+    placed = 0
+    for child in children:
+        bounds = _bounds(child)
+        if bounds is None:
+            pending.append(child)
+            continue
+        placed += _layout_existing(child, context)
+        existing.append(_bounds(child))  # type: ignore[arg-type]
+
+    right = max((box[0] + box[2] for box in existing), default=origin_x)
+    bottom = max((box[1] + box[3] for box in existing), default=origin_y)
+    if not pending:
+        return right, bottom, placed
+
+    before = len(context.placed) - placed
+    sizes = [_measure(child, context) for child in pending]
+    xs, ys, block_w, block_h = _arrange(pending, sizes, context)
+    top = _clear_of_obstacles(origin_x, origin_y, block_w, block_h, existing)
+    for child, (width, height), x, y in zip(pending, sizes, xs, ys):
+        left = origin_x + x
+        upper = top + y
+        child["bounds"] = {
+            "x": int(round(left)),
+            "y": int(round(upper)),
+            "w": int(round(width)),
+            "h": int(round(height)),
+        }
+        context.placed.add(id(child))
+        _translate(child, left, upper, context)
+    placed = len(context.placed) - before
+    return max(right, origin_x + block_w), max(bottom, top + block_h), placed
+
+
+def _layout_existing(node: Dict[str, Any], context: _LayoutContext) -> int:
+    """Posiciona filhos novos de um nó do template, ampliando-o se não couberem."""
+
+    _key, children = payload_child_nodes(node)
+    if not children:
+        return 0
+    x, y, width, height = _bounds(node)  # type: ignore[misc]
+    right, bottom, placed = _layout_children(children, x + PADDING, y + HEADER, context)
+    if not placed:
+        return 0
+    grown_w = max(width, right + PADDING - x)
+    grown_h = max(height, bottom + PADDING - y)
+    if grown_w > width or grown_h > height:
+        # novo dicionário: o original pode ser compartilhado com o template em cache
+        node["bounds"] = {**node["bounds"], "w": int(math.ceil(grown_w)), "h": int(math.ceil(grown_h))}
+    return placed
+
+
+def _connection_pairs(diagram: Mapping[str, Any]) -> Iterator[Tuple[str, str]]:
+    connections = list(diagram.get("connections") or [])
+    _key, nodes = payload_child_nodes(diagram)
+    for node in walk_payload_nodes(nodes):
+        connections.extend(node.get("connections") or [])
+    for connection in connections:
+        if isinstance(connection, Mapping) and connection.get("source") and connection.get("target"):
+            yield str(connection["source"]), str(connection["target"])
+
+
+def _layout_view(diagram: Dict[str, Any], element_edges: Dict[str, Set[str]]) -> int:
+    _key, nodes = payload_child_nodes(diagram)
+    if not nodes:
+        return 0
+    context = _LayoutContext(element_edges=element_edges)
+    for source, target in _connection_pairs(diagram):
+        context.node_edges.setdefault(source, set()).add(target)
+
+    known = [box for box in (_bounds(node) for node in nodes) if box is not None]
+    origin_x = min((box[0] for box in known), default=float(PADDING))
+    origin_y = min((box[1] for box in known), default=float(PADDING))
+    _right, _bottom, placed = _layout_children(nodes, origin_x, origin_y, context)
+    if placed:
+        logger.debug("Layout automático aplicado", extra={"view": diagram.get("id"), "nodes": placed})
+    return placed
+
+
+def auto_layout_view(diagram: Dict[str, Any], relations: Iterable[Mapping[str, Any]] = ()) -> int:
+    """Atribui ``bounds`` aos nós da visão que não os têm; retorna quantos foram posicionados.
+
+    ``relations`` (relacionamentos do datamodel) complementa as conexões da visão na
+    definição das camadas: a origem de uma relação fica acima do destino.
+    """
+
+    return _layout_view(diagram, _relation_edges(relations))
+
+
+def _relation_edges(relations: Iterable[Mapping[str, Any]]) -> Dict[str, Set[str]]:
+    edges: Dict[str, Set[str]] = {}
+    for relation in relations or ():
+        if not isinstance(relation, Mapping):
+            continue
+        source, target = relation.get("source"), relation.get("target")
+        if source and target:
+            edges.setdefault(str(source), set()).add(str(target))
+    return edges
+
+
+def auto_layout_views(views: Any, relations: Iterable[Mapping[str, Any]] = ()) -> int:
+    """Aplica :func:`auto_layout_view` a todas as visões (``{"diagrams": [...]}`` ou lista)."""
+
+    diagrams = views.get("diagrams") if isinstance(views, Mapping) else views
+    if not isinstance(diagrams, list):
+        return 0
+    element_edges = _relation_edges(relations)
+    return sum(
+        _layout_view(diagram, element_edges)
+        for diagram in diagrams
+        if isinstance(diagram, dict)
+    )
@@ -0,0 +1,706 @@
+"""Modelo de domínio compacto (``__slots__``) para os dados ArchiMate do Diagramador.
+
+As classes abaixo substituem os dicionários aninhados no núcleo do pipeline (parse do
+template, merge e geração do Mermaid). Identificadores e tipos são *interned* para que as
+milhares de referências repetidas (``elementRef``, ``source``, ``target``) compartilhem a
+mesma string. ``from_dict``/``to_dict`` convertem de/para o formato JSON usado pelas
+ferramentas, que continua sendo o contrato externo.
+
+Os objetos tipados mantidos nos caches de processo são compartilhados entre sessões: os
+dicionários gerados por ``to_dict`` são novos, mas valores internos como ``style``,
+``bounds`` e ``properties`` são os mesmos objetos do cache e não devem ser alterados.
+Com ``children=False`` os filhos (``nodes``/``connections``/``items``) são emitidos como
+listas vazias, preservando a posição das chaves para quem irá preenchê-las (merge).
+"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+__all__ = [
+    "Text",
+    "Element",
+    "Relationship",
+    "ViewConnection",
+    "ViewNode",
+    "ViewDiagram",
+    "OrgItem",
+    "TemplateModel",
+    "child_nodes",
+    "deep_sizeof",
+    "intern_id",
+    "organization_key",
+    "payload_child_nodes",
+    "payload_diagrams",
+    "payload_id",
+    "payload_ref",
+    "text_of",
+    "view_connections",
+    "view_node_key",
+    "walk_payload_nodes",
+    "walk_view_nodes",
+]
+
+
+def intern_id(value: Any) -> Optional[str]:
+    """Normaliza identificadores para ``str`` interned (``None`` para valores vazios)."""
+
+    if value is None or value == "":
+        return None
+    return sys.intern(str(value))
+
+
+@dataclass(slots=True, frozen=True)
+class Text:
+    """Texto com idioma opcional (``<name xml:lang="pt">``)."""
+
+    text: str
+    lang: Optional[str] = None
+
+    @classmethod
+    def from_payload(cls, payload: Any) -> Any:
+        """Converte ``{"text", "lang"}`` em :class:`Text`; strings e ``None`` são mantidos."""
+
+        if isinstance(payload, dict) and isinstance(payload.get("text"), str):
+            if set(payload) <= {"text", "lang"}:
+                return cls(payload["text"], intern_id(payload.get("lang")))
+        return payload
+
+    def to_payload(self) -> Dict[str, str]:
+        payload = {"text": self.text}
+        if self.lang:
+            payload["lang"] = self.lang
+        return payload
+
+
+def text_of(value: Any) -> Optional[str]:
+    """Extrai o texto de :class:`Text`, payloads ``{"text": ...}`` ou strings."""
+
+    if value is None:
+        return None
+    if isinstance(value, Text):
+        return value.text
+    if isinstance(value, dict):
+        text = value.get("text")
+        return text if isinstance(text, str) else None
+    if isinstance(value, str):
+        return value
+    return None
+
+
+def _dump_text(value: Any) -> Any:
+    return value.to_payload() if isinstance(value, Text) else value
+
+
+def _extra(data: Dict[str, Any], known: Iterable[str]) -> Optional[Dict[str, Any]]:
+    extra = {key: value for key, value in data.items() if key not in known}
+    return extra or None
+
+
+def _put(target: Dict[str, Any], key: str, value: Any) -> None:
+    if value:
+        target[key] = value
+
+
+_CHILD_KEYS = {
+    "style": "style",
+    "label": "label",
+    "points": "points",
+    "properties": "properties",
+    "viewRef": "refs",
+}
+
+
+def _put_children(
+    target: Dict[str, Any], values: Dict[str, Any], child_order: Optional[Tuple[str, ...]]
+) -> None:
+    """Emite os campos filhos na ordem em que aparecem no XML (``child_order``).
+
+    ``documentation`` não entra em ``child_order``; pelo XSD ele vem logo após ``label``.
+    """
+
+    pending = dict(values)
+
+    def emit(key: str) -> None:
+        value = pending.pop(key, None)
+        if value:
+            target[key] = value
+
+    for child in child_order or ():
+        key = _CHILD_KEYS.get(child)
+        if key is None or key not in pending:
+            continue
+        if key == "label":
+            emit("label")
+            emit("documentation")
+        else:
+            emit("documentation")
+            emit(key)
+    for key in list(pending):
+        emit(key)
+
+
+@dataclass(slots=True)
+class Element:
+    id: Optional[str] = None
+    type: Optional[str] = None
+    name: Any = None
+    documentation: Any = None
+    properties: Optional[List[Dict[str, Any]]] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    _KEYS = ("id", "identifier", "type", "name", "documentation", "properties")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Element":
+        return cls(
+            id=intern_id(data.get("id") or data.get("identifier")),
+            type=intern_id(data.get("type")),
+            name=Text.from_payload(data.get("name")),
+            documentation=Text.from_payload(data.get("documentation")),
+            properties=data.get("properties") or None,
+            extra=_extra(data, cls._KEYS),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        _put(data, "id", self.id)
+        _put(data, "type", self.type)
+        _put(data, "name", _dump_text(self.name))
+        _put(data, "documentation", _dump_text(self.documentation))
+        _put(data, "properties", self.properties)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class Relationship:
+    id: Optional[str] = None
+    type: Optional[str] = None
+    source: Optional[str] = None
+    target: Optional[str] = None
+    documentation: Any = None
+    properties: Optional[List[Dict[str, Any]]] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    _KEYS = ("id", "identifier", "type", "source", "target", "documentation", "properties")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Relationship":
+        return cls(
+            id=intern_id(data.get("id") or data.get("identifier")),
+            type=intern_id(data.get("type")),
+            source=intern_id(data.get("source")),
+            target=intern_id(data.get("target")),
+            documentation=Text.from_payload(data.get("documentation")),
+            properties=data.get("properties") or None,
+            extra=_extra(data, cls._KEYS),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        _put(data, "id", self.id)
+        _put(data, "type", self.type)
+        _put(data, "source", self.source)
+        _put(data, "target", self.target)
+        _put(data, "documentation", _dump_text(self.documentation))
+        _put(data, "properties", self.properties)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class ViewConnection:
+    id: Optional[str] = None
+    type: Optional[str] = None
+    relationship_ref: Optional[str] = None
+    source: Optional[str] = None
+    target: Optional[str] = None
+    style: Optional[Dict[str, Any]] = None
+    label: Any = None
+    documentation: Any = None
+    points: Optional[List[Dict[str, Any]]] = None
+    properties: Optional[List[Dict[str, Any]]] = None
+    child_order: Optional[Tuple[str, ...]] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    _KEYS = (
+        "id", "identifier", "type", "relationshipRef", "source", "target", "style",
+        "label", "documentation", "points", "properties", "child_order",
+    )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ViewConnection":
+        child_order = data.get("child_order")
+        return cls(
+            id=intern_id(data.get("id") or data.get("identifier")),
+            type=intern_id(data.get("type")),
+            relationship_ref=intern_id(data.get("relationshipRef")),
+            source=intern_id(data.get("source")),
+            target=intern_id(data.get("target")),
+            style=data.get("style") or None,
+            label=Text.from_payload(data.get("label")),
+            documentation=Text.from_payload(data.get("documentation")),
+            points=data.get("points") or None,
+            properties=data.get("properties") or None,
+            child_order=tuple(sys.intern(str(c)) for c in child_order) if child_order else None,
+            extra=_extra(data, cls._KEYS),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        _put(data, "id", self.id)
+        _put(data, "type", self.type)
+        _put(data, "relationshipRef", self.relationship_ref)
+        _put(data, "source", self.source)
+        _put(data, "target", self.target)
+        _put_children(
+            data,
+            {
+                "style": self.style,
+                "label": _dump_text(self.label),
+                "documentation": _dump_text(self.documentation),
+                "points": self.points,
+                "properties": self.properties,
+            },
+            self.child_order,
+        )
+        if self.child_order:
+            data["child_order"] = list(self.child_order)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class ViewNode:
+    id: Optional[str] = None
+    type: Optional[str] = None
+    bounds: Optional[Dict[str, Any]] = None
+    element_ref: Optional[str] = None
+    relationship_ref: Optional[str] = None
+    view_ref: Optional[str] = None
+    refs: Optional[Dict[str, str]] = None
+    style: Optional[Dict[str, Any]] = None
+    label: Any = None
+    documentation: Any = None
+    properties: Optional[List[Dict[str, Any]]] = None
+    nodes: List["ViewNode"] = field(default_factory=list)
+    connections: List[ViewConnection] = field(default_factory=list)
+    child_order: Optional[Tuple[str, ...]] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    _KEYS = (
+        "id", "identifier", "type", "bounds", "elementRef", "relationshipRef", "viewRef",
+        "refs", "style", "label", "documentation", "properties", "nodes", "connections",
+        "child_order",
+    )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ViewNode":
+        refs = data.get("refs")
+        child_order = data.get("child_order")
+        return cls(
+            id=intern_id(data.get("id") or data.get("identifier")),
+            type=intern_id(data.get("type")),
+            bounds=data.get("bounds") or None,
+            element_ref=intern_id(data.get("elementRef")),
+            relationship_ref=intern_id(data.get("relationshipRef")),
+            view_ref=intern_id(data.get("viewRef")),
+            refs=(
+                {key: intern_id(value) for key, value in refs.items() if value}
+                if isinstance(refs, dict) and refs
+                else None
+            ),
+            style=data.get("style") or None,
+            label=Text.from_payload(data.get("label")),
+            documentation=Text.from_payload(data.get("documentation")),
+            properties=data.get("properties") or None,
+            nodes=[cls.from_dict(child) for child in data.get("nodes") or [] if isinstance(child, dict)],
+            connections=[
+                ViewConnection.from_dict(conn)
+                for conn in data.get("connections") or []
+                if isinstance(conn, dict)
+            ],
+            child_order=tuple(sys.intern(str(c)) for c in child_order) if child_order else None,
+            extra=_extra(data, cls._KEYS),
+        )
+
+    def to_dict(self, *, children: bool = True) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        _put(data, "id", self.id)
+        _put(data, "type", self.type)
+        _put(data, "bounds", self.bounds)
+        _put(data, "elementRef", self.element_ref)
+        _put(data, "relationshipRef", self.relationship_ref)
+        _put(data, "viewRef", self.view_ref)
+        _put_children(
+            data,
+            {
+                "style": self.style,
+                "label": _dump_text(self.label),
+                "documentation": _dump_text(self.documentation),
+                "refs": self.refs,
+                "properties": self.properties,
+            },
+            self.child_order,
+        )
+        if self.nodes:
+            data["nodes"] = [child.to_dict() for child in self.nodes] if children else []
+        if self.connections:
+            data["connections"] = (
+                [conn.to_dict() for conn in self.connections] if children else []
+            )
+        if self.child_order:
+            data["child_order"] = list(self.child_order)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def ref(self, kind: str) -> Optional[str]:
+        """Resolve ``elementRef``/``relationshipRef``/``viewRef`` (atributo ou ``refs``)."""
+
+        value = {
+            "elementRef": self.element_ref,
+            "relationshipRef": self.relationship_ref,
+            "viewRef": self.view_ref,
+        }[kind]
+        if value is None and self.refs:
+            value = self.refs.get(kind)
+        return value
+
+    def key(self) -> Optional[str]:
+        """Chave estável do nó na visão: o identificador ou, na falta dele, a referência."""
+
+        if self.id:
+            return self.id
+        for kind in ("elementRef", "relationshipRef"):
+            value = self.ref(kind)
+            if value:
+                return f"{kind}:{value}"
+        return None
+
+    def walk(self) -> Iterator["ViewNode"]:
+        yield self
+        for child in self.nodes:
+            yield from child.walk()
+
+
+@dataclass(slots=True)
+class ViewDiagram:
+    id: Optional[str] = None
+    type: Optional[str] = None
+    name: Any = None
+    documentation: Any = None
+    style: Optional[Dict[str, Any]] = None
+    label: Any = None
+    properties: Optional[List[Dict[str, Any]]] = None
+    nodes: List[ViewNode] = field(default_factory=list)
+    connections: List[ViewConnection] = field(default_factory=list)
+    child_order: Optional[Tuple[str, ...]] = None
+    extra: Optional[Dict[str, Any]] = None
+
+    _KEYS = (
+        "id", "identifier", "type", "name", "documentation", "style", "label",
+        "properties", "nodes", "connections", "child_order",
+    )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ViewDiagram":
+        child_order = data.get("child_order")
+        return cls(
+            id=intern_id(data.get("id") or data.get("identifier")),
+            type=intern_id(data.get("type")),
+            name=Text.from_payload(data.get("name")),
+            documentation=Text.from_payload(data.get("documentation")),
+            style=data.get("style") or None,
+            label=Text.from_payload(data.get("label")),
+            properties=data.get("properties") or None,
+            nodes=[ViewNode.from_dict(node) for node in data.get("nodes") or [] if isinstance(node, dict)],
+            connections=[
+                ViewConnection.from_dict(conn)
+                for conn in data.get("connections") or []
+                if isinstance(conn, dict)
+            ],
+            child_order=tuple(sys.intern(str(c)) for c in child_order) if child_order else None,
+            extra=_extra(data, cls._KEYS),
+        )
+
+    def to_dict(self, *, children: bool = True) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        _put(data, "id", self.id)
+        _put(data, "type", self.type)
+        _put(data, "name", _dump_text(self.name))
+        _put(data, "documentation", _dump_text(self.documentation))
+        _put_children(
+            data,
+            {
+                "style": self.style,
+                "label": _dump_text(self.label),
+                "properties": self.properties,
+            },
+            self.child_order,
+        )
+        if self.nodes:
+            data["nodes"] = [node.to_dict() for node in self.nodes] if children else []
+        if self.connections:
+            data["connections"] = (
+                [conn.to_dict() for conn in self.connections] if children else []
+            )
+        if self.child_order:
+            data["child_order"] = list(self.child_order)
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def iter_nodes(self) -> Iterator[ViewNode]:
+        for node in self.nodes:
+            yield from node.walk()
+
+
+@dataclass(slots=True)
+class OrgItem:
+    identifier_ref: Optional[str] = None
+    identifier: Optional[str] = None
+    label: Any = None
+    documentation: Any = None
+    items: List["OrgItem"] = field(default_factory=list)
+    extra: Optional[Dict[str, Any]] = None
+
+    _KEYS = ("identifierRef", "identifier", "label", "documentation", "items")
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OrgItem":
+        return cls(
+            identifier_ref=intern_id(data.get("identifierRef")),
+            identifier=intern_id(data.get("identifier")),
+            label=Text.from_payload(data.get("label")),
+            documentation=Text.from_payload(data.get("documentation")),
+            items=[cls.from_dict(item) for item in data.get("items") or [] if isinstance(item, dict)],
+            extra=_extra(data, cls._KEYS),
+        )
+
+    def to_dict(self, *, children: bool = True) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        _put(data, "identifierRef", self.identifier_ref)
+        _put(data, "identifier", self.identifier)
+        _put(data, "label", _dump_text(self.label))
+        _put(data, "documentation", _dump_text(self.documentation))
+        if self.items:
+            data["items"] = [item.to_dict() for item in self.items] if children else []
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+def payload_id(item: Mapping[str, Any]) -> Optional[str]:
+    """Identificador de um item em dicionário (``id`` ou ``identifier``)."""
+
+    value = item.get("id") or item.get("identifier")
+    return str(value) if value else None
+
+
+def payload_ref(node: Mapping[str, Any], kind: str) -> Optional[str]:
+    """``elementRef``/``relationshipRef``/``viewRef`` de um nó em dicionário, como ``ViewNode.ref``."""
+
+    value = node.get(kind)
+    if not value and isinstance(node.get("refs"), Mapping):
+        value = node["refs"].get(kind)
+    return str(value) if value else None
+
+
+def view_node_key(node: Dict[str, Any] | ViewNode) -> Optional[str]:
+    """Chave de casamento de um nó de visão (payload ou :class:`ViewNode`), como em ``ViewNode.key``."""
+
+    if not node:
+        return None
+    if isinstance(node, ViewNode):
+        return node.key()
+    identifier = payload_id(node)
+    if identifier:
+        return identifier
+    for kind in ("elementRef", "relationshipRef"):
+        value = payload_ref(node, kind)
+        if value:
+            return f"{kind}:{value}"
+    return None
+
+
+def organization_key(item: Dict[str, Any] | OrgItem) -> Optional[str]:
+    """Chave de casamento de um item de organização: identificador, referência ou rótulo."""
+
+    if isinstance(item, OrgItem):
+        candidates = (("identifier", item.identifier), ("identifierRef", item.identifier_ref))
+    else:
+        candidates = tuple((key, item.get(key)) for key in ("identifier", "identifierRef"))
+    for key, value in candidates:
+        if value:
+            return f"{key}:{value}"
+    label = text_of(item.label if isinstance(item, OrgItem) else item.get("label"))
+    if label:
+        return f"label:{label}"
+    return None
+
+
+def payload_diagrams(payload: Mapping[str, Any]) -> List[Tuple[str, ViewDiagram]]:
+    """Visões do datamodel (``views.diagrams`` ou lista em ``views``) com o caminho de cada uma."""
+
+    views = payload.get("views")
+    if isinstance(views, dict):
+        raw, prefix = views.get("diagrams"), "views.diagrams"
+    else:
+        raw, prefix = views, "views"
+    if not isinstance(raw, list):
+        return []
+    return [
+        (f"{prefix}[{position}]", ViewDiagram.from_dict(item))
+        for position, item in enumerate(raw)
+        if isinstance(item, dict)
+    ]
+
+
+def child_nodes(node: ViewNode) -> Tuple[str, List[ViewNode]]:
+    """Filhos do nó e a chave em que aparecem (``nodes`` ou o sinônimo ``children``)."""
+
+    if node.nodes:
+        return "nodes", node.nodes
+    children = (node.extra or {}).get("children")
+    if isinstance(children, list):
+        return "children", [ViewNode.from_dict(item) for item in children if isinstance(item, dict)]
+    return "nodes", []
+
+
+def walk_view_nodes(
+    nodes: Iterable[ViewNode], path: str, key: str = "nodes"
+) -> Iterator[Tuple[str, ViewNode]]:
+    """Percorre os nós em profundidade, com o caminho de cada um."""
+
+    for position, node in enumerate(nodes):
+        node_path = f"{path}.{key}[{position}]"
+        yield node_path, node
+        child_key, children = child_nodes(node)
+        yield from walk_view_nodes(children, node_path, child_key)
+
+
+def payload_child_nodes(node: Mapping[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+    """Filhos de um nó (ou visão) em dicionário e a chave em que aparecem.
+
+    Como no gerador de XML, ``children`` é o sinônimo de ``nodes`` usado quando ``nodes``
+    não existe.
+    """
+
+    key = "children" if node.get("nodes") is None and isinstance(node.get("children"), list) else "nodes"
+    values = node.get(key)
+    return key, [item for item in values if isinstance(item, dict)] if isinstance(values, list) else []
+
+
+def walk_payload_nodes(nodes: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Percorre em profundidade nós de visão em dicionário."""
+
+    for node in nodes:
+        yield node
+        yield from walk_payload_nodes(payload_child_nodes(node)[1])
+
+
+def view_connections(diagram: ViewDiagram, path: str = "") -> Iterator[Tuple[str, ViewConnection]]:
+    """Conexões da visão, inclusive as declaradas dentro dos nós."""
+
+    for position, connection in enumerate(diagram.connections):
+        yield f"{path}.connections[{position}]", connection
+    for node_path, node in walk_view_nodes(diagram.nodes, path):
+        for position, connection in enumerate(node.connections):
+            yield f"{node_path}.connections[{position}]", connection
+
+
+@dataclass(slots=True)
+class TemplateModel:
+    """Modelo completo de um template ArchiMate, equivalente ao blueprint em dicionário."""
+
+    model_identifier: Optional[str] = None
+    model_name: Any = None
+    model_documentation: Any = None
+    elements: List[Element] = field(default_factory=list)
+    relations: List[Relationship] = field(default_factory=list)
+    organizations: List[OrgItem] = field(default_factory=list)
+    viewpoints: Optional[List[Dict[str, Any]]] = None
+    diagrams: List[ViewDiagram] = field(default_factory=list)
+    # hash do conteúdo do template de origem; identifica os índices derivados em cache
+    fingerprint: Optional[str] = None
+
+    @classmethod
+    def from_blueprint(cls, blueprint: Dict[str, Any]) -> "TemplateModel":
+        views = blueprint.get("views")
+        views = views if isinstance(views, dict) else {}
+        return cls(
+            model_identifier=blueprint.get("model_identifier"),
+            model_name=Text.from_payload(blueprint.get("model_name")),
+            model_documentation=Text.from_payload(blueprint.get("model_documentation")),
+            elements=[Element.from_dict(item) for item in blueprint.get("elements") or []],
+            relations=[Relationship.from_dict(item) for item in blueprint.get("relations") or []],
+            organizations=[OrgItem.from_dict(item) for item in blueprint.get("organizations") or []],
+            viewpoints=views.get("viewpoints") or None,
+            diagrams=[ViewDiagram.from_dict(item) for item in views.get("diagrams") or []],
+            fingerprint=blueprint.get("fingerprint"),
+        )
+
+    def header(self) -> Dict[str, Any]:
+        """Identificador, nome e documentação do modelo no formato do blueprint."""
+
+        header: Dict[str, Any] = {"model_identifier": self.model_identifier}
+        _put(header, "model_name", _dump_text(self.model_name))
+        _put(header, "model_documentation", _dump_text(self.model_documentation))
+        return header
+
+    def to_blueprint(self) -> Dict[str, Any]:
+        """Gera um blueprint em dicionário novo (valores internos seguem compartilhados)."""
+
+        blueprint = self.header()
+        if self.elements:
+            blueprint["elements"] = [element.to_dict() for element in self.elements]
+        if self.relations:
+            blueprint["relations"] = [relation.to_dict() for relation in self.relations]
+        if self.organizations:
+            blueprint["organizations"] = [item.to_dict() for item in self.organizations]
+        views: Dict[str, Any] = {}
+        if self.viewpoints:
+            views["viewpoints"] = [dict(viewpoint) for viewpoint in self.viewpoints]
+        if self.diagrams:
+            views["diagrams"] = [diagram.to_dict() for diagram in self.diagrams]
+        if views:
+            blueprint["views"] = views
+        if self.fingerprint:
+            blueprint["fingerprint"] = self.fingerprint
+        return blueprint
+
+
+def deep_sizeof(obj: Any) -> int:
+    """Estimativa (em bytes) da memória ocupada por ``obj`` e tudo o que ele referencia.
+
+    Objetos compartilhados (como strings interned) são contados uma única vez.
+    """
+
+    seen: set[int] = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif hasattr(type(current), "__slots__"):
+            stack.extend(
+                getattr(current, slot)
+                for slot in type(current).__slots__
+                if hasattr(current, slot)
+            )
+    return total
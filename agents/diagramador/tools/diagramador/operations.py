@@ -5,16 +5,33 @@ from __future__ import annotations
 """Operações principais do agente Diagramador."""
 
 import base64
-import copy
+import contextlib
+import functools
 import hashlib
 import itertools
 import json
 import logging
 import re
+import sys
 import textwrap
+import time
 import warnings
+from collections import ChainMap
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, MutableMapping, Optional, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 from xml.etree import ElementTree as ET
 
 from google.genai import types
@@ -22,6 +39,7 @@ from google.genai import types
 import requests
 
 from ..archimate_exchange import xml_exchange
+from ..archimate_exchange.xml_exchange import file_sha256
 
 from .constants import (
     ARCHIMATE_NS,
@@ -30,15 +48,61 @@ from .constants import (
     DEFAULT_TEMPLATE,
     DEFAULT_TEMPLATES_DIR,
     DEFAULT_XSD_DIR,
-    DEFAULT_KROKI_URL,
     DEFAULT_MERMAID_IMAGE_FORMAT,
     DEFAULT_MERMAID_VALIDATION_URL,
     FETCH_MERMAID_IMAGES,
+    FULL_XSD_VALIDATION,
+    IMAGE_PAYLOAD_MODE,
+    MERMAID_DETAIL,
+    MERMAID_DETAIL_NODE_BUDGET,
+    MERMAID_MAX_CHARS_PER_RENDER,
+    MERMAID_MAX_NODES_PER_RENDER,
+    OUTPUT_CACHE,
+    XSD_VERDICT_CACHE,
     OUTPUT_DIR,
+    OUTPUT_ISOLATION,
+    PREVIEW_IMAGE_SOURCE,
+    STREAMING_JSON_THRESHOLD,
     XML_LANG_ATTR,
     XSI_ATTR,
 )
-from .session import get_cached_blueprint, store_blueprint
+from .cache import (
+    FileCache,
+    LRUCache,
+    SingleFlight,
+    invalidate_paths,
+    register_invalidation_hook,
+)
+from .model import (
+    Element,
+    OrgItem,
+    Relationship,
+    TemplateModel,
+    Text,
+    ViewConnection,
+    ViewDiagram,
+    ViewNode,
+    intern_id,
+    organization_key as _organization_key,
+    view_node_key as _view_node_key,
+)
+from .diff import diff_payloads
+from .graph import GRAPH_DIRECTIONS, DatamodelGraph
+from .integrity import check_referential_integrity
+from .layout import auto_layout_view, auto_layout_views
+from .spatial import analyze_view_geometry
+from .rate_limit import get_render_limiter, track_queue_time
+from .renderer_pool import get_renderer_pool
+from .session import get_blueprint_handle, get_cached_blueprint, store_blueprint
+from .storage import (
+    artifact_reference,
+    atomic_write_bytes,
+    atomic_write_text,
+    file_lock,
+    namespaced_output_dir,
+    resolve_artifact,
+)
+from .svg_renderer import SVG_MIME_TYPE, render_view_svg, svg_data_uri
 
 warnings.filterwarnings("ignore", category=UserWarning, module=".*pydantic.*")
 
@@ -47,6 +111,13 @@ logger = logging.getLogger(__name__)
 
 PACKAGE_ROOT = Path(__file__).resolve().parents[2]
 
+_TEMPLATE_MODEL_CACHE = FileCache("template_models")
+_TEMPLATE_INDEX_CACHE = FileCache("template_index")
+_DERIVED_INDEX_CACHE = LRUCache("template_derived_indexes", maxsize=32)
+_DATAMODEL_GRAPH_CACHE = LRUCache("datamodel_graphs", maxsize=16)
+_TEMPLATE_DIGEST_CACHE = FileCache("template_digests")
+register_invalidation_hook("xml_exchange", xml_exchange.invalidate_caches)
+
 
 def _resolve_package_path(path: Path) -> Path:
     """Resolve a resource path relative to the package when needed."""
@@ -86,13 +157,75 @@ def _resolve_package_path(path: Path) -> Path:
     return search_order[0]
 
 
-def _ensure_output_dir() -> Path:
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    return OUTPUT_DIR
+def _resolve_output_dir(session_state: Optional[MutableMapping[str, Any]] = None) -> Path:
+    """Diretório de saída da sessão/invocação conforme ``OUTPUT_ISOLATION`` (sem criá-lo)."""
+
+    return namespaced_output_dir(OUTPUT_DIR, session_state, isolation=OUTPUT_ISOLATION)
+
+
+def _session_artifact_dir(session_state: Optional[MutableMapping[str, Any]] = None) -> Path:
+    """Diretório cujos artefatos a sessão pode ler: o dela (isolamento por sessão) ou ``OUTPUT_DIR``."""
+
+    if session_state is not None and OUTPUT_ISOLATION == "session":
+        return _resolve_output_dir(session_state)
+    return Path(OUTPUT_DIR)
+
+
+def _session_artifact_path(handle: str, session_state: Optional[MutableMapping[str, Any]] = None) -> Path:
+    """Artefato ``handle`` (relativo a ``OUTPUT_DIR``) que a sessão pode ler."""
+
+    path = resolve_artifact(OUTPUT_DIR, handle, within=_session_artifact_dir(session_state))
+    if session_state is None and OUTPUT_ISOLATION == "session":
+        # sem sessão o acesso é ao diretório compartilhado, nunca ao de outra sessão
+        sessions_root = (Path(OUTPUT_DIR) / "sessions").resolve()
+        if sessions_root in path.parents:
+            raise ValueError("Handle de artefato fora do diretório de saída.")
+    return path
+
+
+def _session_datamodel_path(name: str, session_state: Optional[MutableMapping[str, Any]] = None) -> Path:
+    """Datamodel salvo por `save_datamodel`: nomes relativos valem primeiro na sessão.
+
+    Qualquer arquivo fora do diretório que a sessão pode ler é recusado.
+    """
+
+    root = _session_artifact_dir(session_state)
+    path = Path(name)
+    if not path.is_absolute():
+        in_root = root / path
+        path = in_root if in_root.exists() else Path.cwd() / path
+    refused = "O datamodel deve ser um arquivo salvo no diretório de saída da sessão."
+    try:
+        handle = path.resolve().relative_to(Path(OUTPUT_DIR).resolve()).as_posix()
+        return _session_artifact_path(handle, session_state)
+    except ValueError:
+        raise ValueError(refused) from None
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Arquivo de datamodel não encontrado: {path}") from None
+
+
+def _output_file(output_dir: Path, filename: str) -> Path:
+    """Caminho de ``filename`` em ``output_dir``; nomes com diretórios são recusados."""
+
+    if not filename or filename in {".", ".."} or Path(filename).name != filename:
+        raise ValueError(f"Nome de arquivo inválido (use apenas o nome, sem diretórios): {filename!r}")
+    return output_dir / filename
+
+
+def _ensure_output_dir(directory: Optional[Path] = None) -> Path:
+    target = directory if directory is not None else OUTPUT_DIR
+    target.mkdir(parents=True, exist_ok=True)
+    return target
+
+
+def _is_shared_output_dir(directory: Path) -> bool:
+    """Diretórios compartilhados entre sessões exigem lock ao gravar nomes fixos."""
+
+    return Path(directory) == Path(OUTPUT_DIR)
 
 
 def _kroki_base_url() -> str:
-    return DEFAULT_KROKI_URL.rstrip("/")
+    return get_renderer_pool().primary_url
 
 
 def _mermaid_validator_base_url() -> str:
@@ -123,13 +256,14 @@ def _mermaid_mime_type(fmt: str) -> str:
     return "application/octet-stream"
 
 
-def _build_mermaid_image_payload(
+def _mermaid_image_request(
     mermaid: str,
     *,
-    alias: str,
     title: str,
     fmt: Optional[str] = None,
 ) -> Dict[str, Any]:
+    """Monta o payload base da imagem (URL, corpo e cabeçalhos da chamada ao Kroki)."""
+
     resolved_format = _resolve_mermaid_format(fmt)
     base_url = _kroki_base_url()
     url = f"{base_url}/"
@@ -144,7 +278,7 @@ def _build_mermaid_image_payload(
         "Content-Type": "application/json",
     }
 
-    payload: Dict[str, Any] = {
+    return {
         "format": resolved_format,
         "mime_type": mime_type,
         "url": url,
@@ -156,23 +290,27 @@ def _build_mermaid_image_payload(
         "headers": headers,
     }
 
-    if not FETCH_MERMAID_IMAGES:
-        return payload
 
-    try:
-        response = requests.post(url, json=request_payload, headers=headers, timeout=30)
-        response.raise_for_status()
-    except requests.RequestException as exc:
-        logger.warning("Falha ao baixar imagem Mermaid", exc_info=exc)
-        return payload
+def _apply_mermaid_image_response(
+    payload: Dict[str, Any],
+    mermaid: str,
+    *,
+    alias: str,
+    content_type: str,
+    body: bytes,
+    output_dir: Optional[Path] = None,
+    digest: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Decodifica a resposta do Kroki e grava a imagem em disco, atualizando o payload."""
 
-    content_type = response.headers.get("Content-Type", "") or ""
+    resolved_format = payload["format"]
+    mime_type = payload["mime_type"]
     content: bytes | None = None
 
-    if "application/json" in content_type.lower():
+    if "application/json" in (content_type or "").lower():
         try:
-            data = response.json()
-        except ValueError:
+            data = json.loads(body.decode("utf-8"))
+        except (ValueError, UnicodeDecodeError):
             data = None
         if isinstance(data, dict):
             raw_content = data.get("content") or data.get("data")
@@ -191,7 +329,7 @@ def _build_mermaid_image_payload(
                     except (ValueError, TypeError):
                         content = None
     else:
-        content = response.content
+        content = body
 
     if not content:
         logger.warning("Resposta vazia ao solicitar imagem Mermaid via Kroki")
@@ -203,20 +341,150 @@ def _build_mermaid_image_payload(
     )
 
     try:
-        output_dir = _ensure_output_dir()
-        digest = hashlib.sha256(mermaid.encode("utf-8")).hexdigest()[:12]
-        filename = f"{alias}_{digest}.{resolved_format}"
-        image_path = output_dir / filename
-        image_path.write_bytes(content)
+        target_dir = _ensure_output_dir(output_dir)
+        digest = digest or _mermaid_digest(mermaid)
+        filename = f"{alias}_{digest[:12]}.{resolved_format}"
+        image_path = target_dir / filename
+        # o nome deriva do conteúdo: basta a troca atômica, sem lock
+        atomic_write_bytes(image_path, content)
         payload["path"] = str(image_path.resolve())
+        payload.update(artifact_reference(image_path, content, OUTPUT_DIR))
     except OSError as exc:
         logger.warning("Falha ao salvar imagem Mermaid", exc_info=exc)
 
     return payload
 
 
+# renders idênticos em andamento (mesma fonte e formato) viram uma única chamada ao Kroki
+_RENDER_FLIGHTS = SingleFlight()
+
+
+def _mermaid_digest(mermaid: str) -> str:
+    return hashlib.sha256(mermaid.encode("utf-8")).hexdigest()
+
+
+def _render_flight_key(payload: Dict[str, Any], digest: str) -> Tuple[str, str]:
+    return payload["format"], digest
+
+
+def _fetch_mermaid_render(payload: Dict[str, Any], digest: str) -> Tuple[str, bytes, str, bool]:
+    """Renderiza no pool, compartilhando a chamada com renders idênticos em voo.
+
+    Retorna ``(content_type, corpo, endpoint, compartilhado)``.
+    """
+
+    def _post() -> Tuple[str, bytes, str]:
+        response, endpoint = get_renderer_pool().post(
+            "/", json=payload["body"], headers=payload["headers"], timeout=30
+        )
+        return response.headers.get("Content-Type", "") or "", response.content or b"", endpoint
+
+    (content_type, body, endpoint), shared = _RENDER_FLIGHTS.do(
+        _render_flight_key(payload, digest), _post
+    )
+    return content_type, body, endpoint, shared
+
+
+def _build_mermaid_image_payload(
+    mermaid: str,
+    *,
+    alias: str,
+    title: str,
+    fmt: Optional[str] = None,
+    output_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    payload = _mermaid_image_request(mermaid, title=title, fmt=fmt)
+
+    if not FETCH_MERMAID_IMAGES:
+        return payload
+
+    digest = _mermaid_digest(mermaid)
+    try:
+        content_type, body, endpoint, shared = _fetch_mermaid_render(payload, digest)
+    except requests.RequestException as exc:
+        logger.warning("Falha ao baixar imagem Mermaid", exc_info=exc)
+        return payload
+    payload["url"] = f"{endpoint}/"
+    if shared:
+        payload["coalesced"] = True
+
+    return _apply_mermaid_image_response(
+        payload,
+        mermaid,
+        alias=alias,
+        content_type=content_type,
+        body=body,
+        output_dir=output_dir,
+        digest=digest,
+    )
+
+
+def _resolve_mermaid_detail(detail: Optional[str]) -> str:
+    candidate = (detail or MERMAID_DETAIL).strip().lower()
+    return candidate if candidate in {"auto", "full", "compact"} else MERMAID_DETAIL
+
+
+def _resolve_image_payload_mode(mode: Optional[str]) -> str:
+    candidate = (mode or IMAGE_PAYLOAD_MODE).strip().lower()
+    return candidate if candidate in {"reference", "inline"} else IMAGE_PAYLOAD_MODE
+
+
+def _apply_image_payload_mode(results: Iterable[Dict[str, Any]], mode: str) -> None:
+    """No modo ``reference`` remove o data URI das imagens que ficaram gravadas em disco."""
+
+    if mode != "reference":
+        return
+    for result in results:
+        images = [result.get("image")] + [part.get("image") for part in result.get("parts") or []]
+        for image in images:
+            # sem arquivo gravado o data URI é a única cópia da imagem e permanece
+            if isinstance(image, dict) and image.get("handle"):
+                image.pop("data_uri", None)
+
+
+def _resolve_image_source(image_source: Optional[str]) -> str:
+    candidate = (image_source or PREVIEW_IMAGE_SOURCE).strip().lower()
+    return candidate if candidate in {"kroki", "svg"} else PREVIEW_IMAGE_SOURCE
+
+
+def _build_svg_image_payload(
+    svg: str,
+    *,
+    alias: str,
+    title: str,
+    output_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Monta o payload da imagem renderizada localmente a partir do layout da visão."""
+
+    payload: Dict[str, Any] = {
+        "format": "svg",
+        "mime_type": SVG_MIME_TYPE,
+        "source": "svg",
+        "alt_text": title,
+        "status": "cached",
+        "data_uri": svg_data_uri(svg),
+    }
+    try:
+        target_dir = _ensure_output_dir(output_dir)
+        digest = hashlib.sha256(svg.encode("utf-8")).hexdigest()[:12]
+        image_path = target_dir / f"{alias}_layout_{digest}.svg"
+        atomic_write_text(image_path, svg)
+        payload["path"] = str(image_path.resolve())
+        payload.update(artifact_reference(image_path, svg.encode("utf-8"), OUTPUT_DIR))
+    except OSError as exc:
+        logger.warning("Falha ao salvar imagem SVG da visão", exc_info=exc)
+    return payload
+
+
 def _mermaid_validation_request(url: str) -> requests.Response:
-    return requests.get(url, timeout=10)
+    with get_render_limiter().slot(url):
+        return requests.get(url, timeout=10)
+
+
+def _queue_ms(waits: Sequence[float]) -> float:
+    """Tempo total (ms) que as chamadas de uma visão passaram na fila do limitador."""
+
+    return round(sum(waits) * 1000, 1)
 
 
 def _extract_mermaid_error_message(svg_payload: str) -> Optional[str]:
@@ -238,13 +506,25 @@ def _extract_mermaid_error_message(svg_payload: str) -> Optional[str]:
     return None
 
 
-def _validate_mermaid_syntax(mermaid: str) -> None:
+def _mermaid_validation_url(mermaid: str) -> Optional[str]:
     if not mermaid.strip():
-        return
-
+        return None
     encoded = _encode_mermaid_for_validator(mermaid)
     base_url = _mermaid_validator_base_url()
-    url = f"{base_url}/svg/{encoded}"
+    return f"{base_url}/svg/{encoded}"
+
+
+def _check_mermaid_validation_payload(payload: str) -> None:
+    payload = payload or ""
+    if 'aria-roledescription="error"' in payload or "Syntax error" in payload or "Parse error" in payload:
+        message = _extract_mermaid_error_message(payload) or "Erro de sintaxe Mermaid detectado"
+        raise ValueError(message)
+
+
+def _validate_mermaid_syntax(mermaid: str) -> None:
+    url = _mermaid_validation_url(mermaid)
+    if url is None:
+        return
 
     try:
         response = _mermaid_validation_request(url)
@@ -253,10 +533,7 @@ def _validate_mermaid_syntax(mermaid: str) -> None:
         logger.warning("Não foi possível validar o Mermaid gerado", exc_info=exc)
         return
 
-    payload = response.text or ""
-    if 'aria-roledescription="error"' in payload or "Syntax error" in payload or "Parse error" in payload:
-        message = _extract_mermaid_error_message(payload) or "Erro de sintaxe Mermaid detectado"
-        raise ValueError(message)
+    _check_mermaid_validation_payload(response.text)
 
 
 def _resolve_templates_dir(directory: str | None = None) -> Path:
@@ -333,9 +610,16 @@ def _text_payload(element: Optional[ET.Element]) -> Optional[Dict[str, str]]:
     return payload
 
 
-def _payload_text(payload: Optional[Dict[str, Any]]) -> Optional[str]:
+def _text_value(element: Optional[ET.Element]) -> Optional[Text]:
+    payload = _text_payload(element)
+    return Text.from_payload(payload) if payload else None
+
+
+def _payload_text(payload: Any) -> Optional[str]:
     if payload is None:
         return None
+    if isinstance(payload, Text):
+        return payload.text
     if isinstance(payload, dict):
         return payload.get("text")
     if isinstance(payload, str):
@@ -346,7 +630,7 @@ def _payload_text(payload: Optional[Dict[str, Any]]) -> Optional[str]:
 def _normalize_text(value: Any) -> Optional[str]:
     if value is None:
         return None
-    if isinstance(value, dict):
+    if isinstance(value, (dict, Text)):
         return _payload_text(value)
     if isinstance(value, (str, bytes)):
         text = value.decode("utf-8") if isinstance(value, bytes) else value
@@ -485,281 +769,188 @@ def _parse_properties_container(container: Optional[ET.Element], ns: Dict[str, s
     return properties or None
 
 
-def _parse_organization_item_full(node: ET.Element, ns: Dict[str, str]) -> Dict[str, Any]:
-    item: Dict[str, Any] = {}
-    identifier_ref = node.get("identifierRef")
-    identifier = node.get("identifier")
-    if identifier_ref:
-        item["identifierRef"] = identifier_ref
-    if identifier:
-        item["identifier"] = identifier
-    label = _text_payload(node.find("a:label", ns))
-    if label:
-        item["label"] = label
-    documentation = _text_payload(node.find("a:documentation", ns))
-    if documentation:
-        item["documentation"] = documentation
-    children = [
-        _parse_organization_item_full(child, ns)
-        for child in node.findall("a:item", ns)
-    ]
-    if children:
-        item["items"] = children
-    return item
+def _parse_organization_item_full(node: ET.Element, ns: Dict[str, str]) -> OrgItem:
+    return OrgItem(
+        identifier_ref=intern_id(node.get("identifierRef")),
+        identifier=intern_id(node.get("identifier")),
+        label=_text_value(node.find("a:label", ns)),
+        documentation=_text_value(node.find("a:documentation", ns)),
+        items=[
+            _parse_organization_item_full(child, ns)
+            for child in node.findall("a:item", ns)
+        ],
+    )
 
 
-def _parse_view_connection_full(node: ET.Element, ns: Dict[str, str]) -> Dict[str, Any]:
-    data: Dict[str, Any] = {}
-    identifier = node.get("identifier")
-    if identifier:
-        data["id"] = identifier
-    conn_type = node.get(XSI_ATTR)
-    if conn_type:
-        data["type"] = conn_type
-    for attr in ("relationshipRef", "source", "target"):
-        value = node.get(attr)
-        if value:
-            data[attr] = value
+def _parse_points(container: ET.Element, ns: Dict[str, str]) -> List[Dict[str, Any]]:
+    points: List[Dict[str, Any]] = []
+    for pt in container.findall("a:point", ns):
+        point_data: Dict[str, Any] = {}
+        for coord in ("x", "y"):
+            coord_value = _coerce_number(pt.get(coord))
+            if coord_value is not None:
+                point_data[coord] = coord_value
+        if point_data:
+            points.append(point_data)
+    return points
+
+
+def _parse_view_connection_full(node: ET.Element, ns: Dict[str, str]) -> ViewConnection:
+    connection = ViewConnection(
+        id=intern_id(node.get("identifier")),
+        type=intern_id(node.get(XSI_ATTR)),
+        relationship_ref=intern_id(node.get("relationshipRef")),
+        source=intern_id(node.get("source")),
+        target=intern_id(node.get("target")),
+    )
 
     child_order: List[str] = []
     for child in list(node):
         local = _local_name(child.tag)
         if local == "style":
             child_order.append("style")
-            style = _parse_style_element(child, ns)
-            if style:
-                data["style"] = style
+            connection.style = _parse_style_element(child, ns)
         elif local == "label":
             child_order.append("label")
-            label = _text_payload(child)
-            if label:
-                data["label"] = label
+            connection.label = _text_value(child)
         elif local == "documentation":
-            documentation = _text_payload(child)
-            if documentation:
-                data["documentation"] = documentation
+            connection.documentation = _text_value(child)
         elif local == "points":
             child_order.append("points")
-            points: List[Dict[str, Any]] = []
-            for pt in child.findall("a:point", ns):
-                point_data: Dict[str, Any] = {}
-                for coord in ("x", "y"):
-                    coord_value = _coerce_number(pt.get(coord))
-                    if coord_value is not None:
-                        point_data[coord] = coord_value
-                if point_data:
-                    points.append(point_data)
-            if points:
-                data["points"] = points
+            connection.points = _parse_points(child, ns) or None
         elif local == "properties":
             child_order.append("properties")
-            properties = _parse_properties_container(child, ns)
-            if properties:
-                data["properties"] = properties
+            connection.properties = _parse_properties_container(child, ns)
     if child_order:
-        data["child_order"] = child_order
-    return data
+        connection.child_order = tuple(sys.intern(item) for item in child_order)
+    return connection
 
 
-def _parse_view_node_full(node: ET.Element, ns: Dict[str, str]) -> Dict[str, Any]:
-    data: Dict[str, Any] = {}
-    identifier = node.get("identifier")
-    if identifier:
-        data["id"] = identifier
-    node_type = node.get(XSI_ATTR)
-    if node_type:
-        data["type"] = node_type
+def _parse_view_node_full(node: ET.Element, ns: Dict[str, str]) -> ViewNode:
     bounds: Dict[str, Any] = {}
     for attr in ("x", "y", "w", "h"):
         value = _coerce_number(node.get(attr))
         if value is not None:
             bounds[attr] = value
-    if bounds:
-        data["bounds"] = bounds
-    for attr in ("elementRef", "relationshipRef", "viewRef"):
-        value = node.get(attr)
-        if value:
-            data[attr] = value
+    view_node = ViewNode(
+        id=intern_id(node.get("identifier")),
+        type=intern_id(node.get(XSI_ATTR)),
+        bounds=bounds or None,
+        element_ref=intern_id(node.get("elementRef")),
+        relationship_ref=intern_id(node.get("relationshipRef")),
+        view_ref=intern_id(node.get("viewRef")),
+    )
 
     child_order: List[str] = []
-    nodes: List[Dict[str, Any]] = []
-    connections: List[Dict[str, Any]] = []
-
     for child in list(node):
         local = _local_name(child.tag)
         if local == "style":
             child_order.append("style")
-            style = _parse_style_element(child, ns)
-            if style:
-                data["style"] = style
+            view_node.style = _parse_style_element(child, ns)
         elif local == "label":
             child_order.append("label")
-            label = _text_payload(child)
-            if label:
-                data["label"] = label
+            view_node.label = _text_value(child)
         elif local == "documentation":
-            documentation = _text_payload(child)
-            if documentation:
-                data["documentation"] = documentation
+            view_node.documentation = _text_value(child)
         elif local == "node":
             child_order.append("node")
-            nodes.append(_parse_view_node_full(child, ns))
+            view_node.nodes.append(_parse_view_node_full(child, ns))
         elif local == "connection":
             child_order.append("connection")
-            connections.append(_parse_view_connection_full(child, ns))
+            view_node.connections.append(_parse_view_connection_full(child, ns))
         elif local == "viewRef":
             child_order.append("viewRef")
-            view_ref = child.get("ref")
+            view_ref = intern_id(child.get("ref"))
             if view_ref:
-                data.setdefault("refs", {})["viewRef"] = view_ref
+                view_node.refs = {"viewRef": view_ref}
         elif local == "properties":
             child_order.append("properties")
-            properties = _parse_properties_container(child, ns)
-            if properties:
-                data["properties"] = properties
-    if nodes:
-        data["nodes"] = nodes
-    if connections:
-        data["connections"] = connections
+            view_node.properties = _parse_properties_container(child, ns)
     if child_order:
-        data["child_order"] = child_order
-    return data
+        view_node.child_order = tuple(sys.intern(item) for item in child_order)
+    return view_node
 
 
-def _parse_view_diagram_full(view: ET.Element, ns: Dict[str, str]) -> Dict[str, Any]:
-    data: Dict[str, Any] = {}
-    identifier = view.get("identifier")
-    if identifier:
-        data["id"] = identifier
-    view_type = view.get(XSI_ATTR)
-    if view_type:
-        data["type"] = view_type
-
-    nodes: List[Dict[str, Any]] = []
-    connections: List[Dict[str, Any]] = []
-    child_order: List[str] = []
+def _parse_view_diagram_full(view: ET.Element, ns: Dict[str, str]) -> ViewDiagram:
+    diagram = ViewDiagram(
+        id=intern_id(view.get("identifier")),
+        type=intern_id(view.get(XSI_ATTR)),
+    )
 
+    child_order: List[str] = []
     for child in list(view):
         local = _local_name(child.tag)
         if local == "name":
-            name = _text_payload(child)
-            if name:
-                data["name"] = name
+            diagram.name = _text_value(child)
         elif local == "documentation":
-            documentation = _text_payload(child)
-            if documentation:
-                data["documentation"] = documentation
+            diagram.documentation = _text_value(child)
         elif local == "style":
             child_order.append("style")
-            style = _parse_style_element(child, ns)
-            if style:
-                data["style"] = style
+            diagram.style = _parse_style_element(child, ns)
         elif local == "label":
             child_order.append("label")
-            label = _text_payload(child)
-            if label:
-                data["label"] = label
+            diagram.label = _text_value(child)
         elif local == "node":
             child_order.append("node")
-            nodes.append(_parse_view_node_full(child, ns))
+            diagram.nodes.append(_parse_view_node_full(child, ns))
         elif local == "connection":
             child_order.append("connection")
-            connections.append(_parse_view_connection_full(child, ns))
+            diagram.connections.append(_parse_view_connection_full(child, ns))
         elif local == "properties":
             child_order.append("properties")
-            properties = _parse_properties_container(child, ns)
-            if properties:
-                data["properties"] = properties
-    if nodes:
-        data["nodes"] = nodes
-    if connections:
-        data["connections"] = connections
+            diagram.properties = _parse_properties_container(child, ns)
     if child_order:
-        data["child_order"] = child_order
-    return data
+        diagram.child_order = tuple(sys.intern(item) for item in child_order)
+    return diagram
 
 
-def _parse_element_full(element: ET.Element, ns: Dict[str, str]) -> Dict[str, Any]:
-    data: Dict[str, Any] = {}
-    identifier = element.get("identifier")
-    if identifier:
-        data["id"] = identifier
-    element_type = element.get(XSI_ATTR)
-    if element_type:
-        data["type"] = element_type
-    name = _text_payload(element.find("a:name", ns))
-    if name:
-        data["name"] = name
-    documentation = _text_payload(element.find("a:documentation", ns))
-    if documentation:
-        data["documentation"] = documentation
-    properties = _parse_properties_container(element.find("a:properties", ns), ns)
-    if properties:
-        data["properties"] = properties
-    return data
+def _parse_element_full(element: ET.Element, ns: Dict[str, str]) -> Element:
+    return Element(
+        id=intern_id(element.get("identifier")),
+        type=intern_id(element.get(XSI_ATTR)),
+        name=_text_value(element.find("a:name", ns)),
+        documentation=_text_value(element.find("a:documentation", ns)),
+        properties=_parse_properties_container(element.find("a:properties", ns), ns),
+    )
 
 
-def _parse_relationship_full(relationship: ET.Element, ns: Dict[str, str]) -> Dict[str, Any]:
-    data: Dict[str, Any] = {}
-    identifier = relationship.get("identifier")
-    if identifier:
-        data["id"] = identifier
-    rel_type = relationship.get(XSI_ATTR)
-    if rel_type:
-        data["type"] = rel_type
-    for attr in ("source", "target"):
-        value = relationship.get(attr)
-        if value:
-            data[attr] = value
-    documentation = _text_payload(relationship.find("a:documentation", ns))
-    if documentation:
-        data["documentation"] = documentation
-    properties = _parse_properties_container(relationship.find("a:properties", ns), ns)
-    if properties:
-        data["properties"] = properties
-    return data
+def _parse_relationship_full(relationship: ET.Element, ns: Dict[str, str]) -> Relationship:
+    return Relationship(
+        id=intern_id(relationship.get("identifier")),
+        type=intern_id(relationship.get(XSI_ATTR)),
+        source=intern_id(relationship.get("source")),
+        target=intern_id(relationship.get("target")),
+        documentation=_text_value(relationship.find("a:documentation", ns)),
+        properties=_parse_properties_container(relationship.find("a:properties", ns), ns),
+    )
 
 
-def _parse_template_blueprint(template: Path) -> Dict[str, Any]:
-    tree = ET.parse(template)
-    root = tree.getroot()
+def _parse_template_model(template: Path) -> TemplateModel:
+    raw = template.read_bytes()
+    root = ET.fromstring(raw)
     ns = {"a": ARCHIMATE_NS}
 
-    blueprint: Dict[str, Any] = {
-        "model_identifier": root.get("identifier"),
-    }
-
-    name = _text_payload(root.find("a:name", ns))
-    if name:
-        blueprint["model_name"] = name
-    documentation = _text_payload(root.find("a:documentation", ns))
-    if documentation:
-        blueprint["model_documentation"] = documentation
-
-    elements = [
-        _parse_element_full(el, ns)
-        for el in root.findall("a:elements/a:element", ns)
-    ]
-    if elements:
-        blueprint["elements"] = elements
-
-    relationships = [
-        _parse_relationship_full(rel, ns)
-        for rel in root.findall("a:relationships/a:relationship", ns)
-    ]
-    if relationships:
-        blueprint["relations"] = relationships
-
-    organizations = [
-        _parse_organization_item_full(item, ns)
-        for item in root.findall("a:organizations/a:item", ns)
-    ]
-    if organizations:
-        blueprint["organizations"] = organizations
+    model = TemplateModel(
+        fingerprint=hashlib.sha256(raw).hexdigest(),
+        model_identifier=root.get("identifier"),
+        model_name=_text_value(root.find("a:name", ns)),
+        model_documentation=_text_value(root.find("a:documentation", ns)),
+        elements=[
+            _parse_element_full(el, ns)
+            for el in root.findall("a:elements/a:element", ns)
+        ],
+        relations=[
+            _parse_relationship_full(rel, ns)
+            for rel in root.findall("a:relationships/a:relationship", ns)
+        ],
+        organizations=[
+            _parse_organization_item_full(item, ns)
+            for item in root.findall("a:organizations/a:item", ns)
+        ],
+    )
 
     views_root = root.find("a:views", ns)
     if views_root is not None:
-        views_payload: Dict[str, Any] = {}
         viewpoints = []
         for viewpoint in views_root.findall("a:viewpoints/a:viewpoint", ns):
             vp: Dict[str, Any] = {}
@@ -774,19 +965,111 @@ def _parse_template_blueprint(template: Path) -> Dict[str, Any]:
                 vp["documentation"] = vp_doc
             if vp:
                 viewpoints.append(vp)
-        if viewpoints:
-            views_payload["viewpoints"] = viewpoints
-
-        diagrams = [
+        model.viewpoints = viewpoints or None
+        model.diagrams = [
             _parse_view_diagram_full(view, ns)
             for view in views_root.findall("a:diagrams/a:view", ns)
         ]
-        if diagrams:
-            views_payload["diagrams"] = diagrams
-        if views_payload:
-            blueprint["views"] = views_payload
 
-    return blueprint
+    return model
+
+
+def _load_template_model(template: Path) -> TemplateModel:
+    """Obtém o modelo tipado do cache de processo, parseando o template apenas quando muda.
+
+    O modelo é compartilhado entre sessões e não deve ser alterado.
+    """
+
+    return _TEMPLATE_MODEL_CACHE.get(template, _parse_template_model)
+
+
+def _load_template_blueprint(template: Path) -> Dict[str, Any]:
+    """Blueprint em dicionário (formato JSON das ferramentas) gerado a partir do modelo em cache.
+
+    A estrutura (listas e dicionários de cada item) é nova a cada chamada; valores internos
+    como ``style`` e ``properties`` continuam compartilhados com o cache.
+    """
+
+    return _load_template_model(template).to_blueprint()
+
+
+def _resolve_template(
+    session_state: Optional[MutableMapping[str, Any]], template: Path
+) -> Tuple[TemplateModel, Optional[Dict[str, Any]]]:
+    """Modelo do template, priorizando a versão referenciada pelo handle da sessão.
+
+    Se o modelo em cache no processo tem o mesmo hash do handle ele é usado diretamente;
+    caso contrário o blueprint é reidratado do armazenamento de processo. Sem nenhum dos
+    dois, o template é relido do disco e, havendo sessão, o handle é atualizado. O
+    blueprint em dicionário só é montado nesses dois últimos casos e vem junto no retorno
+    (``None`` quando não foi preciso montá-lo).
+    """
+
+    handle = get_blueprint_handle(session_state, template)
+    if handle is not None:
+        cached = _TEMPLATE_MODEL_CACHE.peek(template)
+        if cached is not None and cached.fingerprint == handle["fingerprint"]:
+            return cached, None
+        blueprint = get_cached_blueprint(session_state, template)
+        if blueprint is not None:
+            return TemplateModel.from_blueprint(blueprint), blueprint
+    model = _load_template_model(template)
+    if session_state is None:
+        return model, None
+    blueprint = model.to_blueprint()
+    store_blueprint(session_state, template, blueprint)
+    return model, blueprint
+
+
+def _resolve_template_model(
+    session_state: Optional[MutableMapping[str, Any]], template: Path
+) -> TemplateModel:
+    return _resolve_template(session_state, template)[0]
+
+
+def _read_template_metadata(template_path: Path) -> Dict[str, Any]:
+    tree = ET.parse(template_path)
+    root = tree.getroot()
+    ns = {"a": ARCHIMATE_NS}
+    return {
+        "path": str(template_path.resolve()),
+        "model_identifier": root.get("identifier"),
+        "model_name": _text_payload(root.find("a:name", ns)),
+        "documentation": _text_payload(root.find("a:documentation", ns)),
+    }
+
+
+def invalidate_template_caches(paths: Optional[Iterable[str | Path]] = None) -> Dict[str, int]:
+    """Descarta índices, blueprints, árvores e XSDs compilados dos caminhos afetados."""
+
+    removed = invalidate_paths(paths)
+    logger.debug("Caches de template invalidados", extra={"removidos": removed})
+    return removed
+
+
+def prewarm_template_caches(paths: Iterable[str | Path]) -> List[str]:
+    """Recarrega em cache os templates e diretórios de XSD informados."""
+
+    warmed: List[str] = []
+    for raw in paths:
+        path = Path(raw)
+        try:
+            if path.suffix.lower() == ".xml" and path.is_file():
+                _TEMPLATE_INDEX_CACHE.get(path, _read_template_metadata)
+                _load_template_model(path)
+                xml_exchange.load_patch_plan(path)
+            elif path.suffix.lower() == ".xsd" and path.is_file():
+                if (path.parent / "archimate3_Model.xsd").exists():
+                    xml_exchange.load_structural_rules(path.parent)
+                    if xml_exchange.LXML_AVAILABLE:
+                        xml_exchange.load_schema(path.parent)
+            else:
+                continue
+        except (ET.ParseError, OSError, ValueError) as exc:
+            logger.warning("Falha ao pré-carregar template", extra={"path": str(path)}, exc_info=exc)
+            continue
+        warmed.append(str(path))
+    return warmed
 
 
 def _simplify_organization_item(item: Dict[str, Any]) -> Dict[str, Any]:
@@ -963,9 +1246,15 @@ def _build_guidance_from_blueprint(blueprint: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def _strip_template_keys(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Cópia rasa do override sem as chaves de template (``identifier`` vira ``id``).
+
+    Os valores aninhados são compartilhados com o payload de entrada: o merge nunca altera
+    os overrides, apenas os referencia no resultado.
+    """
+
     if data is None:
         return None
-    cleaned = copy.deepcopy(data)
+    cleaned = dict(data)
     cleaned.pop("template_identifier", None)
     cleaned.pop("template_id", None)
     identifier = cleaned.pop("identifier", None)
@@ -986,27 +1275,11 @@ def _apply_textual_override(
             return
 
 
-def _view_node_key(node: Dict[str, Any]) -> Optional[str]:
-    if not node:
-        return None
-    for key in ("id", "identifier"):
-        value = node.get(key)
-        if value:
-            return str(value)
-    for key in ("elementRef", "relationshipRef"):
-        value = node.get(key)
-        if not value and isinstance(node.get("refs"), dict):
-            value = node["refs"].get(key)
-        if value:
-            return f"{key}:{value}"
-    return None
-
-
 def _merge_view_connections(
-    template_connections: List[Dict[str, Any]],
+    template_connections: Iterable[ViewConnection],
     override_connections: Optional[Iterable[Dict[str, Any]]],
 ) -> List[Dict[str, Any]]:
-    template_connections = [copy.deepcopy(conn) for conn in template_connections or []]
+    template_connections = list(template_connections or [])
     overrides = list(override_connections or [])
     if not template_connections and not overrides:
         return []
@@ -1022,23 +1295,24 @@ def _merge_view_connections(
             extras.append(clean)
 
     merged: List[Dict[str, Any]] = []
-    for conn in template_connections:
-        key = conn.get("id")
-        override = override_map.get(str(key)) if key else None
+    for template_conn in template_connections:
+        conn = template_conn.to_dict()
+        key = template_conn.id
+        override = override_map.get(key) if key else None
         if override:
             _apply_textual_override(conn, override, "label", ("label", "label_hint"))
             _apply_textual_override(conn, override, "documentation", ("documentation", "documentation_hint"))
         merged.append(conn)
 
-    merged.extend(copy.deepcopy(extra) for extra in extras)
+    merged.extend(extras)
     return merged
 
 
 def _merge_view_nodes(
-    template_nodes: List[Dict[str, Any]],
+    template_nodes: Iterable[ViewNode],
     override_nodes: Optional[Iterable[Dict[str, Any]]],
 ) -> List[Dict[str, Any]]:
-    template_nodes = [copy.deepcopy(node) for node in template_nodes or []]
+    template_nodes = list(template_nodes or [])
     overrides = list(override_nodes or [])
     if not template_nodes and not overrides:
         return []
@@ -1055,32 +1329,29 @@ def _merge_view_nodes(
 
     merged: List[Dict[str, Any]] = []
     for node in template_nodes:
-        key = _view_node_key(node)
+        key = node.key()
         override = override_map.get(key) if key else None
         merged.append(_merge_view_node(node, override))
 
-    merged.extend(copy.deepcopy(extra) for extra in extras)
+    merged.extend(extras)
     return merged
 
 
-def _merge_view_node(template_node: Dict[str, Any], override_node: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-    merged = copy.deepcopy(template_node)
-    clean_override = copy.deepcopy(override_node) if override_node else None
-    if clean_override:
-        _apply_textual_override(merged, clean_override, "label", ("label", "label_hint"))
-        _apply_textual_override(merged, clean_override, "documentation", ("documentation", "documentation_hint"))
+def _merge_view_node(template_node: ViewNode, override_node: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    merged = template_node.to_dict(children=False)
+    if override_node:
+        _apply_textual_override(merged, override_node, "label", ("label", "label_hint"))
+        _apply_textual_override(merged, override_node, "documentation", ("documentation", "documentation_hint"))
 
-    template_children = template_node.get("nodes", [])
-    override_children = clean_override.get("nodes") if clean_override else None
-    merged_children = _merge_view_nodes(template_children, override_children)
+    override_children = override_node.get("nodes") if override_node else None
+    merged_children = _merge_view_nodes(template_node.nodes, override_children)
     if merged_children:
         merged["nodes"] = merged_children
     elif "nodes" in merged:
         merged.pop("nodes", None)
 
-    template_connections = template_node.get("connections", [])
-    override_connections = clean_override.get("connections") if clean_override else None
-    merged_connections = _merge_view_connections(template_connections, override_connections)
+    override_connections = override_node.get("connections") if override_node else None
+    merged_connections = _merge_view_connections(template_node.connections, override_connections)
     if merged_connections:
         merged["connections"] = merged_connections
     elif "connections" in merged:
@@ -1101,32 +1372,30 @@ def _normalize_view_diagrams(views_payload: Any) -> List[Dict[str, Any]]:
 
 
 def _merge_view_diagram(
-    template_diagram: Dict[str, Any],
+    template_diagram: ViewDiagram,
     override_diagram: Optional[Dict[str, Any]],
 ) -> Dict[str, Any]:
-    merged = copy.deepcopy(template_diagram)
-    clean_override = copy.deepcopy(override_diagram) if override_diagram else None
+    merged = template_diagram.to_dict(children=False)
+    clean_override = override_diagram or None
     if clean_override:
         _apply_textual_override(merged, clean_override, "name", ("name", "name_hint"))
         _apply_textual_override(merged, clean_override, "documentation", ("documentation", "documentation_hint"))
 
     merged["nodes"] = _merge_view_nodes(
-        template_diagram.get("nodes", []),
+        template_diagram.nodes,
         clean_override.get("nodes") if clean_override else None,
     )
     merged["connections"] = _merge_view_connections(
-        template_diagram.get("connections", []),
+        template_diagram.connections,
         clean_override.get("connections") if clean_override else None,
     )
     return merged
 
 
 def _merge_views(
-    template_views: Dict[str, Any],
+    template: TemplateModel,
     override_views: Optional[Any],
 ) -> Dict[str, Any]:
-    template_views = copy.deepcopy(template_views or {})
-    template_diagrams = template_views.get("diagrams", [])
     overrides = _normalize_view_diagrams(override_views)
 
     override_map: Dict[str, Dict[str, Any]] = {}
@@ -1140,35 +1409,24 @@ def _merge_views(
             extras.append(clean)
 
     merged_diagrams: List[Dict[str, Any]] = []
-    for diagram in template_diagrams:
-        key = diagram.get("id")
-        override = override_map.get(str(key)) if key else None
+    for diagram in template.diagrams:
+        key = diagram.id
+        override = override_map.get(key) if key else None
         merged_diagrams.append(_merge_view_diagram(diagram, override))
 
-    merged_diagrams.extend(copy.deepcopy(extra) for extra in extras)
+    merged_diagrams.extend(extras)
 
     result: Dict[str, Any] = {"diagrams": merged_diagrams}
-    if template_views.get("viewpoints"):
-        result["viewpoints"] = template_views["viewpoints"]
+    if template.viewpoints:
+        result["viewpoints"] = list(template.viewpoints)
     return result
 
 
-def _organization_key(item: Dict[str, Any]) -> Optional[str]:
-    for key in ("identifier", "identifierRef"):
-        value = item.get(key)
-        if value:
-            return f"{key}:{value}"
-    label = _payload_text(item.get("label"))
-    if label:
-        return f"label:{label}"
-    return None
-
-
 def _merge_organization_node(
-    template_node: Dict[str, Any],
+    template_node: OrgItem,
     override_node: Optional[Dict[str, Any]],
 ) -> Dict[str, Any]:
-    merged = copy.deepcopy(template_node)
+    merged = template_node.to_dict(children=False)
     if override_node:
         label = override_node.get("label")
         if label is not None:
@@ -1176,9 +1434,8 @@ def _merge_organization_node(
         documentation = override_node.get("documentation")
         if documentation is not None:
             merged["documentation"] = documentation
-    template_children = template_node.get("items", [])
     override_children = override_node.get("items") if override_node else None
-    merged_children = _merge_organization_items(template_children, override_children)
+    merged_children = _merge_organization_items(template_node.items, override_children)
     if merged_children:
         merged["items"] = merged_children
     elif "items" in merged:
@@ -1187,10 +1444,10 @@ def _merge_organization_node(
 
 
 def _merge_organization_items(
-    template_items: List[Dict[str, Any]],
+    template_items: Iterable[OrgItem],
     override_items: Optional[Iterable[Dict[str, Any]]],
 ) -> List[Dict[str, Any]]:
-    template_items = [copy.deepcopy(item) for item in template_items or []]
+    template_items = list(template_items or [])
     overrides = list(override_items or [])
     if not template_items and not overrides:
         return []
@@ -1210,22 +1467,22 @@ def _merge_organization_items(
         override = override_map.get(key) if key else None
         merged.append(_merge_organization_node(item, override))
 
-    merged.extend(copy.deepcopy(extra) for extra in extras)
+    merged.extend(extras)
     return merged
 
 
 def _merge_organizations(
-    template_items: List[Dict[str, Any]],
+    template_items: Iterable[OrgItem],
     override_items: Optional[Iterable[Dict[str, Any]]],
 ) -> List[Dict[str, Any]]:
     return _merge_organization_items(template_items, override_items)
 
 
 def _merge_elements(
-    template_elements: List[Dict[str, Any]],
+    template_elements: Iterable[Element],
     override_elements: Optional[Iterable[Dict[str, Any]]],
 ) -> List[Dict[str, Any]]:
-    template_elements = [copy.deepcopy(element) for element in template_elements or []]
+    template_elements = list(template_elements or [])
     overrides = list(override_elements or [])
     if not template_elements and not overrides:
         return []
@@ -1241,24 +1498,25 @@ def _merge_elements(
             extras.append(clean)
 
     merged: List[Dict[str, Any]] = []
-    for element in template_elements:
-        key = element.get("id")
-        override = override_map.get(str(key)) if key else None
+    for template_element in template_elements:
+        element = template_element.to_dict()
+        key = template_element.id
+        override = override_map.get(key) if key else None
         if override:
             for field in ("name", "documentation", "properties", "type"):
                 if field in override:
                     element[field] = override[field]
         merged.append(element)
 
-    merged.extend(copy.deepcopy(extra) for extra in extras)
+    merged.extend(extras)
     return merged
 
 
 def _merge_relations(
-    template_relations: List[Dict[str, Any]],
+    template_relations: Iterable[Relationship],
     override_relations: Optional[Iterable[Dict[str, Any]]],
 ) -> List[Dict[str, Any]]:
-    template_relations = [copy.deepcopy(relation) for relation in template_relations or []]
+    template_relations = list(template_relations or [])
     overrides = list(override_relations or [])
     if not template_relations and not overrides:
         return []
@@ -1274,149 +1532,174 @@ def _merge_relations(
             extras.append(clean)
 
     merged: List[Dict[str, Any]] = []
-    for relation in template_relations:
-        key = relation.get("id")
-        override = override_map.get(str(key)) if key else None
+    for template_relation in template_relations:
+        relation = template_relation.to_dict()
+        key = template_relation.id
+        override = override_map.get(key) if key else None
         if override:
             for field in ("source", "target", "documentation", "properties", "type"):
                 if field in override:
                     relation[field] = override[field]
         merged.append(relation)
 
-    merged.extend(copy.deepcopy(extra) for extra in extras)
+    merged.extend(extras)
     return merged
 
 
 def _register_element_entry(
     lookup: Dict[str, Dict[str, Any]],
-    element: Dict[str, Any],
+    element: Element,
     source: str,
 ) -> None:
-    identifier = element.get("id") or element.get("identifier")
-    if not identifier:
+    if not element.id:
         return
-    key = str(identifier)
+    key = element.id
     entry = lookup.setdefault(key, {"id": key})
 
-    element_type = element.get("type")
-    if element_type and "type" not in entry:
-        entry["type"] = element_type
+    if element.type and "type" not in entry:
+        entry["type"] = element.type
 
-    name = _normalize_text(element.get("name"))
+    name = _normalize_text(element.name)
     if name:
         if source == "template":
             entry.setdefault("template_name", name)
         else:
             entry["name"] = name
 
-    documentation = _normalize_text(element.get("documentation"))
+    documentation = _normalize_text(element.documentation)
     if documentation:
         if source == "template":
             entry.setdefault("template_documentation", documentation)
         else:
             entry["documentation"] = documentation
 
-    properties = element.get("properties")
-    if properties and source == "template":
-        entry.setdefault("template_properties", properties)
+    if element.properties and source == "template":
+        entry.setdefault("template_properties", element.properties)
 
 
 def _register_relationship_entry(
     lookup: Dict[str, Dict[str, Any]],
-    relation: Dict[str, Any],
+    relation: Relationship,
     source: str,
 ) -> None:
-    identifier = relation.get("id") or relation.get("identifier")
-    if not identifier:
+    if not relation.id:
         return
-    key = str(identifier)
+    key = relation.id
     entry = lookup.setdefault(key, {"id": key})
 
-    rel_type = relation.get("type")
-    if rel_type and "type" not in entry:
-        entry["type"] = rel_type
+    if relation.type and "type" not in entry:
+        entry["type"] = relation.type
 
-    for attr in ("source", "target"):
-        value = relation.get(attr)
-        if value:
-            entry.setdefault(attr, value)
+    if relation.source:
+        entry.setdefault("source", relation.source)
+    if relation.target:
+        entry.setdefault("target", relation.target)
 
-    documentation = _normalize_text(relation.get("documentation"))
+    documentation = _normalize_text(relation.documentation)
     if documentation:
         if source == "template":
             entry.setdefault("template_documentation", documentation)
         else:
             entry["documentation"] = documentation
 
-    properties = relation.get("properties")
-    if properties and source == "template":
-        entry.setdefault("template_properties", properties)
+    if relation.properties and source == "template":
+        entry.setdefault("template_properties", relation.properties)
 
 
 def _build_element_lookup(
-    template: Dict[str, Any], payload: Dict[str, Any]
-) -> Dict[str, Dict[str, Any]]:
-    lookup: Dict[str, Dict[str, Any]] = {}
-    for element in template.get("elements", []) or []:
-        if isinstance(element, dict):
-            _register_element_entry(lookup, element, "template")
-    for element in payload.get("elements", []) or []:
-        if isinstance(element, dict):
-            _register_element_entry(lookup, element, "datamodel")
-    return lookup
+    template_lookup: Mapping[str, Dict[str, Any]], payload: Dict[str, Any]
+) -> Mapping[str, Dict[str, Any]]:
+    """Sobrepõe os elementos do datamodel ao índice (compartilhado) do template.
+
+    Entradas alteradas pelo datamodel são copiadas para a camada local; o índice do template
+    nunca é modificado.
+    """
+
+    overlay: Dict[str, Dict[str, Any]] = {}
+    for raw in payload.get("elements", []) or []:
+        if not isinstance(raw, dict):
+            continue
+        element = Element.from_dict(raw)
+        if element.id and element.id not in overlay and element.id in template_lookup:
+            overlay[element.id] = dict(template_lookup[element.id])
+        _register_element_entry(overlay, element, "datamodel")
+    return ChainMap(overlay, template_lookup) if overlay else template_lookup
 
 
 def _build_relationship_lookup(
-    template: Dict[str, Any], payload: Dict[str, Any]
-) -> Dict[str, Dict[str, Any]]:
-    lookup: Dict[str, Dict[str, Any]] = {}
-    for relation in template.get("relations", []) or []:
-        if isinstance(relation, dict):
-            _register_relationship_entry(lookup, relation, "template")
-    for relation in payload.get("relations", []) or []:
-        if isinstance(relation, dict):
-            _register_relationship_entry(lookup, relation, "datamodel")
-    return lookup
-
-
-def _flatten_view_nodes(nodes: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
-    flattened: Dict[str, Dict[str, Any]] = {}
-
-    def _walk(items: Iterable[Dict[str, Any]]) -> None:
-        for node in items or []:
-            if not isinstance(node, dict):
-                continue
-            key = _view_node_key(node)
+    template_lookup: Mapping[str, Dict[str, Any]], payload: Dict[str, Any]
+) -> Mapping[str, Dict[str, Any]]:
+    overlay: Dict[str, Dict[str, Any]] = {}
+    for raw in payload.get("relations", []) or []:
+        if not isinstance(raw, dict):
+            continue
+        relation = Relationship.from_dict(raw)
+        if relation.id and relation.id not in overlay and relation.id in template_lookup:
+            overlay[relation.id] = dict(template_lookup[relation.id])
+        _register_relationship_entry(overlay, relation, "datamodel")
+    return ChainMap(overlay, template_lookup) if overlay else template_lookup
+
+
+def _flatten_view_nodes(nodes: Iterable[ViewNode]) -> Dict[str, ViewNode]:
+    flattened: Dict[str, ViewNode] = {}
+    for root in nodes or []:
+        for node in root.walk():
+            key = node.key()
             if key:
                 flattened[key] = node
-            child_nodes = node.get("nodes")
-            if child_nodes:
-                _walk(child_nodes)
-
-    _walk(nodes or [])
     return flattened
 
 
 def _flatten_view_connections(
-    connections: Iterable[Dict[str, Any]]
-) -> Dict[str, Dict[str, Any]]:
-    flattened: Dict[str, Dict[str, Any]] = {}
-    for connection in connections or []:
-        if not isinstance(connection, dict):
-            continue
-        identifier = connection.get("id") or connection.get("identifier")
-        if identifier:
-            flattened[str(identifier)] = connection
-    return flattened
+    connections: Iterable[ViewConnection],
+) -> Dict[str, ViewConnection]:
+    return {connection.id: connection for connection in connections or [] if connection.id}
+
+
+@dataclass(slots=True)
+class _TemplateIndex:
+    """Índices derivados apenas do template, reaproveitados entre pré-visualizações."""
+
+    element_lookup: Dict[str, Dict[str, Any]]
+    relation_lookup: Dict[str, Dict[str, Any]]
+    view_nodes: List[Dict[str, ViewNode]]
+    view_connections: List[Dict[str, ViewConnection]]
+
+
+def _build_template_index(template: TemplateModel) -> _TemplateIndex:
+    element_lookup: Dict[str, Dict[str, Any]] = {}
+    for element in template.elements:
+        _register_element_entry(element_lookup, element, "template")
+    relation_lookup: Dict[str, Dict[str, Any]] = {}
+    for relation in template.relations:
+        _register_relationship_entry(relation_lookup, relation, "template")
+    return _TemplateIndex(
+        element_lookup=element_lookup,
+        relation_lookup=relation_lookup,
+        view_nodes=[_flatten_view_nodes(view.nodes) for view in template.diagrams],
+        view_connections=[
+            _flatten_view_connections(view.connections) for view in template.diagrams
+        ],
+    )
+
+
+def _template_index(template: TemplateModel) -> _TemplateIndex:
+    """Índices do template, calculados uma vez por fingerprint de conteúdo."""
+
+    if not template.fingerprint:
+        return _build_template_index(template)
+    return _DERIVED_INDEX_CACHE.get(
+        template.fingerprint, lambda: _build_template_index(template)
+    )
 
 
 def _merge_node_documentation(
-    node: Dict[str, Any],
-    blueprint_node: Optional[Dict[str, Any]],
+    node: ViewNode,
+    blueprint_node: Optional[ViewNode],
 ) -> Tuple[Optional[str], Optional[str]]:
-    node_doc = _normalize_text(node.get("documentation"))
+    node_doc = _normalize_text(node.documentation)
     blueprint_doc = _normalize_text(
-        blueprint_node.get("documentation") if blueprint_node else None
+        blueprint_node.documentation if blueprint_node else None
     )
     return node_doc, blueprint_doc
 
@@ -1432,31 +1715,30 @@ def _unique_alias(base: str, used: set[str]) -> str:
 
 
 def _gather_node_metadata(
-    node: Dict[str, Any],
-    element_lookup: Dict[str, Dict[str, Any]],
-    blueprint_node: Optional[Dict[str, Any]],
+    node: ViewNode,
+    element_lookup: Mapping[str, Dict[str, Any]],
+    blueprint_node: Optional[ViewNode],
 ) -> Dict[str, Any]:
-    refs = node.get("refs") or {}
-    element_ref = node.get("elementRef") or refs.get("elementRef")
-    relationship_ref = node.get("relationshipRef") or refs.get("relationshipRef")
-    view_ref = node.get("viewRef") or refs.get("viewRef")
-    identifier = node.get("id") or node.get("identifier")
+    element_ref = node.ref("elementRef")
+    relationship_ref = node.ref("relationshipRef")
+    view_ref = node.ref("viewRef")
+    identifier = node.id
 
-    element_entry = element_lookup.get(str(element_ref)) if element_ref else None
+    element_entry = element_lookup.get(element_ref) if element_ref else None
 
     label_candidates = [
-        _normalize_text(node.get("label")),
-        _normalize_text(blueprint_node.get("label")) if blueprint_node else None,
+        _normalize_text(node.label),
+        _normalize_text(blueprint_node.label) if blueprint_node else None,
         element_entry.get("name") if element_entry and element_entry.get("name") else None,
         element_entry.get("template_name")
         if element_entry and element_entry.get("template_name")
         else None,
-        str(element_ref) if element_ref else None,
-        str(identifier) if identifier else None,
+        element_ref,
+        identifier,
     ]
     title = next((candidate for candidate in label_candidates if candidate), "Elemento")
 
-    node_type = node.get("type") or (element_entry.get("type") if element_entry else None)
+    node_type = node.type or (element_entry.get("type") if element_entry else None)
 
     node_doc, template_doc = _merge_node_documentation(node, blueprint_node)
     if not node_doc and element_entry:
@@ -1488,7 +1770,7 @@ def _gather_node_metadata(
     }
 
     if blueprint_node:
-        metadata["template_label"] = _normalize_text(blueprint_node.get("label"))
+        metadata["template_label"] = _normalize_text(blueprint_node.label)
 
     if element_entry:
         if element_entry.get("name"):
@@ -1509,29 +1791,26 @@ def _gather_node_metadata(
 
 
 def _gather_connection_metadata(
-    connection: Dict[str, Any],
-    relation_lookup: Dict[str, Dict[str, Any]],
-    blueprint_connection: Optional[Dict[str, Any]],
+    connection: ViewConnection,
+    relation_lookup: Mapping[str, Dict[str, Any]],
+    blueprint_connection: Optional[ViewConnection],
 ) -> Dict[str, Any]:
-    identifier = connection.get("id") or connection.get("identifier")
-    relation_ref = connection.get("relationshipRef")
-    relation_entry = relation_lookup.get(str(relation_ref)) if relation_ref else None
+    relation_ref = connection.relationship_ref
+    relation_entry = relation_lookup.get(relation_ref) if relation_ref else None
 
     label_candidates = [
-        _normalize_text(connection.get("label")),
-        _normalize_text(blueprint_connection.get("label"))
-        if blueprint_connection
-        else None,
+        _normalize_text(connection.label),
+        _normalize_text(blueprint_connection.label) if blueprint_connection else None,
     ]
     label_text = next((candidate for candidate in label_candidates if candidate), None)
 
-    relation_type = connection.get("type") or (
+    relation_type = connection.type or (
         relation_entry.get("type") if relation_entry else None
     )
 
-    documentation = _normalize_text(connection.get("documentation"))
+    documentation = _normalize_text(connection.documentation)
     template_doc = (
-        _normalize_text(blueprint_connection.get("documentation"))
+        _normalize_text(blueprint_connection.documentation)
         if blueprint_connection
         else None
     )
@@ -1556,14 +1835,14 @@ def _gather_connection_metadata(
     mermaid_label = " - ".join(part for part in label_parts if part)
 
     metadata: Dict[str, Any] = {
-        "id": identifier,
+        "id": connection.id,
         "label": mermaid_label,
         "relationship_ref": relation_ref,
         "type": relation_type,
         "documentation": documentation,
         "template_documentation": template_doc,
-        "source": connection.get("source"),
-        "target": connection.get("target"),
+        "source": connection.source,
+        "target": connection.target,
     }
 
     if relation_entry:
@@ -1575,16 +1854,225 @@ def _gather_connection_metadata(
     return metadata
 
 
+# título máximo de cada nó no modo compacto
+_COMPACT_TITLE_LIMIT = 60
+# folga por aresta para o caso de ela virar um link para outra parte
+_COMPACT_STUB_ALLOWANCE = 96
+
+
+@dataclass(slots=True)
+class _MermaidOutline:
+    """Estrutura da visão já resolvida em aliases, usada pelo modo compacto."""
+
+    view_alias: str
+    view_name: str
+    titles: Dict[str, str] = field(default_factory=dict)
+    types: Dict[str, Optional[str]] = field(default_factory=dict)
+    # alias do pai (``None`` para a raiz da visão) -> aliases dos filhos, em ordem
+    children: Dict[Optional[str], List[str]] = field(default_factory=dict)
+    edges: List[Tuple[str, str, Optional[str]]] = field(default_factory=list)
+
+    def add_node(self, alias: str, parent: Optional[str], title: str, node_type: Optional[str]) -> None:
+        self.titles[alias] = title
+        self.types[alias] = node_type
+        self.children.setdefault(parent, []).append(alias)
+
+    def subtree(self, alias: str) -> Iterator[str]:
+        yield alias
+        for child in self.children.get(alias, ()):
+            yield from self.subtree(child)
+
+
+def _compact_node_line(outline: _MermaidOutline, alias: str) -> str:
+    parts = [_mermaid_escape(_truncate_text(outline.titles[alias], _COMPACT_TITLE_LIMIT))]
+    node_type = outline.types.get(alias)
+    if node_type:
+        parts.append(_mermaid_escape(f"Tipo: {node_type}"))
+    label = "<br/>".join(parts)
+    if outline.children.get(alias):
+        return f"subgraph {alias}[\"{label}\"]"
+    return f"{alias}[\"{label}\"]"
+
+
+def _compact_edge_line(source: str, target: str, label: Optional[str]) -> str:
+    if label:
+        return f"{source} -->|{_mermaid_escape(label)}| {target}"
+    return f"{source} --> {target}"
+
+
+def _split_mermaid_outline(
+    outline: _MermaidOutline, max_nodes: int, max_chars: int
+) -> List[List[Tuple[Tuple[str, ...], str]]]:
+    """Agrupa subárvores da visão em partes que respeitam os limites de nós e caracteres.
+
+    Cada parte é uma lista de ``(contêineres ancestrais, alias)``; subárvores acima dos
+    limites são abertas e os filhos seguem agrupados sob o mesmo contêiner em cada parte.
+    """
+
+    edge_chars: Dict[str, int] = {}
+    for source, target, label in outline.edges:
+        edge_chars[source] = (
+            edge_chars.get(source, 0)
+            + len(_compact_edge_line(source, target, label))
+            + _COMPACT_STUB_ALLOWANCE
+        )
+
+    def _own_chars(alias: str) -> int:
+        closing = 5 if outline.children.get(alias) else 0
+        return len(_compact_node_line(outline, alias)) + 2 + closing + edge_chars.get(alias, 0)
+
+    costs: Dict[str, Tuple[int, int]] = {}
+
+    def _cost(alias: str) -> Tuple[int, int]:
+        nodes, chars = 1, _own_chars(alias)
+        for child in outline.children.get(alias, ()):
+            child_nodes, child_chars = _cost(child)
+            nodes += child_nodes
+            chars += child_chars
+        costs[alias] = (nodes, chars)
+        return nodes, chars
+
+    units: List[Tuple[Tuple[str, ...], str]] = []
+
+    def _expand(alias: str, ancestors: Tuple[str, ...]) -> None:
+        nodes, chars = costs[alias]
+        children = outline.children.get(alias)
+        if (nodes <= max_nodes and chars <= max_chars) or not children:
+            units.append((ancestors, alias))
+            return
+        for child in children:
+            _expand(child, ancestors + (alias,))
+
+    for root in outline.children.get(None, ()):
+        _cost(root)
+        _expand(root, ())
+
+    base_chars = len(outline.view_name) + 64
+    parts: List[List[Tuple[Tuple[str, ...], str]]] = []
+    current: List[Tuple[Tuple[str, ...], str]] = []
+    opened: set[str] = set()
+    used_nodes = used_chars = 0
+    for ancestors, alias in units:
+        wrappers = [wrapper for wrapper in ancestors if wrapper not in opened]
+        unit_nodes = costs[alias][0] + len(wrappers)
+        unit_chars = costs[alias][1] + sum(_own_chars(wrapper) for wrapper in wrappers)
+        if current and (
+            used_nodes + unit_nodes > max_nodes or base_chars + used_chars + unit_chars > max_chars
+        ):
+            parts.append(current)
+            current, opened = [], set()
+            unit_nodes = costs[alias][0] + len(ancestors)
+            unit_chars = costs[alias][1] + sum(_own_chars(wrapper) for wrapper in ancestors)
+            used_nodes = used_chars = 0
+        current.append((ancestors, alias))
+        opened.update(ancestors)
+        used_nodes += unit_nodes
+        used_chars += unit_chars
+    if current or not parts:
+        parts.append(current)
+    return parts
+
+
+def _compact_mermaid_parts(
+    outline: _MermaidOutline, max_nodes: int, max_chars: int
+) -> List[Dict[str, Any]]:
+    """Mermaid compacto da visão: sem notas, contêineres como subgraph e partes ligadas.
+
+    Arestas entre partes diferentes apontam para um nó de ligação ``Parte N: título``.
+    """
+
+    parts = _split_mermaid_outline(outline, max_nodes, max_chars)
+    owner: Dict[str, int] = {}
+    for index, units in enumerate(parts):
+        for ancestors, alias in units:
+            for wrapper in ancestors:
+                owner.setdefault(wrapper, index)
+            for member in outline.subtree(alias):
+                owner[member] = index
+
+    total = len(parts)
+    reserved = set(outline.titles) | {outline.view_alias}
+    rendered: List[Dict[str, Any]] = []
+    for index, units in enumerate(parts):
+        title = outline.view_name if total == 1 else f"{outline.view_name} (parte {index + 1}/{total})"
+        lines = ["flowchart TD", f"subgraph {outline.view_alias}[\"{_mermaid_escape(title)}\"]"]
+        local: set[str] = set()
+
+        def _emit(alias: str) -> None:
+            lines.append(_compact_node_line(outline, alias))
+            local.add(alias)
+            children = outline.children.get(alias)
+            if children:
+                for child in children:
+                    _emit(child)
+                lines.append("end")
+
+        stack: List[str] = []
+        for ancestors, alias in units:
+            while stack and tuple(stack) != ancestors[: len(stack)]:
+                stack.pop()
+                lines.append("end")
+            for wrapper in ancestors[len(stack):]:
+                lines.append(_compact_node_line(outline, wrapper))
+                local.add(wrapper)
+                stack.append(wrapper)
+            _emit(alias)
+        lines.extend("end" for _ in stack)
+        lines.append("end")
+
+        used = set(reserved)
+        stubs: Dict[str, str] = {}
+        links: List[Dict[str, Any]] = []
+        for source, target, label in outline.edges:
+            if owner.get(source) != index:
+                continue
+            if target in local:
+                lines.append(_compact_edge_line(source, target, label))
+                continue
+            target_part = owner.get(target)
+            if target_part is None:
+                continue
+            stub = stubs.get(target)
+            if stub is None:
+                stub = _unique_alias(f"ext_{target}", used)
+                stubs[target] = stub
+                stub_title = _truncate_text(outline.titles[target], _COMPACT_TITLE_LIMIT)
+                lines.append(
+                    f"{stub}([\"{_mermaid_escape(f'Parte {target_part + 1}: {stub_title}')}\"])"
+                )
+                links.append({"alias": target, "part": target_part + 1})
+            lines.append(_compact_edge_line(source, stub, label))
+
+        rendered.append(
+            {
+                "index": index + 1,
+                "mermaid": _finalize_mermaid_lines(lines),
+                "node_count": len(local),
+                "links": links,
+            }
+        )
+    return rendered
+
+
 def _build_view_mermaid(
-    view: Dict[str, Any],
-    view_blueprint: Optional[Dict[str, Any]],
-    element_lookup: Dict[str, Dict[str, Any]],
-    relation_lookup: Dict[str, Dict[str, Any]],
-    blueprint_node_map: Dict[str, Dict[str, Any]],
-    blueprint_connection_map: Dict[str, Dict[str, Any]],
-    datamodel_node_map: Dict[str, Dict[str, Any]] | None,
-    datamodel_connection_map: Dict[str, Dict[str, Any]] | None,
-) -> Dict[str, Any]:
+    view: ViewDiagram,
+    view_blueprint: Optional[ViewDiagram],
+    element_lookup: Mapping[str, Dict[str, Any]],
+    relation_lookup: Mapping[str, Dict[str, Any]],
+    blueprint_node_map: Dict[str, ViewNode],
+    blueprint_connection_map: Dict[str, ViewConnection],
+    datamodel_node_map: Dict[str, ViewNode] | None,
+    datamodel_connection_map: Dict[str, ViewConnection] | None,
+    detail: str = "full",
+) -> Tuple[Dict[str, Any], str]:
+    """Gera o Mermaid e os metadados da visão sem acessar a rede.
+
+    Retorna o resultado da visão (com ``image`` ainda vazio) e o alias usado para nomear a
+    imagem renderizada. Com ``detail="compact"`` (ou ``"auto"`` em visões acima de
+    ``MERMAID_DETAIL_NODE_BUDGET`` nós) o Mermaid perde as notas, agrupa contêineres em
+    ``subgraph`` e, se passar dos limites por render, é dividido em ``parts`` ligadas.
+    """
+
     used_aliases: set[str] = set()
     alias_map: Dict[str, str] = {}
     defined_nodes: set[str] = set()
@@ -1592,21 +2080,21 @@ def _build_view_mermaid(
     connection_details: List[Dict[str, Any]] = []
     anonymous_counter = itertools.count(1)
 
-    view_id = view.get("id") or (view_blueprint.get("id") if view_blueprint else None)
+    view_id = view.id or (view_blueprint.id if view_blueprint else None)
     view_alias = _unique_alias(
         _sanitize_mermaid_identifier(str(view_id) if view_id else "view"),
         used_aliases,
     )
 
-    view_name = _normalize_text(view.get("name")) or (
-        _normalize_text(view_blueprint.get("name")) if view_blueprint else None
+    view_name = _normalize_text(view.name) or (
+        _normalize_text(view_blueprint.name) if view_blueprint else None
     )
     if not view_name:
         view_name = str(view_id) if view_id else "Visão"
 
-    view_documentation = _normalize_text(view.get("documentation"))
+    view_documentation = _normalize_text(view.documentation)
     template_view_documentation = (
-        _normalize_text(view_blueprint.get("documentation"))
+        _normalize_text(view_blueprint.documentation)
         if view_blueprint
         else None
     )
@@ -1623,6 +2111,7 @@ def _build_view_mermaid(
 
     lines: List[str] = ["flowchart TD"]
     lines.append(f"{view_alias}[\"{_mermaid_escape(view_name)}\"]")
+    outline = _MermaidOutline(view_alias=view_alias, view_name=view_name)
 
     datamodel_node_map = datamodel_node_map or {}
     datamodel_connection_map = datamodel_connection_map or {}
@@ -1650,10 +2139,11 @@ def _build_view_mermaid(
         if alias not in defined_nodes:
             lines.append(f"{alias}[\"{metadata['label']}\"]")
             defined_nodes.add(alias)
+            outline.add_node(alias, None, metadata["title"], metadata.get("type"))
         return alias
 
-    def _process_node(node: Dict[str, Any], parent_alias: Optional[str]) -> None:
-        key = _view_node_key(node)
+    def _process_node(node: ViewNode, parent_alias: Optional[str]) -> None:
+        key = node.key()
         if not key:
             key = f"anon_{next(anonymous_counter)}"
         alias = alias_map.get(key)
@@ -1667,7 +2157,7 @@ def _build_view_mermaid(
         metadata["source"] = (
             "datamodel" if key in datamodel_node_map else "template"
         )
-        metadata["child_count"] = len(node.get("nodes") or [])
+        metadata["child_count"] = len(node.nodes)
         template_doc = metadata.get("template_documentation")
         if template_doc:
             metadata["template_comments"] = _format_comment_lines(template_doc)
@@ -1679,25 +2169,25 @@ def _build_view_mermaid(
         if alias not in defined_nodes:
             lines.append(f"{alias}[\"{metadata['label']}\"]")
             defined_nodes.add(alias)
+            outline.add_node(
+                alias,
+                None if parent_alias == view_alias else parent_alias,
+                metadata["title"],
+                metadata.get("type"),
+            )
 
         if parent_alias:
             lines.append(f"{parent_alias} --> {alias}")
 
-        for child in node.get("nodes") or []:
-            if isinstance(child, dict):
-                _process_node(child, alias)
+        for child in node.nodes:
+            _process_node(child, alias)
 
-    for node in view.get("nodes") or []:
-        if isinstance(node, dict):
-            _process_node(node, view_alias)
+    for node in view.nodes:
+        _process_node(node, view_alias)
 
-    for connection in view.get("connections") or []:
-        if not isinstance(connection, dict):
-            continue
-        key = connection.get("id") or connection.get("identifier")
-        blueprint_connection = (
-            blueprint_connection_map.get(str(key)) if key else None
-        )
+    for connection in view.connections:
+        key = connection.id
+        blueprint_connection = blueprint_connection_map.get(key) if key else None
         metadata = _gather_connection_metadata(
             connection,
             relation_lookup,
@@ -1714,16 +2204,17 @@ def _build_view_mermaid(
             metadata["comments"] = _format_comment_lines(conn_doc)
         connection_details.append(metadata)
 
-        source_alias = _ensure_alias_for_key(connection.get("source"))
-        target_alias = _ensure_alias_for_key(connection.get("target"))
-        if connection.get("source") in alias_map:
-            source_alias = alias_map[connection.get("source")]
-        if connection.get("target") in alias_map:
-            target_alias = alias_map[connection.get("target")]
+        source_alias = _ensure_alias_for_key(connection.source)
+        target_alias = _ensure_alias_for_key(connection.target)
+        if connection.source in alias_map:
+            source_alias = alias_map[connection.source]
+        if connection.target in alias_map:
+            target_alias = alias_map[connection.target]
 
         if not source_alias or not target_alias:
             continue
 
+        outline.edges.append((source_alias, target_alias, metadata.get("type")))
         label = metadata.get("label")
         if label:
             lines.append(
@@ -1734,14 +2225,20 @@ def _build_view_mermaid(
 
 
     mermaid_source = _finalize_mermaid_lines(lines)
-    _validate_mermaid_syntax(mermaid_source)
-    image_payload = _build_mermaid_image_payload(
-        mermaid_source,
-        alias=view_alias,
-        title=view_name,
-    )
+    if detail == "auto":
+        oversized = (
+            len(outline.titles) > MERMAID_DETAIL_NODE_BUDGET
+            or len(mermaid_source) > MERMAID_MAX_CHARS_PER_RENDER
+        )
+        detail = "compact" if oversized else "full"
+    parts: List[Dict[str, Any]] = []
+    if detail == "compact":
+        parts = _compact_mermaid_parts(
+            outline, MERMAID_MAX_NODES_PER_RENDER, MERMAID_MAX_CHARS_PER_RENDER
+        )
+        mermaid_source = parts[0]["mermaid"]
 
-    return {
+    result = {
         "id": view_id,
         "name": view_name,
         "documentation": view_documentation,
@@ -1749,10 +2246,17 @@ def _build_view_mermaid(
         "comments": view_comments,
         "template_comments": template_view_comments,
         "mermaid": mermaid_source,
-        "image": image_payload,
+        "image": None,
         "nodes": node_details,
         "connections": connection_details,
+        "detail": detail,
     }
+    if len(parts) > 1:
+        for part in parts:
+            part["alias"] = f"{view_alias}_parte_{part['index']}"
+            part["image"] = None
+        result["parts"] = parts
+    return result, view_alias
 
 
 def _content_to_text(content: types.Content | str | bytes) -> str:
@@ -1774,12 +2278,14 @@ def _content_to_text(content: types.Content | str | bytes) -> str:
 def save_datamodel(
     datamodel: types.Content | str | bytes,
     filename: str = DEFAULT_DATAMODEL_FILENAME,
+    session_state: Optional[MutableMapping[str, Any]] = None,
 ) -> Dict[str, Any]:
-    """Persiste o datamodel JSON formatado no diretório `outputs/`.
+    """Persiste o datamodel JSON formatado no diretório `outputs/` (ou no da sessão).
 
     Args:
         datamodel: conteúdo JSON produzido pelo agente Diagramador.
         filename: nome do arquivo (apenas nome, sem diretório) para armazenar o datamodel.
+        session_state: estado da sessão usado para isolar o diretório de saída.
 
     Returns:
         Dicionário com o caminho absoluto salvo, quantidade de elementos e relações e
@@ -1788,36 +2294,60 @@ def save_datamodel(
 
     raw_text = _content_to_text(datamodel)
     try:
-        payload = json.loads(raw_text)
-    except json.JSONDecodeError as exc:
+        if len(raw_text) >= STREAMING_JSON_THRESHOLD:
+            # datamodels grandes são validados item a item e gravados sem reformatação,
+            # para não manter texto e objetos em memória ao mesmo tempo
+            summary = _scan_datamodel_text(raw_text)
+            serialized = raw_text
+        else:
+            payload = json.loads(raw_text)
+            summary = {
+                "element_count": len(payload.get("elements") or []),
+                "relationship_count": len(payload.get("relations") or []),
+                "model_identifier": payload.get("model_identifier"),
+                "model_name": payload.get("model_name"),
+            }
+            serialized = json.dumps(payload, indent=2, ensure_ascii=False)
+    except ValueError as exc:
         logger.error("Falha ao converter datamodel para JSON", exc_info=exc)
         raise ValueError("O conteúdo enviado para `save_datamodel` não é um JSON válido.") from exc
 
-    output_dir = _ensure_output_dir()
-    target_path = output_dir / filename
-    target_path.write_text(
-        json.dumps(payload, indent=2, ensure_ascii=False),
-        encoding="utf-8",
-    )
-
-    elements = payload.get("elements") or []
-    relations = payload.get("relations") or []
+    output_dir = _resolve_output_dir(session_state)
+    target_path = _output_file(output_dir, filename)
+    _ensure_output_dir(output_dir)
+    if _is_shared_output_dir(output_dir):
+        with file_lock(target_path):
+            atomic_write_text(target_path, serialized)
+    else:
+        atomic_write_text(target_path, serialized)
 
     logger.info(
         "Datamodel salvo", extra={
             "path": str(target_path.resolve()),
-            "elements": len(elements),
-            "relations": len(relations),
+            "elements": summary["element_count"],
+            "relations": summary["relationship_count"],
         }
     )
 
-    return {
-        "path": str(target_path.resolve()),
-        "element_count": len(elements),
-        "relationship_count": len(relations),
-        "model_identifier": payload.get("model_identifier"),
-        "model_name": payload.get("model_name"),
+    return {"path": str(target_path.resolve()), **summary}
+
+
+def _scan_datamodel_text(raw_text: str) -> Dict[str, Any]:
+    """Valida o JSON e conta elementos/relações sem materializar as listas."""
+
+    summary: Dict[str, Any] = {
+        "element_count": 0,
+        "relationship_count": 0,
+        "model_identifier": None,
+        "model_name": None,
     }
+    counters = {"elements": "element_count", "relations": "relationship_count"}
+    for key, value in xml_exchange.iter_model_text_sections(raw_text):
+        if key in counters:
+            summary[counters[key]] = sum(1 for _ in value) if value is not None else 0
+        elif key in ("model_identifier", "model_name"):
+            summary[key] = value
+    return summary
 
 
 def finalize_datamodel(
@@ -1838,11 +2368,18 @@ def finalize_datamodel(
     if not template.exists():
         raise FileNotFoundError(f"Template não encontrado: {template}")
 
-    blueprint = get_cached_blueprint(session_state, template)
-    if blueprint is None:
-        blueprint = _parse_template_blueprint(template)
-        store_blueprint(session_state, template, blueprint)
-    final_payload = copy.deepcopy(blueprint)
+    model = _resolve_template_model(session_state, template)
+
+    final_payload = model.header()
+    # reserva as seções presentes no template para manter a ordem de chaves do blueprint
+    for section, present in (
+        ("elements", model.elements),
+        ("relations", model.relations),
+        ("organizations", model.organizations),
+        ("views", model.diagrams or model.viewpoints),
+    ):
+        if present:
+            final_payload[section] = None
 
     if base_payload.get("model_identifier"):
         final_payload["model_identifier"] = base_payload["model_identifier"]
@@ -1851,17 +2388,11 @@ def finalize_datamodel(
     if "model_documentation" in base_payload:
         final_payload["model_documentation"] = base_payload["model_documentation"]
 
-    final_payload["elements"] = _merge_elements(
-        blueprint.get("elements", []),
-        base_payload.get("elements"),
-    )
-    final_payload["relations"] = _merge_relations(
-        blueprint.get("relations", []),
-        base_payload.get("relations"),
-    )
+    final_payload["elements"] = _merge_elements(model.elements, base_payload.get("elements"))
+    final_payload["relations"] = _merge_relations(model.relations, base_payload.get("relations"))
 
     merged_orgs = _merge_organizations(
-        blueprint.get("organizations", []),
+        model.organizations,
         base_payload.get("organizations"),
     )
     if merged_orgs:
@@ -1869,11 +2400,11 @@ def finalize_datamodel(
     else:
         final_payload.pop("organizations", None)
 
-    if blueprint.get("views") or base_payload.get("views"):
-        merged_views = _merge_views(
-            blueprint.get("views", {}),
-            base_payload.get("views"),
-        )
+    laid_out = 0
+    if model.diagrams or model.viewpoints or base_payload.get("views"):
+        merged_views = _merge_views(model, base_payload.get("views"))
+        # nós acrescentados pelo datamodel chegam sem bounds; recebem posição aqui
+        laid_out = auto_layout_views(merged_views, final_payload.get("relations") or [])
         if merged_views and any(merged_views.get("diagrams", [])):
             final_payload["views"] = merged_views
         elif merged_views and merged_views.get("viewpoints"):
@@ -1894,9 +2425,31 @@ def finalize_datamodel(
         if key not in managed_keys and key not in final_payload:
             final_payload[key] = value
 
+    integrity = check_referential_integrity(final_payload)
+    if not integrity["valid"]:
+        logger.warning(
+            "Datamodel finalizado com referências inconsistentes",
+            extra={
+                "pendentes": len(integrity["dangling"]),
+                "duplicados": len(integrity["duplicates"]),
+            },
+        )
+
+    geometry = _geometry_summary(final_payload.get("views"), template=model)
+    if not geometry["valid"]:
+        logger.warning(
+            "Datamodel finalizado com problemas de geometria nas visões",
+            extra={
+                "sobreposicoes": geometry["counts"]["overlaps"],
+                "fora_do_conteiner": geometry["counts"]["outside_container"],
+            },
+        )
+
     final_json = json.dumps(final_payload, indent=2, ensure_ascii=False)
     return {
-        "datamodel": copy.deepcopy(final_payload),
+        # o payload mesclado compartilha subárvores com o modelo em cache e com a entrada;
+        # o retorno é reconstruído a partir do JSON para ficar independente de ambos
+        "datamodel": json.loads(final_json),
         "json": final_json,
         "element_count": len(final_payload.get("elements", [])),
         "relationship_count": len(final_payload.get("relations", [])),
@@ -1906,14 +2459,301 @@ def finalize_datamodel(
             else []
         ),
         "template": str(template.resolve()),
+        "integrity": integrity,
+        "auto_layout_nodes": laid_out,
+        "geometry": geometry,
     }
 
 
-def generate_mermaid_preview(
+def _template_identifier_kinds(model: TemplateModel) -> Dict[str, str]:
+    known: Dict[str, str] = {}
+    for element in model.elements:
+        if element.id:
+            known[element.id] = "element"
+    for relation in model.relations:
+        if relation.id:
+            known[relation.id] = "relation"
+    for diagram in model.diagrams:
+        if diagram.id:
+            known[diagram.id] = "view"
+        for node in diagram.iter_nodes():
+            if node.id:
+                known[node.id] = "node"
+            for connection in node.connections:
+                if connection.id:
+                    known[connection.id] = "connection"
+        for connection in diagram.connections:
+            if connection.id:
+                known[connection.id] = "connection"
+    return known
+
+
+def check_datamodel_integrity(
+    datamodel: types.Content | str | bytes,
+    template_path: str | None = None,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Lista referências pendentes e identificadores duplicados do datamodel.
+
+    Com ``template_path``, identificadores do template contam como existentes, de modo que
+    um datamodel preliminar pode referenciá-los sem redeclará-los.
+    """
+
+    raw_text = _content_to_text(datamodel)
+    try:
+        payload = json.loads(raw_text)
+    except json.JSONDecodeError as exc:
+        logger.error("Datamodel inválido para verificação de integridade", exc_info=exc)
+        raise ValueError("O conteúdo enviado não é um JSON válido.") from exc
+    if not isinstance(payload, dict):
+        raise ValueError("O datamodel deve ser um objeto JSON.")
+
+    known: Dict[str, str] = {}
+    if template_path:
+        template = _resolve_package_path(Path(template_path))
+        if not template.exists():
+            raise FileNotFoundError(f"Template não encontrado: {template}")
+        known = _template_identifier_kinds(_resolve_template_model(session_state, template))
+    return check_referential_integrity(payload, known=known)
+
+
+_GRAPH_QUERIES = ("neighbors", "path", "impact", "where_used")
+_GRAPH_RESULT_LIMIT = 50
+
+
+def _datamodel_source_text(
+    datamodel: types.Content | str | bytes,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> str:
+    """Aceita o JSON do datamodel ou o caminho de um datamodel salvo por `save_datamodel`.
+
+    Caminhos só são aceitos dentro do diretório de saída da sessão (ou de ``OUTPUT_DIR``
+    quando não há sessão); qualquer outro arquivo é recusado.
+    """
+
+    raw_text = _content_to_text(datamodel)
+    candidate = raw_text.strip()
+    if not candidate or candidate[0] in "{[" or "\n" in candidate:
+        return raw_text
+    return _session_datamodel_path(candidate, session_state).read_text(encoding="utf-8")
+
+
+def _load_datamodel_graph(raw_text: str) -> DatamodelGraph:
+    def build() -> DatamodelGraph:
+        try:
+            payload = json.loads(raw_text)
+        except json.JSONDecodeError as exc:
+            logger.error("Datamodel inválido para consulta de grafo", exc_info=exc)
+            raise ValueError("O conteúdo enviado não é um JSON válido.") from exc
+        if not isinstance(payload, dict):
+            raise ValueError("O datamodel deve ser um objeto JSON.")
+        return DatamodelGraph.from_payload(payload)
+
+    key = hashlib.sha256(raw_text.encode("utf-8")).hexdigest()
+    return _DATAMODEL_GRAPH_CACHE.get(key, build)
+
+
+def query_datamodel_graph(
+    datamodel: types.Content | str | bytes,
+    query: str,
+    element_id: str,
+    target_id: str | None = None,
+    relation_types: Sequence[str] | None = None,
+    direction: str | None = None,
+    max_depth: int = 3,
+    limit: int = _GRAPH_RESULT_LIMIT,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Responde consultas de grafo sobre o datamodel sem devolvê-lo por inteiro.
+
+    ``query`` aceita ``neighbors`` (vizinhos diretos), ``path`` (menor caminho até
+    ``target_id``), ``impact`` (conceitos alcançáveis até ``max_depth`` saltos) e
+    ``where_used`` (visões e pastas que referenciam o conceito). O índice do grafo é
+    construído uma vez por conteúdo de datamodel e reaproveitado nas consultas seguintes.
+    """
+
+    if query not in _GRAPH_QUERIES:
+        raise ValueError(
+            f"Consulta desconhecida: {query!r}. Use uma de: {', '.join(_GRAPH_QUERIES)}."
+        )
+    if direction is None:
+        direction = "outgoing" if query == "impact" else "both"
+    if direction not in GRAPH_DIRECTIONS:
+        raise ValueError(
+            f"Direção inválida: {direction!r}. Use uma de: {', '.join(GRAPH_DIRECTIONS)}."
+        )
+    if query == "path" and not target_id:
+        raise ValueError("A consulta 'path' exige `target_id`.")
+
+    graph = _load_datamodel_graph(_datamodel_source_text(datamodel, session_state))
+    types_filter = [value for value in relation_types or [] if value] or None
+    started = time.perf_counter()
+    if query == "neighbors":
+        results: Any = graph.neighbors(element_id, direction=direction, relation_types=types_filter)
+    elif query == "path":
+        results = graph.path(
+            element_id,
+            target_id,
+            direction=direction,
+            relation_types=types_filter,
+            max_depth=max_depth,
+        )
+    elif query == "impact":
+        results = graph.impact(
+            element_id, direction=direction, relation_types=types_filter, max_depth=max_depth
+        )
+    else:
+        results = graph.where_used(element_id)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    response: Dict[str, Any] = {
+        "query": query,
+        "element": graph.describe(element_id),
+        "direction": direction,
+    }
+    if isinstance(results, list):
+        response["count"] = len(results)
+        response["truncated"] = len(results) > limit
+        response["results"] = results[:limit]
+    else:
+        response["results"] = results
+    if target_id:
+        response["target"] = graph.describe(target_id)
+    response["elapsed_ms"] = round(elapsed_ms, 3)
+    return response
+
+
+def diff_datamodels(
+    datamodel: types.Content | str | bytes,
+    baseline: types.Content | str | bytes | None = None,
+    template_path: str | None = None,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Changeset compacto (adicionados, removidos, campos alterados) do datamodel.
+
+    Com ``baseline`` (JSON ou arquivo salvo) compara as duas versões do datamodel; sem ele,
+    compara com o blueprint do template em ``template_path``. Nesse caso campos e itens que
+    o datamodel omite não contam como diferença, pois ``finalize_datamodel`` os herda do
+    template.
+    """
+
+    payloads = []
+    sources = [datamodel] if baseline is None else [baseline, datamodel]
+    for source in sources:
+        raw_text = _datamodel_source_text(source, session_state)
+        try:
+            payload = json.loads(raw_text)
+        except json.JSONDecodeError as exc:
+            logger.error("Datamodel inválido para comparação", exc_info=exc)
+            raise ValueError("O conteúdo enviado não é um JSON válido.") from exc
+        if not isinstance(payload, dict):
+            raise ValueError("O datamodel deve ser um objeto JSON.")
+        payloads.append(payload)
+
+    if baseline is not None:
+        before, after = payloads
+        result = diff_payloads(before, after)
+        result["against"] = "datamodel"
+        return result
+
+    if not template_path:
+        raise ValueError("Informe `baseline` ou `template_path` para a comparação.")
+    template = _resolve_package_path(Path(template_path))
+    if not template.exists():
+        raise FileNotFoundError(f"Template não encontrado: {template}")
+    model, blueprint = _resolve_template(session_state, template)
+    if blueprint is None:
+        blueprint = model.to_blueprint()
+    result = diff_payloads(blueprint, payloads[0], partial=True)
+    result["against"] = "template"
+    result["template"] = str(template)
+    return result
+
+
+def _geometry_summary(
+    views: Any,
+    *,
+    detailed: bool = False,
+    template: Optional[TemplateModel] = None,
+) -> Dict[str, Any]:
+    """Consolida o relatório geométrico de cada visão do payload.
+
+    Com ``template`` cada visão é comparada à visão de mesmo id no template, e só contam
+    os problemas que envolvem nós acrescentados ou movidos pelo datamodel.
+    """
+
+    diagrams = views.get("diagrams") if isinstance(views, dict) else views
+    baselines = {view.id: view for view in template.diagrams} if template is not None else {}
+    # visões que o template não tem não têm referência: tudo nelas conta
+    reports = [
+        analyze_view_geometry(diagram, baselines.get(diagram.get("id") or diagram.get("identifier")))
+        for diagram in diagrams or []
+        if isinstance(diagram, dict)
+    ]
+    counts = {"overlaps": 0, "outside_container": 0, "empty_containers": 0, "missing_bounds": 0}
+    for report in reports:
+        for key, value in report["counts"].items():
+            counts[key] += value
+    summary: Dict[str, Any] = {
+        "valid": all(report["valid"] for report in reports),
+        "counts": counts,
+        "views_with_issues": [report["view"] for report in reports if not report["valid"]],
+    }
+    if detailed:
+        summary["views"] = reports
+    return summary
+
+
+def check_view_geometry(
     datamodel: types.Content | str | bytes,
     template_path: str | None = None,
     session_state: Optional[MutableMapping[str, Any]] = None,
 ) -> Dict[str, Any]:
+    """Sobreposições, filhos fora do contêiner e contêineres vazios em cada visão.
+
+    Aceita o JSON do datamodel ou o caminho de um arquivo salvo. Com ``template_path`` as
+    visões são antes mescladas ao template e diagramadas como em ``finalize_datamodel``,
+    de modo que o relatório reflete a geometria que será exportada.
+    """
+
+    started = time.perf_counter()
+    raw_text = _datamodel_source_text(datamodel, session_state)
+    try:
+        payload = json.loads(raw_text)
+    except json.JSONDecodeError as exc:
+        logger.error("Datamodel inválido para checagem de geometria", exc_info=exc)
+        raise ValueError("O conteúdo enviado não é um JSON válido.") from exc
+    if not isinstance(payload, dict):
+        raise ValueError("O datamodel deve ser um objeto JSON.")
+
+    views = payload.get("views")
+    model = None
+    if template_path:
+        template = _resolve_package_path(Path(template_path))
+        if not template.exists():
+            raise FileNotFoundError(f"Template não encontrado: {template}")
+        model = _resolve_template_model(session_state, template)
+        views = _merge_views(model, views)
+        auto_layout_views(views, _merge_relations(model.relations, payload.get("relations")))
+
+    result = _geometry_summary(views, detailed=True, template=model)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def _compose_mermaid_preview(
+    datamodel: types.Content | str | bytes,
+    template_path: str | None = None,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+    detail: str | None = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any], List[Tuple[Dict[str, Any], str, Callable[..., str]]]]:
+    """Etapa local (sem rede) da pré-visualização: parse, merge e geração do Mermaid.
+
+    Cada visão vem acompanhada de um renderizador SVG (``render(title=...)``) já ligado à
+    visão mesclada e aos índices de elementos/relacionamentos.
+    """
+
+    detail = _resolve_mermaid_detail(detail)
     raw_text = _content_to_text(datamodel)
     try:
         payload = json.loads(raw_text)
@@ -1921,92 +2761,82 @@ def generate_mermaid_preview(
         logger.error("Datamodel inválido para pré-visualização Mermaid", exc_info=exc)
         raise ValueError("O conteúdo enviado não é um JSON válido.") from exc
 
-    template: Dict[str, Any] = {}
+    template = TemplateModel()
     template_metadata: Dict[str, Any] = {}
     if template_path:
         template_file = _resolve_package_path(Path(template_path))
         if not template_file.exists():
             raise FileNotFoundError(f"Template não encontrado: {template_file}")
-        template = get_cached_blueprint(session_state, template_file) or _parse_template_blueprint(
-            template_file
-        )
-        store_blueprint(session_state, template_file, template)
+        template = _resolve_template_model(session_state, template_file)
         template_metadata["path"] = str(template_file.resolve())
 
-    element_lookup = _build_element_lookup(template, payload)
-    relation_lookup = _build_relationship_lookup(template, payload)
+    index = _template_index(template)
+    element_lookup = _build_element_lookup(index.element_lookup, payload)
+    relation_lookup = _build_relationship_lookup(index.relation_lookup, payload)
 
-    datamodel_views = _normalize_view_diagrams(payload.get("views"))
-    blueprint_views = _normalize_view_diagrams(template.get("views"))
+    datamodel_views = [
+        view for view in _normalize_view_diagrams(payload.get("views")) if isinstance(view, dict)
+    ]
 
     datamodel_view_map: Dict[str, Dict[str, Any]] = {}
-    datamodel_node_maps: Dict[str, Dict[str, Any]] = {}
-    datamodel_connection_maps: Dict[str, Dict[str, Any]] = {}
     for view in datamodel_views:
-        if not isinstance(view, dict):
-            continue
         view_id = view.get("id")
         if view_id:
             datamodel_view_map[str(view_id)] = view
-            datamodel_node_maps[str(view_id)] = _flatten_view_nodes(view.get("nodes") or [])
-            datamodel_connection_maps[str(view_id)] = _flatten_view_connections(
-                view.get("connections") or []
-            )
 
-    results: List[Dict[str, Any]] = []
+    results: List[Tuple[Dict[str, Any], str, Callable[..., str]]] = []
     processed_ids: set[str] = set()
 
-    for view in blueprint_views:
-        if not isinstance(view, dict):
-            continue
-        view_id = view.get("id")
-        view_key = str(view_id) if view_id else f"template_{len(results) + 1}"
-        override_view = datamodel_view_map.get(str(view_id)) if view_id else None
-        merged_view = (
-            _merge_view_diagram(view, override_view) if override_view else copy.deepcopy(view)
-        )
-        blueprint_nodes = _flatten_view_nodes(view.get("nodes") or [])
-        blueprint_connections = _flatten_view_connections(view.get("connections") or [])
-        datamodel_nodes = datamodel_node_maps.get(str(view_id), {}) if view_id else {}
-        datamodel_connections = (
-            datamodel_connection_maps.get(str(view_id), {}) if view_id else {}
-        )
-        results.append(
-            _build_view_mermaid(
-                merged_view,
-                view,
-                element_lookup,
-                relation_lookup,
-                blueprint_nodes,
-                blueprint_connections,
-                datamodel_nodes,
-                datamodel_connections,
-            )
+    for position, view in enumerate(template.diagrams):
+        view_id = view.id
+        view_key = view_id or f"template_{len(results) + 1}"
+        override_view = datamodel_view_map.get(view_id) if view_id else None
+        if override_view:
+            merged_payload = _merge_view_diagram(view, override_view)
+            auto_layout_view(merged_payload, payload.get("relations") or [])
+            merged_view = ViewDiagram.from_dict(merged_payload)
+            override_model = ViewDiagram.from_dict(override_view)
+            datamodel_nodes = _flatten_view_nodes(override_model.nodes)
+            datamodel_connections = _flatten_view_connections(override_model.connections)
+        else:
+            merged_view = view
+            datamodel_nodes = {}
+            datamodel_connections = {}
+        result, view_alias = _build_view_mermaid(
+            merged_view,
+            view,
+            element_lookup,
+            relation_lookup,
+            index.view_nodes[position],
+            index.view_connections[position],
+            datamodel_nodes,
+            datamodel_connections,
+            detail,
         )
+        render = functools.partial(render_view_svg, merged_view, element_lookup, relation_lookup)
+        results.append((result, view_alias, render))
         if view_id:
-            processed_ids.add(str(view_id))
+            processed_ids.add(view_id)
         processed_ids.add(view_key)
 
-    for view in datamodel_views:
-        if not isinstance(view, dict):
-            continue
-        view_id = view.get("id")
+    for raw_view in datamodel_views:
+        view_id = raw_view.get("id")
         if view_id and str(view_id) in processed_ids:
             continue
-        datamodel_nodes = _flatten_view_nodes(view.get("nodes") or [])
-        datamodel_connections = _flatten_view_connections(view.get("connections") or [])
-        results.append(
-            _build_view_mermaid(
-                view,
-                None,
-                element_lookup,
-                relation_lookup,
-                {},
-                {},
-                datamodel_nodes,
-                datamodel_connections,
-            )
+        view = ViewDiagram.from_dict(raw_view)
+        result, view_alias = _build_view_mermaid(
+            view,
+            None,
+            element_lookup,
+            relation_lookup,
+            {},
+            {},
+            _flatten_view_nodes(view.nodes),
+            _flatten_view_connections(view.connections),
+            detail,
         )
+        render = functools.partial(render_view_svg, view, element_lookup, relation_lookup)
+        results.append((result, view_alias, render))
         if view_id:
             processed_ids.add(str(view_id))
 
@@ -2015,6 +2845,27 @@ def generate_mermaid_preview(
             "Não foi possível identificar visões no datamodel ou no template informado."
         )
 
+    return payload, template_metadata, results
+
+
+def _mermaid_render_targets(
+    result: Dict[str, Any], view_alias: str
+) -> List[Tuple[Dict[str, Any], str, str]]:
+    """(destino da imagem, Mermaid, alias) de cada render da visão (uma por parte)."""
+
+    parts = result.get("parts")
+    if not parts:
+        return [(result, result["mermaid"], view_alias)]
+    return [(part, part["mermaid"], part["alias"]) for part in parts]
+
+
+def _assemble_preview_response(
+    payload: Dict[str, Any],
+    template_metadata: Dict[str, Any],
+    results: List[Dict[str, Any]],
+    image_payload: str | None = None,
+) -> Dict[str, Any]:
+    _apply_image_payload_mode(results, _resolve_image_payload_mode(image_payload))
     response: Dict[str, Any] = {
         "model_identifier": payload.get("model_identifier"),
         "model_name": payload.get("model_name"),
@@ -2031,65 +2882,233 @@ def generate_mermaid_preview(
     return response
 
 
+def generate_mermaid_preview(
+    datamodel: types.Content | str | bytes,
+    template_path: str | None = None,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+    image_source: str | None = None,
+    detail: str | None = None,
+    image_payload: str | None = None,
+) -> Dict[str, Any]:
+    """Gera o Mermaid de cada visão e a imagem correspondente.
+
+    ``image_source`` (ou ``DIAGRAMADOR_PREVIEW_IMAGE_SOURCE``) escolhe a origem da imagem:
+    ``kroki`` renderiza o Mermaid remotamente; ``svg`` desenha o layout real da visão
+    localmente, sem nenhuma chamada de rede (inclusive a validação do Mermaid).
+    ``detail`` (ou ``DIAGRAMADOR_MERMAID_DETAIL``) controla o nível de detalhe do Mermaid;
+    visões divididas trazem uma imagem por item de ``parts``. ``image_payload`` (ou
+    ``DIAGRAMADOR_IMAGE_PAYLOAD``) escolhe entre devolver só a referência da imagem gravada
+    (``reference``; os bytes vêm de ``fetch_preview_image``) ou também o data URI (``inline``).
+    As chamadas aos renderizadores passam pelo limitador global; ``queue_ms`` de cada visão
+    informa quanto tempo elas esperaram na fila. Renders idênticos em andamento em outras
+    sessões são compartilhados, e a imagem vem marcada com ``coalesced``.
+    """
+
+    source = _resolve_image_source(image_source)
+    payload, template_metadata, composed = _compose_mermaid_preview(
+        datamodel, template_path, session_state, detail
+    )
+    output_dir = _resolve_output_dir(session_state)
+    results: List[Dict[str, Any]] = []
+    for result, view_alias, render in composed:
+        if source == "svg":
+            result["image"] = _build_svg_image_payload(
+                render(title=result["name"]),
+                alias=view_alias,
+                title=result["name"],
+                output_dir=output_dir,
+            )
+        else:
+            with track_queue_time() as waits:
+                for target, mermaid, alias in _mermaid_render_targets(result, view_alias):
+                    _validate_mermaid_syntax(mermaid)
+                    target["image"] = _build_mermaid_image_payload(
+                        mermaid,
+                        alias=alias,
+                        title=result["name"],
+                        output_dir=output_dir,
+                    )
+            result["queue_ms"] = _queue_ms(waits)
+            if result.get("parts"):
+                result["image"] = result["parts"][0]["image"]
+        results.append(result)
+    return _assemble_preview_response(payload, template_metadata, results, image_payload)
+
+
+_PREVIEW_IMAGE_SUFFIXES = frozenset({".png", ".svg"})
+
+
+def fetch_preview_image(
+    handle: str,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Lê a imagem referenciada por ``handle`` e a devolve como data URI.
+
+    Só imagens de pré-visualização (``.png``/``.svg``) são servidas. Com isolamento por
+    sessão, apenas artefatos da própria sessão (ou do diretório compartilhado, quando não
+    há sessão) podem ser lidos.
+    """
+
+    if Path(handle or "").suffix.lower() not in _PREVIEW_IMAGE_SUFFIXES:
+        raise ValueError("Handle não referencia uma imagem de pré-visualização.")
+    path = _session_artifact_path(handle, session_state)
+    content = path.read_bytes()
+    suffix = path.suffix.lower().lstrip(".")
+    mime_type = SVG_MIME_TYPE if suffix == "svg" else _mermaid_mime_type(suffix)
+    result = artifact_reference(path, content, OUTPUT_DIR)
+    result["mime_type"] = mime_type
+    result["data_uri"] = f"data:{mime_type};base64,{base64.b64encode(content).decode('ascii')}"
+    return result
+
+
+_OUTPUT_MANIFEST_SUFFIX = ".manifest.json"
+
+
+def _output_manifest_path(xml_path: Path) -> Path:
+    return xml_path.with_name(xml_path.name + _OUTPUT_MANIFEST_SUFFIX)
+
+
+def _generation_key(template: Path, model_path: Path) -> Dict[str, str]:
+    """Identifica as entradas do XML: conteúdo do template e do datamodel e versão do gerador."""
+
+    return {
+        "template": _TEMPLATE_DIGEST_CACHE.get(template, file_sha256),
+        "datamodel": file_sha256(model_path),
+        "generator": xml_exchange.GENERATOR_VERSION,
+    }
+
+
+def _validation_key(xsd_dir: Path, full_xsd: bool) -> str:
+    signature = xml_exchange._schema_signature(xsd_dir)
+    return json.dumps([str(xsd_dir.resolve()), bool(full_xsd), signature])
+
+
+def _verdict_cache_path() -> Optional[Path]:
+    """Arquivo de veredictos XSD, compartilhado por todas as sessões em ``OUTPUT_DIR``."""
+
+    if not XSD_VERDICT_CACHE:
+        return None
+    return Path(OUTPUT_DIR) / ".xsd_verdicts.sqlite3"
+
+
+def _load_output_manifest(xml_path: Path, key: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """Manifesto da última geração, se ela veio das mesmas entradas e o XML não foi alterado."""
+
+    try:
+        manifest = json.loads(_output_manifest_path(xml_path).read_text(encoding="utf-8"))
+        if not isinstance(manifest, dict) or manifest.get("key") != key:
+            return None
+        if file_sha256(xml_path) != manifest.get("xml_sha256"):
+            return None
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest.get("validations"), dict):
+        manifest["validations"] = {}
+    return manifest
+
+
 def generate_archimate_diagram(
     model_json_path: str,
     output_filename: str = DEFAULT_DIAGRAM_FILENAME,
     template_path: str | None = None,
     validate: bool = True,
     xsd_dir: str | None = None,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+    full_xsd: bool | None = None,
+    force: bool = False,
 ) -> Dict[str, Any]:
-    """Gera o XML ArchiMate utilizando o template padrão e valida com os XSDs oficiais."""
+    """Gera o XML ArchiMate utilizando o template padrão e valida com os XSDs oficiais.
 
-    model_path = Path(model_json_path)
-    if not model_path.is_absolute():
-        model_path = Path.cwd() / model_path
+    A validação começa pelas regras estruturais derivadas dos XSDs (uma passada, erros
+    precisos); a validação XSD completa só roda se ela passar e ``full_xsd`` (padrão:
+    ``DIAGRAMADOR_FULL_XSD_VALIDATION``) estiver ativo.
 
-    if not model_path.exists():
-        raise FileNotFoundError(
-            f"Arquivo de datamodel não encontrado: {model_path}"
-        )
+    Se template e datamodel forem idênticos (por conteúdo) aos da última geração do mesmo
+    arquivo, o XML existente e o relatório de validação guardado são reaproveitados
+    (``cached`` no retorno); ``force`` ignora esse cache (``DIAGRAMADOR_OUTPUT_CACHE``).
+    Veredictos XSD de XMLs com o mesmo conteúdo são lidos do arquivo compartilhado em
+    ``OUTPUT_DIR`` (``DIAGRAMADOR_XSD_VERDICT_CACHE``), mesmo com ``force``.
+    """
+
+    output_dir = _resolve_output_dir(session_state)
+    xml_path = _output_file(output_dir, output_filename)
+    model_path = _session_datamodel_path(model_json_path, session_state)
 
     template = Path(template_path) if template_path else DEFAULT_TEMPLATE
     template = _resolve_package_path(template)
     if not template.exists():
         raise FileNotFoundError(f"Template ArchiMate não encontrado: {template}")
 
-    output_dir = _ensure_output_dir()
-    xml_path = output_dir / output_filename
-
-    logger.info(
-        "Gerando diagrama ArchiMate", extra={
-            "template": str(template.resolve()),
-            "model": str(model_path.resolve()),
-            "output": str(xml_path.resolve()),
-        }
-    )
-
-    xml_exchange.patch_template_with_model(template, model_path, xml_path)
-
-    validation: Dict[str, Any] | None = None
+    xsd_dir_path: Optional[Path] = None
     if validate:
-        xsd_dir_path = Path(xsd_dir) if xsd_dir else DEFAULT_XSD_DIR
-        xsd_dir_path = _resolve_package_path(xsd_dir_path)
+        xsd_dir_path = _resolve_package_path(Path(xsd_dir) if xsd_dir else DEFAULT_XSD_DIR)
         if not xsd_dir_path.exists():
             raise FileNotFoundError(
                 f"Diretório de XSDs não encontrado: {xsd_dir_path}"
             )
-        ok, errors = xml_exchange.validate_with_full_xsd(xml_path, xsd_dir_path)
-        validation = {"valid": ok, "errors": errors}
-        logger.info(
-            "Validação XSD executada",
-            extra={
-                "resultado": "OK" if ok else "FALHOU",
-                "erros": len(errors),
-                "xsd_dir": str(xsd_dir_path.resolve()),
-            },
-        )
+
+    output_dir = _ensure_output_dir(output_dir)
+
+    # em diretórios compartilhados o lock garante que a validação leia o XML desta chamada
+    guard = file_lock(xml_path) if _is_shared_output_dir(output_dir) else contextlib.nullcontext()
+    validation: Dict[str, Any] | None = None
+    with guard:
+        key = _generation_key(template, model_path) if OUTPUT_CACHE else None
+        manifest = None if key is None or force else _load_output_manifest(xml_path, key)
+        cached = manifest is not None
+        changed = not cached
+
+        if cached:
+            logger.info(
+                "Diagrama ArchiMate reaproveitado (entradas inalteradas)",
+                extra={"output": str(xml_path.resolve())},
+            )
+        else:
+            logger.info(
+                "Gerando diagrama ArchiMate", extra={
+                    "template": str(template.resolve()),
+                    "model": str(model_path.resolve()),
+                    "output": str(xml_path.resolve()),
+                }
+            )
+            xml_exchange.patch_template_with_model(template, model_path, xml_path)
+            if key is not None:
+                manifest = {"key": key, "xml_sha256": file_sha256(xml_path), "validations": {}}
+
+        if xsd_dir_path is not None:
+            resolved_full_xsd = FULL_XSD_VALIDATION if full_xsd is None else full_xsd
+            validation_key = _validation_key(xsd_dir_path, resolved_full_xsd)
+            if manifest is not None:
+                validation = manifest["validations"].get(validation_key)
+            if validation is None:
+                ok, errors, stage = xml_exchange.validate_in_stages(
+                    xml_path,
+                    xsd_dir_path,
+                    full_xsd=resolved_full_xsd,
+                    verdict_cache=_verdict_cache_path(),
+                )
+                validation = {"valid": ok, "errors": errors, "stage": stage}
+                logger.info(
+                    "Validação XSD executada",
+                    extra={
+                        "resultado": "OK" if ok else "FALHOU",
+                        "etapa": stage,
+                        "erros": len(errors),
+                        "xsd_dir": str(xsd_dir_path.resolve()),
+                    },
+                )
+                if manifest is not None:
+                    manifest["validations"][validation_key] = validation
+                    changed = True
+
+        if manifest is not None and changed:
+            atomic_write_text(_output_manifest_path(xml_path), json.dumps(manifest))
 
     return {
         "path": str(xml_path.resolve()),
         "validated": validate,
         "validation_report": validation,
+        "cached": cached,
     }
 
 
@@ -2105,17 +3124,13 @@ def list_templates(directory: str | None = None) -> Dict[str, Any]:
     discovered: List[Dict[str, Any]] = []
     for template_path in sorted(templates_dir.rglob("*.xml")):
         try:
-            tree = ET.parse(template_path)
-            root = tree.getroot()
-            ns = {"a": ARCHIMATE_NS}
-            name_el = root.find("a:name", ns)
-            documentation_el = root.find("a:documentation", ns)
+            cached = _TEMPLATE_INDEX_CACHE.get(template_path, _read_template_metadata)
             metadata = {
-                "path": str(template_path.resolve()),
+                "path": cached["path"],
                 "relative_path": str(template_path.relative_to(templates_dir)),
-                "model_identifier": root.get("identifier"),
-                "model_name": _text_payload(name_el),
-                "documentation": _text_payload(documentation_el),
+                "model_identifier": cached["model_identifier"],
+                "model_name": cached["model_name"],
+                "documentation": cached["documentation"],
             }
             discovered.append(metadata)
         except ET.ParseError:
@@ -2140,16 +3155,25 @@ def describe_template(
     if not template.exists():
         raise FileNotFoundError(f"Template não encontrado: {template}")
 
-    blueprint = _parse_template_blueprint(template)
+    blueprint = _load_template_blueprint(template)
     store_blueprint(session_state, template, blueprint)
     guidance = _build_guidance_from_blueprint(blueprint)
     guidance["model"]["path"] = str(template.resolve())
     return guidance
+
+
 __all__ = [
+    "invalidate_template_caches",
+    "prewarm_template_caches",
     "list_templates",
     "describe_template",
     "generate_mermaid_preview",
+    "fetch_preview_image",
     "finalize_datamodel",
     "save_datamodel",
+    "check_datamodel_integrity",
+    "query_datamodel_graph",
+    "diff_datamodels",
+    "check_view_geometry",
     "generate_archimate_diagram",
 ]
@@ -0,0 +1,272 @@
+"""Limite global de taxa e de concorrência para as chamadas aos renderizadores.
+
+Todas as sessões do processo dividem um *token bucket* (requisições por segundo, com
+rajada) e um limite de chamadas simultâneas por host (Kroki, mermaid.ink). Quem chega com
+o balde vazio ou o host saturado espera na fila até ``queue_timeout``; passado o limite, a
+ficha reservada é devolvida e a chamada falha com :class:`RendererBusyError`, que os
+chamadores tratam como qualquer falha de rede (a pré-visualização segue sem a imagem ou
+sem a validação). O tempo de fila de cada chamada é acumulado em :func:`track_queue_time`
+para ser reportado por visão.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from .constants import (
+    RENDER_HOST_CONCURRENCY,
+    RENDER_QUEUE_TIMEOUT,
+    RENDER_RATE_BURST,
+    RENDER_RATE_LIMIT,
+)
+
+__all__ = [
+    "RendererBusyError",
+    "RenderLimiter",
+    "TokenBucket",
+    "get_render_limiter",
+    "track_queue_time",
+]
+
+_QUEUE_SAMPLES: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar(
+    "diagramador_render_queue", default=None
+)
+
+
+class RendererBusyError(requests.RequestException):
+    """A fila do renderizador excedeu o tempo máximo de espera."""
+
+
+class TokenBucket:
+    """Balde de fichas com reserva: quem chega antes é atendido antes."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, timeout: float) -> Optional[float]:
+        """Reserva uma ficha e devolve quanto esperar por ela; ``None`` se passar de ``timeout``."""
+
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # o saldo pode ficar negativo: é a fila de reservas já feitas
+            delay = max(-(self._tokens - 1) / self.rate, 0.0)
+            if delay > timeout:
+                return None
+            self._tokens -= 1
+            return delay
+
+    def refund(self) -> None:
+        """Devolve a ficha de uma reserva que não chegou a ser usada."""
+
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class _HostGate:
+    """Vagas de um host, disputadas por threads e por corrotinas.
+
+    Threads esperam na :class:`threading.Condition`; corrotinas, num future do próprio
+    event loop, resolvido por :meth:`release` (de qualquer thread) sem polling.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._busy = 0
+        self._cond = threading.Condition()
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = deque()
+
+    def acquire(self, timeout: float) -> bool:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._busy < self.limit, timeout):
+                return False
+            self._busy += 1
+            return True
+
+    async def aacquire(self, timeout: float) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._busy < self.limit:
+                    self._busy += 1
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                waiter: asyncio.Future[None] = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                self._forget(loop, waiter)
+            except BaseException:
+                self._forget(loop, waiter)
+                raise
+
+    def release(self) -> None:
+        with self._cond:
+            self._busy -= 1
+            self._cond.notify()
+            self._wake_next()
+
+    def _wake_next(self) -> None:
+        # chamado com ``_cond`` adquirida; acorda a próxima corrotina da fila
+        while self._waiters:
+            loop, waiter = self._waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(self._wake, waiter)
+            except RuntimeError:  # event loop já encerrado
+                continue
+            return
+
+    def _wake(self, waiter: "asyncio.Future[None]") -> None:
+        if waiter.done():
+            # a corrotina desistiu antes de ser acordada: a vez passa para a próxima
+            with self._cond:
+                if self._busy < self.limit:
+                    self._wake_next()
+        else:
+            waiter.set_result(None)
+
+    def _forget(self, loop: asyncio.AbstractEventLoop, waiter: "asyncio.Future[None]") -> None:
+        with self._cond:
+            try:
+                self._waiters.remove((loop, waiter))
+            except ValueError:
+                # já tinha sido acordada: repassa a vez que não vai usar
+                if self._busy < self.limit:
+                    self._wake_next()
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc or url
+
+
+def _record(waited: float) -> None:
+    samples = _QUEUE_SAMPLES.get()
+    if samples is not None:
+        samples.append(waited)
+
+
+@contextlib.contextmanager
+def track_queue_time() -> Iterator[List[float]]:
+    """Coleta o tempo de fila (s) de cada chamada limitada feita dentro do bloco."""
+
+    samples: List[float] = []
+    token = _QUEUE_SAMPLES.set(samples)
+    try:
+        yield samples
+    finally:
+        _QUEUE_SAMPLES.reset(token)
+
+
+class RenderLimiter:
+    """Token bucket do processo mais um limite de concorrência por host."""
+
+    def __init__(
+        self,
+        *,
+        rate: float = RENDER_RATE_LIMIT,
+        burst: float = RENDER_RATE_BURST,
+        per_host: int = RENDER_HOST_CONCURRENCY,
+        queue_timeout: float = RENDER_QUEUE_TIMEOUT,
+    ) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.per_host = max(int(per_host), 1)
+        self.queue_timeout = max(float(queue_timeout), 0.0)
+        self._gates: Dict[str, _HostGate] = {}
+        self._lock = threading.Lock()
+
+    def _gate(self, url: str) -> _HostGate:
+        host = _host(url)
+        with self._lock:
+            gate = self._gates.get(host)
+            if gate is None:
+                gate = _HostGate(self.per_host)
+                self._gates[host] = gate
+            return gate
+
+    def _reserve(self, url: str) -> float:
+        delay = self.bucket.reserve(self.queue_timeout)
+        if delay is None:
+            raise RendererBusyError(f"Limite de requisições aos renderizadores excedido ({_host(url)})")
+        return delay
+
+    @contextlib.contextmanager
+    def slot(self, url: str) -> Iterator[float]:
+        """Aguarda a vez de chamar ``url``; devolve o tempo de fila em segundos."""
+
+        started = time.monotonic()
+        delay = self._reserve(url)
+        gate = self._gate(url)
+        try:
+            if delay:
+                time.sleep(delay)
+            remaining = self.queue_timeout - (time.monotonic() - started)
+            if not gate.acquire(max(remaining, 0.0)):
+                raise RendererBusyError(f"Renderizador saturado ({_host(url)})")
+        except BaseException:
+            self.bucket.refund()
+            raise
+        waited = time.monotonic() - started
+        _record(waited)
+        try:
+            yield waited
+        finally:
+            gate.release()
+
+    @contextlib.asynccontextmanager
+    async def aslot(self, url: str) -> AsyncIterator[float]:
+        """Versão assíncrona de :meth:`slot`, sem bloquear o event loop."""
+
+        started = time.monotonic()
+        delay = self._reserve(url)
+        gate = self._gate(url)
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            remaining = self.queue_timeout - (time.monotonic() - started)
+            if not await gate.aacquire(max(remaining, 0.0)):
+                raise RendererBusyError(f"Renderizador saturado ({_host(url)})")
+        except BaseException:
+            self.bucket.refund()
+            raise
+        waited = time.monotonic() - started
+        _record(waited)
+        try:
+            yield waited
+        finally:
+            gate.release()
+
+
+_ACTIVE_LIMITER: Optional[RenderLimiter] = None
+_ACTIVE_LOCK = threading.Lock()
+
+
+def get_render_limiter() -> RenderLimiter:
+    """Limitador do processo, criado na primeira chamada com os valores do ambiente."""
+
+    global _ACTIVE_LIMITER
+    with _ACTIVE_LOCK:
+        if _ACTIVE_LIMITER is None:
+            _ACTIVE_LIMITER = RenderLimiter()
+        return _ACTIVE_LIMITER
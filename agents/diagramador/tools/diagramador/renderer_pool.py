@@ -0,0 +1,450 @@
+"""Pool de endpoints Kroki com balanceamento, sondas de saúde, retries e hedging.
+
+Cada render escolhe o endpoint saudável com menos requisições em andamento (ou o próximo
+do rodízio). Falhas de rede e respostas 5xx são repetidas em outro endpoint após um
+backoff exponencial com jitter; endpoints que acumulam falhas saem do rodízio até que a
+sonda de saúde (``GET /health``) os traga de volta. Quando o p95 observado de um endpoint
+passa do limite de hedge, uma segunda requisição vai para outro endpoint se a primeira
+não responder dentro desse limite, e vence a que terminar primeiro. Cada tentativa passa
+antes pelo limitador global de :mod:`.rate_limit`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+
+from .constants import (
+    KROKI_BALANCING,
+    KROKI_HEALTH_INTERVAL,
+    KROKI_HEDGE_AFTER_MS,
+    KROKI_RETRIES,
+    KROKI_URLS,
+)
+from .rate_limit import RendererBusyError, get_render_limiter
+
+try:
+    import httpx  # type: ignore
+
+    _ASYNC_ERRORS: Tuple[type, ...] = (httpx.HTTPError,)
+except ModuleNotFoundError:  # pragma: no cover - fallback para ambientes sem httpx
+    _ASYNC_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "BALANCING_STRATEGIES",
+    "KrokiEndpoint",
+    "RendererPool",
+    "configure_renderer_pool",
+    "get_renderer_pool",
+]
+
+BALANCING_STRATEGIES = ("least_outstanding", "round_robin")
+
+# amostras mínimas antes de confiar no p95 de um endpoint
+_MIN_LATENCY_SAMPLES = 5
+
+
+@dataclass(slots=True)
+class KrokiEndpoint:
+    """Estado de um endpoint: requisições em andamento, falhas seguidas e latências."""
+
+    url: str
+    healthy: bool = True
+    outstanding: int = 0
+    consecutive_failures: int = 0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=64))
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < _MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.consecutive_failures,
+            "p95_ms": round(p95 * 1000, 3) if p95 is not None else None,
+        }
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Erros de rede e 5xx valem nova tentativa; 4xx (ex.: Mermaid inválido) não."""
+
+    status = _status_code(exc)
+    return status is None or status >= 500
+
+
+class RendererPool:
+    """Distribui os renders entre vários endpoints Kroki."""
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        *,
+        strategy: str = "least_outstanding",
+        retries: int = 2,
+        backoff: float = 0.1,
+        backoff_cap: float = 2.0,
+        hedge_after: Optional[float] = None,
+        failure_threshold: int = 3,
+        health_path: str = "/health",
+        health_timeout: float = 2.0,
+    ) -> None:
+        self.endpoints = [KrokiEndpoint(url.rstrip("/")) for url in urls if url]
+        if not self.endpoints:
+            raise ValueError("Informe ao menos um endpoint Kroki.")
+        if strategy not in BALANCING_STRATEGIES:
+            raise ValueError(f"Estratégia de balanceamento desconhecida: {strategy}")
+        self.strategy = strategy
+        self.retries = max(int(retries), 0)
+        self.backoff = backoff
+        self.backoff_cap = backoff_cap
+        self.hedge_after = hedge_after if hedge_after and hedge_after > 0 else None
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.health_path = health_path
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+        self._cursor = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stop_event = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+
+    @property
+    def primary_url(self) -> str:
+        return self.endpoints[0].url
+
+    # seleção e contabilidade -------------------------------------------------------------
+
+    def choose(self, exclude: Sequence[str] = ()) -> KrokiEndpoint:
+        """Próximo endpoint; sem saudáveis disponíveis, tenta os demais antes de desistir."""
+
+        with self._lock:
+            count = len(self.endpoints)
+            rotation = [self.endpoints[(self._cursor + offset) % count] for offset in range(count)]
+            self._cursor = (self._cursor + 1) % count
+            candidates = [ep for ep in rotation if ep.healthy and ep.url not in exclude]
+            if not candidates:
+                candidates = [ep for ep in rotation if ep.url not in exclude] or rotation
+            if self.strategy == "round_robin":
+                chosen = candidates[0]
+            else:
+                # min() é estável: empates ficam com o primeiro do rodízio
+                chosen = min(candidates, key=lambda ep: ep.outstanding)
+            chosen.outstanding += 1
+            return chosen
+
+    def _release(
+        self, endpoint: KrokiEndpoint, elapsed: Optional[float], error: Optional[BaseException]
+    ) -> None:
+        """Fecha a contabilidade da requisição.
+
+        ``elapsed=None`` indica que o endpoint não chegou a responder (fila cheia, hedge
+        perdedor, backup igual ao primário): só a vaga é liberada, sem amostra de latência
+        e sem mexer na saúde do endpoint, que volta ao rodízio apenas pela sonda.
+        """
+
+        with self._lock:
+            endpoint.outstanding = max(endpoint.outstanding - 1, 0)
+            if elapsed is None:
+                return
+            if error is None or not _is_retryable(error):
+                endpoint.latencies.append(elapsed)
+                endpoint.consecutive_failures = 0
+                endpoint.healthy = True
+                return
+            endpoint.consecutive_failures += 1
+            if endpoint.healthy and endpoint.consecutive_failures >= self.failure_threshold:
+                endpoint.healthy = False
+                logger.warning(
+                    "Endpoint Kroki removido do rodízio após falhas seguidas",
+                    extra={"endpoint": endpoint.url, "falhas": endpoint.consecutive_failures},
+                )
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Backoff exponencial com *full jitter*."""
+
+        return random.uniform(0, min(self.backoff_cap, self.backoff * (2**attempt)))
+
+    def _should_hedge(self, endpoint: KrokiEndpoint) -> bool:
+        if self.hedge_after is None or len(self.endpoints) < 2:
+            return False
+        p95 = endpoint.p95()
+        return p95 is not None and p95 > self.hedge_after
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [endpoint.snapshot() for endpoint in self.endpoints]
+
+    # chamadas síncronas ------------------------------------------------------------------
+
+    def _send(
+        self, endpoint: KrokiEndpoint, path: str, kwargs: Dict[str, Any]
+    ) -> Tuple[Any, str]:
+        url = f"{endpoint.url}{path}"
+        elapsed: Optional[float] = None
+        error: Optional[BaseException] = None
+        try:
+            with get_render_limiter().slot(url):
+                started = time.perf_counter()
+                try:
+                    response = requests.post(url, **kwargs)
+                    response.raise_for_status()
+                except requests.RequestException as exc:
+                    elapsed, error = time.perf_counter() - started, exc
+                    raise
+                elapsed = time.perf_counter() - started
+        finally:
+            # sem resposta (fila cheia, erro local) só a vaga é liberada
+            self._release(endpoint, elapsed, error)
+        return response, endpoint.url
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(len(self.endpoints) * 2, 2),
+                    thread_name_prefix="diagramador-kroki-hedge",
+                )
+            return self._executor
+
+    def _send_hedged(
+        self, endpoint: KrokiEndpoint, path: str, kwargs: Dict[str, Any]
+    ) -> Tuple[Any, str]:
+        if not self._should_hedge(endpoint):
+            return self._send(endpoint, path, kwargs)
+        executor = self._get_executor()
+        # copia o contexto para que o tempo de fila chegue a track_queue_time
+        pending = {
+            executor.submit(contextvars.copy_context().run, self._send, endpoint, path, kwargs)
+        }
+        done, _ = wait(pending, timeout=self.hedge_after)
+        if not done:
+            backup = self.choose(exclude=(endpoint.url,))
+            if backup is endpoint:
+                self._release(backup, None, None)
+            else:
+                logger.debug("Requisição hedge disparada", extra={"endpoint": backup.url})
+                pending.add(
+                    executor.submit(
+                        contextvars.copy_context().run, self._send, backup, path, kwargs
+                    )
+                )
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except requests.RequestException as exc:
+                    error = exc
+        assert error is not None
+        raise error
+
+    def post(self, path: str = "/", **kwargs: Any) -> Tuple[Any, str]:
+        """``requests.post`` balanceado; retorna a resposta e o endpoint que a serviu."""
+
+        tried: List[str] = []
+        for attempt in range(self.retries + 1):
+            endpoint = self.choose(exclude=tried)
+            try:
+                return self._send_hedged(endpoint, path, kwargs)
+            except RendererBusyError:
+                # o limite é global: repetir só aumentaria a fila
+                raise
+            except requests.RequestException as exc:
+                if not _is_retryable(exc) or attempt == self.retries:
+                    raise
+                logger.info(
+                    "Falha no endpoint Kroki, tentando novamente",
+                    extra={"endpoint": endpoint.url, "tentativa": attempt + 1},
+                )
+            tried.append(endpoint.url)
+            time.sleep(self.backoff_delay(attempt))
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    # chamadas assíncronas ----------------------------------------------------------------
+
+    async def _asend(
+        self, client: Any, endpoint: KrokiEndpoint, path: str, kwargs: Dict[str, Any]
+    ) -> Tuple[Any, str]:
+        url = f"{endpoint.url}{path}"
+        elapsed: Optional[float] = None
+        error: Optional[BaseException] = None
+        try:
+            async with get_render_limiter().aslot(url):
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, **kwargs)
+                    response.raise_for_status()
+                except _ASYNC_ERRORS as exc:
+                    elapsed, error = time.perf_counter() - started, exc
+                    raise
+                elapsed = time.perf_counter() - started
+        finally:
+            # fila cheia, hedge perdedor ou cliente fechado: não conta como falha, sucesso
+            # ou amostra, só libera a vaga
+            self._release(endpoint, elapsed, error)
+        return response, endpoint.url
+
+    async def _asend_hedged(
+        self, client: Any, endpoint: KrokiEndpoint, path: str, kwargs: Dict[str, Any]
+    ) -> Tuple[Any, str]:
+        if not self._should_hedge(endpoint):
+            return await self._asend(client, endpoint, path, kwargs)
+        pending = {asyncio.ensure_future(self._asend(client, endpoint, path, kwargs))}
+        done, _ = await asyncio.wait(pending, timeout=self.hedge_after)
+        if not done:
+            backup = self.choose(exclude=(endpoint.url,))
+            if backup is endpoint:
+                self._release(backup, None, None)
+            else:
+                pending.add(asyncio.ensure_future(self._asend(client, backup, path, kwargs)))
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        assert error is not None
+        raise error
+
+    async def apost(self, client: Any, path: str = "/", **kwargs: Any) -> Tuple[Any, str]:
+        """Versão assíncrona de :meth:`post` sobre um ``httpx.AsyncClient``."""
+
+        tried: List[str] = []
+        for attempt in range(self.retries + 1):
+            endpoint = self.choose(exclude=tried)
+            try:
+                return await self._asend_hedged(client, endpoint, path, kwargs)
+            except _ASYNC_ERRORS as exc:
+                if not _is_retryable(exc) or attempt == self.retries:
+                    raise
+                logger.info(
+                    "Falha no endpoint Kroki, tentando novamente",
+                    extra={"endpoint": endpoint.url, "tentativa": attempt + 1},
+                )
+            tried.append(endpoint.url)
+            await asyncio.sleep(self.backoff_delay(attempt))
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    # sondas de saúde ---------------------------------------------------------------------
+
+    def probe(self) -> List[Dict[str, Any]]:
+        """Consulta ``health_path`` de cada endpoint e atualiza o rodízio."""
+
+        for endpoint in self.endpoints:
+            try:
+                response = requests.get(
+                    f"{endpoint.url}{self.health_path}", timeout=self.health_timeout
+                )
+                healthy = response.status_code < 500
+            except requests.RequestException:
+                healthy = False
+            with self._lock:
+                if healthy and not endpoint.healthy:
+                    logger.info("Endpoint Kroki de volta ao rodízio", extra={"endpoint": endpoint.url})
+                endpoint.healthy = healthy
+                if healthy:
+                    endpoint.consecutive_failures = 0
+        return self.stats()
+
+    @property
+    def health_checks_running(self) -> bool:
+        return self._health_thread is not None and self._health_thread.is_alive()
+
+    def start_health_checks(self, interval: float) -> "RendererPool":
+        if self.health_checks_running or interval <= 0:
+            return self
+        self._stop_event.clear()
+
+        def _run() -> None:
+            while not self._stop_event.wait(interval):
+                try:
+                    self.probe()
+                except Exception:  # pragma: no cover - a sonda nunca derruba o processo
+                    logger.exception("Falha na sonda de saúde dos endpoints Kroki")
+
+        self._health_thread = threading.Thread(
+            target=_run, name="diagramador-kroki-health", daemon=True
+        )
+        self._health_thread.start()
+        return self
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        self._stop_event.set()
+        if self._health_thread is not None:
+            self._health_thread.join(timeout)
+            self._health_thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+_ACTIVE_POOL: Optional[RendererPool] = None
+_ACTIVE_LOCK = threading.Lock()
+
+
+def _build_pool(
+    urls: Optional[Iterable[str]], health_interval: Optional[float], options: Dict[str, Any]
+) -> RendererPool:
+    options.setdefault("strategy", KROKI_BALANCING)
+    options.setdefault("retries", KROKI_RETRIES)
+    options.setdefault("hedge_after", KROKI_HEDGE_AFTER_MS / 1000 or None)
+    pool = RendererPool(list(urls) if urls is not None else KROKI_URLS, **options)
+    interval = KROKI_HEALTH_INTERVAL if health_interval is None else health_interval
+    if len(pool.endpoints) > 1:
+        pool.start_health_checks(interval)
+    return pool
+
+
+def configure_renderer_pool(
+    urls: Optional[Iterable[str]] = None,
+    *,
+    health_interval: Optional[float] = None,
+    **options: Any,
+) -> RendererPool:
+    """Substitui o pool do processo (padrões vindos das variáveis ``DIAGRAMADOR_KROKI_*``)."""
+
+    global _ACTIVE_POOL
+    pool = _build_pool(urls, health_interval, options)
+    with _ACTIVE_LOCK:
+        previous, _ACTIVE_POOL = _ACTIVE_POOL, pool
+    if previous is not None:
+        previous.close(timeout=0)
+    return pool
+
+
+def get_renderer_pool() -> RendererPool:
+    """Pool do processo, criado na primeira chamada."""
+
+    global _ACTIVE_POOL
+    with _ACTIVE_LOCK:
+        if _ACTIVE_POOL is None:
+            _ACTIVE_POOL = _build_pool(None, None, {})
+        return _ACTIVE_POOL
@@ -1,11 +1,22 @@
-"""Utilitários para uso do estado de sessão no agente Diagramador."""
+"""Utilitários para uso do estado de sessão no agente Diagramador.
+
+O estado de sessão do ADK é persistido e trafega a cada turno, por isso ele guarda apenas
+um *handle* por template (caminho, hash do conteúdo e tamanho). O blueprint em si fica no
+armazenamento de processo, indexado pelo hash; quando some (reinício, invalidação), o
+chamador o reidrata a partir do template em disco e registra o handle novamente.
+"""
 
 from __future__ import annotations
 
 import copy
+import hashlib
+import json
+import logging
 from pathlib import Path
 from typing import Any, Dict, MutableMapping, Optional
 
+from .cache import LRUCache
+
 SESSION_STATE_ROOT = "diagramador"
 BLUEPRINT_CACHE_KEY = "template_blueprints"
 
@@ -13,10 +24,17 @@ __all__ = [
     "SESSION_STATE_ROOT",
     "BLUEPRINT_CACHE_KEY",
     "get_session_bucket",
+    "get_blueprint_handle",
     "get_cached_blueprint",
     "store_blueprint",
+    "session_state_footprint",
 ]
 
+logger = logging.getLogger(__name__)
+
+# hash do conteúdo -> blueprint (compartilhado entre sessões, nunca alterado)
+_BLUEPRINT_STORE = LRUCache("session_blueprints", maxsize=32)
+
 
 def get_session_bucket(session_state: Optional[MutableMapping[str, Any]]) -> Dict[str, Any]:
     """Obtém (ou cria) o bucket raiz do agente dentro do estado de sessão."""
@@ -39,17 +57,66 @@ def _normalize_template_path(template_path: str | Path) -> str:
     return str(path.resolve())
 
 
-def get_cached_blueprint(
-    session_state: Optional[MutableMapping[str, Any]], template_path: str | Path
-) -> Optional[Dict[str, Any]]:
-    """Recupera o blueprint de template armazenado no estado de sessão."""
+def _serialized_size(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
 
+
+def _handles(
+    session_state: Optional[MutableMapping[str, Any]], *, create: bool = False
+) -> Optional[MutableMapping[str, Any]]:
     bucket = get_session_bucket(session_state)
     cache = bucket.get(BLUEPRINT_CACHE_KEY)
-    if not isinstance(cache, MutableMapping):
+    if isinstance(cache, MutableMapping):
+        return cache
+    if not create or session_state is None:
+        return None
+    cache = {}
+    bucket[BLUEPRINT_CACHE_KEY] = cache
+    return cache
+
+
+def _is_handle(entry: Any) -> bool:
+    return isinstance(entry, dict) and "fingerprint" in entry and "elements" not in entry
+
+
+def _blueprint_fingerprint(blueprint: Dict[str, Any]) -> str:
+    fingerprint = blueprint.get("fingerprint")
+    if isinstance(fingerprint, str) and fingerprint:
+        return fingerprint
+    canonical = json.dumps(blueprint, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_blueprint_handle(
+    session_state: Optional[MutableMapping[str, Any]], template_path: str | Path
+) -> Optional[Dict[str, Any]]:
+    """Handle (``path``, ``fingerprint``, ``bytes``) registrado na sessão para o template."""
+
+    cache = _handles(session_state)
+    if cache is None:
         return None
     normalized = _normalize_template_path(template_path)
-    blueprint = cache.get(normalized)
+    entry = cache.get(normalized)
+    if isinstance(entry, dict) and not _is_handle(entry):
+        # estados antigos guardavam o blueprint inteiro: converte para handle
+        store_blueprint(session_state, normalized, entry)
+        entry = cache.get(normalized)
+    return dict(entry) if _is_handle(entry) else None
+
+
+def get_cached_blueprint(
+    session_state: Optional[MutableMapping[str, Any]], template_path: str | Path
+) -> Optional[Dict[str, Any]]:
+    """Reidrata o blueprint referenciado pelo handle da sessão.
+
+    Retorna ``None`` quando não há handle ou quando o conteúdo já saiu do armazenamento de
+    processo; nesse caso o chamador deve recarregar o template e chamar :func:`store_blueprint`.
+    """
+
+    handle = get_blueprint_handle(session_state, template_path)
+    if handle is None:
+        return None
+    blueprint = _BLUEPRINT_STORE.peek(handle["fingerprint"])
     return copy.deepcopy(blueprint) if isinstance(blueprint, dict) else None
 
 
@@ -57,15 +124,51 @@ def store_blueprint(
     session_state: Optional[MutableMapping[str, Any]],
     template_path: str | Path,
     blueprint: Dict[str, Any],
-) -> None:
-    """Armazena uma cópia do blueprint de template no estado de sessão."""
+) -> Optional[Dict[str, Any]]:
+    """Guarda o blueprint no armazenamento de processo e registra o handle na sessão."""
 
     if session_state is None:
-        return
-    bucket = get_session_bucket(session_state)
-    cache = bucket.setdefault(BLUEPRINT_CACHE_KEY, {})
-    if not isinstance(cache, MutableMapping):
-        cache = {}
-        bucket[BLUEPRINT_CACHE_KEY] = cache
+        return None
+    fingerprint = _blueprint_fingerprint(blueprint)
+    stored = _BLUEPRINT_STORE.peek(fingerprint)
+    if stored is None:
+        snapshot = copy.deepcopy(blueprint)
+        stored = _BLUEPRINT_STORE.get(fingerprint, lambda: snapshot)
+    cache = _handles(session_state, create=True)
     normalized = _normalize_template_path(template_path)
-    cache[normalized] = copy.deepcopy(blueprint)
+    previous = cache.get(normalized)
+    if _is_handle(previous) and previous["fingerprint"] == fingerprint:
+        return dict(previous)
+    handle = {
+        "path": normalized,
+        "fingerprint": fingerprint,
+        "bytes": _serialized_size(stored),
+    }
+    cache[normalized] = handle
+    logger.debug(
+        "Blueprint registrado na sessão por handle",
+        extra={"template": normalized, "fingerprint": fingerprint, "bytes": handle["bytes"]},
+    )
+    return dict(handle)
+
+
+def session_state_footprint(session_state: Optional[MutableMapping[str, Any]]) -> Dict[str, Any]:
+    """Tamanho serializado do bucket do agente e quanto os handles evitam carregar.
+
+    ``blueprint_bytes`` soma o tamanho dos blueprints referenciados, que antes viajavam
+    inteiros no estado; ``saved_bytes`` é a diferença para o que a sessão carrega hoje.
+    """
+
+    bucket = get_session_bucket(session_state) if session_state is not None else {}
+    cache = _handles(session_state) or {}
+    handles = [entry for entry in cache.values() if _is_handle(entry)]
+    state_bytes = _serialized_size(bucket)
+    handle_bytes = _serialized_size(handles) if handles else 0
+    blueprint_bytes = sum(int(entry.get("bytes") or 0) for entry in handles)
+    return {
+        "templates": len(handles),
+        "state_bytes": state_bytes,
+        "handle_bytes": handle_bytes,
+        "blueprint_bytes": blueprint_bytes,
+        "saved_bytes": max(blueprint_bytes - handle_bytes, 0),
+    }
@@ -0,0 +1,200 @@
+"""Índice espacial em grade para checagens geométricas das visões.
+
+Cada grupo de nós irmãos (filhos do mesmo contêiner) é inserido numa grade uniforme cujo
+tamanho de célula acompanha o tamanho médio dos nós; sobreposições são buscadas apenas
+entre nós que compartilham células, o que mantém a checagem próxima de linear mesmo em
+visões com milhares de nós. Na mesma passada são apontados filhos que extrapolam os
+limites do contêiner, contêineres vazios e nós sem ``bounds``.
+
+Com a visão do template como referência, só contam os problemas que envolvem nós que o
+datamodel acrescentou ou moveu: rótulos e marcadores que o próprio template desenha sobre
+contêineres, ou contêineres de exemplo empilhados, não são erros do datamodel.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .model import ViewDiagram, ViewNode, child_nodes, text_of, walk_view_nodes
+
+__all__ = [
+    "GridIndex",
+    "analyze_view_geometry",
+]
+
+Box = Tuple[float, float, float, float]
+
+# limite de itens listados por categoria no relatório (as contagens são sempre completas)
+GEOMETRY_REPORT_LIMIT = 50
+
+
+def _box(node: ViewNode) -> Optional[Box]:
+    bounds = node.bounds
+    if not isinstance(bounds, dict):
+        return None
+    try:
+        x, y, w, h = (float(bounds[key]) for key in ("x", "y", "w", "h"))
+    except (KeyError, TypeError, ValueError):
+        return None
+    return x, y, w, h
+
+
+@dataclass(slots=True)
+class GridIndex:
+    """Grade uniforme: célula -> índices dos retângulos que a tocam."""
+
+    cell: float
+    boxes: List[Box] = field(default_factory=list)
+    cells: Dict[Tuple[int, int], List[int]] = field(default_factory=dict)
+
+    def _span(self, box: Box) -> Iterator[Tuple[int, int]]:
+        x, y, w, h = box
+        for cx in range(math.floor(x / self.cell), math.floor((x + w) / self.cell) + 1):
+            for cy in range(math.floor(y / self.cell), math.floor((y + h) / self.cell) + 1):
+                yield cx, cy
+
+    def insert(self, box: Box) -> int:
+        index = len(self.boxes)
+        self.boxes.append(box)
+        for key in self._span(box):
+            self.cells.setdefault(key, []).append(index)
+        return index
+
+    def query(self, box: Box) -> List[int]:
+        """Índices cujos retângulos têm interseção de área positiva com ``box``."""
+
+        x, y, w, h = box
+        found = set()
+        for key in self._span(box):
+            for index in self.cells.get(key, ()):
+                if index in found:
+                    continue
+                ox, oy, ow, oh = self.boxes[index]
+                if ox < x + w and x < ox + ow and oy < y + h and y < oy + oh:
+                    found.add(index)
+        return sorted(found)
+
+    @classmethod
+    def build(cls, boxes: Iterable[Box]) -> "GridIndex":
+        boxes = list(boxes)
+        mean = sum(max(box[2], box[3]) for box in boxes) / len(boxes) if boxes else 1.0
+        index = cls(cell=max(mean, 1.0))
+        for box in boxes:
+            index.insert(box)
+        return index
+
+
+def _overlap_area(a: Box, b: Box) -> float:
+    width = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    height = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    return max(width, 0.0) * max(height, 0.0)
+
+
+def _overflow(child: Box, parent: Box) -> Dict[str, float]:
+    overflow = {
+        "left": parent[0] - child[0],
+        "top": parent[1] - child[1],
+        "right": (child[0] + child[2]) - (parent[0] + parent[2]),
+        "bottom": (child[1] + child[3]) - (parent[1] + parent[3]),
+    }
+    return {side: round(value, 2) for side, value in overflow.items() if value > 0}
+
+
+def _label(node: ViewNode) -> Optional[str]:
+    return node.id or node.key()
+
+
+def _template_boxes(baseline: ViewDiagram | Dict[str, Any]) -> set[Tuple[Optional[str], Optional[Box]]]:
+    if isinstance(baseline, dict):
+        baseline = ViewDiagram.from_dict(baseline)
+    # pares (chave, caixa): nós sem identificador do template não colidem entre si
+    return {(node.key(), _box(node)) for _path, node in walk_view_nodes(baseline.nodes, "")}
+
+
+def analyze_view_geometry(
+    diagram: ViewDiagram | Dict[str, Any],
+    baseline: ViewDiagram | Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """Sobreposições entre irmãos, filhos fora do contêiner, contêineres vazios e nós sem bounds.
+
+    Com ``baseline`` (a mesma visão no template), sobreposições, extrapolações e contêineres
+    vazios só são apontados quando envolvem algum nó ausente do template ou com ``bounds``
+    diferentes dos dele.
+    """
+
+    if isinstance(diagram, dict):
+        diagram = ViewDiagram.from_dict(diagram)
+    template_boxes = _template_boxes(baseline) if baseline is not None else None
+
+    def changed(node: ViewNode, box: Optional[Box]) -> bool:
+        if template_boxes is None:
+            return True
+        return (node.key(), box) not in template_boxes
+
+    overlaps: List[Dict[str, Any]] = []
+    outside: List[Dict[str, Any]] = []
+    empty: List[str] = []
+    missing: List[str] = []
+    node_count = 0
+
+    # pilha de (irmãos, nó pai, bounds do pai)
+    stack: List[Tuple[List[ViewNode], Optional[ViewNode], Optional[Box]]] = [
+        (list(diagram.nodes), None, None)
+    ]
+    while stack:
+        siblings, parent, parent_box = stack.pop()
+        placed: List[Tuple[ViewNode, Box]] = []
+        for node in siblings:
+            node_count += 1
+            box = _box(node)
+            _key, children = child_nodes(node)
+            if box is None:
+                missing.append(_label(node) or "?")
+            else:
+                placed.append((node, box))
+                if parent_box is not None:
+                    overflow = _overflow(box, parent_box)
+                    if overflow and (changed(node, box) or changed(parent, parent_box)):
+                        outside.append(
+                            {"node": _label(node), "parent": _label(parent), "overflow": overflow}
+                        )
+            if not children and node.type == "Container" and changed(node, box):
+                empty.append(_label(node) or "?")
+            if children:
+                stack.append((children, node, box))
+
+        if len(placed) < 2:
+            continue
+        grid = GridIndex.build(box for _node, box in placed)
+        for index, (node, box) in enumerate(placed):
+            for other in grid.query(box):
+                if other <= index:
+                    continue
+                if not (changed(node, box) or changed(*placed[other])):
+                    continue
+                overlaps.append(
+                    {
+                        "a": _label(node),
+                        "b": _label(placed[other][0]),
+                        "area": round(_overlap_area(box, placed[other][1]), 2),
+                    }
+                )
+
+    return {
+        "view": diagram.id,
+        "name": text_of(diagram.name),
+        "node_count": node_count,
+        "valid": not overlaps and not outside,
+        "counts": {
+            "overlaps": len(overlaps),
+            "outside_container": len(outside),
+            "empty_containers": len(empty),
+            "missing_bounds": len(missing),
+        },
+        "overlaps": overlaps[:GEOMETRY_REPORT_LIMIT],
+        "outside_container": outside[:GEOMETRY_REPORT_LIMIT],
+        "empty_containers": empty[:GEOMETRY_REPORT_LIMIT],
+        "missing_bounds": missing[:GEOMETRY_REPORT_LIMIT],
+    }
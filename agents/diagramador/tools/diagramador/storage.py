@@ -0,0 +1,184 @@
+"""Gravação segura de artefatos e isolamento de saídas por sessão do Diagramador."""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import re
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, MutableMapping, Optional, Tuple
+
+# a gravação atômica vive no xml_exchange, que também a usa e roda como script isolado
+from ..archimate_exchange.xml_exchange import atomic_write_bytes, atomic_write_text
+from .session import get_session_bucket
+
+try:
+    import fcntl  # type: ignore
+
+    _HAS_FCNTL = True
+except ModuleNotFoundError:  # pragma: no cover - Windows
+    _HAS_FCNTL = False
+
+__all__ = [
+    "OUTPUT_NAMESPACE_KEY",
+    "artifact_reference",
+    "atomic_write_bytes",
+    "atomic_write_text",
+    "file_lock",
+    "image_dimensions",
+    "namespaced_output_dir",
+    "resolve_artifact",
+    "session_output_namespace",
+]
+
+OUTPUT_NAMESPACE_KEY = "output_namespace"
+
+_NAMESPACE_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_SVG_ROOT_RE = re.compile(rb"<svg\b[^>]*>")
+_SVG_ATTR_RE = re.compile(rb'\b(width|height|viewBox)="([^"]*)"')
+_LOCAL_LOCKS: Dict[str, threading.Lock] = {}
+_LOCAL_LOCKS_GUARD = threading.Lock()
+
+
+def _local_lock(key: str) -> threading.Lock:
+    with _LOCAL_LOCKS_GUARD:
+        lock = _LOCAL_LOCKS.get(key)
+        if lock is None:
+            lock = _LOCAL_LOCKS[key] = threading.Lock()
+        return lock
+
+
+@contextlib.contextmanager
+def file_lock(path: str | Path) -> Iterator[None]:
+    """Lock exclusivo (entre threads e processos) associado a ``path``.
+
+    Usa ``flock`` em ``<path>.lock`` quando disponível; nas demais plataformas o lock vale
+    apenas dentro do processo.
+    """
+
+    target = Path(path)
+    key = str(target.resolve())
+    with _local_lock(key):
+        if not _HAS_FCNTL:
+            yield
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = target.with_name(f".{target.name}.lock")
+        with open(lock_path, "a+b") as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _sanitize_namespace(value: str) -> str:
+    cleaned = _NAMESPACE_RE.sub("_", value).strip("._")
+    return cleaned[:64] or uuid.uuid4().hex[:12]
+
+
+def session_output_namespace(
+    session_state: Optional[MutableMapping[str, Any]],
+) -> Optional[str]:
+    """Retorna (criando na primeira chamada) o namespace de saída da sessão."""
+
+    if session_state is None:
+        return None
+    bucket = get_session_bucket(session_state)
+    namespace = bucket.get(OUTPUT_NAMESPACE_KEY)
+    if not isinstance(namespace, str) or not namespace:
+        namespace = uuid.uuid4().hex[:12]
+        bucket[OUTPUT_NAMESPACE_KEY] = namespace
+    return _sanitize_namespace(namespace)
+
+
+def namespaced_output_dir(
+    base: Path,
+    session_state: Optional[MutableMapping[str, Any]] = None,
+    *,
+    isolation: str = "session",
+) -> Path:
+    """Resolve o diretório de saída conforme o modo de isolamento configurado.
+
+    - ``session``: ``<base>/sessions/<namespace>`` quando há estado de sessão; caso contrário
+      o diretório compartilhado ``<base>``.
+    - ``invocation``: um subdiretório novo (``<base>/runs/<uuid>``) a cada chamada.
+    - ``none``: sempre ``<base>``.
+    """
+
+    if isolation == "invocation":
+        return base / "runs" / uuid.uuid4().hex[:12]
+    if isolation == "session":
+        namespace = session_output_namespace(session_state)
+        if namespace:
+            return base / "sessions" / namespace
+    return base
+
+
+def _svg_length(value: Optional[bytes]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value.strip().removesuffix(b"px"))
+    except ValueError:
+        return None
+
+
+def _number(value: float) -> int | float:
+    return int(value) if float(value).is_integer() else round(value, 2)
+
+
+def image_dimensions(content: bytes) -> Optional[Tuple[int | float, int | float]]:
+    """Largura e altura lidas do cabeçalho PNG ou da raiz SVG, sem decodificar a imagem."""
+
+    if content.startswith(_PNG_SIGNATURE) and len(content) >= 24:
+        return int.from_bytes(content[16:20], "big"), int.from_bytes(content[20:24], "big")
+    match = _SVG_ROOT_RE.search(content[:4096])
+    if match is None:
+        return None
+    attrs = dict(_SVG_ATTR_RE.findall(match.group(0)))
+    width, height = _svg_length(attrs.get(b"width")), _svg_length(attrs.get(b"height"))
+    if width is None or height is None:
+        box = (attrs.get(b"viewBox") or b"").replace(b",", b" ").split()
+        if len(box) != 4:
+            return None
+        try:
+            width, height = float(box[2]), float(box[3])
+        except ValueError:
+            return None
+    return _number(width), _number(height)
+
+
+def artifact_reference(path: Path, content: bytes, root: Path) -> Dict[str, Any]:
+    """Handle estável (caminho relativo a ``root``), hash, tamanho e dimensões do artefato."""
+
+    try:
+        handle = Path(path).resolve().relative_to(Path(root).resolve()).as_posix()
+    except ValueError:
+        handle = Path(path).name
+    reference: Dict[str, Any] = {
+        "handle": handle,
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "bytes": len(content),
+    }
+    dimensions = image_dimensions(content)
+    if dimensions is not None:
+        reference["width"], reference["height"] = dimensions
+    return reference
+
+
+def resolve_artifact(root: Path, handle: str, *, within: Optional[Path] = None) -> Path:
+    """Caminho do artefato referenciado por ``handle``, sem sair de ``root`` (nem de ``within``)."""
+
+    if not handle or Path(handle).is_absolute():
+        raise ValueError("Handle de artefato inválido.")
+    candidate = (Path(root) / handle).resolve()
+    for boundary in (root, within):
+        if boundary is not None and Path(boundary).resolve() not in candidate.parents:
+            raise ValueError("Handle de artefato fora do diretório de saída.")
+    if not candidate.is_file():
+        raise FileNotFoundError(f"Artefato não encontrado: {handle}")
+    return candidate
@@ -0,0 +1,407 @@
+"""Renderização offline (SVG) das visões ArchiMate a partir do layout do template.
+
+Diferente da pré-visualização Mermaid, que descarta o posicionamento e depende do Kroki, o
+renderizador desenha cada nó nos ``bounds`` absolutos da visão, com as cores e fontes de
+``style``, os rótulos dos elementos e as conexões passando pelos ``points`` (bendpoints).
+Tudo roda em Python puro, sem rede, em poucos milissegundos por visão.
+"""
+
+from __future__ import annotations
+
+import base64
+import math
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from .model import ViewConnection, ViewDiagram, ViewNode, text_of
+
+__all__ = [
+    "SVG_MIME_TYPE",
+    "render_view_svg",
+    "svg_data_uri",
+]
+
+SVG_MIME_TYPE = "image/svg+xml"
+
+_MARGIN = 20
+_PADDING = 5
+_DEFAULT_FONT = "Segoe UI, Arial, Helvetica, sans-serif"
+_DEFAULT_FONT_SIZE = 9
+# largura média de um caractere em relação ao tamanho da fonte (aproximação para quebra de linha)
+_CHAR_WIDTH = 0.55
+_LINE_HEIGHT = 1.25
+
+# cores padrão do Archi por camada, usadas quando o nó não define ``fillColor``
+_LAYER_FILLS: Tuple[Tuple[Tuple[str, ...], str], ...] = (
+    (("Business", "Contract", "Representation", "Product"), "#ffffb5"),
+    (("Application", "DataObject"), "#b5ffff"),
+    (
+        (
+            "Technology", "Node", "Device", "SystemSoftware", "Artifact", "Communication",
+            "Path", "Equipment", "Facility", "DistributionNetwork", "Material",
+        ),
+        "#c9e7b7",
+    ),
+    (
+        (
+            "Stakeholder", "Driver", "Assessment", "Goal", "Outcome", "Principle",
+            "Requirement", "Constraint", "Meaning", "Value",
+        ),
+        "#ccccff",
+    ),
+    (("Resource", "Capability", "ValueStream", "CourseOfAction"), "#f5deaa"),
+    (("WorkPackage", "Deliverable", "ImplementationEvent", "Plateau", "Gap"), "#ffe0e0"),
+    (("Location",), "#fbb875"),
+)
+
+# (tracejado, marcador inicial, marcador final) por tipo de relacionamento
+_RELATION_STYLES: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {
+    "Composition": (None, "diamond-filled", None),
+    "Aggregation": (None, "diamond-open", None),
+    "Assignment": (None, "dot", "arrow-filled"),
+    "Realization": ("6 3", None, "triangle-open"),
+    "Serving": (None, None, "arrow-open"),
+    "Access": ("2 2", None, "arrow-open"),
+    "Influence": ("6 3", None, "arrow-open"),
+    "Triggering": (None, None, "arrow-filled"),
+    "Flow": ("6 3", None, "arrow-filled"),
+    "Specialization": (None, None, "triangle-open"),
+}
+
+_MARKERS = """<defs>
+<marker id="arrow-filled" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" markerHeight="8" orient="auto"><path d="M0,0 L10,5 L0,10 z" fill="context-stroke"/></marker>
+<marker id="arrow-open" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" markerHeight="8" orient="auto"><path d="M0,0 L10,5 L0,10" fill="none" stroke="context-stroke"/></marker>
+<marker id="triangle-open" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="10" markerHeight="10" orient="auto"><path d="M0,0 L10,5 L0,10 z" fill="#ffffff" stroke="context-stroke"/></marker>
+<marker id="diamond-filled" viewBox="0 0 12 8" refX="0" refY="4" markerWidth="12" markerHeight="8" orient="auto"><path d="M0,4 L6,0 L12,4 L6,8 z" fill="context-stroke"/></marker>
+<marker id="diamond-open" viewBox="0 0 12 8" refX="0" refY="4" markerWidth="12" markerHeight="8" orient="auto"><path d="M0,4 L6,0 L12,4 L6,8 z" fill="#ffffff" stroke="context-stroke"/></marker>
+<marker id="dot" viewBox="0 0 6 6" refX="3" refY="3" markerWidth="6" markerHeight="6"><circle cx="3" cy="3" r="3" fill="context-stroke"/></marker>
+</defs>"""
+
+Rect = Tuple[float, float, float, float]
+
+
+def _number(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.1f}".rstrip("0").rstrip(".")
+
+
+def _node_rect(node: ViewNode) -> Optional[Rect]:
+    bounds = node.bounds
+    if not isinstance(bounds, Mapping):
+        return None
+    return (
+        _number(bounds.get("x")),
+        _number(bounds.get("y")),
+        max(_number(bounds.get("w"), 120.0), 1.0),
+        max(_number(bounds.get("h"), 55.0), 1.0),
+    )
+
+
+def _color(value: Any) -> Tuple[Optional[str], float]:
+    """Converte ``{"r", "g", "b", "a"}`` em ``#rrggbb`` e opacidade (``a`` vai de 0 a 100)."""
+
+    if not isinstance(value, Mapping):
+        return None, 1.0
+    channels = [min(max(int(_number(value.get(key))), 0), 255) for key in ("r", "g", "b")]
+    opacity = 1.0
+    if value.get("a") is not None:
+        opacity = min(max(_number(value.get("a"), 100.0), 0.0), 100.0) / 100.0
+    return "#{:02x}{:02x}{:02x}".format(*channels), opacity
+
+
+def _layer_fill(element_type: Optional[str]) -> str:
+    if element_type:
+        for prefixes, fill in _LAYER_FILLS:
+            if element_type.startswith(prefixes):
+                return fill
+    return "#ffffff"
+
+
+def _font(style: Optional[Mapping[str, Any]]) -> Tuple[str, float, str, str]:
+    """Retorna família, tamanho em px, atributos extras e cor da fonte de ``style``."""
+
+    font = style.get("font") if isinstance(style, Mapping) else None
+    font = font if isinstance(font, Mapping) else {}
+    family = font.get("name") or ""
+    size = _number(font.get("size"), _DEFAULT_FONT_SIZE) or _DEFAULT_FONT_SIZE
+    font_style = str(font.get("style") or "").lower()
+    extra = ""
+    if "bold" in font_style:
+        extra += ' font-weight="bold"'
+    if "italic" in font_style:
+        extra += ' font-style="italic"'
+    color, _ = _color(font.get("color"))
+    family = f"{family}, {_DEFAULT_FONT}" if family else _DEFAULT_FONT
+    # tamanhos do ArchiMate estão em pontos; o SVG trabalha em px (96 dpi)
+    return family, size * 4.0 / 3.0, extra, color or "#000000"
+
+
+def _wrap(text: str, width: float, font_px: float) -> List[str]:
+    max_chars = max(int(width / (font_px * _CHAR_WIDTH)), 1)
+    lines: List[str] = []
+    for paragraph in text.splitlines() or [""]:
+        current = ""
+        for word in paragraph.split():
+            while len(word) > max_chars:
+                if current:
+                    lines.append(current)
+                    current = ""
+                lines.append(word[:max_chars])
+                word = word[max_chars:]
+            candidate = f"{current} {word}" if current else word
+            if len(candidate) <= max_chars:
+                current = candidate
+            else:
+                lines.append(current)
+                current = word
+        lines.append(current)
+    return lines
+
+
+def _text_block(
+    text: str,
+    rect: Rect,
+    style: Optional[Mapping[str, Any]],
+    *,
+    anchor: str,
+) -> str:
+    x, y, w, h = rect
+    family, font_px, extra, color = _font(style)
+    lines = _wrap(text, w - 2 * _PADDING, font_px)
+    line_px = font_px * _LINE_HEIGHT
+    max_lines = max(int((h - _PADDING) / line_px), 1)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1].rstrip()[:-1] + "…" if lines[-1] else "…"
+    text_x = x + w / 2 if anchor == "middle" else x + _PADDING
+    parts = [
+        f'<text x="{_fmt(text_x)}" y="{_fmt(y + _PADDING + font_px)}" '
+        f"font-family={quoteattr(family)} font-size=\"{_fmt(font_px)}\"{extra} "
+        f'fill="{color}" text-anchor="{anchor}">'
+    ]
+    for index, line in enumerate(lines):
+        dy = "0" if index == 0 else _fmt(line_px)
+        parts.append(f'<tspan x="{_fmt(text_x)}" dy="{dy}">{escape(line)}</tspan>')
+    parts.append("</text>")
+    return "".join(parts)
+
+
+def _node_label(
+    node: ViewNode,
+    element_entry: Optional[Mapping[str, Any]],
+) -> Optional[str]:
+    label = text_of(node.label)
+    if label:
+        return label
+    if element_entry:
+        return element_entry.get("name") or element_entry.get("template_name")
+    return node.ref("elementRef")
+
+
+def _render_node(
+    node: ViewNode,
+    rect: Rect,
+    element_lookup: Mapping[str, Mapping[str, Any]],
+) -> str:
+    element_ref = node.ref("elementRef")
+    element_entry = element_lookup.get(element_ref) if element_ref else None
+    element_type = element_entry.get("type") if element_entry else None
+    style = node.style if isinstance(node.style, Mapping) else {}
+
+    fill, fill_opacity = _color(style.get("fillColor"))
+    stroke, stroke_opacity = _color(style.get("lineColor"))
+    if fill is None:
+        if node.type == "Label":
+            fill_opacity = 0.0
+        fill = _layer_fill(element_type) if element_ref else "#ffffff"
+    if stroke is None:
+        stroke = "#000000"
+        stroke_opacity = 0.0 if node.type == "Label" else 1.0
+
+    x, y, w, h = rect
+    parts = [f"<g{_id_attr(node.id)}>"]
+    tooltip = " ".join(part for part in (element_type, _node_label(node, element_entry)) if part)
+    if tooltip:
+        parts.append(f"<title>{escape(tooltip)}</title>")
+    parts.append(
+        f'<rect x="{_fmt(x)}" y="{_fmt(y)}" width="{_fmt(w)}" height="{_fmt(h)}" '
+        f'rx="{4 if element_ref else 0}" fill="{fill}" fill-opacity="{_fmt(fill_opacity)}" '
+        f'stroke="{stroke}" stroke-opacity="{_fmt(stroke_opacity)}"/>'
+    )
+    label = _node_label(node, element_entry)
+    if label:
+        # elementos centralizam o nome como no Archi; containers e notas alinham à esquerda
+        anchor = "middle" if element_ref else "start"
+        parts.append(_text_block(label, rect, style, anchor=anchor))
+    parts.append("</g>")
+    return "".join(parts)
+
+
+def _id_attr(identifier: Optional[str]) -> str:
+    return f" id={quoteattr(identifier)}" if identifier else ""
+
+
+def _center(rect: Rect) -> Tuple[float, float]:
+    x, y, w, h = rect
+    return x + w / 2, y + h / 2
+
+
+def _clip_to_rect(rect: Rect, toward: Tuple[float, float]) -> Tuple[float, float]:
+    """Ponto da borda de ``rect`` na reta entre seu centro e ``toward``."""
+
+    cx, cy = _center(rect)
+    dx, dy = toward[0] - cx, toward[1] - cy
+    if dx == 0 and dy == 0:
+        return cx, cy
+    half_w, half_h = rect[2] / 2, rect[3] / 2
+    scale = min(
+        half_w / abs(dx) if dx else math.inf,
+        half_h / abs(dy) if dy else math.inf,
+    )
+    if scale >= 1:
+        return cx, cy
+    return cx + dx * scale, cy + dy * scale
+
+
+def _points(connection: ViewConnection) -> List[Tuple[float, float]]:
+    return [
+        (_number(point.get("x")), _number(point.get("y")))
+        for point in connection.points or []
+        if isinstance(point, Mapping)
+    ]
+
+
+def _connection_path(
+    source: Rect, target: Rect, bendpoints: Sequence[Tuple[float, float]]
+) -> List[Tuple[float, float]]:
+    inner = list(bendpoints)
+    start = _clip_to_rect(source, inner[0] if inner else _center(target))
+    end = _clip_to_rect(target, inner[-1] if inner else _center(source))
+    return [start, *inner, end]
+
+
+def _render_connection(
+    connection: ViewConnection,
+    rects: Mapping[str, Rect],
+    relation_lookup: Mapping[str, Mapping[str, Any]],
+) -> Optional[str]:
+    source = rects.get(connection.source or "")
+    target = rects.get(connection.target or "")
+    if source is None or target is None:
+        return None
+
+    relation_type = connection.type
+    if connection.relationship_ref:
+        entry = relation_lookup.get(connection.relationship_ref)
+        if entry and entry.get("type"):
+            relation_type = entry.get("type")
+    dash, marker_start, marker_end = _RELATION_STYLES.get(relation_type or "", (None, None, None))
+
+    style = connection.style if isinstance(connection.style, Mapping) else {}
+    stroke, stroke_opacity = _color(style.get("lineColor"))
+    path = _connection_path(source, target, _points(connection))
+    coords = " ".join(f"{_fmt(px)},{_fmt(py)}" for px, py in path)
+
+    attrs = [
+        f'points="{coords}"',
+        'fill="none"',
+        f'stroke="{stroke or "#000000"}"',
+        f'stroke-opacity="{_fmt(stroke_opacity)}"',
+    ]
+    if dash:
+        attrs.append(f'stroke-dasharray="{dash}"')
+    if marker_start:
+        attrs.append(f'marker-start="url(#{marker_start})"')
+    if marker_end:
+        attrs.append(f'marker-end="url(#{marker_end})"')
+
+    parts = [f"<g{_id_attr(connection.id)}>"]
+    if relation_type:
+        parts.append(f"<title>{escape(relation_type)}</title>")
+    parts.append(f"<polyline {' '.join(attrs)}/>")
+    label = text_of(connection.label)
+    if label:
+        middle = path[len(path) // 2 - 1], path[len(path) // 2]
+        mx = (middle[0][0] + middle[1][0]) / 2
+        my = (middle[0][1] + middle[1][1]) / 2
+        family, font_px, extra, color = _font(style)
+        parts.append(
+            f'<text x="{_fmt(mx)}" y="{_fmt(my - 3)}" font-family={quoteattr(family)} '
+            f'font-size="{_fmt(font_px)}"{extra} fill="{color}" text-anchor="middle">'
+            f"{escape(label)}</text>"
+        )
+    parts.append("</g>")
+    return "".join(parts)
+
+
+def _iter_connections(view: ViewDiagram) -> Iterable[ViewConnection]:
+    yield from view.connections
+    for node in view.iter_nodes():
+        yield from node.connections
+
+
+def render_view_svg(
+    view: ViewDiagram,
+    element_lookup: Optional[Mapping[str, Mapping[str, Any]]] = None,
+    relation_lookup: Optional[Mapping[str, Mapping[str, Any]]] = None,
+    *,
+    title: Optional[str] = None,
+) -> str:
+    """Desenha ``view`` como SVG usando os ``bounds`` absolutos de cada nó.
+
+    ``element_lookup``/``relation_lookup`` seguem o formato dos índices da pré-visualização
+    (``name``/``template_name``/``type`` por identificador) e são usados para rótulos, cores
+    padrão por camada e a notação de cada tipo de relacionamento.
+    """
+
+    element_lookup = element_lookup or {}
+    relation_lookup = relation_lookup or {}
+
+    placed: List[Tuple[ViewNode, Rect]] = []
+    rects: Dict[str, Rect] = {}
+    for node in view.iter_nodes():
+        rect = _node_rect(node)
+        if rect is None:
+            continue
+        placed.append((node, rect))
+        if node.id:
+            rects[node.id] = rect
+
+    if placed:
+        min_x = min(rect[0] for _, rect in placed) - _MARGIN
+        min_y = min(rect[1] for _, rect in placed) - _MARGIN
+        max_x = max(rect[0] + rect[2] for _, rect in placed) + _MARGIN
+        max_y = max(rect[1] + rect[3] for _, rect in placed) + _MARGIN
+    else:
+        min_x, min_y, max_x, max_y = 0.0, 0.0, 240.0, 60.0
+    width, height = max_x - min_x, max_y - min_y
+
+    caption = title or text_of(view.name) or view.id or "Visão"
+    parts = [
+        '<svg xmlns="http://www.w3.org/2000/svg" '
+        f'width="{_fmt(width)}" height="{_fmt(height)}" '
+        f'viewBox="{_fmt(min_x)} {_fmt(min_y)} {_fmt(width)} {_fmt(height)}">',
+        f"<title>{escape(caption)}</title>",
+        _MARKERS,
+        f'<rect x="{_fmt(min_x)}" y="{_fmt(min_y)}" width="{_fmt(width)}" '
+        f'height="{_fmt(height)}" fill="#ffffff"/>',
+    ]
+    # a ordem de ``iter_nodes`` (pais antes dos filhos) garante o empilhamento correto
+    for node, rect in placed:
+        parts.append(_render_node(node, rect, element_lookup))
+    for connection in _iter_connections(view):
+        rendered = _render_connection(connection, rects, relation_lookup)
+        if rendered:
+            parts.append(rendered)
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def svg_data_uri(svg: str) -> str:
+    return f"data:{SVG_MIME_TYPE};base64,{base64.b64encode(svg.encode('utf-8')).decode('ascii')}"
@@ -0,0 +1,347 @@
+"""Observador do diretório de templates com invalidação automática de caches."""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from .cache import FileSignature, file_signature
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "WATCHED_SUFFIXES",
+    "TemplateWatcher",
+    "start_template_watcher",
+    "stop_template_watcher",
+]
+
+WATCHED_SUFFIXES = (".xml", ".xsd", ".archimate")
+
+# Arquivos gerados pela própria validação XSD; alterá-los não muda o schema de origem.
+_IGNORED_PREFIXES = ("_archimate3_",)
+
+# Constantes de <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (
+    _IN_CLOSE_WRITE
+    | _IN_MODIFY
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+_DEBOUNCE_SECONDS = 0.05
+
+ChangeCallback = Callable[[List[str]], None]
+
+
+def _is_relevant(path: str) -> bool:
+    name = os.path.basename(path)
+    if name.startswith(_IGNORED_PREFIXES):
+        return False
+    return name.lower().endswith(WATCHED_SUFFIXES)
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1  # noqa: B018 - garante que o símbolo existe
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class _InotifyBackend:
+    """Backend baseado em inotify (Linux) acessado via ctypes, sem dependências extras."""
+
+    name = "inotify"
+
+    def __init__(self, libc, directories: Iterable[Path]) -> None:
+        self._libc = libc
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        self._watches: Dict[int, str] = {}
+        for directory in directories:
+            self._add_tree(Path(directory))
+
+    def _add_watch(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(str(directory)), ctypes.c_uint32(_WATCH_MASK)
+        )
+        if wd >= 0:
+            self._watches[wd] = str(directory)
+
+    def _add_tree(self, directory: Path) -> None:
+        if not directory.is_dir():
+            return
+        self._add_watch(directory)
+        for root, dirs, _files in os.walk(directory):
+            for name in dirs:
+                self._add_watch(Path(root) / name)
+
+    def wait(self, timeout: float) -> Set[str]:
+        changed: Set[str] = set()
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        while ready:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            self._decode(data, changed)
+            # agrupa rajadas de eventos (ex.: cópia de vários arquivos) em um único lote
+            ready, _, _ = select.select([self._fd], [], [], _DEBOUNCE_SECONDS)
+        return changed
+
+    def _decode(self, data: bytes, changed: Set[str]) -> None:
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            raw_name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(raw_name)) if raw_name else directory
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._add_tree(Path(path))
+                # diretórios novos/removidos afetam tudo o que está abaixo deles
+                changed.add(path)
+            elif mask & _IN_DELETE_SELF:
+                self._watches.pop(wd, None)
+                changed.add(directory)
+            elif _is_relevant(path):
+                changed.add(path)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class _PollingBackend:
+    """Backend portátil que compara ``mtime``/tamanho dos arquivos a cada intervalo."""
+
+    name = "polling"
+
+    def __init__(self, directories: Iterable[Path], stop_event: threading.Event) -> None:
+        self._directories = [Path(directory) for directory in directories]
+        self._stop_event = stop_event
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Optional[FileSignature]]:
+        snapshot: Dict[str, Optional[FileSignature]] = {}
+        for directory in self._directories:
+            if not directory.is_dir():
+                continue
+            for root, _dirs, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if _is_relevant(path):
+                        snapshot[path] = file_signature(path)
+        return snapshot
+
+    def poll(self) -> Set[str]:
+        current = self._scan()
+        previous = self._snapshot
+        self._snapshot = current
+        changed = {path for path, sig in current.items() if previous.get(path) != sig}
+        changed.update(path for path in previous if path not in current)
+        return changed
+
+    def wait(self, timeout: float) -> Set[str]:
+        if self._stop_event.wait(timeout):
+            return set()
+        return self.poll()
+
+    def close(self) -> None:
+        return None
+
+
+class TemplateWatcher:
+    """Observa diretórios de templates/XSDs e invalida os caches dos arquivos alterados.
+
+    Usa inotify quando disponível e recorre a polling por ``mtime`` nos demais casos. Com
+    ``prewarm`` habilitado os arquivos alterados são recarregados em segundo plano logo após
+    a invalidação, de modo que a próxima chamada de ferramenta já encontre o cache quente.
+    """
+
+    def __init__(
+        self,
+        directories: Iterable[str | Path],
+        *,
+        on_change: ChangeCallback,
+        prewarm: Optional[ChangeCallback] = None,
+        interval: float = 1.0,
+        backend: str = "auto",
+    ) -> None:
+        self.directories = [Path(directory).resolve() for directory in directories]
+        self.interval = max(float(interval), 0.05)
+        self._on_change = on_change
+        self._prewarm = prewarm
+        self._requested_backend = backend
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._backend = None
+
+    @property
+    def backend_name(self) -> Optional[str]:
+        return getattr(self._backend, "name", None)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _create_backend(self):
+        if self._requested_backend in ("auto", "inotify"):
+            libc = _load_libc()
+            if libc is not None:
+                try:
+                    return _InotifyBackend(libc, self.directories)
+                except OSError as exc:
+                    logger.warning("inotify indisponível, usando polling", exc_info=exc)
+            elif self._requested_backend == "inotify":
+                logger.warning("inotify indisponível nesta plataforma, usando polling")
+        return _PollingBackend(self.directories, self._stop_event)
+
+    def start(self) -> "TemplateWatcher":
+        if self.running:
+            return self
+        self._stop_event.clear()
+        self._backend = self._create_backend()
+        if self._prewarm is not None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="diagramador-prewarm"
+            )
+        self._thread = threading.Thread(
+            target=self._run, name="diagramador-template-watcher", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            "Observador de templates iniciado",
+            extra={"backend": self.backend_name, "diretorios": [str(d) for d in self.directories]},
+        )
+        return self
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def handle_changes(self, paths: Iterable[str]) -> List[str]:
+        """Invalida os caches dos caminhos e agenda o pré-aquecimento, se configurado."""
+
+        changed = sorted(set(paths))
+        if not changed:
+            return changed
+        self._on_change(changed)
+        if self._prewarm is not None:
+            existing = [path for path in changed if os.path.isfile(path)]
+            if existing:
+                if self._executor is not None:
+                    self._executor.submit(self._safe_prewarm, existing)
+                else:
+                    self._safe_prewarm(existing)
+        return changed
+
+    def _safe_prewarm(self, paths: List[str]) -> None:
+        try:
+            self._prewarm(paths)  # type: ignore[misc]
+        except Exception:  # pragma: no cover - pré-aquecimento é apenas otimização
+            logger.exception("Falha ao pré-aquecer caches de template")
+
+    def _run(self) -> None:
+        backend = self._backend
+        while not self._stop_event.is_set() and backend is not None:
+            try:
+                changed = backend.wait(self.interval)
+            except OSError as exc:  # pragma: no cover - falhas do kernel/FS
+                logger.warning("Falha no observador de templates", exc_info=exc)
+                self._stop_event.wait(self.interval)
+                continue
+            if changed and not self._stop_event.is_set():
+                self.handle_changes(changed)
+
+
+_ACTIVE_WATCHER: Optional[TemplateWatcher] = None
+_ACTIVE_LOCK = threading.Lock()
+
+
+def start_template_watcher(
+    directories: Optional[Iterable[str | Path]] = None,
+    *,
+    prewarm: bool = False,
+    interval: float = 1.0,
+    backend: str = "auto",
+) -> TemplateWatcher:
+    """Inicia (uma única vez por processo) o observador dos diretórios de templates e XSDs."""
+
+    from . import operations
+    from .constants import DEFAULT_XSD_DIR
+
+    global _ACTIVE_WATCHER
+    with _ACTIVE_LOCK:
+        if _ACTIVE_WATCHER is not None and _ACTIVE_WATCHER.running:
+            return _ACTIVE_WATCHER
+        if directories is None:
+            candidates = [
+                operations._resolve_templates_dir(),
+                operations._resolve_package_path(DEFAULT_XSD_DIR),
+            ]
+            directories = []
+            for candidate in candidates:
+                resolved = candidate.resolve()
+                if resolved.is_dir() and not any(
+                    resolved == d or d in resolved.parents for d in directories
+                ):
+                    directories.append(resolved)
+        watcher = TemplateWatcher(
+            directories,
+            on_change=operations.invalidate_template_caches,
+            prewarm=operations.prewarm_template_caches if prewarm else None,
+            interval=interval,
+            backend=backend,
+        )
+        _ACTIVE_WATCHER = watcher.start()
+        return watcher
+
+
+def stop_template_watcher() -> None:
+    global _ACTIVE_WATCHER
+    with _ACTIVE_LOCK:
+        if _ACTIVE_WATCHER is not None:
+            _ACTIVE_WATCHER.stop()
+            _ACTIVE_WATCHER = None
@@ -0,0 +1,11 @@
+"""Stub simples para `google.adk.tools.tool_context`."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+
+@dataclass
+class ToolContext:
+    state: Dict[str, Any] = field(default_factory=dict)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+from pathlib import Path
+import asyncio
+import base64
+import hashlib
+import importlib
+import struct
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+
+import pytest
+from google.adk.tools.tool_context import ToolContext
+
+from tools.diagramador import DEFAULT_TEMPLATE, fetch_preview_image, generate_mermaid_preview
+from tools.diagramador import operations
+from tools.diagramador.storage import image_dimensions
+
+SAMPLE_TEMPLATE = operations._resolve_package_path(DEFAULT_TEMPLATE)
+SAMPLE_DATAMODEL = operations._resolve_package_path(
+    Path("tools/archimate_exchange/samples/pix_solution_case/pix_container_datamodel.json")
+)
+
+
+def test_image_dimensions_reads_png_header_and_svg_root():
+    png = b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", 640, 480) + b"\x00" * 16
+
+    assert image_dimensions(png) == (640, 480)
+    assert image_dimensions(b'<svg xmlns="x" width="120.5" height="80px"></svg>') == (120.5, 80)
+    assert image_dimensions(b'<svg viewBox="0 0 300 200"></svg>') == (300, 200)
+    assert image_dimensions(b"GIF89a") is None
+
+
+def test_preview_returns_image_references_and_fetch_returns_bytes(monkeypatch, tmp_path):
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path)
+    session_state: dict = {}
+
+    preview = generate_mermaid_preview(
+        SAMPLE_DATAMODEL.read_text(encoding="utf-8"),
+        template_path=str(SAMPLE_TEMPLATE),
+        session_state=session_state,
+        image_source="svg",
+    )
+
+    image = preview["views"][0]["image"]
+    assert "data_uri" not in image
+    content = Path(image["path"]).read_bytes()
+    assert image["sha256"] == hashlib.sha256(content).hexdigest()
+    assert image["bytes"] == len(content)
+    assert image["width"] > 0 and image["height"] > 0
+    assert image["handle"].startswith("sessions/")
+
+    fetched = fetch_preview_image(image["handle"], session_state=session_state)
+    assert fetched["mime_type"] == "image/svg+xml"
+    assert fetched["sha256"] == image["sha256"]
+    assert base64.b64decode(fetched["data_uri"].split(",", 1)[1]) == content
+
+    with pytest.raises(ValueError):
+        fetch_preview_image("../" + image["handle"])
+    # outra sessão não lê artefatos desta
+    with pytest.raises(ValueError):
+        fetch_preview_image(image["handle"], session_state={})
+
+
+def test_fetch_preview_image_serves_only_own_session_images(monkeypatch, tmp_path):
+    agent = importlib.import_module("agents.diagramador.agent")
+    agent_operations = importlib.import_module("agents.diagramador.tools.diagramador.operations")
+    monkeypatch.setattr(agent_operations, "OUTPUT_DIR", tmp_path)
+    owner, intruder = ToolContext(), ToolContext()
+
+    saved = agent.save_datamodel('{"model": "a"}', "modelo.json", tool_context=owner)
+    session_dir = Path(saved["path"]).parent
+    (session_dir / "visao.svg").write_text('<svg width="10" height="10"></svg>', encoding="utf-8")
+    (session_dir / ".xsd_verdicts.sqlite3").write_bytes(b"SQLite format 3\x00")
+    (session_dir / "modelo.xml.manifest.json").write_text("{}", encoding="utf-8")
+    prefix = session_dir.relative_to(tmp_path).as_posix()
+
+    fetched = agent.fetch_preview_image(f"{prefix}/visao.svg", tool_context=owner)
+    assert fetched["mime_type"] == "image/svg+xml"
+
+    # outra sessão, ou uma chamada sem sessão, não lê a imagem desta
+    with pytest.raises(ValueError):
+        agent.fetch_preview_image(f"{prefix}/visao.svg", tool_context=intruder)
+    with pytest.raises(ValueError):
+        asyncio.run(agent.fetch_preview_image_async(f"{prefix}/visao.svg", tool_context=intruder))
+    with pytest.raises(ValueError):
+        agent.fetch_preview_image(f"{prefix}/visao.svg")
+    # nem a própria sessão lê artefatos que não são imagens
+    for name in ("modelo.json", ".xsd_verdicts.sqlite3", "modelo.xml.manifest.json"):
+        with pytest.raises(ValueError):
+            agent.fetch_preview_image(f"{prefix}/{name}", tool_context=owner)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+from pathlib import Path
+import asyncio
+import contextlib
+import json
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+from unittest import mock
+
+import pytest
+
+from tools.diagramador import (
+    DEFAULT_TEMPLATE,
+    async_operations,
+    generate_mermaid_preview,
+    generate_mermaid_preview_async,
+    list_templates,
+    list_templates_async,
+)
+from tools.diagramador import operations, rate_limit, renderer_pool
+
+SAMPLE_TEMPLATE = operations._resolve_package_path(DEFAULT_TEMPLATE)
+SAMPLE_DATAMODEL = operations._resolve_package_path(
+    Path("tools/archimate_exchange/samples/pix_solution_case/pix_container_datamodel.json")
+)
+
+
+@pytest.fixture(autouse=True)
+def stub_mermaid_validation(monkeypatch):
+    response = mock.Mock()
+    response.raise_for_status = mock.Mock()
+    response.text = "<svg id='mermaidInkSvg'></svg>"
+    validator = mock.Mock(return_value=response)
+    monkeypatch.setattr(operations, "_mermaid_validation_request", validator)
+    monkeypatch.setattr(async_operations, "HTTPX_AVAILABLE", False)
+    return validator
+
+
+def test_async_preview_matches_sync_preview():
+    payload = SAMPLE_DATAMODEL.read_text(encoding="utf-8")
+    expected = generate_mermaid_preview(payload, str(SAMPLE_TEMPLATE))
+    result = asyncio.run(generate_mermaid_preview_async(payload, str(SAMPLE_TEMPLATE)))
+    assert [view["mermaid"] for view in result["views"]] == [
+        view["mermaid"] for view in expected["views"]
+    ]
+    assert result["view_count"] == expected["view_count"]
+
+
+def test_async_preview_fetches_images_concurrently(monkeypatch, tmp_path):
+    response = mock.Mock()
+    response.raise_for_status = mock.Mock()
+    response.content = b"PNGDATA"
+    response.headers = {"Content-Type": "image/png"}
+    post = mock.Mock(return_value=response)
+    monkeypatch.setattr(operations, "FETCH_MERMAID_IMAGES", True)
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(operations.requests, "post", post)
+
+    payload = SAMPLE_DATAMODEL.read_text(encoding="utf-8")
+    result = asyncio.run(generate_mermaid_preview_async(payload, str(SAMPLE_TEMPLATE)))
+
+    assert post.call_count == result["view_count"]
+    for view in result["views"]:
+        assert view["image"]["status"] == "cached"
+        assert Path(view["image"]["path"]).exists()
+
+
+def test_async_preview_propagates_mermaid_errors(stub_mermaid_validation):
+    stub_mermaid_validation.return_value.text = (
+        '<svg aria-roledescription="error"><text>Parse error on line 1</text></svg>'
+    )
+    datamodel = {
+        "views": {"diagrams": [{"id": "v1", "name": "V", "nodes": [{"id": "n1"}]}]},
+    }
+    with pytest.raises(ValueError, match="Parse error"):
+        asyncio.run(generate_mermaid_preview_async(json.dumps(datamodel)))
+
+
+def test_async_list_templates_runs_in_executor():
+    assert asyncio.run(list_templates_async()) == list_templates()
+
+
+def test_make_tool_registers_async_variant_when_supported(monkeypatch):
+    import importlib
+
+    module = importlib.import_module("agents.diagramador.agent")
+    monkeypatch.setattr(module, "ASYNC_TOOLS", "auto")
+    assert module._make_tool(module.list_templates, name="list_templates").function is (
+        module.list_templates
+    )
+    monkeypatch.setattr(module.FunctionTool, "run_async", lambda self: None, raising=False)
+    tool = module._make_tool(
+        module.list_templates,
+        name="list_templates",
+        async_function=module.list_templates_async,
+    )
+    assert tool.function is module.list_templates_async
+    assert tool.name == "list_templates"
+
+
+@pytest.fixture()
+def httpx_transport(monkeypatch, tmp_path):
+    """Liga o ramo ``httpx.AsyncClient`` com um ``MockTransport`` no lugar da rede."""
+
+    httpx = pytest.importorskip("httpx")
+    calls: list = []
+    routes: dict = {}
+
+    async def _handler(request):
+        calls.append((request.method, request.url.host))
+        return await routes[request.method](request)
+
+    @contextlib.asynccontextmanager
+    async def _client():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(_handler)) as client:
+            yield client
+
+    monkeypatch.setattr(async_operations, "HTTPX_AVAILABLE", True)
+    monkeypatch.setattr(async_operations, "_http_client", _client)
+    monkeypatch.setattr(operations, "FETCH_MERMAID_IMAGES", True)
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(rate_limit, "_ACTIVE_LIMITER", rate_limit.RenderLimiter(rate=0, burst=1))
+    monkeypatch.setattr(renderer_pool, "_ACTIVE_POOL", None)
+    renderer_pool.configure_renderer_pool(["https://kroki.example"], health_interval=0)
+    return httpx, routes, calls
+
+
+def test_async_preview_validates_and_renders_through_httpx(
+    httpx_transport, stub_mermaid_validation
+):
+    httpx, routes, calls = httpx_transport
+
+    async def _validate(request):
+        return httpx.Response(200, text="<svg id='mermaidInkSvg'></svg>")
+
+    async def _render(request):
+        assert json.loads(request.content)["diagram_source"]
+        return httpx.Response(200, headers={"Content-Type": "image/png"}, content=b"PNGDATA")
+
+    routes.update(GET=_validate, POST=_render)
+    payload = SAMPLE_DATAMODEL.read_text(encoding="utf-8")
+
+    result = asyncio.run(generate_mermaid_preview_async(payload, str(SAMPLE_TEMPLATE)))
+
+    views = result["view_count"]
+    assert [method for method, _ in calls].count("GET") == views
+    assert [host for method, host in calls if method == "POST"] == ["kroki.example"] * views
+    for view in result["views"]:
+        assert view["image"]["status"] == "cached"
+        assert Path(view["image"]["path"]).read_bytes() == b"PNGDATA"
+    stub_mermaid_validation.assert_not_called()
+
+
+def test_async_preview_httpx_errors(httpx_transport):
+    httpx, routes, calls = httpx_transport
+    datamodel = json.dumps(
+        {"views": {"diagrams": [{"id": "v1", "name": "V", "nodes": [{"id": "n1"}]}]}}
+    )
+
+    async def _offline(request):
+        raise httpx.ConnectError("sem rede", request=request)
+
+    # validador e Kroki fora do ar: a prévia segue sem validação e sem imagem
+    routes.update(GET=_offline, POST=_offline)
+    view = asyncio.run(generate_mermaid_preview_async(datamodel))["views"][0]
+    assert "path" not in view["image"]
+    assert ("POST", "kroki.example") in calls
+
+    async def _syntax_error(request):
+        return httpx.Response(
+            200, text='<svg aria-roledescription="error"><text>Parse error on line 1</text></svg>'
+        )
+
+    routes["GET"] = _syntax_error
+    with pytest.raises(ValueError, match="Parse error"):
+        asyncio.run(generate_mermaid_preview_async(datamodel))
@@ -0,0 +1,112 @@
+from __future__ import annotations
+from pathlib import Path
+import copy
+import json
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+
+from tools.diagramador import DEFAULT_TEMPLATE, diff_datamodels, diff_payloads
+from tools.diagramador import operations
+
+SAMPLE_TEMPLATE = operations._resolve_package_path(DEFAULT_TEMPLATE)
+
+
+def _payload() -> dict:
+    return {
+        "elements": [
+            {"id": "app", "type": "ApplicationComponent", "name": "App"},
+            {"id": "db", "type": "DataObject", "name": {"text": "Base"}},
+        ],
+        "relations": [{"id": "r1", "type": "Access", "source": "app", "target": "db"}],
+        "views": {
+            "diagrams": [
+                {
+                    "id": "v1",
+                    "name": "Contexto",
+                    "nodes": [
+                        {
+                            "id": "grp",
+                            "label": "Grupo",
+                            "children": [{"elementRef": "app", "bounds": {"x": 10, "y": 10}}],
+                        }
+                    ],
+                }
+            ]
+        },
+        "organizations": [{"label": "Aplicação", "items": [{"identifierRef": "app"}]}],
+    }
+
+
+def test_diff_payloads_matches_items_by_key():
+    before = _payload()
+    after = copy.deepcopy(before)
+    after["elements"][1]["name"] = "Base"  # mesmo texto em outro formato
+    after["elements"][0]["documentation"] = "Nova"
+    after["elements"].append({"id": "svc", "type": "ApplicationService", "name": "Serviço"})
+    after["relations"] = []
+    child = after["views"]["diagrams"][0]["nodes"][0]["children"][0]
+    child["bounds"] = {"x": 40, "y": 10}
+    after["organizations"][0]["items"].append({"identifierRef": "svc"})
+
+    result = diff_payloads(before, after)
+
+    assert result["identical"] is False
+    changes = result["changes"]
+    assert changes["elements"]["added"] == [
+        {"key": "svc", "id": "svc", "type": "ApplicationService", "name": "Serviço"}
+    ]
+    assert changes["elements"]["modified"] == [
+        {"key": "app", "changes": {"documentation": {"before": None, "after": "Nova"}}}
+    ]
+    assert [item["key"] for item in changes["relations"]["removed"]] == ["r1"]
+    assert changes["nodes"]["modified"] == [
+        {
+            "key": "v1/elementRef:app",
+            "view": "v1",
+            "changes": {"bounds": {"before": {"x": 10, "y": 10}, "after": {"x": 40, "y": 10}}},
+        }
+    ]
+    assert [item["key"] for item in changes["organizations"]["added"]] == [
+        "/label:Aplicação/identifierRef:svc"
+    ]
+    assert "views" not in changes
+    assert diff_payloads(before, copy.deepcopy(before))["identical"] is True
+
+
+def test_diff_datamodels_against_template_ignores_omitted_fields():
+    blueprint = operations._load_template_blueprint(SAMPLE_TEMPLATE)
+    element = blueprint["elements"][0]
+    datamodel = {"elements": [{"id": element["id"], "name": "Renomeado"}]}
+
+    result = diff_datamodels(json.dumps(datamodel), template_path=str(SAMPLE_TEMPLATE))
+
+    assert result["against"] == "template"
+    assert result["changes"] == {
+        "elements": {
+            "modified": [
+                {
+                    "key": element["id"],
+                    "changes": {"name": {"before": operations._payload_text(element["name"]), "after": "Renomeado"}},
+                }
+            ]
+        }
+    }
+    assert result["summary"]["elements"]["removed"] == len(blueprint["elements"]) - 1
+
+
+def test_diff_datamodels_between_versions():
+    before = _payload()
+    after = copy.deepcopy(before)
+    after["views"]["diagrams"][0]["name"] = "Contexto atualizado"
+
+    result = diff_datamodels(json.dumps(after), baseline=json.dumps(before))
+
+    assert result["against"] == "datamodel"
+    assert result["summary"]["views"] == {"added": 0, "removed": 0, "modified": 1}
+    assert result["changes"]["views"]["modified"][0]["changes"] == {
+        "name": {"before": "Contexto", "after": "Contexto atualizado"}
+    }
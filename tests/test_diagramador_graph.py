@@ -0,0 +1,130 @@
+from __future__ import annotations
+from pathlib import Path
+import json
+import sys
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+from unittest import mock
+
+from tools.diagramador import DatamodelGraph, query_datamodel_graph
+from tools.diagramador import operations
+
+SAMPLE_DATAMODEL = operations._resolve_package_path(
+    Path("tools/archimate_exchange/samples/pix_solution_case/pix_container_datamodel.json")
+)
+
+
+def _payload() -> dict:
+    return {
+        "elements": [
+            {"id": "app", "type": "ApplicationComponent", "name": "App"},
+            {"id": "api", "type": "ApplicationInterface", "name": "API"},
+            {"id": "svc", "type": "ApplicationService", "name": "Serviço"},
+            {"id": "db", "type": "DataObject", "name": "Base"},
+        ],
+        "relations": [
+            {"id": "r1", "type": "Serving", "source": "app", "target": "api"},
+            {"id": "r2", "type": "FlowRelationship", "source": "api", "target": "svc"},
+            {"id": "r3", "type": "Access", "source": "svc", "target": "db"},
+        ],
+        "views": {
+            "diagrams": [
+                {
+                    "id": "v1",
+                    "name": "Contexto",
+                    "nodes": [
+                        {
+                            "id": "grp",
+                            "type": "Container",
+                            "children": [{"id": "n-app", "type": "Element", "elementRef": "app"}],
+                        }
+                    ],
+                    "connections": [{"id": "c1", "relationshipRef": "r1"}],
+                }
+            ]
+        },
+        "organizations": [
+            {"label": "Aplicação", "items": [{"identifierRef": "app"}, {"identifierRef": "api"}]}
+        ],
+    }
+
+
+def test_graph_indexes_adjacency_views_and_folders():
+    graph = DatamodelGraph.from_payload(_payload())
+
+    assert [item["id"] for item in graph.neighbors("api")] == ["svc", "app"]
+    assert [item["id"] for item in graph.neighbors("api", relation_types=["ServingRelationship"])] == ["app"]
+    assert [step["id"] for step in graph.path("app", "db", direction="outgoing")] == ["app", "api", "svc", "db"]
+    assert graph.path("db", "app", direction="outgoing") == []
+    assert [(item["id"], item["depth"]) for item in graph.impact("app", max_depth=2)] == [("api", 1), ("svc", 2)]
+    assert [item["id"] for item in graph.impact("db", direction="incoming")] == ["svc", "api", "app"]
+
+    used = graph.where_used("app")
+    assert used["views"] == [{"id": "v1", "name": "Contexto", "nodes": ["n-app"]}]
+    assert used["organizations"] == [["Aplicação"]]
+    assert graph.where_used("r1")["views"][0]["nodes"] == ["c1"]
+
+
+def test_graph_indexes_connections_nested_in_nodes():
+    payload = _payload()
+    node = payload["views"]["diagrams"][0]["nodes"][0]
+    node["connections"] = [{"id": "c2", "relationshipRef": "r2"}]
+
+    used = DatamodelGraph.from_payload(payload).where_used("r2")
+
+    assert used["views"] == [{"id": "v1", "name": "Contexto", "nodes": ["c2"]}]
+
+
+def test_query_datamodel_graph_reuses_index_and_limits_results():
+    raw = json.dumps(_payload())
+    operations._DATAMODEL_GRAPH_CACHE.invalidate()
+    with mock.patch.object(
+        operations.DatamodelGraph, "from_payload", wraps=DatamodelGraph.from_payload
+    ) as build:
+        first = query_datamodel_graph(raw, "impact", "app", limit=1)
+        second = query_datamodel_graph(raw, "path", "app", target_id="db")
+
+    assert build.call_count == 1
+    assert first["count"] == 3 and first["truncated"] is True and len(first["results"]) == 1
+    assert second["target"]["name"] == "Base"
+    assert [step["id"] for step in second["results"]] == ["app", "api", "svc", "db"]
+
+    with pytest.raises(ValueError):
+        query_datamodel_graph(raw, "ancestors", "app")
+    with pytest.raises(ValueError):
+        query_datamodel_graph(raw, "path", "app")
+
+
+def test_query_datamodel_graph_reads_saved_datamodel(tmp_path):
+    target = tmp_path / "datamodel.json"
+    target.write_text(SAMPLE_DATAMODEL.read_text(encoding="utf-8"), encoding="utf-8")
+    with mock.patch.object(operations, "OUTPUT_DIR", tmp_path):
+        result = query_datamodel_graph("datamodel.json", "where_used", "id-3db4884e4ef2449292c1953d4bda30c7")
+
+    assert result["element"]["name"] == "Mobile Banking App"
+    assert result["results"]["views"]
+
+
+def test_query_datamodel_graph_refuses_paths_outside_session_dir(tmp_path):
+    outside = tmp_path / "segredo.json"
+    outside.write_text(json.dumps(_payload()), encoding="utf-8")
+    state: dict = {}
+    with mock.patch.object(operations, "OUTPUT_DIR", tmp_path / "outputs"):
+        other = operations._resolve_output_dir({}) / "datamodel.json"
+        other.parent.mkdir(parents=True)
+        other.write_text(json.dumps(_payload()), encoding="utf-8")
+        for reference in (str(outside), "../segredo.json", str(other)):
+            with pytest.raises(ValueError, match="diretório de saída"):
+                query_datamodel_graph(reference, "where_used", "app", session_state=state)
+
+        own = operations._resolve_output_dir(state) / "datamodel.json"
+        own.parent.mkdir(parents=True)
+        own.write_text(json.dumps(_payload()), encoding="utf-8")
+        for reference in ("datamodel.json", str(own)):
+            result = query_datamodel_graph(reference, "where_used", "app", session_state=state)
+            assert result["element"]["name"] == "App"
@@ -0,0 +1,95 @@
+from __future__ import annotations
+from pathlib import Path
+import json
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+
+from tools.diagramador import (
+    DEFAULT_TEMPLATE,
+    check_datamodel_integrity,
+    check_referential_integrity,
+    finalize_datamodel,
+)
+from tools.diagramador import operations
+
+SAMPLE_TEMPLATE = operations._resolve_package_path(DEFAULT_TEMPLATE)
+SAMPLE_DATAMODEL = operations._resolve_package_path(
+    Path("tools/archimate_exchange/samples/pix_solution_case/pix_container_datamodel.json")
+)
+
+
+def _payload() -> dict:
+    return {
+        "elements": [
+            {"id": "app", "type": "ApplicationComponent"},
+            {"id": "svc", "type": "ApplicationService"},
+        ],
+        "relations": [
+            {"id": "rel", "type": "Serving", "source": "svc", "target": "app"},
+            {"id": "rel-bad", "type": "Serving", "source": "svc", "target": "missing"},
+        ],
+        "organizations": [
+            {"label": "Pasta", "items": [{"identifierRef": "app"}, {"identifierRef": "ghost"}]}
+        ],
+        "views": {
+            "diagrams": [
+                {
+                    "id": "view",
+                    "nodes": [
+                        {
+                            "id": "n-app",
+                            "elementRef": "app",
+                            "children": [{"id": "n-svc", "elementRef": "svc"}],
+                        },
+                        {"id": "n-rel", "elementRef": "rel"},
+                        {"id": "app"},
+                    ],
+                    "connections": [
+                        {"id": "c1", "relationshipRef": "rel", "source": "n-svc", "target": "n-app"},
+                        {"id": "c2", "relationshipRef": "rel", "source": "n-svc", "target": "n-x"},
+                    ],
+                }
+            ]
+        },
+    }
+
+
+def test_check_referential_integrity_reports_dangling_and_duplicates():
+    report = check_referential_integrity(_payload())
+
+    assert report["valid"] is False
+    dangling = {(issue["path"], issue["attribute"]): issue for issue in report["dangling"]}
+    assert set(dangling) == {
+        ("relations[1]", "target"),
+        ("views.diagrams[0].nodes[1]", "elementRef"),
+        ("views.diagrams[0].connections[1]", "target"),
+        ("organizations[0].items[1]", "identifierRef"),
+    }
+    # a referência existe, mas aponta para um relacionamento em vez de um elemento
+    assert dangling[("views.diagrams[0].nodes[1]", "elementRef")]["found"] == "relation"
+    assert report["duplicates"] == [
+        {"id": "app", "paths": ["elements[0]", "views.diagrams[0].nodes[2]"]}
+    ]
+    assert report["issue_count"] == 5
+
+
+def test_check_datamodel_integrity_resolves_template_identifiers():
+    model = operations._load_template_model(SAMPLE_TEMPLATE)
+    element_id = model.elements[0].id
+    payload = {"relations": [{"id": "rel-new", "source": element_id, "target": element_id}]}
+
+    assert check_datamodel_integrity(json.dumps(payload))["valid"] is False
+    report = check_datamodel_integrity(json.dumps(payload), template_path=str(SAMPLE_TEMPLATE))
+    assert report["valid"] is True
+
+
+def test_finalize_datamodel_includes_integrity_report():
+    result = finalize_datamodel(
+        SAMPLE_DATAMODEL.read_text(encoding="utf-8"), str(SAMPLE_TEMPLATE)
+    )
+    assert result["integrity"]["valid"] is True
+    assert result["integrity"]["identifier_count"] > 0
@@ -0,0 +1,134 @@
+from __future__ import annotations
+from pathlib import Path
+import json
+import sys
+import time
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+
+from tools.diagramador import DEFAULT_TEMPLATE, auto_layout_view, finalize_datamodel
+from tools.diagramador import operations
+
+SAMPLE_TEMPLATE = operations._resolve_package_path(DEFAULT_TEMPLATE)
+
+
+def _overlaps(a: dict, b: dict) -> bool:
+    return (
+        a["x"] < b["x"] + b["w"]
+        and b["x"] < a["x"] + a["w"]
+        and a["y"] < b["y"] + b["h"]
+        and b["y"] < a["y"] + a["h"]
+    )
+
+
+def _inside(inner: dict, outer: dict) -> bool:
+    return (
+        outer["x"] <= inner["x"]
+        and outer["y"] <= inner["y"]
+        and inner["x"] + inner["w"] <= outer["x"] + outer["w"]
+        and inner["y"] + inner["h"] <= outer["y"] + outer["h"]
+    )
+
+
+def test_auto_layout_places_new_nodes_inside_parents_and_avoids_template_nodes():
+    template_bounds = {"x": 10, "y": 10, "w": 300, "h": 120}
+    view = {
+        "id": "v1",
+        "nodes": [
+            {
+                "id": "layer",
+                "bounds": template_bounds,
+                "nodes": [
+                    {"id": "fixed", "bounds": {"x": 30, "y": 40, "w": 120, "h": 55}},
+                    {"id": "a", "elementRef": "ea"},
+                    {"id": "b", "elementRef": "eb"},
+                ],
+            },
+            {
+                "id": "group",
+                "label": "Novo",
+                "children": [{"id": "c", "elementRef": "ec"}, {"id": "d", "elementRef": "ed"}],
+            },
+        ],
+        "connections": [{"id": "c1", "source": "c", "target": "d"}],
+    }
+
+    placed = auto_layout_view(view, [{"source": "ea", "target": "eb"}])
+
+    assert placed == 5
+    layer, group = view["nodes"]
+    fixed, a, b = layer["nodes"]
+    # o dicionário do template não é alterado; o contêiner cresce com um novo bounds
+    assert template_bounds == {"x": 10, "y": 10, "w": 300, "h": 120}
+    assert layer["bounds"] is not template_bounds
+    for node in (fixed, a, b):
+        assert _inside(node["bounds"], layer["bounds"])
+    assert not _overlaps(a["bounds"], fixed["bounds"])
+    assert not _overlaps(b["bounds"], fixed["bounds"])
+    # a origem da relação fica na camada acima do destino
+    assert a["bounds"]["y"] < b["bounds"]["y"]
+
+    c, d = group["children"]
+    assert _inside(c["bounds"], group["bounds"]) and _inside(d["bounds"], group["bounds"])
+    assert c["bounds"]["y"] < d["bounds"]["y"]
+    assert not _overlaps(group["bounds"], layer["bounds"])
+    assert auto_layout_view(view) == 0
+
+
+def test_auto_layout_handles_thousands_of_nodes_quickly():
+    count = 3000
+    view = {
+        "id": "big",
+        "nodes": [{"id": f"n{i}", "elementRef": f"e{i}"} for i in range(count)],
+    }
+    relations = [{"source": f"e{i}", "target": f"e{(i * 7 + 1) % count}"} for i in range(count)]
+
+    started = time.perf_counter()
+    placed = auto_layout_view(view, relations)
+    elapsed = time.perf_counter() - started
+
+    assert placed == count
+    assert elapsed < 1.0
+    rows: dict = {}
+    for node in view["nodes"]:
+        rows.setdefault(node["bounds"]["y"], []).append(node["bounds"])
+    for row in rows.values():
+        row.sort(key=lambda bounds: bounds["x"])
+        assert all(left["x"] + left["w"] <= right["x"] for left, right in zip(row, row[1:]))
+
+
+def test_finalize_datamodel_lays_out_added_view_nodes():
+    blueprint = operations._load_template_blueprint(SAMPLE_TEMPLATE)
+    view_id = blueprint["views"]["diagrams"][0]["id"]
+    datamodel = {
+        "elements": [{"id": "novo-el", "type": "ApplicationComponent", "name": "Novo"}],
+        "views": {
+            "diagrams": [
+                {
+                    "id": view_id,
+                    # sem id/referência, o contêiner entra como extra no merge com o template
+                    "nodes": [
+                        {
+                            "type": "Container",
+                            "label": "Novo grupo",
+                            "nodes": [{"id": "novo-no", "type": "Element", "elementRef": "novo-el"}],
+                        }
+                    ],
+                }
+            ]
+        },
+    }
+
+    result = finalize_datamodel(json.dumps(datamodel), str(SAMPLE_TEMPLATE))
+
+    assert result["auto_layout_nodes"] == 2
+    diagram = result["datamodel"]["views"]["diagrams"][0]
+    added = diagram["nodes"][-1]
+    assert added["label"] == "Novo grupo"
+    assert _inside(added["nodes"][0]["bounds"], added["bounds"])
+    for node in diagram["nodes"][:-1]:
+        if node.get("bounds"):
+            assert not _overlaps(added["bounds"], node["bounds"])
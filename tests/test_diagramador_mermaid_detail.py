@@ -0,0 +1,109 @@
+from __future__ import annotations
+from pathlib import Path
+import json
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+from unittest import mock
+
+import pytest
+
+from tools.diagramador import generate_mermaid_preview
+from tools.diagramador import operations
+
+
+@pytest.fixture(autouse=True)
+def offline_preview(monkeypatch):
+    response = mock.Mock()
+    response.raise_for_status = mock.Mock()
+    response.text = "<svg id='mermaidInkSvg'></svg>"
+    monkeypatch.setattr(operations, "_mermaid_validation_request", mock.Mock(return_value=response))
+    monkeypatch.setattr(operations, "FETCH_MERMAID_IMAGES", False)
+
+
+def _large_datamodel(groups: int = 6, per_group: int = 20) -> str:
+    elements = [
+        {
+            "id": f"e{g}_{i}",
+            "type": "ApplicationComponent",
+            "name": f"Componente {g}.{i}",
+            "documentation": "Documentação longa " * 20,
+        }
+        for g in range(groups)
+        for i in range(per_group)
+    ]
+    nodes = [
+        {
+            "id": f"g{g}",
+            "type": "Container",
+            "label": f"Grupo {g}",
+            "nodes": [
+                {"id": f"n{g}_{i}", "type": "Element", "elementRef": f"e{g}_{i}"}
+                for i in range(per_group)
+            ],
+        }
+        for g in range(groups)
+    ]
+    connections = [
+        {"id": f"c{g}", "type": "Flow", "source": f"n{g}_0", "target": f"n{(g + 1) % groups}_1"}
+        for g in range(groups)
+    ]
+    return json.dumps(
+        {
+            "elements": elements,
+            "views": {"diagrams": [{"id": "big", "name": "Grande", "nodes": nodes, "connections": connections}]},
+        }
+    )
+
+
+def test_auto_detail_compacts_large_views_into_subgraphs():
+    view = generate_mermaid_preview(_large_datamodel())["views"][0]
+
+    assert view["detail"] == "compact"
+    assert "parts" not in view
+    mermaid = view["mermaid"]
+    assert 'subgraph g0["Grupo 0<br/>Tipo: Container"];' in mermaid
+    assert "Documentação" not in mermaid
+    assert "g0 --> n0_0" not in mermaid
+    assert "n0_0 -->|Flow| n1_1;" in mermaid
+    # os metadados continuam completos
+    assert view["nodes"][1]["documentation"].startswith("Documentação longa")
+
+    full = generate_mermaid_preview(_large_datamodel(), detail="full")["views"][0]
+    assert full["detail"] == "full"
+    assert "Documentação" in full["mermaid"]
+
+
+def test_compact_detail_splits_views_into_linked_parts(monkeypatch):
+    monkeypatch.setattr(operations, "MERMAID_MAX_NODES_PER_RENDER", 45)
+
+    view = generate_mermaid_preview(_large_datamodel())["views"][0]
+
+    parts = view["parts"]
+    assert len(parts) == 3
+    assert all(part["node_count"] <= 45 for part in parts)
+    assert sum(part["node_count"] for part in parts) == 6 * 21
+    assert view["mermaid"] == parts[0]["mermaid"]
+    assert parts[0]["mermaid"].count('subgraph big["Grande (parte 1/3)"]') == 1
+    # g1 -> g2 cruza da parte 1 para a 2 e vira um nó de ligação
+    assert {"alias": "n2_1", "part": 2} in parts[0]["links"]
+    assert 'ext_n2_1(["Parte 2: Componente 2.1"]);' in parts[0]["mermaid"]
+    assert "n1_0 -->|Flow| ext_n2_1;" in parts[0]["mermaid"]
+    assert [part["alias"] for part in parts] == ["big_parte_1", "big_parte_2", "big_parte_3"]
+    assert all(part["image"]["body"]["diagram_source"] == part["mermaid"] for part in parts)
+    assert view["image"] is parts[0]["image"]
+
+
+def test_compact_detail_bounds_characters_by_opening_containers(monkeypatch):
+    monkeypatch.setattr(operations, "MERMAID_MAX_CHARS_PER_RENDER", 1500)
+
+    view = generate_mermaid_preview(_large_datamodel(groups=1, per_group=60), detail="compact")["views"][0]
+
+    parts = view["parts"]
+    assert len(parts) > 1
+    assert all(len(part["mermaid"]) <= 1500 for part in parts)
+    # o contêiner aberto continua agrupando os filhos em cada parte
+    assert all('subgraph g0["Grupo 0<br/>Tipo: Container"];' in part["mermaid"] for part in parts)
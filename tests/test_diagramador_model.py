@@ -0,0 +1,101 @@
+from __future__ import annotations
+from pathlib import Path
+import json
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+
+from tools.diagramador import DEFAULT_TEMPLATE, TemplateModel, ViewNode
+from tools.diagramador import operations
+from tools.diagramador.model import (
+    deep_sizeof,
+    payload_child_nodes,
+    payload_ref,
+    view_node_key,
+    walk_payload_nodes,
+)
+
+SAMPLE_TEMPLATE = operations._resolve_package_path(DEFAULT_TEMPLATE)
+
+
+def _synthetic_blueprint(size: int) -> dict:
+    elements = [
+        {
+            "id": f"id-{i:06d}",
+            "type": "ApplicationComponent",
+            "name": {"text": f"Componente {i}", "lang": "pt"},
+        }
+        for i in range(size)
+    ]
+    relations = [
+        {
+            "id": f"rel-{i:06d}",
+            "type": "Serving",
+            "source": f"id-{i:06d}",
+            "target": f"id-{(i + 1) % size:06d}",
+        }
+        for i in range(size)
+    ]
+    nodes = [
+        {
+            "id": f"node-{i:06d}",
+            "type": "Element",
+            "bounds": {"x": i, "y": i, "w": 120, "h": 55},
+            "elementRef": f"id-{i:06d}",
+        }
+        for i in range(size)
+    ]
+    blueprint = {
+        "model_identifier": "model",
+        "elements": elements,
+        "relations": relations,
+        "views": {"diagrams": [{"id": "view", "name": {"text": "Visão"}, "nodes": nodes}]},
+    }
+    # strings independentes, como após um json.loads
+    return json.loads(json.dumps(blueprint))
+
+
+def test_template_model_round_trips_blueprint():
+    model = operations._parse_template_model(SAMPLE_TEMPLATE)
+    blueprint = model.to_blueprint()
+    assert TemplateModel.from_blueprint(blueprint).to_blueprint() == blueprint
+    assert json.dumps(blueprint) == json.dumps(TemplateModel.from_blueprint(blueprint).to_blueprint())
+
+
+def test_view_node_resolves_refs_and_key():
+    node = ViewNode.from_dict({"refs": {"elementRef": "el-1"}, "label": "Nó"})
+    assert node.ref("elementRef") == "el-1"
+    assert node.key() == "elementRef:el-1"
+    assert node.to_dict() == {"refs": {"elementRef": "el-1"}, "label": "Nó"}
+
+
+def test_payload_helpers_follow_xml_generator_rules():
+    view = {
+        "nodes": [
+            {"identifier": "grp", "children": [{"refs": {"elementRef": "e1"}}]},
+            # ``nodes`` presente, mesmo vazio, prevalece sobre ``children``
+            {"id": "vazio", "nodes": [], "children": [{"id": "ignorado"}]},
+        ]
+    }
+
+    assert payload_child_nodes(view["nodes"][0])[0] == "children"
+    assert payload_child_nodes(view["nodes"][1]) == ("nodes", [])
+    walked = list(walk_payload_nodes(payload_child_nodes(view)[1]))
+    assert [view_node_key(node) for node in walked] == ["grp", "elementRef:e1", "vazio"]
+    assert payload_ref(walked[1], "elementRef") == "e1"
+    assert payload_ref(walked[1], "viewRef") is None
+
+
+def test_identifiers_are_interned():
+    model = TemplateModel.from_blueprint(_synthetic_blueprint(10))
+    node = model.diagrams[0].nodes[3]
+    assert node.element_ref is model.elements[3].id
+
+
+def test_typed_model_uses_less_memory_than_dicts():
+    blueprint = _synthetic_blueprint(10_000)
+    model = TemplateModel.from_blueprint(_synthetic_blueprint(10_000))
+    assert deep_sizeof(model) < deep_sizeof(blueprint) * 0.75
@@ -20,8 +20,10 @@ from tools.diagramador import (
     finalize_datamodel,
     generate_archimate_diagram,
     generate_mermaid_preview,
+    get_cached_blueprint,
     list_templates,
     save_datamodel,
+    session_state_footprint,
 )
 from tools.diagramador import operations
 
@@ -66,12 +68,65 @@ def test_describe_template_stores_blueprint(session_state):
     cache = bucket[BLUEPRINT_CACHE_KEY]
     resolved = str(SAMPLE_TEMPLATE.resolve())
     assert resolved in cache
+    assert set(cache[resolved]) == {"path", "fingerprint", "bytes"}
+
+
+def test_session_state_keeps_only_blueprint_handles(session_state):
+    describe_template(str(SAMPLE_TEMPLATE), session_state=session_state)
+    footprint = session_state_footprint(session_state)
+    assert footprint["templates"] == 1
+    assert footprint["state_bytes"] < 1024
+    assert footprint["blueprint_bytes"] > 50 * footprint["state_bytes"]
+    assert footprint["saved_bytes"] > 0
+
+    blueprint = get_cached_blueprint(session_state, SAMPLE_TEMPLATE)
+    assert blueprint == operations._load_template_blueprint(SAMPLE_TEMPLATE)
+    blueprint["elements"].clear()
+    assert get_cached_blueprint(session_state, SAMPLE_TEMPLATE)["elements"]
+
+
+def test_blueprint_handle_rehydrates_after_store_eviction(session_state):
+    describe_template(str(SAMPLE_TEMPLATE), session_state=session_state)
+    handle = dict(session_state[SESSION_STATE_ROOT][BLUEPRINT_CACHE_KEY][str(SAMPLE_TEMPLATE.resolve())])
+    operations.invalidate_template_caches()
+    assert get_cached_blueprint(session_state, SAMPLE_TEMPLATE) is None
+
+    result = finalize_datamodel(SAMPLE_DATAMODEL.read_text(encoding="utf-8"), str(SAMPLE_TEMPLATE), session_state=session_state)
+    assert result["element_count"] > 0
+    assert session_state[SESSION_STATE_ROOT][BLUEPRINT_CACHE_KEY][str(SAMPLE_TEMPLATE.resolve())] == handle
+    assert get_cached_blueprint(session_state, SAMPLE_TEMPLATE) is not None
+
+
+def test_template_blueprint_built_only_when_needed(session_state, monkeypatch):
+    operations.invalidate_template_caches()
+    to_blueprint = mock.Mock(wraps=operations.TemplateModel.to_blueprint)
+    store = mock.Mock(wraps=operations.store_blueprint)
+    monkeypatch.setattr(operations.TemplateModel, "to_blueprint", lambda self: to_blueprint(self))
+    monkeypatch.setattr(operations, "store_blueprint", store)
+
+    operations._resolve_template_model(None, SAMPLE_TEMPLATE)
+    assert (to_blueprint.call_count, store.call_count) == (0, 0)
+
+    # a comparação reaproveita o blueprint montado para registrar o handle
+    operations.diff_datamodels("{}", template_path=str(SAMPLE_TEMPLATE), session_state=session_state)
+    assert (to_blueprint.call_count, store.call_count) == (1, 1)
+    operations._resolve_template_model(session_state, SAMPLE_TEMPLATE)
+    assert (to_blueprint.call_count, store.call_count) == (1, 1)
+
+
+def test_legacy_full_blueprint_in_state_becomes_handle(session_state):
+    blueprint = operations._load_template_blueprint(SAMPLE_TEMPLATE)
+    resolved = str(SAMPLE_TEMPLATE.resolve())
+    session_state[SESSION_STATE_ROOT] = {BLUEPRINT_CACHE_KEY: {resolved: blueprint}}
+
+    assert get_cached_blueprint(session_state, SAMPLE_TEMPLATE) == blueprint
+    assert set(session_state[SESSION_STATE_ROOT][BLUEPRINT_CACHE_KEY][resolved]) == {"path", "fingerprint", "bytes"}
 
 
 def test_finalize_datamodel_uses_cached_blueprint(sample_payload, session_state):
     describe_template(str(SAMPLE_TEMPLATE), session_state=session_state)
     with mock.patch(
-        "tools.diagramador.operations._parse_template_blueprint",
+        "tools.diagramador.operations._parse_template_model",
         side_effect=AssertionError("blueprint should be served from cache"),
     ):
         result = finalize_datamodel(
@@ -83,10 +138,31 @@ def test_finalize_datamodel_uses_cached_blueprint(sample_payload, session_state)
     assert "json" in result
 
 
+def test_finalize_datamodel_result_is_independent_of_inputs(sample_payload):
+    payload = json.loads(sample_payload)
+    views = payload.get("views") or {}
+    diagrams = views.get("diagrams") if isinstance(views, dict) else views
+    diagrams[0].setdefault("nodes", []).append(
+        {"label": "Extra", "nodes": [{"identifier": "child", "label": "Filho"}]}
+    )
+    raw = json.dumps(payload)
+
+    first = finalize_datamodel(raw, str(SAMPLE_TEMPLATE))
+    first_nodes = first["datamodel"]["views"]["diagrams"][0]["nodes"]
+    first_nodes[-1]["nodes"][0]["label"] = "alterado"
+    for node in first_nodes:
+        if node.get("style"):
+            node["style"].clear()
+
+    second = finalize_datamodel(raw, str(SAMPLE_TEMPLATE))
+    assert second["json"] == first["json"]
+    assert json.loads(second["json"]) == second["datamodel"]
+
+
 def test_generate_mermaid_preview_reuses_cache(sample_payload, session_state):
     describe_template(str(SAMPLE_TEMPLATE), session_state=session_state)
     with mock.patch(
-        "tools.diagramador.operations._parse_template_blueprint",
+        "tools.diagramador.operations._parse_template_model",
         side_effect=AssertionError("template parse should not run when cached"),
     ):
         preview = generate_mermaid_preview(
@@ -110,6 +186,27 @@ def test_generate_mermaid_preview_reuses_cache(sample_payload, session_state):
     )
 
 
+def test_generate_mermaid_preview_reuses_template_index(sample_payload):
+    operations._DERIVED_INDEX_CACHE.invalidate()
+    with mock.patch(
+        "tools.diagramador.operations._build_template_index",
+        wraps=operations._build_template_index,
+    ) as build_index:
+        first = generate_mermaid_preview(sample_payload, str(SAMPLE_TEMPLATE))
+        second = generate_mermaid_preview(sample_payload, str(SAMPLE_TEMPLATE))
+    assert build_index.call_count == 1
+    assert [view["mermaid"] for view in first["views"]] == [
+        view["mermaid"] for view in second["views"]
+    ]
+
+    model = operations._load_template_model(SAMPLE_TEMPLATE)
+    index = operations._DERIVED_INDEX_CACHE.peek(model.fingerprint)
+    element_id = model.elements[0].id
+    override = {"elements": [{"id": element_id, "name": "Nome da sessão"}]}
+    generate_mermaid_preview(json.dumps(override), str(SAMPLE_TEMPLATE))
+    assert "name" not in index.element_lookup[element_id]
+
+
 def test_generate_mermaid_preview_resolves_agent_relative_path(sample_payload):
     preview = generate_mermaid_preview(
         sample_payload,
@@ -364,6 +461,27 @@ def test_save_and_generate_archimate_diagram(tmp_path, sample_payload):
     assert xml_result["validation_report"]["valid"] is True
 
 
+def test_save_datamodel_streams_large_payloads(tmp_path, sample_payload):
+    expected = json.loads(sample_payload)
+    with mock.patch.object(operations, "OUTPUT_DIR", tmp_path), mock.patch.object(
+        operations, "STREAMING_JSON_THRESHOLD", 0
+    ), mock.patch.object(operations.json, "loads", side_effect=AssertionError("sem json.loads")):
+        result = save_datamodel(sample_payload, filename="grande.json")
+
+    assert Path(result["path"]).read_text(encoding="utf-8") == sample_payload
+    assert result["element_count"] == len(expected["elements"])
+    assert result["relationship_count"] == len(expected["relations"])
+    assert result["model_identifier"] == expected.get("model_identifier")
+
+    with mock.patch.object(operations, "OUTPUT_DIR", tmp_path), mock.patch.object(
+        operations, "STREAMING_JSON_THRESHOLD", 0
+    ):
+        for broken in ('{"elements": [', '{"elements": [{"id": "a"}]} trailing junk'):
+            with pytest.raises(ValueError):
+                save_datamodel(broken, filename="quebrado.json")
+    assert not (tmp_path / "quebrado.json").exists()
+
+
 def test_finalize_datamodel_resolves_agent_relative_path(sample_payload):
     result = finalize_datamodel(
         sample_payload,
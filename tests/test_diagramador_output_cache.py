@@ -0,0 +1,86 @@
+from __future__ import annotations
+from pathlib import Path
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+from unittest import mock
+
+import pytest
+
+from tools.archimate_exchange import xml_exchange
+from tools.diagramador import DEFAULT_TEMPLATE, generate_archimate_diagram
+from tools.diagramador import operations
+
+SAMPLE_TEMPLATE = operations._resolve_package_path(DEFAULT_TEMPLATE)
+SAMPLE_DATAMODEL = operations._resolve_package_path(
+    Path("tools/archimate_exchange/samples/pix_solution_case/pix_container_datamodel.json")
+)
+
+
+@pytest.fixture()
+def spies(monkeypatch, tmp_path):
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path / "outputs")
+    monkeypatch.setattr(operations, "OUTPUT_CACHE", True)
+    patch = mock.Mock(wraps=xml_exchange.patch_template_with_model)
+    validate = mock.Mock(wraps=xml_exchange.validate_in_stages)
+    monkeypatch.setattr(xml_exchange, "patch_template_with_model", patch)
+    monkeypatch.setattr(xml_exchange, "validate_in_stages", validate)
+    # só datamodels salvos no diretório de saída são aceitos
+    model = tmp_path / "outputs" / "datamodel.json"
+    model.parent.mkdir()
+    model.write_bytes(SAMPLE_DATAMODEL.read_bytes())
+    return patch, validate, model
+
+
+def _generate(model: Path, **kwargs):
+    return generate_archimate_diagram(
+        str(model), template_path=str(SAMPLE_TEMPLATE), **kwargs
+    )
+
+
+def test_identical_inputs_reuse_xml_and_validation_report(spies):
+    patch, validate, model = spies
+
+    first = _generate(model)
+    second = _generate(model)
+
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["validation_report"] == first["validation_report"]
+    assert second["validation_report"]["valid"] is True
+    assert patch.call_count == 1 and validate.call_count == 1
+
+    forced = _generate(model, force=True)
+    assert forced["cached"] is False
+    assert patch.call_count == 2 and validate.call_count == 2
+
+
+def test_changed_inputs_or_edited_output_regenerate(spies):
+    patch, validate, model = spies
+    xml_path = Path(_generate(model)["path"])
+
+    # outra etapa de validação reaproveita o XML e só valida de novo
+    assert _generate(model, full_xsd=False)["cached"] is True
+    assert (patch.call_count, validate.call_count) == (1, 2)
+    assert _generate(model, full_xsd=False)["validation_report"]["stage"] == "structural"
+    assert validate.call_count == 2
+
+    xml_path.write_text(xml_path.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+    assert _generate(model)["cached"] is False
+
+    model.write_text(model.read_text(encoding="utf-8").replace("PIX", "Pix"), encoding="utf-8")
+    assert _generate(model)["cached"] is False
+    assert patch.call_count == 3
+
+
+def test_output_cache_can_be_disabled(spies, monkeypatch):
+    patch, _validate, model = spies
+    monkeypatch.setattr(operations, "OUTPUT_CACHE", False)
+
+    results = [_generate(model, validate=False) for _ in range(2)]
+
+    assert [result["cached"] for result in results] == [False, False]
+    assert patch.call_count == 2
+    assert not Path(results[0]["path"] + ".manifest.json").exists()
@@ -0,0 +1,175 @@
+from __future__ import annotations
+from pathlib import Path
+import asyncio
+import json
+import sys
+import threading
+import time
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+from unittest import mock
+
+import pytest
+import requests
+
+from tools.diagramador import RendererBusyError, RenderLimiter, generate_mermaid_preview
+from tools.diagramador import operations, rate_limit, renderer_pool
+from tools.diagramador.rate_limit import TokenBucket, track_queue_time
+
+
+def test_token_bucket_spaces_reservations_beyond_burst():
+    bucket = TokenBucket(rate=10, burst=2)
+
+    delays = [bucket.reserve(timeout=1.0) for _ in range(4)]
+
+    assert delays[:2] == [0.0, 0.0]
+    assert delays[2] == pytest.approx(0.1, abs=0.01)
+    assert delays[3] == pytest.approx(0.2, abs=0.01)
+    # a próxima ficha sairia depois do tempo máximo de espera
+    assert bucket.reserve(timeout=0.1) is None
+
+
+def test_host_semaphore_bounds_concurrency_and_wait():
+    limiter = RenderLimiter(rate=0, burst=1, per_host=1, queue_timeout=0.05)
+    holding = threading.Event()
+    release = threading.Event()
+
+    def _hold():
+        with limiter.slot("https://kroki.example/"):
+            holding.set()
+            release.wait(1)
+
+    worker = threading.Thread(target=_hold)
+    worker.start()
+    holding.wait(1)
+    try:
+        with pytest.raises(RendererBusyError):
+            with limiter.slot("https://kroki.example/png"):
+                pass
+        # outro host tem a própria vaga
+        with track_queue_time() as waits:
+            with limiter.slot("https://mermaid.example/svg/x"):
+                pass
+        assert len(waits) == 1
+    finally:
+        release.set()
+        worker.join()
+
+    assert isinstance(RendererBusyError("x"), requests.RequestException)
+
+
+def test_async_slot_waits_for_free_slot():
+    limiter = RenderLimiter(rate=0, burst=1, per_host=1, queue_timeout=1.0)
+
+    async def _scenario():
+        async def _call(hold: float) -> float:
+            async with limiter.aslot("https://kroki.example/") as waited:
+                await asyncio.sleep(hold)
+                return waited
+
+        return await asyncio.gather(_call(0.05), _call(0))
+
+    first, second = asyncio.run(_scenario())
+
+    assert first < 0.02
+    assert second >= 0.04
+
+
+def test_async_slot_is_woken_by_release_from_another_thread():
+    limiter = RenderLimiter(rate=0, burst=1, per_host=1, queue_timeout=2.0)
+    holding = threading.Event()
+
+    def _hold():
+        with limiter.slot("https://kroki.example/"):
+            holding.set()
+            time.sleep(0.05)
+
+    async def _wait() -> float:
+        async with limiter.aslot("https://kroki.example/") as waited:
+            return waited
+
+    worker = threading.Thread(target=_hold)
+    worker.start()
+    holding.wait(1)
+    waited = asyncio.run(_wait())
+    worker.join()
+
+    assert 0.02 <= waited < 1.0
+
+
+def test_slot_refunds_token_when_host_stays_busy():
+    limiter = RenderLimiter(rate=1, burst=2, per_host=1, queue_timeout=0.05)
+
+    async def _busy():
+        async with limiter.aslot("https://kroki.example/"):
+            with pytest.raises(RendererBusyError):
+                async with limiter.aslot("https://kroki.example/"):
+                    pass
+
+    asyncio.run(_busy())
+    # a ficha da chamada recusada voltou ao balde: ainda há uma para usar já
+    assert limiter.bucket.reserve(timeout=0) == 0.0
+
+    limiter = RenderLimiter(rate=1, burst=2, per_host=1, queue_timeout=0.05)
+    with limiter.slot("https://kroki.example/"):
+        with pytest.raises(RendererBusyError):
+            with limiter.slot("https://kroki.example/"):
+                pass
+    assert limiter.bucket.reserve(timeout=0) == 0.0
+
+
+def test_preview_reports_queue_time_per_view(monkeypatch, tmp_path):
+    validation = mock.Mock()
+    validation.return_value.text = "<svg id='mermaidInkSvg'></svg>"
+    monkeypatch.setattr(operations, "_mermaid_validation_request", validation)
+    monkeypatch.setattr(operations, "FETCH_MERMAID_IMAGES", True)
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(renderer_pool, "_ACTIVE_POOL", None)
+    monkeypatch.setattr(
+        rate_limit, "_ACTIVE_LIMITER", RenderLimiter(rate=5, burst=1, per_host=4, queue_timeout=5)
+    )
+    response = mock.Mock(headers={"Content-Type": "image/png"}, content=b"PNGDATA")
+    monkeypatch.setattr(renderer_pool.requests, "post", mock.Mock(return_value=response))
+    renderer_pool.configure_renderer_pool(["https://kroki.example"], health_interval=0)
+    datamodel = {
+        "views": {
+            "diagrams": [
+                {"id": f"v{i}", "name": f"V{i}", "nodes": [{"id": f"n{i}"}]} for i in range(3)
+            ]
+        }
+    }
+
+    views = generate_mermaid_preview(json.dumps(datamodel))["views"]
+
+    assert [view["image"]["status"] for view in views] == ["cached"] * 3
+    # rajada de 1 a 5/s: a primeira visão passa direto, as demais esperam ~200 ms cada
+    assert views[0]["queue_ms"] < 20
+    assert all(view["queue_ms"] >= 100 for view in views[1:])
+
+
+def test_busy_renderer_degrades_preview_without_marking_endpoint(monkeypatch, tmp_path):
+    validation = mock.Mock()
+    validation.return_value.text = "<svg id='mermaidInkSvg'></svg>"
+    monkeypatch.setattr(operations, "_mermaid_validation_request", validation)
+    monkeypatch.setattr(operations, "FETCH_MERMAID_IMAGES", True)
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(renderer_pool, "_ACTIVE_POOL", None)
+    limiter = RenderLimiter(rate=1, burst=1, per_host=1, queue_timeout=0)
+    limiter.bucket.reserve(timeout=1)
+    monkeypatch.setattr(rate_limit, "_ACTIVE_LIMITER", limiter)
+    post = mock.Mock()
+    monkeypatch.setattr(renderer_pool.requests, "post", post)
+    pool = renderer_pool.configure_renderer_pool(["https://kroki.example"], health_interval=0)
+    datamodel = {"views": {"diagrams": [{"id": "v1", "name": "V", "nodes": [{"id": "n1"}]}]}}
+
+    started = time.perf_counter()
+    view = generate_mermaid_preview(json.dumps(datamodel))["views"][0]
+
+    assert time.perf_counter() - started < 1
+    assert "path" not in view["image"]
+    post.assert_not_called()
+    assert pool.stats()[0]["healthy"] is True
+    assert pool.stats()[0]["outstanding"] == 0
@@ -0,0 +1,264 @@
+from __future__ import annotations
+from pathlib import Path
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+from unittest import mock
+
+import pytest
+import requests
+
+from tools.diagramador import (
+    RendererBusyError,
+    RendererPool,
+    RenderLimiter,
+    configure_renderer_pool,
+    generate_mermaid_preview,
+)
+from tools.diagramador import operations, rate_limit, renderer_pool
+
+
+class _KrokiStandIn:
+    """Servidor HTTP local que imita o Kroki (POST /) e a rota ``/health``."""
+
+    def __init__(self, *, status: int = 200, delay: float = 0.0) -> None:
+        self.status = status
+        self.delay = delay
+        self.renders = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):  # noqa: D401 - silencia o log do http.server
+                return
+
+            def _reply(self, status: int, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply(stand_in.status, b"{}", "application/json")
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                stand_in.renders += 1
+                time.sleep(stand_in.delay)
+                if stand_in.status >= 400:
+                    self._reply(stand_in.status, b"erro", "text/plain")
+                else:
+                    self._reply(200, b"PNGDATA", "image/png")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture()
+def stand_ins():
+    servers = []
+
+    def _start(**options):
+        server = _KrokiStandIn(**options)
+        servers.append(server)
+        return server
+
+    yield _start
+    for server in servers:
+        server.close()
+
+
+def _render(pool: RendererPool):
+    response, endpoint = pool.post(
+        "/", json={"diagram_source": "flowchart TD; A-->B;"}, timeout=5
+    )
+    return response.content, endpoint
+
+
+def test_round_robin_spreads_renders_across_endpoints(stand_ins):
+    first, second = stand_ins(), stand_ins()
+    pool = RendererPool([first.url, second.url], strategy="round_robin")
+
+    endpoints = [_render(pool)[1] for _ in range(6)]
+
+    assert first.renders == second.renders == 3
+    assert endpoints[:2] == [first.url, second.url]
+
+
+def test_least_outstanding_prefers_idle_endpoint(stand_ins):
+    busy, idle = stand_ins(), stand_ins()
+    pool = RendererPool([busy.url, idle.url])
+    pool.endpoints[0].outstanding = 5
+
+    assert [_render(pool)[1] for _ in range(3)] == [idle.url] * 3
+    assert pool.stats()[1]["outstanding"] == 0
+
+
+def test_failed_endpoint_is_retried_elsewhere_and_restored_by_probe(stand_ins):
+    broken, healthy = stand_ins(status=503), stand_ins()
+    pool = RendererPool(
+        [broken.url, healthy.url], strategy="round_robin", backoff=0.001, failure_threshold=2
+    )
+
+    results = [_render(pool) for _ in range(4)]
+
+    assert all(content == b"PNGDATA" and endpoint == healthy.url for content, endpoint in results)
+    assert broken.renders == 2
+    assert pool.stats()[0]["healthy"] is False
+
+    broken.status = 200
+    assert pool.probe()[0]["healthy"] is True
+    assert {_render(pool)[1] for _ in range(2)} == {broken.url, healthy.url}
+
+
+def test_client_errors_are_not_retried(stand_ins):
+    rejecting = stand_ins(status=400)
+    pool = RendererPool([rejecting.url, stand_ins().url], strategy="round_robin")
+
+    with pytest.raises(requests.HTTPError):
+        _render(pool)
+    assert rejecting.renders == 1
+    assert pool.stats()[0]["healthy"] is True
+
+
+def test_slow_endpoint_is_hedged_when_p95_exceeds_threshold(stand_ins):
+    slow, fast = stand_ins(delay=0.6), stand_ins()
+    pool = RendererPool([slow.url, fast.url], strategy="round_robin", hedge_after=0.05)
+    pool.endpoints[0].latencies.extend([0.6] * 10)
+
+    started = time.perf_counter()
+    content, endpoint = _render(pool)
+    elapsed = time.perf_counter() - started
+
+    assert content == b"PNGDATA"
+    assert endpoint == fast.url
+    assert elapsed < 0.5
+    assert slow.renders == 1 and fast.renders == 1
+    pool.close()
+
+
+def test_release_without_response_keeps_endpoint_out_of_rotation(monkeypatch):
+    pool = RendererPool(["https://slow.example", "https://fast.example"], hedge_after=0.02)
+    slow = pool.endpoints[0]
+    slow.healthy, slow.consecutive_failures = False, 5
+    slow.latencies.extend([1.0] * 10)
+
+    slow.outstanding = 1
+    pool._release(slow, None, None)
+    assert (slow.healthy, slow.consecutive_failures, slow.outstanding) == (False, 5, 0)
+
+    busy = RenderLimiter(rate=1, burst=1, per_host=1, queue_timeout=0)
+    busy.bucket.reserve(timeout=1)
+    monkeypatch.setattr(rate_limit, "_ACTIVE_LIMITER", busy)
+    slow.outstanding = 1
+    with pytest.raises(RendererBusyError):
+        pool._send(slow, "/", {})
+    assert (slow.healthy, slow.consecutive_failures, slow.outstanding) == (False, 5, 0)
+
+    class _Client:
+        async def post(self, url, **kwargs):
+            await asyncio.sleep(1.0 if url.startswith(slow.url) else 0)
+            return mock.Mock(raise_for_status=mock.Mock())
+
+    # o primário lento perde o hedge: o cancelamento não o devolve ao rodízio
+    monkeypatch.setattr(rate_limit, "_ACTIVE_LIMITER", RenderLimiter(rate=0, burst=1))
+    slow.outstanding = 1
+    _response, endpoint = asyncio.run(pool._asend_hedged(_Client(), slow, "/", {}))
+    assert endpoint == "https://fast.example"
+    assert (slow.healthy, slow.consecutive_failures, slow.outstanding) == (False, 5, 0)
+    assert pool.endpoints[1].healthy is True
+
+
+def test_preview_renders_through_configured_pool(stand_ins, monkeypatch, tmp_path):
+    broken, healthy = stand_ins(status=502), stand_ins()
+    validation = mock.Mock()
+    validation.return_value.text = "<svg id='mermaidInkSvg'></svg>"
+    monkeypatch.setattr(operations, "_mermaid_validation_request", validation)
+    monkeypatch.setattr(operations, "FETCH_MERMAID_IMAGES", True)
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(renderer_pool, "_ACTIVE_POOL", None)
+    pool = configure_renderer_pool(
+        [broken.url, healthy.url], health_interval=0, strategy="round_robin", backoff=0.001
+    )
+    datamodel = {"views": {"diagrams": [{"id": "v1", "name": "V", "nodes": [{"id": "n1"}]}]}}
+
+    try:
+        image = generate_mermaid_preview(json.dumps(datamodel))["views"][0]["image"]
+    finally:
+        pool.close()
+
+    assert image["status"] == "cached"
+    assert image["url"] == f"{healthy.url}/"
+    assert Path(image["path"]).read_bytes() == b"PNGDATA"
+
+
+def test_async_pool_retries_rejects_and_hedges_over_httpx(monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    monkeypatch.setattr(rate_limit, "_ACTIVE_LIMITER", RenderLimiter(rate=0, burst=1))
+    hosts = {"broken.example": (503, 0.0), "fast.example": (200, 0.0), "slow.example": (200, 0.6)}
+    hosts["rejecting.example"] = (400, 0.0)
+    renders: list = []
+
+    async def _kroki(request):
+        status, delay = hosts[request.url.host]
+        renders.append(request.url.host)
+        await asyncio.sleep(delay)
+        return httpx.Response(status, headers={"Content-Type": "image/png"}, content=b"PNGDATA")
+
+    async def _post(pool: RendererPool):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(_kroki)) as client:
+            started = time.perf_counter()
+            response, endpoint = await pool.apost(
+                client, "/", json={"diagram_source": "x"}, timeout=5
+            )
+            return response.content, endpoint, time.perf_counter() - started
+
+    pool = RendererPool(
+        ["https://broken.example", "https://fast.example"],
+        strategy="round_robin",
+        backoff=0.001,
+        failure_threshold=1,
+    )
+    content, endpoint, _ = asyncio.run(_post(pool))
+    assert (content, endpoint) == (b"PNGDATA", "https://fast.example")
+    assert renders == ["broken.example", "fast.example"]
+    assert [item["healthy"] for item in pool.stats()] == [False, True]
+    assert [item["outstanding"] for item in pool.stats()] == [0, 0]
+
+    renders.clear()
+    pool = RendererPool(
+        ["https://rejecting.example", "https://fast.example"], strategy="round_robin"
+    )
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(_post(pool))
+    assert renders == ["rejecting.example"]
+    assert pool.stats()[0]["healthy"] is True
+
+    renders.clear()
+    pool = RendererPool(
+        ["https://slow.example", "https://fast.example"], strategy="round_robin", hedge_after=0.05
+    )
+    pool.endpoints[0].latencies.extend([0.6] * 10)
+    content, endpoint, elapsed = asyncio.run(_post(pool))
+    assert (content, endpoint) == (b"PNGDATA", "https://fast.example")
+    assert elapsed < 0.5
+    assert sorted(renders) == ["fast.example", "slow.example"]
+    # o primário cancelado não conta como amostra nem como falha
+    assert pool.stats()[0]["outstanding"] == 0
+    assert len(pool.endpoints[0].latencies) == 10
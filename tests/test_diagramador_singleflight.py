@@ -0,0 +1,157 @@
+from __future__ import annotations
+from pathlib import Path
+import asyncio
+import sys
+import threading
+import time
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+from unittest import mock
+
+import pytest
+
+from tools.diagramador import RenderLimiter, async_operations, operations, rate_limit, renderer_pool
+from tools.diagramador.cache import SingleFlight
+
+
+def _concurrently(count: int, func):
+    barrier = threading.Barrier(count)
+    results: list = [None] * count
+
+    def _run(index: int) -> None:
+        barrier.wait()
+        results[index] = func(index)
+
+    threads = [threading.Thread(target=_run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_single_flight_shares_result_and_error_between_waiters():
+    flights = SingleFlight()
+    calls = []
+
+    def _slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "render"
+
+    outcomes = _concurrently(4, lambda _: flights.do("k", _slow))
+
+    assert calls == [1]
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True]
+    assert {result for result, _ in outcomes} == {"render"}
+    assert len(flights) == 0
+
+    def _boom():
+        raise ValueError("falhou")
+
+    with pytest.raises(ValueError):
+        flights.do("k", _boom)
+    # depois de terminar, a chave volta a executar normalmente
+    assert flights.do("k", lambda: 1) == (1, False)
+
+
+def test_async_single_flight_survives_leader_cancellation():
+    flights = SingleFlight()
+    calls = []
+
+    async def _render():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return b"PNG"
+
+    async def _scenario():
+        leader = asyncio.ensure_future(flights.ado("k", _render))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.ado("k", _render))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(_scenario()) == (b"PNG", True)
+    assert calls == [1]
+
+
+def test_concurrent_previews_of_identical_source_issue_one_render(monkeypatch, tmp_path):
+    monkeypatch.setattr(operations, "FETCH_MERMAID_IMAGES", True)
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(renderer_pool, "_ACTIVE_POOL", None)
+
+    def _slow_post(*args, **kwargs):
+        time.sleep(0.1)
+        return mock.Mock(headers={"Content-Type": "image/png"}, content=b"PNGDATA")
+
+    post = mock.Mock(side_effect=_slow_post)
+    monkeypatch.setattr(renderer_pool.requests, "post", post)
+    renderer_pool.configure_renderer_pool(["https://kroki.example"], health_interval=0)
+    mermaid = "flowchart TD; A-->B;"
+
+    images = _concurrently(
+        3,
+        lambda index: operations._build_mermaid_image_payload(
+            mermaid, alias=f"sessao{index}", title="V", output_dir=tmp_path / f"s{index}"
+        ),
+    )
+
+    assert post.call_count == 1
+    assert [image["status"] for image in images] == ["cached"] * 3
+    assert sum(bool(image.get("coalesced")) for image in images) == 2
+    # cada sessão grava a própria cópia
+    assert len({image["path"] for image in images}) == 3
+    assert all(Path(image["path"]).read_bytes() == b"PNGDATA" for image in images)
+
+    # formatos diferentes da mesma fonte não são agrupados
+    operations._build_mermaid_image_payload(mermaid, alias="svg", title="V", fmt="svg")
+    assert post.call_count == 2
+
+
+def test_async_followers_survive_leader_client_closing(monkeypatch, tmp_path):
+    httpx = pytest.importorskip("httpx")
+    monkeypatch.setattr(operations, "FETCH_MERMAID_IMAGES", True)
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(renderer_pool, "_ACTIVE_POOL", None)
+    monkeypatch.setattr(
+        rate_limit, "_ACTIVE_LIMITER", RenderLimiter(rate=0, per_host=1, queue_timeout=5)
+    )
+    pool = renderer_pool.configure_renderer_pool(["https://kroki.example"], health_interval=0)
+    renders = []
+
+    def _kroki(request):
+        renders.append(request.url)
+        return httpx.Response(200, headers={"Content-Type": "image/png"}, content=b"PNGDATA")
+
+    async def _preview(alias: str):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(_kroki)) as client:
+            return await async_operations._abuild_mermaid_image_payload(
+                "flowchart TD; A-->B;",
+                alias=alias,
+                title="V",
+                client=client,
+                output_dir=tmp_path / alias,
+            )
+
+    async def _scenario():
+        # o host está ocupado: o voo compartilhado fica na fila do limitador
+        async with rate_limit.get_render_limiter().aslot("https://kroki.example/"):
+            leader = asyncio.ensure_future(_preview("lider"))
+            await asyncio.sleep(0.02)
+            follower = asyncio.ensure_future(_preview("seguidor"))
+            await asyncio.sleep(0.02)
+            leader.cancel()
+            await asyncio.gather(leader, return_exceptions=True)
+        return await follower
+
+    image = asyncio.run(_scenario())
+
+    assert image["status"] == "cached"
+    assert Path(image["path"]).read_bytes() == b"PNGDATA"
+    assert "coalesced" not in image
+    assert len(renders) == 1
+    assert pool.stats()[0]["outstanding"] == 0
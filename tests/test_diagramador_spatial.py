@@ -0,0 +1,184 @@
+from __future__ import annotations
+from pathlib import Path
+import json
+import random
+import sys
+import time
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+
+from tools.diagramador import (
+    DEFAULT_TEMPLATE,
+    GridIndex,
+    analyze_view_geometry,
+    check_view_geometry,
+    finalize_datamodel,
+)
+from tools.diagramador import operations
+
+SAMPLE_TEMPLATE = operations._resolve_package_path(DEFAULT_TEMPLATE)
+
+
+def _bounds(x: float, y: float, w: float = 100, h: float = 50) -> dict:
+    return {"x": x, "y": y, "w": w, "h": h}
+
+
+def test_grid_index_returns_only_intersecting_boxes():
+    index = GridIndex.build([(0, 0, 100, 50), (100, 0, 100, 50), (50, 25, 100, 50), (900, 900, 10, 10)])
+
+    # encostar na borda não conta como interseção
+    assert index.query((0, 0, 100, 50)) == [0, 2]
+    assert index.query((500, 500, 10, 10)) == []
+
+
+def test_analyze_view_geometry_reports_siblings_containers_and_bounds():
+    view = {
+        "id": "v1",
+        "nodes": [
+            {
+                "id": "grp",
+                "type": "Container",
+                "bounds": _bounds(0, 0, 300, 200),
+                "children": [
+                    {"id": "a", "bounds": _bounds(10, 10)},
+                    {"id": "b", "bounds": _bounds(60, 30)},
+                    {"id": "c", "bounds": _bounds(250, 180)},
+                ],
+            },
+            # sobrepõe "a" mas não é irmão dele: só conta contra "grp"
+            {"id": "d", "bounds": _bounds(290, 10)},
+            {"id": "vazio", "type": "Container", "bounds": _bounds(500, 0)},
+            {"id": "sem-bounds", "elementRef": "x"},
+        ],
+    }
+
+    report = analyze_view_geometry(view)
+
+    assert report["valid"] is False
+    assert report["node_count"] == 7
+    assert report["counts"] == {
+        "overlaps": 2,
+        "outside_container": 1,
+        "empty_containers": 1,
+        "missing_bounds": 1,
+    }
+    assert {"a": "a", "b": "b", "area": 1500.0} in report["overlaps"]
+    assert {"a": "grp", "b": "d", "area": 500.0} in report["overlaps"]
+    assert report["outside_container"] == [
+        {"node": "c", "parent": "grp", "overflow": {"right": 50.0, "bottom": 30.0}}
+    ]
+    assert report["empty_containers"] == ["vazio"]
+    assert report["missing_bounds"] == ["sem-bounds"]
+
+
+def test_analyze_view_geometry_scales_to_large_views():
+    rng = random.Random(7)
+    count = 10000
+    view = {
+        "id": "big",
+        "nodes": [
+            {"id": f"n{i}", "bounds": _bounds(rng.uniform(0, 40000), rng.uniform(0, 40000), 120, 55)}
+            for i in range(count)
+        ],
+    }
+
+    started = time.perf_counter()
+    report = analyze_view_geometry(view)
+    elapsed = time.perf_counter() - started
+
+    assert report["node_count"] == count
+    assert len(report["overlaps"]) <= 50
+    assert elapsed < 2.0
+
+
+def test_check_view_geometry_tool_and_finalize_summary():
+    datamodel = {
+        "views": {
+            "diagrams": [
+                {
+                    "id": "v1",
+                    "nodes": [
+                        {"id": "a", "bounds": _bounds(0, 0)},
+                        {"id": "b", "bounds": _bounds(20, 20)},
+                    ],
+                }
+            ]
+        }
+    }
+
+    result = check_view_geometry(json.dumps(datamodel))
+
+    assert result["valid"] is False
+    assert result["views_with_issues"] == ["v1"]
+    assert result["counts"]["overlaps"] == 1
+    assert result["views"][0]["overlaps"] == [{"a": "a", "b": "b", "area": 2400.0}]
+
+    blueprint = operations._load_template_blueprint(SAMPLE_TEMPLATE)
+    merged = check_view_geometry(json.dumps({}), template_path=str(SAMPLE_TEMPLATE))
+    assert len(merged["views"]) == len(blueprint["views"]["diagrams"])
+
+    finalized = finalize_datamodel(json.dumps({}), str(SAMPLE_TEMPLATE))
+    assert finalized["geometry"]["counts"] == merged["counts"]
+    assert "views" not in finalized["geometry"]
+
+
+def test_analyze_view_geometry_with_baseline_reports_only_changed_nodes():
+    template_view = {
+        "id": "v1",
+        "nodes": [
+            {"id": "a", "bounds": _bounds(0, 0)},
+            {"id": "b", "bounds": _bounds(20, 20)},
+            {"id": "c", "bounds": _bounds(400, 0)},
+            {"id": "vazio", "type": "Container", "bounds": _bounds(800, 0)},
+        ],
+    }
+
+    assert analyze_view_geometry(template_view)["counts"]["overlaps"] == 1
+    assert analyze_view_geometry(template_view, template_view)["valid"] is True
+
+    moved = json.loads(json.dumps(template_view))
+    moved["nodes"][2]["bounds"] = _bounds(30, 10)
+    report = analyze_view_geometry(moved, template_view)
+
+    # a sobreposição a/b e o contêiner vazio já vêm do template
+    assert report["counts"]["overlaps"] == 2
+    assert all("c" in (item["a"], item["b"]) for item in report["overlaps"])
+    assert report["empty_containers"] == []
+
+
+def test_pristine_template_geometry_is_valid():
+    result = check_view_geometry(json.dumps({}), template_path=str(SAMPLE_TEMPLATE))
+
+    assert result["valid"] is True
+    assert result["counts"]["overlaps"] == 0
+    assert result["counts"]["empty_containers"] == 0
+
+    finalized = finalize_datamodel(json.dumps({}), str(SAMPLE_TEMPLATE))
+    assert finalized["geometry"]["valid"] is True
+
+    blueprint_view = operations._load_template_blueprint(SAMPLE_TEMPLATE)["views"]["diagrams"][0]
+    view_id = blueprint_view["id"]
+    anchor = next(
+        node for node in blueprint_view["nodes"] if node.get("bounds") and node.get("type") == "Container"
+    )
+    bounds = anchor["bounds"]
+    added = {
+        "views": {
+            "diagrams": [
+                {
+                    "id": view_id,
+                    "nodes": [
+                        {"type": "Label", "label": "Nota", "bounds": _bounds(bounds["x"] + 10, bounds["y"] + 10)}
+                    ],
+                }
+            ]
+        }
+    }
+
+    flagged = check_view_geometry(json.dumps(added), template_path=str(SAMPLE_TEMPLATE))
+    assert flagged["valid"] is False
+    assert flagged["views_with_issues"] == [view_id]
+    assert flagged["counts"]["overlaps"] >= 1
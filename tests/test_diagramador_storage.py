@@ -0,0 +1,137 @@
+from __future__ import annotations
+from pathlib import Path
+import asyncio
+import importlib
+import json
+import sys
+import threading
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+
+import pytest
+from google.adk.tools.tool_context import ToolContext
+
+from tools.diagramador import SESSION_STATE_ROOT, operations, save_datamodel
+from tools.diagramador.storage import (
+    atomic_write_text,
+    file_lock,
+    namespaced_output_dir,
+)
+
+
+def test_sessions_get_distinct_output_directories(tmp_path):
+    first: dict = {}
+    second: dict = {}
+    dir_a = namespaced_output_dir(tmp_path, first)
+    dir_b = namespaced_output_dir(tmp_path, second)
+    assert dir_a != dir_b
+    assert dir_a.parent == tmp_path / "sessions"
+    assert namespaced_output_dir(tmp_path, first) == dir_a
+    assert namespaced_output_dir(tmp_path, None) == tmp_path
+    assert namespaced_output_dir(tmp_path, first, isolation="none") == tmp_path
+
+
+def test_invocation_isolation_creates_unique_directories(tmp_path):
+    runs = {namespaced_output_dir(tmp_path, isolation="invocation") for _ in range(5)}
+    assert len(runs) == 5
+
+
+def test_atomic_write_leaves_no_temporary_files(tmp_path):
+    target = tmp_path / "out" / "file.json"
+    atomic_write_text(target, "{}")
+    atomic_write_text(target, '{"a": 1}')
+    assert target.read_text(encoding="utf-8") == '{"a": 1}'
+    assert [p.name for p in target.parent.iterdir()] == ["file.json"]
+
+
+def test_file_lock_serializes_writers(tmp_path):
+    target = tmp_path / "shared.txt"
+    target.write_text("", encoding="utf-8")
+
+    def append(value: str) -> None:
+        for _ in range(20):
+            with file_lock(target):
+                current = target.read_text(encoding="utf-8")
+                atomic_write_text(target, current + value)
+
+    threads = [threading.Thread(target=append, args=(c,)) for c in "abcd"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(target.read_text(encoding="utf-8")) == 80
+
+
+def test_save_datamodel_uses_session_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path)
+    state_a: dict = {}
+    state_b: dict = {}
+    result_a = save_datamodel('{"model": "a"}', "modelo.json", session_state=state_a)
+    result_b = save_datamodel('{"model": "b"}', "modelo.json", session_state=state_b)
+    assert result_a["path"] != result_b["path"]
+    assert Path(result_a["path"]).read_text(encoding="utf-8") != Path(
+        result_b["path"]
+    ).read_text(encoding="utf-8")
+
+
+def test_agent_tools_isolate_outputs_by_tool_context(tmp_path, monkeypatch):
+    agent = importlib.import_module("agents.diagramador.agent")
+    # o agente importa o pacote pelo caminho completo (outro objeto de módulo)
+    agent_operations = importlib.import_module("agents.diagramador.tools.diagramador.operations")
+    monkeypatch.setattr(agent_operations, "OUTPUT_DIR", tmp_path)
+    context_a, context_b = ToolContext(), ToolContext()
+
+    path_a = agent.save_datamodel('{"model": "a"}', "modelo.json", tool_context=context_a)["path"]
+    path_b = asyncio.run(
+        agent.save_datamodel_async('{"model": "b"}', "modelo.json", tool_context=context_b)
+    )["path"]
+
+    assert Path(path_a).parent != Path(path_b).parent
+    assert {Path(path_a).parent.parent, Path(path_b).parent.parent} == {tmp_path / "sessions"}
+    assert "output_namespace" in context_a.state[SESSION_STATE_ROOT]
+    # a mesma sessão volta ao mesmo diretório
+    again = agent.save_datamodel('{"model": "c"}', "outro.json", tool_context=context_a)["path"]
+    assert Path(again).parent == Path(path_a).parent
+
+
+def test_save_datamodel_cannot_write_into_another_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path)
+    owner: dict = {}
+    intruder: dict = {}
+    target = Path(save_datamodel('{"model": "b"}', session_state=owner)["path"])
+    save_datamodel('{"model": "a"}', session_state=intruder)
+
+    for name in (f"../{target.parent.name}/{target.name}", str(target), "..", ""):
+        with pytest.raises(ValueError):
+            save_datamodel('{"model": "a"}', filename=name, session_state=intruder)
+    with pytest.raises(ValueError):
+        operations.generate_archimate_diagram(
+            target.name,
+            output_filename=f"../{target.parent.name}/diagram.xml",
+            validate=False,
+            session_state=intruder,
+        )
+
+    assert json.loads(target.read_text(encoding="utf-8")) == {"model": "b"}
+    assert not (target.parent / "diagram.xml").exists()
+
+
+def test_generate_archimate_diagram_reads_only_own_session_datamodel(tmp_path, monkeypatch):
+    monkeypatch.setattr(operations, "OUTPUT_DIR", tmp_path / "outputs")
+    monkeypatch.chdir(tmp_path)
+    owner: dict = {}
+    intruder: dict = {}
+    target = Path(save_datamodel('{"model": "b"}', session_state=owner)["path"])
+    (tmp_path / "solto.json").write_text('{"model": "c"}', encoding="utf-8")
+
+    # caminho absoluto, relativo à raiz de saída ou ao cwd: nada fora da própria sessão
+    for name in (str(target), f"outputs/sessions/{target.parent.name}/{target.name}", "solto.json"):
+        with pytest.raises(ValueError):
+            operations.generate_archimate_diagram(name, validate=False, session_state=intruder)
+    # sem sessão, o diretório de uma sessão também fica de fora
+    with pytest.raises(ValueError):
+        operations.generate_archimate_diagram(str(target), validate=False)
+    assert not list((tmp_path / "outputs" / "sessions").glob("*/*.xml"))
@@ -0,0 +1,117 @@
+from __future__ import annotations
+from pathlib import Path
+import base64
+import sys
+from xml.etree import ElementTree as ET
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+from unittest import mock
+
+from tools.diagramador import (
+    DEFAULT_TEMPLATE,
+    ViewDiagram,
+    generate_mermaid_preview,
+    render_view_svg,
+)
+from tools.diagramador import operations
+
+SVG_NS = "{http://www.w3.org/2000/svg}"
+SAMPLE_TEMPLATE = operations._resolve_package_path(DEFAULT_TEMPLATE)
+SAMPLE_DATAMODEL = operations._resolve_package_path(
+    Path("tools/archimate_exchange/samples/pix_solution_case/pix_container_datamodel.json")
+)
+
+
+def _view() -> ViewDiagram:
+    return ViewDiagram.from_dict(
+        {
+            "id": "view-1",
+            "name": {"text": "Visão <teste>"},
+            "nodes": [
+                {
+                    "id": "group",
+                    "type": "Container",
+                    "bounds": {"x": 100, "y": 100, "w": 400, "h": 200},
+                    "label": {"text": "Camada"},
+                    "style": {"fillColor": {"r": 255, "g": 0, "b": 0, "a": 50}},
+                    "nodes": [
+                        {
+                            "id": "n1",
+                            "type": "Element",
+                            "elementRef": "app",
+                            "bounds": {"x": 120, "y": 140, "w": 120, "h": 55},
+                        },
+                        {
+                            "id": "n2",
+                            "type": "Element",
+                            "elementRef": "svc",
+                            "bounds": {"x": 340, "y": 140, "w": 120, "h": 55},
+                        },
+                    ],
+                }
+            ],
+            "connections": [
+                {
+                    "id": "c1",
+                    "type": "Relationship",
+                    "relationshipRef": "rel",
+                    "source": "n1",
+                    "target": "n2",
+                    "points": [{"x": 290, "y": 260}],
+                }
+            ],
+        }
+    )
+
+
+def test_render_view_svg_uses_bounds_styles_and_bendpoints():
+    svg = render_view_svg(
+        _view(),
+        {"app": {"name": "App & Cia", "type": "ApplicationComponent"}},
+        {"rel": {"type": "Serving"}},
+    )
+    root = ET.fromstring(svg)
+
+    assert root.get("viewBox") == "80 80 440 240"
+    groups = {group.get("id"): group for group in root.iter(f"{SVG_NS}g")}
+    container_rect = groups["group"].find(f"{SVG_NS}rect")
+    assert container_rect.get("fill") == "#ff0000"
+    assert container_rect.get("fill-opacity") == "0.5"
+    element_rect = groups["n1"].find(f"{SVG_NS}rect")
+    assert element_rect.get("fill") == "#b5ffff"
+    assert "App & Cia" in "".join(groups["n1"].find(f"{SVG_NS}text").itertext())
+    # sem nome no índice, o rótulo cai para a referência do elemento
+    assert "svc" in "".join(groups["n2"].find(f"{SVG_NS}text").itertext())
+
+    polyline = groups["c1"].find(f"{SVG_NS}polyline")
+    points = [tuple(map(float, pair.split(","))) for pair in polyline.get("points").split()]
+    assert points[1] == (290.0, 260.0)
+    assert 120 <= points[0][0] <= 240 and 140 <= points[0][1] <= 195
+    assert 340 <= points[-1][0] <= 460 and 140 <= points[-1][1] <= 195
+    assert polyline.get("marker-end") == "url(#arrow-open)"
+
+
+def test_generate_mermaid_preview_renders_offline_svg(tmp_path):
+    payload = SAMPLE_DATAMODEL.read_text(encoding="utf-8")
+    with mock.patch.object(operations, "OUTPUT_DIR", tmp_path), mock.patch.object(
+        operations.requests, "post"
+    ) as post, mock.patch.object(operations, "_mermaid_validation_request") as validate:
+        result = generate_mermaid_preview(
+            payload, template_path=str(SAMPLE_TEMPLATE), image_source="svg", image_payload="inline"
+        )
+
+    post.assert_not_called()
+    validate.assert_not_called()
+    assert result["views"]
+    for view in result["views"]:
+        image = view["image"]
+        assert image["source"] == "svg"
+        assert image["mime_type"] == "image/svg+xml"
+        path = Path(image["path"])
+        assert path.parent == tmp_path and path.suffix == ".svg"
+        encoded = image["data_uri"].split(",", 1)[1]
+        assert base64.b64decode(encoded) == path.read_bytes()
+        ET.fromstring(path.read_bytes())
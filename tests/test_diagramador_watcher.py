@@ -0,0 +1,122 @@
+from __future__ import annotations
+from pathlib import Path
+import shutil
+import sys
+import time
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+
+import pytest
+
+from tools.archimate_exchange import xml_exchange
+from tools.diagramador import DEFAULT_TEMPLATE, TemplateWatcher, list_templates
+from tools.diagramador import operations
+from tools.diagramador.cache import FileCache
+
+SAMPLE_TEMPLATE = operations._resolve_package_path(DEFAULT_TEMPLATE)
+
+
+@pytest.fixture()
+def template_dir(tmp_path) -> Path:
+    target = tmp_path / "templates" / "demo"
+    target.mkdir(parents=True)
+    shutil.copy(SAMPLE_TEMPLATE, target / "layout_template.xml")
+    yield tmp_path / "templates"
+    operations.invalidate_template_caches([tmp_path])
+
+
+def _rename_model(path: Path, name: str) -> None:
+    text = path.read_text(encoding="utf-8")
+    start = text.index("<name", text.index("<model"))
+    start = text.index(">", start) + 1
+    end = text.index("</name>", start)
+    path.write_text(text[:start] + name + text[end:], encoding="utf-8")
+
+
+def test_file_cache_reloads_when_signature_changes(tmp_path):
+    cache = FileCache("test_reload")
+    target = tmp_path / "value.txt"
+    target.write_text("a", encoding="utf-8")
+    loads = []
+
+    def loader(path: Path) -> str:
+        loads.append(path)
+        return path.read_text(encoding="utf-8")
+
+    assert cache.get(target, loader) == "a"
+    assert cache.get(target, loader) == "a"
+    target.write_text("bb", encoding="utf-8")
+    assert cache.get(target, loader) == "bb"
+    assert len(loads) == 2
+    assert cache.invalidate([tmp_path]) == 1
+    assert len(cache) == 0
+
+
+def test_file_cache_and_xml_exchange_share_overlap_rules(tmp_path):
+    cache = FileCache("test_overlap")
+    xsd_dir = tmp_path / "schemas"
+    xsd_dir.mkdir()
+    # entrada indexada por diretório: um arquivo dentro dele também a invalida
+    cache.get(xsd_dir, lambda path: "dir")
+    assert cache.invalidate([xsd_dir / "archimate3_Model.xsd"]) == 1
+    cache.get(xsd_dir, lambda path: "dir")
+    assert cache.invalidate([tmp_path / "schemas-old"]) == 0
+
+    key, target = str(xsd_dir), str(xsd_dir / "archimate3_Model.xsd")
+    assert xml_exchange.paths_overlap(key, [target]) and xml_exchange.paths_overlap(target, [key])
+    assert not xml_exchange.paths_overlap(key, [str(tmp_path / "schemas-old")])
+
+
+def test_template_tree_is_cached_and_copied():
+    first = xml_exchange.load_template_tree(SAMPLE_TEMPLATE)
+    second = xml_exchange.load_template_tree(SAMPLE_TEMPLATE)
+    assert first is not second
+    first.getroot().set("identifier", "changed")
+    assert second.getroot().get("identifier") != "changed"
+    assert xml_exchange.invalidate_caches([SAMPLE_TEMPLATE]) >= 1
+
+
+@pytest.mark.parametrize("backend", ["polling", "inotify"])
+def test_watcher_invalidates_and_prewarms_changed_template(template_dir, backend):
+    template = template_dir / "demo" / "layout_template.xml"
+    operations._load_template_model(template)
+    assert operations._TEMPLATE_MODEL_CACHE.peek(template) is not None
+
+    changes = []
+    prewarmed = []
+
+    def on_change(paths):
+        changes.append(paths)
+        operations.invalidate_template_caches(paths)
+
+    def prewarm(paths):
+        prewarmed.extend(operations.prewarm_template_caches(paths))
+
+    watcher = TemplateWatcher(
+        [template_dir], on_change=on_change, prewarm=prewarm, interval=0.05, backend=backend
+    ).start()
+    try:
+        if backend == "inotify" and watcher.backend_name != "inotify":
+            pytest.skip("inotify indisponível nesta plataforma")
+        time.sleep(0.1)
+        _rename_model(template, "Modelo Renomeado")
+        deadline = time.monotonic() + 5
+        while not prewarmed and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+
+    assert any(str(template) in paths for paths in changes)
+    assert str(template) in prewarmed
+    model = operations._TEMPLATE_MODEL_CACHE.peek(template)
+    assert model.model_name.text == "Modelo Renomeado"
+
+
+def test_list_templates_reflects_new_files(template_dir):
+    first = list_templates(str(template_dir))
+    shutil.copy(SAMPLE_TEMPLATE, template_dir / "demo" / "copy_template.xml")
+    second = list_templates(str(template_dir))
+    assert second["count"] == first["count"] + 1
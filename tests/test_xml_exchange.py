@@ -0,0 +1,357 @@
+from __future__ import annotations
+from pathlib import Path
+import json
+import shutil
+import subprocess
+import sys
+import textwrap
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "agents" / "diagramador"))
+import sitecustomize  # noqa: F401  # Ensure stub packages are available before imports
+
+import pytest
+
+from tools.archimate_exchange import xml_exchange
+from tools.diagramador import DEFAULT_TEMPLATE, DEFAULT_XSD_DIR
+from tools.diagramador import operations
+
+SAMPLE_TEMPLATE = operations._resolve_package_path(DEFAULT_TEMPLATE)
+SAMPLE_XSD_DIR = operations._resolve_package_path(DEFAULT_XSD_DIR)
+SAMPLE_DATAMODEL = operations._resolve_package_path(
+    Path("tools/archimate_exchange/samples/pix_solution_case/pix_container_datamodel.json")
+)
+
+
+@pytest.fixture()
+def datamodel_dir(tmp_path) -> Path:
+    models = tmp_path / "models"
+    models.mkdir()
+    shutil.copy(SAMPLE_DATAMODEL, models / "pix_a.json")
+    shutil.copy(SAMPLE_DATAMODEL, models / "pix_b.json")
+    (models / "broken.json").write_text("{ not json", encoding="utf-8")
+    return models
+
+
+def test_resolve_batch_inputs_accepts_directory_and_glob(datamodel_dir):
+    from_dir = xml_exchange._resolve_batch_inputs(datamodel_dir)
+    from_glob = xml_exchange._resolve_batch_inputs(str(datamodel_dir / "pix_*.json"))
+    assert [p.name for p in from_dir] == ["broken.json", "pix_a.json", "pix_b.json"]
+    assert [p.name for p in from_glob] == ["pix_a.json", "pix_b.json"]
+
+
+def test_load_manifest_resolves_relative_entries(datamodel_dir):
+    manifest = datamodel_dir / "manifest.json"
+    manifest.write_text(
+        json.dumps(["pix_a.json", {"model": "pix_b.json", "out": "custom/b.xml"}]),
+        encoding="utf-8",
+    )
+    entries = xml_exchange._load_manifest(manifest)
+    assert entries[0] == (datamodel_dir / "pix_a.json", None)
+    assert entries[1] == (datamodel_dir / "pix_b.json", datamodel_dir / "custom" / "b.xml")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_batch_reports_per_file_status(datamodel_dir, tmp_path, workers):
+    entries = [(path, None) for path in xml_exchange._resolve_batch_inputs(datamodel_dir)]
+    summary = xml_exchange.run_batch(
+        entries,
+        SAMPLE_TEMPLATE,
+        tmp_path / "out",
+        xsd_dir=SAMPLE_XSD_DIR,
+        workers=workers,
+    )
+    assert summary["total"] == 3
+    assert summary["succeeded"] == 2
+    assert summary["failed"] == 1
+    by_name = {Path(item["model"]).name: item for item in summary["files"]}
+    assert by_name["broken.json"]["status"] == "error"
+    assert by_name["pix_a.json"]["valid"] is True
+    assert by_name["pix_a.json"]["validate_ms"] >= 0
+    assert Path(by_name["pix_b.json"]["out"]).exists()
+    json.dumps(summary)
+
+
+def test_watch_batch_keeps_output_name_per_input(tmp_path):
+    entries = []
+    for folder in ("a", "b"):
+        (tmp_path / folder).mkdir()
+        shutil.copy(SAMPLE_DATAMODEL, tmp_path / folder / "x.json")
+        entries.append((tmp_path / folder / "x.json", None))
+    summaries = []
+
+    def collect():
+        if summaries:
+            # só b/x.json muda no segundo ciclo
+            with open(entries[1][0], "a", encoding="utf-8") as handle:
+                handle.write("\n")
+        return list(entries)
+
+    xml_exchange._watch_batch(
+        collect,
+        SAMPLE_TEMPLATE,
+        tmp_path / "out",
+        xsd_dir=None,
+        workers=1,
+        interval=0,
+        emit=summaries.append,
+        max_cycles=2,
+    )
+
+    first = {item["model"]: item["out"] for item in summaries[0]["files"]}
+    assert sorted(Path(out).name for out in first.values()) == ["x.xml", "x_1.xml"]
+    assert [(item["model"], item["out"]) for item in summaries[1]["files"]] == [
+        (str(entries[1][0]), first[str(entries[1][0])])
+    ]
+
+
+def _mutated_template(tmp_path, mutate) -> Path:
+    tree = xml_exchange.load_template_tree(SAMPLE_TEMPLATE)
+    mutate(tree.getroot())
+    target = tmp_path / "mutated.xml"
+    tree.write(str(target), encoding="utf-8", xml_declaration=True)
+    return target
+
+
+def _first(root, path: str):
+    ns = {"a": xml_exchange.ARCHI_NS}
+    return root.find(path, ns)
+
+
+def test_prevalidate_structure_accepts_valid_template():
+    ok, errors = xml_exchange.prevalidate_structure(SAMPLE_TEMPLATE, SAMPLE_XSD_DIR)
+    assert ok, errors
+    rules = xml_exchange.load_structural_rules(SAMPLE_XSD_DIR)
+    assert rules is xml_exchange.load_structural_rules(SAMPLE_XSD_DIR)
+    assert {"Element", "Container", "Label"} == set(rules.concrete["ViewNodeType"])
+    assert "Serving" in rules.concrete["RelationshipType"]
+    assert "ServingRelationship" not in rules.concrete["RelationshipType"]
+
+
+@pytest.mark.parametrize(
+    ("mutate", "expected"),
+    [
+        (
+            lambda root: _first(root, "a:relationships/a:relationship").set(
+                xml_exchange.XSI_TYPE, "ServingRelationship"
+            ),
+            "xsi:type 'ServingRelationship' inválido para <relationship>",
+        ),
+        (
+            lambda root: root.findall(
+                "a:elements/a:element", {"a": xml_exchange.ARCHI_NS}
+            )[1].set(
+                "identifier", _first(root, "a:elements/a:element").get("identifier")
+            ),
+            "identificador duplicado",
+        ),
+        (
+            lambda root: root.append(root.find("{%s}name" % xml_exchange.ARCHI_NS)),
+            "<name> fora de ordem",
+        ),
+        (
+            lambda root: _first(root, "a:relationships/a:relationship").attrib.pop("source"),
+            "atributo obrigatório 'source' ausente",
+        ),
+        (
+            lambda root: _first(root, "a:relationships/a:relationship").set("target", "id-x"),
+            "referencia identificador inexistente 'id-x'",
+        ),
+    ],
+    ids=["relationship-type", "duplicate-id", "child-order", "required-attribute", "dangling-ref"],
+)
+def test_prevalidate_structure_reports_common_failures(tmp_path, mutate, expected):
+    target = _mutated_template(tmp_path, mutate)
+    ok, errors = xml_exchange.prevalidate_structure(target, SAMPLE_XSD_DIR)
+    assert not ok
+    assert expected in errors[0]
+
+    full_ok, _errors = xml_exchange.validate_with_full_xsd(target, SAMPLE_XSD_DIR)
+    assert full_ok is False
+
+
+def test_validate_in_stages_skips_full_xsd_after_structural_failure(tmp_path, monkeypatch):
+    target = _mutated_template(
+        tmp_path, lambda root: _first(root, "a:elements/a:element").set(xml_exchange.XSI_TYPE, "Foo")
+    )
+    calls = []
+    monkeypatch.setattr(
+        xml_exchange,
+        "validate_with_full_xsd",
+        lambda *args, **kwargs: calls.append(args) or (True, []),
+    )
+    ok, errors, stage = xml_exchange.validate_in_stages(target, SAMPLE_XSD_DIR)
+    assert (ok, stage) == (False, "structural")
+    assert len(errors) == 1
+    assert not calls
+
+    ok, _errors, stage = xml_exchange.validate_in_stages(SAMPLE_TEMPLATE, SAMPLE_XSD_DIR)
+    assert (ok, stage) == (True, "xsd")
+    assert len(calls) == 1
+
+
+@pytest.mark.skipif(not xml_exchange.LXML_AVAILABLE, reason="validação XSD requer lxml")
+def test_full_xsd_verdicts_are_reused_by_content_and_schema(tmp_path, monkeypatch):
+    xsd_dir = tmp_path / "xsd"
+    shutil.copytree(SAMPLE_XSD_DIR, xsd_dir)
+    invalid = _mutated_template(
+        tmp_path, lambda root: root.append(root.find("{%s}name" % xml_exchange.ARCHI_NS))
+    )
+    store = tmp_path / "verdicts.sqlite3"
+    expected = xml_exchange.validate_with_full_xsd(invalid, xsd_dir, verdict_cache=store)
+    assert expected[0] is False and str(invalid) in expected[1][0]
+
+    def _no_schema(_xsd_dir):
+        raise AssertionError("schema não deveria ser usado com veredicto guardado")
+
+    monkeypatch.setattr(xml_exchange, "_schema_entry", _no_schema)
+    assert xml_exchange.validate_with_full_xsd(invalid, xsd_dir, verdict_cache=store) == expected
+
+    # mesmo conteúdo em outro arquivo: as mensagens citam o arquivo da vez
+    copy = tmp_path / "copia.xml"
+    shutil.copy(invalid, copy)
+    ok, errors = xml_exchange.validate_with_full_xsd(copy, xsd_dir, verdict_cache=store)
+    assert not ok and errors == [e.replace(str(invalid), str(copy)) for e in expected[1]]
+
+    # XSD alterado invalida o veredicto
+    model_xsd = xsd_dir / "archimate3_Model.xsd"
+    model_xsd.write_bytes(model_xsd.read_bytes() + b"\n")
+    with pytest.raises(AssertionError):
+        xml_exchange.validate_with_full_xsd(invalid, xsd_dir, verdict_cache=store)
+
+
+def test_verdict_store_prunes_only_every_few_puts_and_over_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(xml_exchange, "_VERDICT_PRUNE_EVERY", 4)
+    store = xml_exchange.VerdictStore(tmp_path / "verdicts.sqlite3", max_entries=3)
+    statements: list = []
+    store._connect().set_trace_callback(statements.append)
+
+    def _rows() -> int:
+        return store._connect().execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    for index in range(6):
+        store.put(f"xml{index}", "schema", True, [])
+
+    # a 1ª gravação só conta as linhas; a 5ª poda as mais antigas; a 6ª não verifica
+    assert sum(statement.startswith("DELETE") for statement in statements) == 1
+    assert sum("COUNT(*)" in statement for statement in statements) == 2
+    assert _rows() == 4
+    assert store.get("xml0", "schema") is None and store.get("xml5", "schema") == (True, [])
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_json_stream_reader_yields_items_one_by_one(chunk_size):
+    import io
+
+    payload = json.loads(SAMPLE_DATAMODEL.read_text(encoding="utf-8"))
+    reader = xml_exchange._JsonStreamReader(io.StringIO(json.dumps(payload, indent=1)), chunk_size)
+    sections = {}
+    for key, value in reader.sections():
+        if key in xml_exchange.STREAMED_MODEL_KEYS:
+            assert not isinstance(value, list)
+            value = list(value)
+        sections[key] = value
+    assert sections == payload
+
+    # o texto em memória é percorrido direto, com o mesmo resultado
+    assert {
+        key: list(value) if key in xml_exchange.STREAMED_MODEL_KEYS else value
+        for key, value in xml_exchange.iter_model_text_sections(json.dumps(payload))
+    } == payload
+
+    for broken in ('{"elements": [1, 2', '{"elements": [{"id": "a"}]} trailing junk', "{} {}"):
+        with pytest.raises(ValueError):
+            list(xml_exchange._JsonStreamReader(io.StringIO(broken), chunk_size).sections())
+        with pytest.raises(ValueError):
+            list(xml_exchange.iter_model_text_sections(broken))
+    assert list(xml_exchange.iter_model_text_sections('{"elements": []} \n')) != []
+
+
+def test_patch_template_with_model_streams_elements_and_relations(tmp_path, monkeypatch):
+    payload = json.loads(SAMPLE_DATAMODEL.read_text(encoding="utf-8"))
+    seen = []
+    original = xml_exchange._build_elements_tree
+
+    def build(items):
+        seen.append(type(items))
+        return original(items)
+
+    monkeypatch.setattr(xml_exchange, "_build_elements_tree", build)
+    out = xml_exchange.patch_template_with_model(SAMPLE_TEMPLATE, SAMPLE_DATAMODEL, tmp_path / "out.xml")
+
+    assert seen and seen[0] is not list
+    ok, errors = xml_exchange.prevalidate_structure(out, SAMPLE_XSD_DIR)
+    assert ok, errors
+    root = xml_exchange.ET.parse(str(out)).getroot()
+    identifiers = {el.get("identifier") for el in root.iter(xml_exchange.qn("element"))}
+    assert {item["id"] for item in payload["elements"]} <= identifiers
+
+
+def test_patch_plan_is_cached_per_template_signature(tmp_path):
+    template = tmp_path / "template.xml"
+    template.write_bytes(SAMPLE_TEMPLATE.read_bytes())
+
+    plan = xml_exchange.load_patch_plan(template)
+
+    assert plan is xml_exchange.load_patch_plan(template)
+    skeleton = plan.skeleton.getroot()
+    assert [xml_exchange._local_name(child.tag) for child in skeleton][:1] == ["views"]
+    assert [tag for _, tag in plan.slots] == ["name", "elements", "relationships", "organizations"]
+    assert skeleton[plan.views_index].find(xml_exchange.qn("diagrams")) is None
+
+    _mutated_template(tmp_path, lambda root: root.remove(_first(root, "a:organizations")))
+    template.write_bytes((tmp_path / "mutated.xml").read_bytes() + b"\n")
+    assert xml_exchange.load_patch_plan(template) is not plan
+    assert xml_exchange.invalidate_caches([template]) >= 1
+
+
+def test_patch_plan_inserts_missing_sections_in_schema_order(tmp_path):
+    def strip(root):
+        for tag in ("name", "elements", "relationships", "views"):
+            root.remove(_first(root, f"a:{tag}"))
+
+    template = _mutated_template(tmp_path, strip)
+    out = xml_exchange.patch_template_with_model(template, SAMPLE_DATAMODEL, tmp_path / "out.xml")
+
+    root = xml_exchange.ET.parse(str(out)).getroot()
+    order = [xml_exchange._local_name(child.tag) for child in root]
+    assert order == ["name", "elements", "relationships", "organizations", "views"]
+    views = [xml_exchange._local_name(child.tag) for child in _first(root, "a:views")]
+    assert views == ["viewpoints", "diagrams"]
+    ok, errors = xml_exchange.prevalidate_structure(out, SAMPLE_XSD_DIR)
+    assert ok, errors
+
+
+def test_stdlib_fallback_serializer_indents_without_reparsing(tmp_path):
+    script = textwrap.dedent(
+        f"""
+        import json, sys
+        sys.modules["lxml"] = None
+        sys.path.insert(0, {str(REPO_ROOT / "agents" / "diagramador")!r})
+        from tools.archimate_exchange import xml_exchange
+        assert not xml_exchange.LXML_AVAILABLE
+        payload = json.loads(open({str(SAMPLE_DATAMODEL)!r}, encoding="utf-8").read())
+        payload["elements"][0]["documentation"] = {{"text": "linha 1\\nlinha 2"}}
+        model = {str(tmp_path / "model.json")!r}
+        json.dump(payload, open(model, "w", encoding="utf-8"))
+        out = xml_exchange.patch_template_with_model({str(SAMPLE_TEMPLATE)!r}, model, {str(tmp_path / "out.xml")!r})
+        tree = xml_exchange.load_template_tree({str(SAMPLE_TEMPLATE)!r})
+        before = [(el.text, el.tail) for el in tree.iter()]
+        xml_exchange._serialize_tree(tree)
+        assert before == [(el.text, el.tail) for el in tree.iter()]
+        """
+    )
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=tmp_path)
+
+    text = (tmp_path / "out.xml").read_text(encoding="utf-8")
+    lines = text.splitlines()
+    assert lines[0] == '<?xml version="1.0" encoding="utf-8"?>'
+    assert lines[1].startswith('<ns0:model xmlns:ns0="%s"' % xml_exchange.ARCHI_NS)
+    assert 'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"' in lines[1]
+    assert lines[2].startswith("  <ns0:name")
+    # sem as linhas só de espaços que o reparse com minidom deixava
+    assert not any(line and not line.strip() for line in lines)
+    assert "linha 1&#xD;\nlinha 2" in text
+    ok, errors = xml_exchange.prevalidate_structure(tmp_path / "out.xml", SAMPLE_XSD_DIR)
+    assert ok, errors